@@ -5,8 +5,18 @@ Asset Providers Package
 
 from .base import AssetProvider, AssetInfo, DriverAsset, UpdateAsset, SBIAsset, AssetType, DriverType, UpdateType
 from .local import LocalAssetProvider
+from .remote import RemoteAssetProvider, RemoteAssetError
+from .hybrid import HybridAssetProvider
+from .catalog import AssetCatalog, CatalogEntry, CompatibilityIndex, get_asset_catalog
+from .manifest import PackageManifest, get_package_manifest
+from .factory import create_asset_provider, build_provider_settings
+from .watcher import AssetWatcher
 
 __all__ = [
     'AssetProvider', 'AssetInfo', 'DriverAsset', 'UpdateAsset', 'SBIAsset',
-    'AssetType', 'DriverType', 'UpdateType', 'LocalAssetProvider'
+    'AssetType', 'DriverType', 'UpdateType', 'LocalAssetProvider',
+    'RemoteAssetProvider', 'RemoteAssetError', 'HybridAssetProvider',
+    'AssetCatalog', 'CatalogEntry', 'CompatibilityIndex', 'get_asset_catalog',
+    'PackageManifest', 'get_package_manifest',
+    'create_asset_provider', 'build_provider_settings', 'AssetWatcher'
 ]
\ No newline at end of file
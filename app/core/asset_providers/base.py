@@ -90,9 +90,19 @@ class SBIAsset(AssetInfo):
 class AssetProvider(ABC):
     """Abstract base class for asset providers."""
     
+    # Providers that record SHA-256 digests of their assets override this
+    asset_digests: bool = False
+    
     @abstractmethod
-    async def get_drivers(self, device_family: str, os_id: int) -> List[DriverAsset]:
-        """Get drivers for specific device family and OS."""
+    async def get_drivers(self, device_family: str, os_id: int,
+                          driver_family_ids: Optional[List[int]] = None,
+                          device_ids: Optional[List[int]] = None) -> List[DriverAsset]:
+        """Get drivers for specific device family and OS.
+
+        ``driver_family_ids`` restricts the result to the families requested by
+        the device profile; ``device_ids`` overrides the device ids resolved
+        for ``device_family``.
+        """
         pass
     
     @abstractmethod 
@@ -113,4 +123,28 @@ class AssetProvider(ABC):
     @abstractmethod
     async def validate_asset(self, asset: AssetInfo) -> bool:
         """Validate asset integrity."""
-        pass
\ No newline at end of file
+        pass
+    
+    async def digest_assets(self, assets: List[AssetInfo]) -> Dict[str, Optional[str]]:
+        """Compute asset digests (name -> sha256 or None if verification failed)."""
+        return {}
+    
+    def get_discovery_timings(self) -> Dict[str, Any]:
+        """Get timings of the last discovery calls."""
+        return {}
+    
+    def start_prefetch(self) -> None:
+        """Start fetching deferred assets in the background (no-op for local providers)."""
+        pass
+    
+    async def wait_for_prefetch(self) -> None:
+        """Wait until deferred assets are available locally."""
+        pass
+    
+    def get_fetch_stats(self) -> Dict[str, Any]:
+        """Get cache hit/miss and transfer statistics for the current job."""
+        return {}
+    
+    def release(self) -> None:
+        """Release cached assets held for the current job (no-op for local providers)."""
+        pass
@@ -0,0 +1,566 @@
+"""
+Asset Catalog - Persistent SQLite index of driver and update packages
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import List, Dict, Optional, Any, Iterable, Set
+from dataclasses import dataclass, field
+from datetime import datetime
+import logging
+
+from .manifest import dir_mtimes_current, is_manifest_file
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CATALOG_PATH = Path("runtime/data/kassia_asset_catalog.db")
+
+
+def _map_shared(func, items: List[Any], executor: Optional[Executor], workers: int) -> List[Any]:
+    """Map ``func`` over ``items`` with up to ``workers`` threads of a shared pool.
+
+    The calling thread works through the items as well, and helpers that have
+    not started when it runs out of items are cancelled. A caller that is itself
+    running on ``executor`` therefore never waits for work queued behind it.
+    """
+    if executor is None or workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    results: List[Any] = [None] * len(items)
+    remaining = iter(enumerate(items))
+    lock = threading.Lock()
+
+    def drain():
+        while True:
+            with lock:
+                position, item = next(remaining, (None, None))
+            if position is None:
+                return
+            results[position] = func(item)
+
+    helpers = [executor.submit(drain) for _ in range(min(workers, len(items)) - 1)]
+    drain()
+    for helper in helpers:
+        if not helper.cancel():
+            helper.result()
+    return results
+
+
+@dataclass
+class CatalogEntry:
+    """Indexed package configuration."""
+    config_path: Path
+    kind: str  # "driver" or "update"
+    config: Dict[str, Any]
+    config_mtime: float
+    config_size: int
+    dir_mtime: float
+    details: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def package_dir(self) -> Path:
+        return self.config_path.parent
+
+    @property
+    def supported_os(self) -> List[int]:
+        return self.config.get('supportedOperatingSystems', []) or []
+
+    @property
+    def supported_devices(self) -> List[int]:
+        return self.config.get('supportedDevices', []) or []
+
+    @property
+    def family_id(self) -> Optional[int]:
+        return self.config.get('driverFamilyId')
+
+
+@dataclass
+class RefreshStats:
+    """Result of a catalog refresh."""
+    scanned: int = 0
+    parsed: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    failed: int = 0
+    duration: float = 0.0
+    updated_paths: List[str] = field(default_factory=list)
+    removed_paths: List[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return self.parsed > 0 or self.removed > 0
+
+
+class CompatibilityIndex:
+    """Inverted index of catalog entries by OS id, device id and driver family.
+
+    Entries with an empty ``supportedOperatingSystems`` or ``supportedDevices``
+    list are kept in separate "any" sets so they match every OS or device.
+    """
+
+    def __init__(self, entries: Iterable[CatalogEntry]):
+        self.entries: Dict[str, CatalogEntry] = {}
+        self.by_os: Dict[int, Set[str]] = {}
+        self.by_device: Dict[int, Set[str]] = {}
+        self.by_family: Dict[int, Set[str]] = {}
+        self.any_os: Set[str] = set()
+        self.any_device: Set[str] = set()
+
+        for entry in entries:
+            key = str(entry.config_path)
+            self.entries[key] = entry
+
+            if entry.supported_os:
+                for os_id in entry.supported_os:
+                    self.by_os.setdefault(os_id, set()).add(key)
+            else:
+                self.any_os.add(key)
+
+            if entry.supported_devices:
+                for device_id in entry.supported_devices:
+                    self.by_device.setdefault(device_id, set()).add(key)
+            else:
+                self.any_device.add(key)
+
+            if entry.family_id is not None:
+                self.by_family.setdefault(entry.family_id, set()).add(key)
+
+    def lookup(self, os_id: Optional[int] = None,
+               device_ids: Optional[Iterable[int]] = None,
+               family_ids: Optional[Iterable[int]] = None) -> List[CatalogEntry]:
+        """Get entries matching all given criteria.
+
+        ``None`` means "no filter". When ``family_ids`` is given, only entries
+        belonging to one of those families are returned.
+        """
+        keys = set(self.entries)
+
+        if os_id is not None:
+            keys &= self.by_os.get(os_id, set()) | self.any_os
+
+        if device_ids is not None:
+            matching = set(self.any_device)
+            for device_id in device_ids:
+                matching |= self.by_device.get(device_id, set())
+            keys &= matching
+
+        if family_ids is not None:
+            matching = set()
+            for family_id in family_ids:
+                matching |= self.by_family.get(family_id, set())
+            keys &= matching
+
+        return [self.entries[key] for key in keys]
+
+    def get_index_info(self) -> Dict[str, int]:
+        """Get index statistics."""
+        return {
+            'entries': len(self.entries),
+            'os_ids': len(self.by_os),
+            'device_ids': len(self.by_device),
+            'families': len(self.by_family)
+        }
+
+
+class AssetCatalog:
+    """On-disk catalog of package configurations with incremental rescans.
+
+    Packages are keyed by config path and invalidated by config mtime/size and
+    the mtime of the package directory, so a rescan only re-parses packages
+    whose directories actually changed. Files added or removed further down a
+    package only change the mtime of their own directory; a parser that
+    depends on them returns the package's directory mtimes as ``dir_mtimes``
+    in its details, and the entry is re-parsed when any of them changed.
+    """
+
+    def __init__(self, db_path: Path = DEFAULT_CATALOG_PATH):
+        self.db_path = Path(db_path)
+        self.generation = 0
+        self._entries: Dict[str, CatalogEntry] = {}
+        self._loaded_roots: set = set()
+        self._indexes: Dict[tuple, tuple] = {}
+        self._refresh_locks: Dict[tuple, threading.Lock] = {}
+        self._watched: Dict[tuple, Optional[str]] = {}
+        self._lock = threading.RLock()
+        self.init_database()
+
+    def init_database(self):
+        """Initialize catalog schema."""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS catalog_entries (
+                    config_path TEXT PRIMARY KEY,
+                    root TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    config_mtime REAL NOT NULL,
+                    config_size INTEGER NOT NULL,
+                    dir_mtime REAL NOT NULL,
+                    config TEXT NOT NULL,
+                    details TEXT,
+                    indexed_at TEXT NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_catalog_root ON catalog_entries (root, kind)')
+            conn.commit()
+
+    # Public API
+
+    def refresh(self, root: Path, kind: str, parser=None, parser_tag: Optional[str] = None,
+                workers: int = 1, executor: Optional[Executor] = None) -> RefreshStats:
+        """Bring the index for a package root up to date.
+
+        ``parser`` is called as ``parser(config_path, config)`` for packages
+        that need re-parsing and returns extra details stored alongside the
+        configuration (e.g. detected driver type). Entries indexed with a
+        different ``parser_tag`` are re-parsed as well. With an ``executor`` and
+        ``workers`` > 1, package directories are scanned and parsed on up to
+        ``workers`` threads of that (shared) pool.
+        """
+        root = Path(root)
+        return self._refresh(root, kind, self._scan_packages(root, workers, executor), [str(root)],
+                             parser, parser_tag, workers, executor)
+
+    def refresh_paths(self, root: Path, kind: str, paths: Iterable[Path], parser=None,
+                      parser_tag: Optional[str] = None, workers: int = 1,
+                      executor: Optional[Executor] = None) -> RefreshStats:
+        """Re-index only the top-level directories of a root that contain ``paths``.
+
+        Used for change notifications: packages in the affected subtrees are
+        re-parsed even if their directory mtime is unchanged, because the
+        change may be further down the tree.
+        """
+        root = Path(root)
+        scopes = set()
+        for path in paths:
+            try:
+                relative = Path(path).relative_to(root)
+            except ValueError:
+                continue
+            if not relative.parts:
+                return self.refresh(root, kind, parser, parser_tag, workers, executor)
+            scopes.add(root / relative.parts[0])
+
+        if not scopes:
+            return RefreshStats()
+
+        def scan():
+            for scope in sorted(scopes):
+                if scope.is_dir():
+                    yield from self._scan_tree(scope)
+                elif (scope.is_file() and scope.name.lower().endswith('.json')
+                      and not is_manifest_file(scope.name)):
+                    yield scope, scope.stat(), root.stat().st_mtime
+
+        return self._refresh(root, kind, scan(), [str(scope) for scope in scopes],
+                             parser, parser_tag, workers, executor, force=True)
+
+    def scan_configs(self, root: Path) -> List[Path]:
+        """Package configuration files below ``root``, found the same way ``refresh`` finds them."""
+        return sorted(config_path for config_path, _, _ in self._scan_packages(Path(root)))
+
+    def set_watched(self, root: Path, kind: str, watched: bool = True,
+                    parser_tag: Optional[str] = None) -> None:
+        """Mark a root as kept current by a change watcher (or clear the mark)."""
+        key = (str(Path(root)), kind)
+        with self._lock:
+            if watched:
+                self._watched[key] = parser_tag
+            else:
+                self._watched.pop(key, None)
+
+    def is_watched(self, root: Path, kind: str, parser_tag: Optional[str] = None) -> bool:
+        """Whether a watcher keeps this root current, so discovery can skip the rescan."""
+        key = (str(Path(root)), kind)
+        with self._lock:
+            return key in self._watched and self._watched[key] == parser_tag
+
+    def get_entries(self, root: Path, kind: str) -> List[CatalogEntry]:
+        """Get indexed entries below a package root."""
+        root_key = str(Path(root))
+        with self._lock:
+            self._ensure_loaded(root_key, kind)
+            return [entry for path, entry in self._entries.items()
+                    if entry.kind == kind and self._under_root(path, root_key)]
+
+    def query(self, root: Path, kind: str, os_id: Optional[int] = None,
+              device_ids: Optional[Iterable[int]] = None,
+              family_ids: Optional[Iterable[int]] = None) -> List[CatalogEntry]:
+        """Get indexed entries compatible with an OS, devices and driver families."""
+        return self.get_index(root, kind).lookup(os_id, device_ids, family_ids)
+
+    def get_index(self, root: Path, kind: str) -> CompatibilityIndex:
+        """Get the compatibility index for a package root.
+
+        The index is rebuilt only when the catalog generation changes.
+        """
+        key = (str(Path(root)), kind)
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached and cached[0] == self.generation:
+                return cached[1]
+
+            index = CompatibilityIndex(self.get_entries(root, kind))
+            self._indexes[key] = (self.generation, index)
+            logger.debug(f"Compatibility index built for {root} ({kind}): {index.get_index_info()}")
+            return index
+
+    def clear(self) -> None:
+        """Drop all indexed entries."""
+        with self._lock:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute('DELETE FROM catalog_entries')
+                conn.commit()
+            self._entries.clear()
+            self._loaded_roots.clear()
+            self._indexes.clear()
+            self.generation += 1
+
+    def get_catalog_info(self) -> Dict[str, Any]:
+        """Get catalog statistics."""
+        with self._lock:
+            kinds: Dict[str, int] = {}
+            for entry in self._entries.values():
+                kinds[entry.kind] = kinds.get(entry.kind, 0) + 1
+            return {
+                'catalog_path': str(self.db_path),
+                'generation': self.generation,
+                'entries': len(self._entries),
+                'entries_by_kind': kinds,
+                'loaded_roots': sorted(r for r, _ in self._loaded_roots),
+                'watched_roots': sorted(r for r, _ in self._watched)
+            }
+
+    # Helper methods
+
+    def _scan_packages(self, root: Path, workers: int = 1, executor: Optional[Executor] = None):
+        """Yield (config_path, stat, dir_mtime) for each package config.
+
+        A directory containing a JSON configuration is treated as a package
+        root, so large driver trees below it are never walked. Top-level
+        directories are scanned in parallel on ``executor`` when ``workers`` > 1.
+        """
+        if not root.exists():
+            return
+
+        listing = self._list_directory(root)
+        if listing is None:
+            return
+        dir_mtime, configs, subdirs = listing
+
+        for entry in configs:
+            yield Path(entry.path), entry.stat(), dir_mtime
+
+        if executor is not None and workers > 1 and len(subdirs) > 1:
+            for results in _map_shared(lambda d: list(self._scan_tree(d)), subdirs, executor, workers):
+                yield from results
+        else:
+            for subdir in subdirs:
+                yield from self._scan_tree(subdir)
+
+    def _scan_tree(self, start: Path):
+        """Scan a directory tree below the catalog root, stopping at package roots."""
+        pending = [start]
+        while pending:
+            directory = pending.pop()
+            listing = self._list_directory(directory)
+            if listing is None:
+                continue
+            dir_mtime, configs, subdirs = listing
+
+            for entry in configs:
+                yield Path(entry.path), entry.stat(), dir_mtime
+
+            if not configs:
+                pending.extend(subdirs)
+
+    @staticmethod
+    def _list_directory(directory: Path):
+        """List a directory once: (dir_mtime, config entries, subdirectories)."""
+        try:
+            dir_mtime = directory.stat().st_mtime
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError as e:
+            logger.warning(f"Failed to scan asset directory {directory}: {e}")
+            return None
+
+        configs = []
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(Path(entry.path))
+                elif (entry.is_file() and entry.name.lower().endswith('.json')
+                      and not is_manifest_file(entry.name)):
+                    configs.append(entry)
+            except OSError:
+                continue
+        return dir_mtime, configs, subdirs
+
+    @staticmethod
+    def _parse_package(item, kind: str, parser, parser_tag: Optional[str]) -> Optional[CatalogEntry]:
+        """Read and parse one package configuration."""
+        config_path, config_stat, dir_mtime = item
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            details = parser(config_path, config) if parser else {}
+            if parser_tag is not None:
+                details = dict(details or {}, parser_tag=parser_tag)
+        except Exception as e:
+            logger.error(f"Failed to index package config {config_path}: {e}")
+            return None
+
+        return CatalogEntry(
+            config_path=config_path,
+            kind=kind,
+            config=config,
+            config_mtime=config_stat.st_mtime,
+            config_size=config_stat.st_size,
+            dir_mtime=dir_mtime,
+            details=details or {}
+        )
+
+    def _refresh(self, root: Path, kind: str, scanned, scopes: List[str], parser,
+                 parser_tag: Optional[str], workers: int, executor: Optional[Executor],
+                 force: bool = False) -> RefreshStats:
+        """Apply a scan of ``scopes`` (subtrees of ``root``) to the index."""
+        start = datetime.now()
+        stats = RefreshStats()
+        root_key = str(root)
+
+        with self._get_refresh_lock(root_key, kind):
+            with self._lock:
+                self._ensure_loaded(root_key, kind)
+                known = {path: entry for path, entry in self._entries.items()
+                         if entry.kind == kind and any(self._under_root(path, scope) for scope in scopes)}
+
+            seen = set()
+            pending = []
+
+            for config_path, config_stat, dir_mtime in scanned:
+                key = str(config_path)
+                seen.add(key)
+                stats.scanned += 1
+
+                entry = known.get(key)
+                if (entry and not force and entry.config_mtime == config_stat.st_mtime
+                        and entry.config_size == config_stat.st_size
+                        and entry.dir_mtime == dir_mtime
+                        and entry.details.get('parser_tag') == parser_tag
+                        and dir_mtimes_current(entry.details.get('dir_mtimes', {}))):
+                    stats.unchanged += 1
+                    continue
+                pending.append((config_path, config_stat, dir_mtime))
+
+            def parse(item):
+                return self._parse_package(item, kind, parser, parser_tag)
+
+            results = _map_shared(parse, pending, executor, workers)
+
+            changed_entries = [e for e in results if e is not None]
+            stats.parsed = len(changed_entries)
+            stats.failed = len(results) - len(changed_entries)
+
+            removed = [path for path in known if path not in seen]
+            stats.removed = len(removed)
+            stats.updated_paths = [str(e.config_path) for e in changed_entries]
+            stats.removed_paths = removed
+
+            if stats.changed:
+                with self._lock:
+                    for entry in changed_entries:
+                        self._entries[str(entry.config_path)] = entry
+                    for path in removed:
+                        self._entries.pop(path, None)
+                    self._persist(root_key, changed_entries, removed)
+                    self.generation += 1
+
+        stats.duration = (datetime.now() - start).total_seconds()
+        if stats.changed:
+            logger.info(f"Asset catalog refreshed for {root}: {stats.parsed} parsed, "
+                        f"{stats.unchanged} unchanged, {stats.removed} removed ({stats.duration:.3f}s)")
+        else:
+            logger.debug(f"Asset catalog up to date for {root} ({stats.scanned} packages)")
+        return stats
+
+    def _get_refresh_lock(self, root_key: str, kind: str) -> threading.Lock:
+        """Get the lock serializing refreshes of one package root."""
+        with self._lock:
+            return self._refresh_locks.setdefault((root_key, kind), threading.Lock())
+
+    def _ensure_loaded(self, root_key: str, kind: str) -> None:
+        """Load persisted entries for a root into memory once."""
+        if (root_key, kind) in self._loaded_roots:
+            return
+
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.row_factory = sqlite3.Row
+                cursor = conn.execute(
+                    'SELECT * FROM catalog_entries WHERE root = ? AND kind = ?',
+                    (root_key, kind)
+                )
+                for row in cursor.fetchall():
+                    try:
+                        self._entries[row['config_path']] = CatalogEntry(
+                            config_path=Path(row['config_path']),
+                            kind=row['kind'],
+                            config=json.loads(row['config']),
+                            config_mtime=row['config_mtime'],
+                            config_size=row['config_size'],
+                            dir_mtime=row['dir_mtime'],
+                            details=json.loads(row['details']) if row['details'] else {}
+                        )
+                    except json.JSONDecodeError:
+                        continue
+        except Exception as e:
+            logger.error(f"Failed to load asset catalog {self.db_path}: {e}")
+
+        self._loaded_roots.add((root_key, kind))
+
+    def _persist(self, root_key: str, changed: List[CatalogEntry], removed: List[str]) -> None:
+        """Write changed entries to disk."""
+        now = datetime.now().isoformat()
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO catalog_entries (
+                        config_path, root, kind, config_mtime, config_size,
+                        dir_mtime, config, details, indexed_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [
+                    (str(e.config_path), root_key, e.kind, e.config_mtime, e.config_size,
+                     e.dir_mtime, json.dumps(e.config), json.dumps(e.details, default=str), now)
+                    for e in changed
+                ])
+                conn.executemany('DELETE FROM catalog_entries WHERE config_path = ?',
+                                 [(path,) for path in removed])
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to persist asset catalog: {e}")
+
+    @staticmethod
+    def _under_root(path: str, root_key: str) -> bool:
+        return path == root_key or path.startswith(root_key.rstrip(os.sep) + os.sep)
+
+
+# Global catalog instances (one per database path)
+_catalog_instances: Dict[str, AssetCatalog] = {}
+_catalog_lock = threading.Lock()
+
+
+def get_asset_catalog(db_path: Path = DEFAULT_CATALOG_PATH) -> AssetCatalog:
+    """Get the shared catalog instance for a database path."""
+    key = str(Path(db_path).resolve())
+    with _catalog_lock:
+        if key not in _catalog_instances:
+            _catalog_instances[key] = AssetCatalog(Path(db_path))
+        return _catalog_instances[key]
@@ -0,0 +1,57 @@
+"""
+Asset Provider Factory - Create the provider selected in the build configuration
+"""
+
+from pathlib import Path
+from typing import Dict, Any
+import logging
+
+from .base import AssetProvider
+from .local import LocalAssetProvider
+from .remote import RemoteAssetProvider
+from .hybrid import HybridAssetProvider
+from ...models.config import (
+    AssetProviderType, BuildConfig, SharePointAssetConfig, HybridAssetConfig
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def build_provider_settings(build_config: BuildConfig) -> Dict[str, Any]:
+    """Local provider settings derived from the build configuration."""
+    return {
+        'driverRoot': build_config.driverRoot,
+        'updateRoot': build_config.updateRoot,
+        'sbiRoot': build_config.sbiRoot,
+        'yunonaPath': build_config.yunonaPath,
+        'osWimMap': build_config.osWimMap,
+        'assetCatalogPath': build_config.assetCatalogPath,
+        'trustedManifests': build_config.trustedManifests,
+        'discoveryWorkers': build_config.discoveryWorkers,
+        'assetDigests': build_config.assetDigests,
+        'digestCachePath': build_config.digestCachePath,
+        'digestWorkers': build_config.digestWorkers
+    }
+
+
+def create_asset_provider(build_config: BuildConfig, assets_path: Path = Path("assets")) -> AssetProvider:
+    """Create the asset provider configured in ``assetProvider`` (local if not configured)."""
+    provider_config = build_config.assetProvider
+    provider_type = provider_config.type if provider_config else AssetProviderType.LOCAL
+    options = provider_config.config if provider_config else {}
+
+    if provider_type == AssetProviderType.SHAREPOINT:
+        remote_config = SharePointAssetConfig(**options)
+        logger.info(f"Using remote asset provider: {remote_config.siteUrl}")
+        return RemoteAssetProvider(remote_config.dict())
+
+    local = LocalAssetProvider(assets_path, build_config=build_provider_settings(build_config))
+
+    if provider_type == AssetProviderType.HYBRID:
+        hybrid_config = HybridAssetConfig(**options)
+        logger.info(f"Using hybrid asset provider: {hybrid_config.remote.siteUrl}")
+        remote = RemoteAssetProvider(hybrid_config.remote.dict())
+        return HybridAssetProvider(local, remote, prefetch=hybrid_config.prefetch)
+
+    return local
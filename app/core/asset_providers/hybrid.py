@@ -0,0 +1,224 @@
+"""
+Hybrid Asset Provider - Local asset tree first, remote source as fallback
+"""
+
+import time
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Dict, Any
+import logging
+
+from .base import AssetProvider, DriverAsset, UpdateAsset, SBIAsset, AssetInfo
+from .local import LocalAssetProvider
+from .remote import RemoteAssetProvider, RemoteAssetError
+
+
+logger = logging.getLogger(__name__)
+
+
+class HybridAssetProvider(AssetProvider):
+    """Answers from the local asset tree and falls back to a remote source.
+
+    Drivers and updates that are only available remotely are resolved from
+    the remote index during discovery. With ``prefetch`` enabled their
+    download is deferred: ``start_prefetch()`` fetches them on a background
+    thread while the SBI is copied and mounted, and ``wait_for_prefetch()``
+    blocks only for whatever is still in flight before integration.
+    """
+
+    def __init__(self, local: LocalAssetProvider, remote: RemoteAssetProvider, prefetch: bool = True):
+        self.local = local
+        self.remote = remote
+        self.prefetch = prefetch
+        self.asset_digests = local.asset_digests
+        self.digest_cache = local.digest_cache
+
+        self._pending: List[AssetInfo] = []
+        self._prefetch_future: Optional[Future] = None
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kassia-prefetch")
+        self._lock = threading.Lock()
+        self.stats = {
+            'local_hits': 0,
+            'remote_cache_hits': 0,
+            'remote_misses': 0,
+            'remote_unavailable': 0,
+            'prefetch_seconds': 0.0,
+            'prefetch_wait_seconds': 0.0
+        }
+
+        logger.info(f"HybridAssetProvider initialized (prefetch: {prefetch})")
+
+    # AssetProvider API
+
+    async def get_drivers(self, device_family: str, os_id: int,
+                          driver_family_ids: Optional[List[int]] = None,
+                          device_ids: Optional[List[int]] = None) -> List[DriverAsset]:
+        """Get drivers from the local tree, adding remote drivers that are not present locally."""
+        local_drivers = await self.local.get_drivers(device_family, os_id, driver_family_ids, device_ids)
+        remote_drivers = await self._plan_remote(
+            self.remote.plan_drivers(device_family, os_id, driver_family_ids, device_ids)
+        )
+
+        local_names = {d.name for d in local_drivers}
+        missing = [d for d in remote_drivers if d.name not in local_names]
+        await self._resolve_remote(local_drivers, missing)
+
+        drivers = local_drivers + missing
+        drivers.sort(key=lambda d: d.order)
+        return drivers
+
+    async def get_updates(self, os_id: int) -> List[UpdateAsset]:
+        """Get updates from the local tree, adding remote updates that are not present locally."""
+        local_updates = await self.local.get_updates(os_id)
+        remote_updates = await self._plan_remote(self.remote.plan_updates(os_id))
+
+        local_names = {u.name for u in local_updates}
+        missing = [u for u in remote_updates if u.name not in local_names]
+        await self._resolve_remote(local_updates, missing)
+
+        updates = local_updates + missing
+        updates.sort(key=lambda u: u.order)
+        return updates
+
+    async def get_sbi(self, os_id: int) -> Optional[SBIAsset]:
+        """Get System Base Image, downloading it only if no local SBI exists."""
+        sbi = await self.local.get_sbi(os_id)
+        if sbi:
+            self._count('local_hits')
+            return sbi
+
+        try:
+            sbi = await self.remote.get_sbi(os_id)
+        except RemoteAssetError as e:
+            logger.warning(f"Remote SBI lookup failed: {e}")
+            self._count('remote_unavailable')
+            return None
+
+        if sbi:
+            self._count('remote_misses')
+        return sbi
+
+    async def get_yunona_scripts(self) -> List[AssetInfo]:
+        """Get Yunona scripts from the local tree, or from the remote source if none exist locally."""
+        scripts = await self.local.get_yunona_scripts()
+        if scripts:
+            return scripts
+
+        try:
+            return await self.remote.get_yunona_scripts()
+        except RemoteAssetError as e:
+            logger.warning(f"Remote Yunona lookup failed: {e}")
+            self._count('remote_unavailable')
+            return []
+
+    async def validate_asset(self, asset: AssetInfo) -> bool:
+        """Validate an asset with the provider it came from."""
+        if asset.metadata.get('source') != "remote":
+            return await self.local.validate_asset(asset)
+
+        # Deferred assets are verified against the index size and digest when downloaded
+        if self._is_pending(asset):
+            return bool(asset.metadata.get('remote_package', {}).get('files'))
+
+        return await self.remote.validate_asset(asset)
+
+    async def digest_assets(self, assets: List[AssetInfo]) -> Dict[str, Optional[str]]:
+        """Compute digests of assets that are available locally."""
+        return await self.local.digest_assets([a for a in assets if not self._is_pending(a)])
+
+    def get_discovery_timings(self) -> Dict[str, Any]:
+        return self.local.get_discovery_timings()
+
+    def start_prefetch(self) -> None:
+        """Start downloading deferred remote assets in the background."""
+        with self._lock:
+            if not self._pending or self._prefetch_future is not None:
+                return
+            assets = list(self._pending)
+            self._prefetch_future = self._prefetch_executor.submit(self._run_prefetch, assets)
+
+        logger.info(f"Prefetching {len(assets)} remote assets in the background")
+
+    async def wait_for_prefetch(self) -> None:
+        """Wait until all deferred remote assets are downloaded."""
+        while True:
+            self.start_prefetch()
+            with self._lock:
+                future = self._prefetch_future
+            if future is None:
+                return
+
+            start = time.perf_counter()
+            try:
+                await asyncio.wrap_future(future)
+            finally:
+                with self._lock:
+                    self.stats['prefetch_wait_seconds'] += time.perf_counter() - start
+                    self._prefetch_future = None
+
+    def get_fetch_stats(self) -> Dict[str, Any]:
+        """Get cache hit/miss and transfer statistics for the current job."""
+        remote = self.remote.get_cache_info()
+        with self._lock:
+            stats = dict(self.stats)
+            stats['pending'] = len(self._pending)
+
+        stats['prefetch_seconds'] = round(stats['prefetch_seconds'], 3)
+        stats['prefetch_wait_seconds'] = round(stats['prefetch_wait_seconds'], 3)
+        for key in ('files_downloaded', 'files_resumed', 'files_cached', 'bytes_downloaded', 'evictions'):
+            stats[key] = remote[key]
+        return stats
+
+    def release(self) -> None:
+        """Release the leases on remote packages held for the current job."""
+        self.remote.release()
+
+    # Helper methods
+
+    async def _plan_remote(self, plan) -> List[AssetInfo]:
+        try:
+            return await plan
+        except RemoteAssetError as e:
+            logger.warning(f"Remote asset source unavailable, using local assets only: {e}")
+            self._count('remote_unavailable')
+            return []
+
+    async def _resolve_remote(self, local_assets: List[AssetInfo], missing: List[AssetInfo]) -> None:
+        """Count cache hits and download or defer the assets that are only available remotely."""
+        cached = await asyncio.to_thread(lambda: [self.remote.is_cached(a) for a in missing])
+        to_fetch = [asset for asset, is_cached in zip(missing, cached) if not is_cached]
+
+        with self._lock:
+            self.stats['local_hits'] += len(local_assets)
+            self.stats['remote_cache_hits'] += len(missing) - len(to_fetch)
+            self.stats['remote_misses'] += len(to_fetch)
+
+        if not to_fetch:
+            return
+        if self.prefetch:
+            with self._lock:
+                self._pending.extend(to_fetch)
+            logger.info(f"Deferred download of {len(to_fetch)} remote assets")
+        else:
+            await self.remote.fetch_assets(to_fetch)
+
+    def _run_prefetch(self, assets: List[AssetInfo]) -> None:
+        start = time.perf_counter()
+        try:
+            self.remote.fetch_assets_sync(assets)
+        finally:
+            with self._lock:
+                self.stats['prefetch_seconds'] += time.perf_counter() - start
+
+        with self._lock:
+            self._pending = [a for a in self._pending if not any(a is fetched for fetched in assets)]
+        logger.info(f"Prefetched {len(assets)} remote assets in {time.perf_counter() - start:.2f}s")
+
+    def _is_pending(self, asset: AssetInfo) -> bool:
+        with self._lock:
+            return any(asset is pending for pending in self._pending)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
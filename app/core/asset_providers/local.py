@@ -3,17 +3,56 @@ Local Asset Provider Implementation - Fixed for Config Integration
 """
 
 import json
+import time
 import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 import logging
 
 from .base import AssetProvider, DriverAsset, UpdateAsset, SBIAsset, AssetInfo, AssetType, DriverType, UpdateType
+from .catalog import CatalogEntry, RefreshStats, DEFAULT_CATALOG_PATH, get_asset_catalog
+from .manifest import get_package_manifest, load_manifest_file
+from ..wim_reader import WimReader, WimReadError
+from ...utils.digest_cache import DEFAULT_DIGEST_CACHE_PATH, DigestCache, get_digest_cache
 
 
 logger = logging.getLogger(__name__)
 
 
+DEFAULT_DEVICE_FAMILY_MAPPING = Path("config/ids/deviceFamilyMapping.json")
+DEFAULT_DISCOVERY_WORKERS = 8
+
+
+# Shared discovery pools (one per worker count) so per-request providers don't spawn threads
+_discovery_executors: Dict[int, ThreadPoolExecutor] = {}
+_discovery_lock = threading.Lock()
+
+
+def get_discovery_executor(workers: int = DEFAULT_DISCOVERY_WORKERS) -> ThreadPoolExecutor:
+    """Get the bounded thread pool used for blocking asset discovery."""
+    with _discovery_lock:
+        if workers not in _discovery_executors:
+            _discovery_executors[workers] = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="kassia-discovery"
+            )
+        return _discovery_executors[workers]
+
+
+def load_device_family_mapping(mapping_path: Path) -> Dict[str, Any]:
+    """Load the familyMapping section of deviceFamilyMapping.json."""
+    if not mapping_path.exists():
+        return {}
+    try:
+        with open(mapping_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('familyMapping', {})
+    except Exception as e:
+        logger.error(f"Failed to load device family mapping {mapping_path}: {e}")
+        return {}
+
+
 class LocalAssetProvider(AssetProvider):
     """Local filesystem asset provider for development and testing."""
     
@@ -29,6 +68,13 @@ class LocalAssetProvider(AssetProvider):
             self.sbi_path = Path(build_config.get('sbiRoot', assets_path / "sbi"))
             self.yunona_path = Path(build_config.get('yunonaPath', assets_path / "yunona"))
             self.os_wim_map = build_config.get('osWimMap', {})
+            catalog_path = Path(build_config.get('assetCatalogPath', DEFAULT_CATALOG_PATH))
+            self.device_mapping_path = Path(build_config.get('deviceFamilyMappingPath', DEFAULT_DEVICE_FAMILY_MAPPING))
+            self.trusted_manifests = bool(build_config.get('trustedManifests', False))
+            self.discovery_workers = max(1, int(build_config.get('discoveryWorkers', DEFAULT_DISCOVERY_WORKERS)))
+            self.asset_digests = bool(build_config.get('assetDigests', True))
+            digest_cache_path = Path(build_config.get('digestCachePath', DEFAULT_DIGEST_CACHE_PATH))
+            digest_workers = int(build_config.get('digestWorkers', 2))
         else:
             # Fallback to default paths
             self.drivers_path = self.assets_path / "drivers"
@@ -36,6 +82,25 @@ class LocalAssetProvider(AssetProvider):
             self.sbi_path = self.assets_path / "sbi"
             self.yunona_path = self.assets_path / "yunona"
             self.os_wim_map = {}
+            catalog_path = DEFAULT_CATALOG_PATH
+            self.device_mapping_path = DEFAULT_DEVICE_FAMILY_MAPPING
+            self.trusted_manifests = False
+            self.discovery_workers = DEFAULT_DISCOVERY_WORKERS
+            self.asset_digests = True
+            digest_cache_path = DEFAULT_DIGEST_CACHE_PATH
+            digest_workers = 2
+        
+        self._device_mapping: Optional[Dict[str, Any]] = None
+        self._executor = get_discovery_executor(self.discovery_workers)
+        self.last_discovery_timings: Dict[str, float] = {}
+        
+        # Persistent package index shared by all providers using the same database
+        self.catalog = get_asset_catalog(catalog_path)
+        
+        # Persistent SHA-256 digests keyed by file identity, opened on first use
+        self.digest_cache_path = digest_cache_path
+        self._digest_workers = digest_workers
+        self._digest_cache: Optional[DigestCache] = None
         
         logger.info(f"LocalAssetProvider initialized:")
         logger.info(f"  Assets path: {self.assets_path}")
@@ -44,23 +109,155 @@ class LocalAssetProvider(AssetProvider):
         logger.info(f"  SBI path: {self.sbi_path}")
         logger.info(f"  Yunona path: {self.yunona_path}")
         logger.info(f"  OS WIM map: {self.os_wim_map}")
+        logger.info(f"  Asset catalog: {self.catalog.db_path}")
+        logger.info(f"  Trusted manifests: {self.trusted_manifests}")
+        logger.info(f"  Discovery workers: {self.discovery_workers}")
+        logger.info(f"  Asset digests: {self.asset_digests} ({self.digest_cache_path})")
     
-    async def get_drivers(self, device_family: str, os_id: int) -> List[DriverAsset]:
+    @property
+    def digest_cache(self) -> DigestCache:
+        """The digest cache; only opened (and its database created) when digests are used."""
+        if self._digest_cache is None:
+            self._digest_cache = get_digest_cache(self.digest_cache_path, workers=self._digest_workers)
+        return self._digest_cache
+    
+    async def get_drivers(self, device_family: str, os_id: int,
+                          driver_family_ids: Optional[List[int]] = None,
+                          device_ids: Optional[List[int]] = None) -> List[DriverAsset]:
         """Get drivers for specific device family and OS."""
+        return await self._run_in_pool("drivers", self._discover_drivers,
+                                       device_family, os_id, driver_family_ids, device_ids)
+    
+    async def get_updates(self, os_id: int) -> List[UpdateAsset]:
+        """Get updates for specific OS."""
+        return await self._run_in_pool("updates", self._discover_updates, os_id)
+    
+    async def get_sbi(self, os_id: int) -> Optional[SBIAsset]:
+        """Get System Base Image for OS."""
+        return await self._run_in_pool("sbi", self._discover_sbi, os_id)
+    
+    async def get_yunona_scripts(self) -> List[AssetInfo]:
+        """Get Yunona post-deployment scripts."""
+        return await self._run_in_pool("yunona_scripts", self._discover_yunona_scripts)
+    
+    async def validate_asset(self, asset: AssetInfo) -> bool:
+        """Validate asset integrity, including its content digest."""
+        is_valid = await self._run_in_pool("validation", self._validate_asset_sync, asset, accumulate=True)
+        if is_valid and self.asset_digests:
+            is_valid = await self._verify_digest(asset)
+        return is_valid
+    
+    async def digest_assets(self, assets: List[AssetInfo]) -> Dict[str, Optional[str]]:
+        """Compute (or look up) digests for assets and record them in their metadata."""
+        results = await asyncio.gather(*(self._verify_digest(a) for a in assets))
+        return {a.name: a.metadata.get('sha256') if ok else None for a, ok in zip(assets, results)}
+    
+    def get_discovery_timings(self) -> Dict[str, float]:
+        """Get per-phase timings (seconds) of the last discovery calls."""
+        return {phase: round(duration, 4) for phase, duration in self.last_discovery_timings.items()}
+    
+    def get_catalog_roots(self) -> Dict[str, Path]:
+        """Package roots indexed in the catalog, by kind."""
+        return {"driver": self.drivers_path, "update": self.updates_path}
+    
+    def refresh_catalog(self, kind: str, paths: Optional[List[Path]] = None) -> RefreshStats:
+        """Refresh the catalog for one kind, limited to the subtrees containing ``paths`` if given."""
+        root, parser, parser_tag = self._catalog_source(kind)
+        if paths is None:
+            return self.catalog.refresh(root, kind, parser, parser_tag=parser_tag,
+                                        workers=self.discovery_workers, executor=self._executor)
+        return self.catalog.refresh_paths(root, kind, paths, parser, parser_tag=parser_tag,
+                                          workers=self.discovery_workers, executor=self._executor)
+    
+    def set_catalog_watched(self, kind: str, watched: bool = True) -> None:
+        """Mark the catalog root of a kind as kept current by a watcher."""
+        root, _, parser_tag = self._catalog_source(kind)
+        self.catalog.set_watched(root, kind, watched, parser_tag=parser_tag)
+    
+    async def _verify_digest(self, asset: AssetInfo) -> bool:
+        """Record the asset's SHA-256 in its metadata and compare it to a declared digest."""
+        start = time.perf_counter()
+        try:
+            if asset.path.is_dir():
+                if asset.metadata.get('packageManifest') is not None:
+                    return True  # trusted manifests: no traversal for digests either
+                files = get_package_manifest(asset.path).files
+                digest = await self.digest_cache.digest_tree_async(asset.path, files)
+            else:
+                digest = await self.digest_cache.digest_async(asset.path)
+        except Exception as e:
+            logger.error(f"Failed to compute digest for {asset.path}: {e}")
+            return False
+        finally:
+            self.last_discovery_timings['digest'] = (
+                self.last_discovery_timings.get('digest', 0.0) + time.perf_counter() - start
+            )
+        
+        asset.metadata['sha256'] = digest
+        
+        expected = asset.metadata.get('expected_sha256')
+        if expected and expected.lower() != digest:
+            logger.error(f"Digest mismatch for {asset.path}: expected {expected}, got {digest}")
+            return False
+        return True
+    
+    async def _run_in_pool(self, phase: str, func, *args, accumulate: bool = False):
+        """Run blocking filesystem work on the discovery pool and time the phase."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+        finally:
+            duration = time.perf_counter() - start
+            if accumulate:
+                duration += self.last_discovery_timings.get(phase, 0.0)
+            self.last_discovery_timings[phase] = duration
+    
+    def _catalog_source(self, kind: str):
+        """(root, parser, parser_tag) used to index packages of a kind."""
+        if kind == "driver":
+            return (self.drivers_path, self._parse_driver_package,
+                    "trusted" if self.trusted_manifests else None)
+        return self.updates_path, self._parse_update_package, None
+    
+    def _refresh_unless_watched(self, kind: str) -> RefreshStats:
+        root, _, parser_tag = self._catalog_source(kind)
+        if self.catalog.is_watched(root, kind, parser_tag):
+            return RefreshStats()
+        return self.refresh_catalog(kind)
+    
+    def _discover_drivers(self, device_family: str, os_id: int,
+                          driver_family_ids: Optional[List[int]] = None,
+                          device_ids: Optional[List[int]] = None) -> List[DriverAsset]:
+        """Get drivers for specific device family and OS (runs on the discovery pool)."""
         drivers = []
         
         if not self.drivers_path.exists():
             logger.warning(f"Drivers path does not exist: {self.drivers_path}")
             return drivers
         
-        # Search for driver configurations
-        for config_file in self.drivers_path.rglob("*.json"):
+        if device_ids is None:
+            device_ids = self._resolve_device_ids(device_family)
+        
+        # Bring the catalog up to date (unless a watcher keeps it current), then query the index
+        stats = self._refresh_unless_watched("driver")
+        self.last_discovery_timings['drivers_refresh'] = stats.duration
+        entries = self.catalog.query(self.drivers_path, "driver", os_id,
+                                     device_ids=device_ids, family_ids=driver_family_ids)
+        
+        for entry in entries:
             try:
-                driver_asset = await self._load_driver_from_config(config_file, device_family, os_id)
+                driver_asset = self._driver_from_entry(entry)
                 if driver_asset:
                     drivers.append(driver_asset)
             except Exception as e:
-                logger.error(f"Failed to load driver config {config_file}: {e}")
+                logger.error(f"Failed to load driver config {entry.config_path}: {e}")
+        
+        if driver_family_ids is not None:
+            found_families = {d.family_id for d in drivers}
+            missing_families = [f for f in driver_family_ids if f not in found_families]
+            if missing_families:
+                logger.warning(f"No drivers found for families {missing_families} ({device_family} OS {os_id})")
         
         # Sort by order
         drivers.sort(key=lambda d: d.order)
@@ -68,22 +265,25 @@ class LocalAssetProvider(AssetProvider):
         logger.info(f"Found {len(drivers)} compatible drivers for {device_family} OS {os_id}")
         return drivers
     
-    async def get_updates(self, os_id: int) -> List[UpdateAsset]:
-        """Get updates for specific OS."""
+    def _discover_updates(self, os_id: int) -> List[UpdateAsset]:
+        """Get updates for specific OS (runs on the discovery pool)."""
         updates = []
         
         if not self.updates_path.exists():
             logger.warning(f"Updates path does not exist: {self.updates_path}")
             return updates
         
-        # Search for update configurations
-        for config_file in self.updates_path.rglob("*.json"):
+        # Bring the catalog up to date (unless a watcher keeps it current), then query the index
+        stats = self._refresh_unless_watched("update")
+        self.last_discovery_timings['updates_refresh'] = stats.duration
+        
+        for entry in self.catalog.query(self.updates_path, "update", os_id):
             try:
-                update_asset = await self._load_update_from_config(config_file, os_id)
+                update_asset = self._update_from_entry(entry)
                 if update_asset:
                     updates.append(update_asset)
             except Exception as e:
-                logger.error(f"Failed to load update config {config_file}: {e}")
+                logger.error(f"Failed to load update config {entry.config_path}: {e}")
         
         # Sort by order
         updates.sort(key=lambda u: u.order)
@@ -91,7 +291,7 @@ class LocalAssetProvider(AssetProvider):
         logger.info(f"Found {len(updates)} compatible updates for OS {os_id}")
         return updates
     
-    async def get_sbi(self, os_id: int) -> Optional[SBIAsset]:
+    def _discover_sbi(self, os_id: int) -> Optional[SBIAsset]:
         """Get System Base Image for OS - Enhanced to use config mapping."""
         
         # First try: Use OS WIM mapping from build config
@@ -103,17 +303,11 @@ class LocalAssetProvider(AssetProvider):
             
             if wim_path.exists() and wim_path.is_file():
                 logger.info(f"Found SBI via config mapping: {wim_path}")
-                return SBIAsset(
-                    name=wim_path.stem,
-                    path=wim_path,
-                    asset_type=AssetType.SBI,
-                    metadata={
-                        "source": "config_mapping",
-                        "os_id": os_id,
-                        "configured_path": wim_path_str
-                    },
-                    os_id=os_id
-                )
+                return self._sbi_from_wim(wim_path, os_id, {
+                    "source": "config_mapping",
+                    "os_id": os_id,
+                    "configured_path": wim_path_str
+                })
             else:
                 logger.warning(f"Configured WIM path does not exist: {wim_path}")
         
@@ -136,17 +330,11 @@ class LocalAssetProvider(AssetProvider):
             for wim_file in self.sbi_path.glob(pattern):
                 if wim_file.is_file():
                     logger.info(f"Found SBI via directory search: {wim_file}")
-                    return SBIAsset(
-                        name=wim_file.stem,
-                        path=wim_file,
-                        asset_type=AssetType.SBI,
-                        metadata={
-                            "source": "directory_search",
-                            "discovered_pattern": pattern,
-                            "os_id": os_id
-                        },
-                        os_id=os_id
-                    )
+                    return self._sbi_from_wim(wim_file, os_id, {
+                        "source": "directory_search",
+                        "discovered_pattern": pattern,
+                        "os_id": os_id
+                    })
         
         logger.warning(f"No SBI found for OS {os_id}")
         logger.info(f"Searched in:")
@@ -163,7 +351,32 @@ class LocalAssetProvider(AssetProvider):
         
         return None
     
-    async def get_yunona_scripts(self) -> List[AssetInfo]:
+    def _sbi_from_wim(self, wim_path: Path, os_id: int, metadata: Dict[str, Any]) -> SBIAsset:
+        """Build an SBI asset, describing its images from the WIM metadata."""
+        sbi = SBIAsset(
+            name=wim_path.stem,
+            path=wim_path,
+            asset_type=AssetType.SBI,
+            metadata=metadata,
+            os_id=os_id
+        )
+        
+        try:
+            file_info = WimReader(wim_path).read()
+        except WimReadError as e:
+            logger.warning(f"Could not read WIM metadata for {wim_path}: {e}")
+            return sbi
+        
+        first_image = file_info.images[0] if file_info.images else None
+        if first_image:
+            sbi.architecture = first_image.architecture or sbi.architecture
+            sbi.build_number = first_image.build
+        metadata['image_count'] = len(file_info.images)
+        metadata['compression'] = file_info.header.compression
+        metadata['images'] = [image.to_dict() for image in file_info.images]
+        return sbi
+    
+    def _discover_yunona_scripts(self) -> List[AssetInfo]:
         """Get Yunona post-deployment scripts."""
         scripts = []
         
@@ -187,7 +400,7 @@ class LocalAssetProvider(AssetProvider):
         logger.info(f"Found {len(scripts)} Yunona scripts")
         return scripts
     
-    async def validate_asset(self, asset: AssetInfo) -> bool:
+    def _validate_asset_sync(self, asset: AssetInfo) -> bool:
         """Validate asset integrity."""
         if not asset.path.exists():
             logger.error(f"Asset path does not exist: {asset.path}")
@@ -195,11 +408,11 @@ class LocalAssetProvider(AssetProvider):
         
         # For drivers, validate the directory and its contents
         if asset.asset_type == AssetType.DRIVER:
-            return await self._validate_driver_directory(asset)
+            return self._validate_driver_directory(asset)
         
         # For SBI, validate the WIM file
         if asset.asset_type == AssetType.SBI:
-            return await self._validate_wim_file(asset.path)
+            return self._validate_wim_file(asset.path)
         
         # For other assets, expect a file
         if not asset.path.is_file():
@@ -213,157 +426,215 @@ class LocalAssetProvider(AssetProvider):
         
         return True
     
-    # [Rest of the methods remain the same as in the original file]
-    async def _load_driver_from_config(self, config_file: Path, device_family: str, os_id: int) -> Optional[DriverAsset]:
-        """Load driver configuration and check compatibility."""
+    def _parse_driver_package(self, config_file: Path, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Inspect a changed driver package once; the result is stored in the catalog."""
+        driver_dir = config_file.parent
+        declared_type = self._declared_driver_type(config)
+        
+        # Trusted mode: declared type and precomputed manifest, no directory traversal
+        if self.trusted_manifests and declared_type:
+            manifest_data = load_manifest_file(config_file)
+            if manifest_data is not None:
+                extension = f".{declared_type.value}"
+                files = manifest_data.get('files', [])
+                return {
+                    'driver_type': declared_type.value,
+                    'driver_file_count': sum(1 for f in files if f['path'].lower().endswith(extension)),
+                    'total_bytes': manifest_data.get('totalBytes'),
+                    'file_count': len(files),
+                    'manifest_source': 'file'
+                }
+            logger.debug(f"No package manifest for {config_file.name}, scanning directory")
+        
+        driver_type = declared_type or self._detect_driver_type(driver_dir)
+        driver_files = self._find_driver_files(driver_dir, driver_type)
+        
+        if declared_type and not driver_files:
+            detected_type = self._detect_driver_type(driver_dir)
+            if detected_type != declared_type and self._find_driver_files(driver_dir, detected_type):
+                logger.warning(f"Driver {driver_dir.name} declares type {declared_type.value} "
+                               f"but contains {detected_type.value.upper()} files")
+        
+        manifest = get_package_manifest(driver_dir)
+        
+        return {
+            'driver_type': driver_type.value,
+            'driver_file_count': len(driver_files),
+            'total_bytes': manifest.total_bytes,
+            'file_count': manifest.file_count,
+            'manifest_source': 'scan',
+            'dir_mtimes': dict(manifest.dir_mtimes)  # nested changes invalidate the catalog entry
+        }
+    
+    def _declared_driver_type(self, config: Dict[str, Any]) -> Optional[DriverType]:
+        """Get the driver type declared in a package config, if valid."""
+        declared = config.get('driverType')
+        if not declared:
+            return None
         try:
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            
-            # Check OS compatibility
-            supported_os = config.get('supportedOperatingSystems', [])
-            if supported_os and os_id not in supported_os:
-                return None
-            
-            # Check device compatibility (simplified - would need device family mapping)
-            supported_devices = config.get('supportedDevices', [])
-            
-            # Determine driver type from files in directory
-            driver_dir = config_file.parent
-            driver_type = self._detect_driver_type(driver_dir)
-            
-            # Find actual driver files
-            driver_files = self._find_driver_files(driver_dir, driver_type)
-            if not driver_files:
-                logger.warning(f"No driver files found in {driver_dir}")
-                return None
-            
-            return DriverAsset(
-                name=config.get('driverName', config_file.parent.name),
-                path=driver_dir,
-                asset_type=AssetType.DRIVER,
-                metadata=config,
-                driver_type=driver_type,
-                family_id=config.get('driverFamilyId'),
-                supported_devices=supported_devices,
-                supported_os=supported_os,
-                order=config.get('order', 9999)
-            )
+            return DriverType(str(declared).lower())
+        except ValueError:
+            logger.warning(f"Unknown declared driver type: {declared}")
+            return None
+    
+    def _parse_update_package(self, config_file: Path, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Inspect a changed update package once; the result is stored in the catalog."""
+        update_file = config_file.parent / config.get('downloadFileName', '')
+        exists = bool(config.get('downloadFileName')) and update_file.is_file()
+        return {
+            'update_file': update_file.name,
+            'update_file_exists': exists,
+            'update_file_size': update_file.stat().st_size if exists else None
+        }
+    
+    def _resolve_device_ids(self, device_family: str) -> Optional[List[int]]:
+        """Resolve device ids for a device family from deviceFamilyMapping.json."""
+        if self._device_mapping is None:
+            self._device_mapping = load_device_family_mapping(self.device_mapping_path)
+        
+        family = self._device_mapping.get(device_family)
+        if not family:
+            logger.debug(f"No device id mapping for {device_family}, skipping device filter")
+            return None
+        return family.get('deviceIds')
+    
+    def _driver_from_entry(self, entry: CatalogEntry) -> Optional[DriverAsset]:
+        """Build a driver asset from an indexed package."""
+        config = entry.config
+        driver_dir = entry.package_dir
         
-        except Exception as e:
-            logger.error(f"Failed to load driver config {config_file}: {e}")
+        if not entry.details.get('driver_file_count'):
+            logger.warning(f"No driver files found in {driver_dir}")
             return None
+        
+        metadata = self._asset_metadata(config)
+        if entry.details.get('manifest_source') == 'file':
+            metadata = dict(metadata, packageManifest={
+                'driverFileCount': entry.details.get('driver_file_count'),
+                'fileCount': entry.details.get('file_count'),
+                'totalBytes': entry.details.get('total_bytes')
+            })
+        
+        return DriverAsset(
+            name=config.get('driverName', driver_dir.name),
+            path=driver_dir,
+            asset_type=AssetType.DRIVER,
+            metadata=metadata,
+            size=entry.details.get('total_bytes'),
+            driver_type=DriverType(entry.details.get('driver_type', DriverType.INF.value)),
+            family_id=config.get('driverFamilyId'),
+            supported_devices=config.get('supportedDevices', []),
+            supported_os=entry.supported_os,
+            order=config.get('order', 9999)
+        )
     
-    async def _load_update_from_config(self, config_file: Path, os_id: int) -> Optional[UpdateAsset]:
-        """Load update configuration and check compatibility."""
-        try:
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            
-            # Check OS compatibility
-            supported_os = config.get('supportedOperatingSystems', [])
-            if supported_os and os_id not in supported_os:
-                return None
-            
-            # Find update file
-            update_file = config_file.parent / config.get('downloadFileName', '')
-            if not update_file.exists():
-                logger.warning(f"Update file not found: {update_file}")
-                return None
-            
-            # Determine update type from file extension
-            update_type = UpdateType(config.get('updateType', update_file.suffix[1:].lower()))
-            
-            return UpdateAsset(
-                name=config.get('updateName', config_file.parent.name),
-                path=update_file,
-                asset_type=AssetType.UPDATE,
-                metadata=config,
-                update_type=update_type,
-                update_version=config.get('updateVersion'),
-                supported_os=supported_os,
-                requires_reboot=config.get('rebootRequired', False),
-                order=config.get('order', 9999)
-            )
+    @staticmethod
+    def _asset_metadata(config: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy a package config for asset metadata; a declared sha256 becomes expected_sha256."""
+        metadata = dict(config)
+        if config.get('sha256'):
+            metadata['expected_sha256'] = metadata.pop('sha256')
+        return metadata
+    
+    def _update_from_entry(self, entry: CatalogEntry) -> Optional[UpdateAsset]:
+        """Build an update asset from an indexed package."""
+        config = entry.config
+        update_file = entry.package_dir / entry.details.get('update_file', '')
         
-        except Exception as e:
-            logger.error(f"Failed to load update config {config_file}: {e}")
+        if not entry.details.get('update_file_exists'):
+            logger.warning(f"Update file not found: {update_file}")
             return None
+        
+        # Determine update type from file extension
+        update_type = UpdateType(config.get('updateType', update_file.suffix[1:].lower()))
+        
+        return UpdateAsset(
+            name=config.get('updateName', entry.package_dir.name),
+            path=update_file,
+            asset_type=AssetType.UPDATE,
+            metadata=self._asset_metadata(config),
+            size=entry.details.get('update_file_size'),
+            update_type=update_type,
+            update_version=config.get('updateVersion'),
+            supported_os=entry.supported_os,
+            requires_reboot=config.get('rebootRequired', False),
+            order=config.get('order', 9999)
+        )
     
     def _detect_driver_type(self, driver_dir: Path) -> DriverType:
         """Detect driver type from files in directory."""
-        if list(driver_dir.rglob("*.inf")):
+        manifest = get_package_manifest(driver_dir)
+        if manifest.has(".inf"):
             return DriverType.INF
-        elif list(driver_dir.rglob("*.appx")):
+        elif manifest.has(".appx"):
             return DriverType.APPX
-        elif list(driver_dir.rglob("*.exe")):
+        elif manifest.has(".exe"):
             return DriverType.EXE
         else:
             return DriverType.INF  # Default
     
     def _find_driver_files(self, driver_dir: Path, driver_type: DriverType) -> List[Path]:
         """Find driver files of specific type."""
-        patterns = {
-            DriverType.INF: "*.inf",
-            DriverType.APPX: "*.appx",
-            DriverType.EXE: "*.exe"
+        extensions = {
+            DriverType.INF: ".inf",
+            DriverType.APPX: ".appx",
+            DriverType.EXE: ".exe"
         }
         
-        pattern = patterns.get(driver_type, "*.inf")
-        return list(driver_dir.rglob(pattern))
+        extension = extensions.get(driver_type, ".inf")
+        return get_package_manifest(driver_dir).get_files(extension)
     
-    async def _validate_wim_file(self, wim_path: Path) -> bool:
-        """Validate WIM file integrity (basic check)."""
+    def _validate_wim_file(self, wim_path: Path) -> bool:
+        """Validate WIM file integrity from its header and XML metadata."""
         try:
-            # Basic file size check (WIM files should be substantial)
-            size_mb = wim_path.stat().st_size / (1024 * 1024)
-            if size_mb < 100:  # Less than 100MB is suspicious
-                logger.warning(f"WIM file suspiciously small: {size_mb:.1f}MB")
-                return False
-            
-            # TODO: Could add DISM validation here
-            # result = subprocess.run(['dism', '/Get-WimInfo', f'/WimFile:{wim_path}'], 
-            #                        capture_output=True, text=True)
-            # return result.returncode == 0
-            
-            return True
-        except Exception as e:
-            logger.error(f"Failed to validate WIM file {wim_path}: {e}")
+            file_info = WimReader(wim_path).read()
+        except WimReadError as e:
+            logger.error(f"Invalid WIM file {wim_path}: {e}")
             return False
+        
+        if not file_info.images:
+            logger.error(f"WIM file contains no images: {wim_path}")
+            return False
+        
+        if file_info.header.image_count != len(file_info.images):
+            logger.error(f"WIM image count mismatch in {wim_path}: header "
+                         f"{file_info.header.image_count}, XML {len(file_info.images)}")
+            return False
+        
+        logger.info(f"WIM file valid: {wim_path.name} ({len(file_info.images)} images, "
+                    f"{file_info.header.compression})")
+        return True
     
-    async def _validate_driver_directory(self, asset: AssetInfo) -> bool:
+    def _validate_driver_directory(self, asset: AssetInfo) -> bool:
         """Validate driver directory structure."""
         if not asset.path.is_dir():
             logger.error(f"Driver asset path is not a directory: {asset.path}")
             return False
         
+        # Trusted mode: rely on the precomputed manifest instead of walking the tree
+        package_manifest = asset.metadata.get('packageManifest') if self.trusted_manifests else None
+        if package_manifest is not None:
+            if not package_manifest.get('driverFileCount'):
+                logger.error(f"Package manifest lists no driver files: {asset.path}")
+                return False
+            return True
+        
+        manifest = get_package_manifest(asset.path)
+        
         # Check if directory contains expected files based on driver type
         if hasattr(asset, 'driver_type'):
             driver_type = asset.driver_type
+            extension = f".{driver_type.value}"
+            label = driver_type.value.upper()
             
-            if driver_type == DriverType.INF:
-                inf_files = list(asset.path.rglob("*.inf"))
-                if not inf_files:
-                    logger.error(f"No INF files found in driver directory: {asset.path}")
-                    return False
-                logger.info(f"Found {len(inf_files)} INF files in {asset.path}")
-                
-            elif driver_type == DriverType.APPX:
-                appx_files = list(asset.path.rglob("*.appx"))
-                if not appx_files:
-                    logger.error(f"No APPX files found in driver directory: {asset.path}")
-                    return False
-                logger.info(f"Found {len(appx_files)} APPX files in {asset.path}")
-                
-            elif driver_type == DriverType.EXE:
-                exe_files = list(asset.path.rglob("*.exe"))
-                if not exe_files:
-                    logger.error(f"No EXE files found in driver directory: {asset.path}")
-                    return False
-                logger.info(f"Found {len(exe_files)} EXE files in {asset.path}")
+            file_count = manifest.count(extension)
+            if not file_count:
+                logger.error(f"No {label} files found in driver directory: {asset.path}")
+                return False
+            logger.info(f"Found {file_count} {label} files in {asset.path}")
         
         # Check if there's a JSON config file
-        json_files = list(asset.path.glob("*.json"))
+        json_files = [f for f in manifest.get_files(".json") if f.parent == asset.path]
         if json_files:
             logger.info(f"Found configuration files: {[f.name for f in json_files]}")
         
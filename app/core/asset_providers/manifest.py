@@ -0,0 +1,242 @@
+"""
+Package Manifest - Single-pass file inventory of asset package directories
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from typing import List, Dict, Optional, Any
+from dataclasses import dataclass, field
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+MANIFEST_SUFFIX = ".manifest.json"
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class PackageManifest:
+    """File inventory of a package directory built from one directory walk."""
+    root: Path
+    files: List[Path] = field(default_factory=list)
+    files_by_ext: Dict[str, List[Path]] = field(default_factory=dict)
+    total_bytes: int = 0
+    newest_mtime: float = 0.0
+    dir_mtimes: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def file_count(self) -> int:
+        return len(self.files)
+
+    def get_files(self, extension: str) -> List[Path]:
+        """Get files with an extension (e.g. ".inf"), case-insensitive."""
+        return list(self.files_by_ext.get(self._normalize_ext(extension), []))
+
+    def count(self, extension: str) -> int:
+        return len(self.files_by_ext.get(self._normalize_ext(extension), []))
+
+    def has(self, extension: str) -> bool:
+        return self.count(extension) > 0
+
+    def is_current(self) -> bool:
+        """Check whether any directory in the package changed since the walk."""
+        return dir_mtimes_current(self.dir_mtimes)
+
+    def get_summary(self) -> Dict[str, int]:
+        """Get file counts by extension."""
+        return {ext: len(files) for ext, files in sorted(self.files_by_ext.items())}
+
+    @staticmethod
+    def _normalize_ext(extension: str) -> str:
+        extension = extension.lower()
+        return extension if extension.startswith('.') else f".{extension}"
+
+
+def dir_mtimes_current(dir_mtimes: Dict[str, float]) -> bool:
+    """Check that every directory still exists with the recorded mtime."""
+    for directory, mtime in dir_mtimes.items():
+        try:
+            if os.stat(directory).st_mtime != mtime:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def build_package_manifest(root: Path) -> PackageManifest:
+    """Walk a package directory once with os.scandir."""
+    root = Path(root)
+    manifest = PackageManifest(root=root)
+
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            manifest.dir_mtimes[str(directory)] = directory.stat().st_mtime
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            logger.warning(f"Failed to scan package directory {directory}: {e}")
+            continue
+
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(Path(entry.path))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    path = Path(entry.path)
+                    manifest.files.append(path)
+                    manifest.files_by_ext.setdefault(path.suffix.lower(), []).append(path)
+                    manifest.total_bytes += stat.st_size
+                    manifest.newest_mtime = max(manifest.newest_mtime, stat.st_mtime)
+            except OSError:
+                continue
+
+        pending.extend(reversed(subdirs))
+
+    return manifest
+
+
+# Global manifest cache (one manifest per package directory)
+_manifest_cache: Dict[str, PackageManifest] = {}
+_manifest_lock = threading.Lock()
+
+
+def get_package_manifest(root: Path) -> PackageManifest:
+    """Get the cached manifest for a package directory, rebuilding it when a
+    directory mtime in the package changed."""
+    key = str(Path(root))
+    with _manifest_lock:
+        manifest = _manifest_cache.get(key)
+        if manifest and manifest.is_current():
+            return manifest
+
+    manifest = build_package_manifest(Path(root))
+    logger.debug(f"Package manifest built for {root}: {manifest.file_count} files, "
+                 f"{manifest.total_bytes} bytes")
+
+    with _manifest_lock:
+        _manifest_cache[key] = manifest
+    return manifest
+
+
+def invalidate_package_manifest(root: Optional[Path] = None) -> None:
+    """Drop a cached manifest, or all manifests when no root is given."""
+    with _manifest_lock:
+        if root is None:
+            _manifest_cache.clear()
+        else:
+            _manifest_cache.pop(str(Path(root)), None)
+
+
+# Precomputed manifest files (<config stem>.manifest.json next to the package JSON)
+
+def is_manifest_file(name: str) -> bool:
+    """Check whether a file name is a precomputed package manifest."""
+    return str(name).lower().endswith(MANIFEST_SUFFIX)
+
+
+def manifest_file_for(config_path: Path) -> Path:
+    """Get the manifest file path for a package configuration."""
+    config_path = Path(config_path)
+    return config_path.with_name(f"{config_path.stem}{MANIFEST_SUFFIX}")
+
+
+def generate_manifest_file(config_path: Path, driver_type: str) -> Path:
+    """Write a precomputed manifest for the package of a configuration."""
+    config_path = Path(config_path)
+    package_dir = config_path.parent
+    manifest = build_package_manifest(package_dir)
+
+    files = [f for f in manifest.files if not is_manifest_file(f.name)]
+    data = {
+        'manifestVersion': MANIFEST_VERSION,
+        'driverType': driver_type,
+        'totalBytes': sum(f.stat().st_size for f in files),
+        'newestMtime': manifest.newest_mtime,
+        'files': [
+            {'path': f.relative_to(package_dir).as_posix(), 'size': f.stat().st_size}
+            for f in files
+        ],
+        'generatedAt': datetime.now().isoformat()
+    }
+
+    # Write via rename so the directory mtime changes and catalogs re-index
+    manifest_path = manifest_file_for(config_path)
+    temp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, manifest_path)
+
+    logger.info(f"Package manifest written: {manifest_path} ({len(files)} files)")
+    return manifest_path
+
+
+def load_manifest_file(config_path: Path) -> Optional[Dict[str, Any]]:
+    """Load the precomputed manifest of a package, if present."""
+    manifest_path = manifest_file_for(config_path)
+    if not manifest_path.exists():
+        return None
+
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.error(f"Failed to load package manifest {manifest_path}: {e}")
+        return None
+
+    if data.get('manifestVersion') != MANIFEST_VERSION:
+        logger.warning(f"Unsupported package manifest version in {manifest_path}")
+        return None
+    return data
+
+
+def verify_manifest_file(config_path: Path) -> List[str]:
+    """Compare a precomputed manifest against the real package files.
+
+    Returns a list of problems; an empty list means the manifest matches.
+    """
+    config_path = Path(config_path)
+    package_dir = config_path.parent
+    data = load_manifest_file(config_path)
+    if data is None:
+        return [f"No valid manifest: {manifest_file_for(config_path).name}"]
+
+    problems = []
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            declared_type = json.load(f).get('driverType')
+    except Exception as e:
+        return [f"Failed to read package config: {e}"]
+
+    if declared_type and declared_type != data.get('driverType'):
+        problems.append(f"Driver type mismatch: config declares {declared_type}, "
+                        f"manifest has {data.get('driverType')}")
+
+    listed = {entry['path']: entry.get('size') for entry in data.get('files', [])}
+    actual = {
+        f.relative_to(package_dir).as_posix(): f.stat().st_size
+        for f in build_package_manifest(package_dir).files
+        if not is_manifest_file(f.name)
+    }
+
+    for path in sorted(set(listed) - set(actual)):
+        problems.append(f"Missing file: {path}")
+    for path in sorted(set(actual) - set(listed)):
+        problems.append(f"Unlisted file: {path}")
+    for path in sorted(set(listed) & set(actual)):
+        if listed[path] != actual[path]:
+            problems.append(f"Size mismatch: {path} ({listed[path]} != {actual[path]})")
+
+    if data.get('driverType'):
+        extension = f".{data['driverType']}"
+        if not any(p.lower().endswith(extension) for p in listed):
+            problems.append(f"No {data['driverType'].upper()} files listed")
+
+    return problems
@@ -0,0 +1,690 @@
+"""
+Remote Asset Provider - HTTP(S)/SharePoint asset source with local disk cache
+"""
+
+import os
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import urllib.request
+import urllib.error
+import weakref
+from contextlib import contextmanager
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath, PureWindowsPath
+from typing import List, Optional, Dict, Any, Iterable, Set
+import logging
+
+from .base import AssetProvider, DriverAsset, UpdateAsset, SBIAsset, AssetInfo, AssetType, DriverType, UpdateType
+from .catalog import CatalogEntry, CompatibilityIndex
+from .local import DEFAULT_DEVICE_FAMILY_MAPPING, load_device_family_mapping
+
+
+logger = logging.getLogger(__name__)
+
+
+INDEX_FILE = "index.json"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Cached packages in use by live providers, shared by concurrent builds: "<cache path>|<kind>/<name>" -> count
+_package_leases: Dict[str, int] = {}
+_leases_lock = threading.Lock()
+
+
+def _release_leases(leases: Set[str]) -> None:
+    with _leases_lock:
+        for lease in leases:
+            count = _package_leases.get(lease, 0) - 1
+            if count > 0:
+                _package_leases[lease] = count
+            else:
+                _package_leases.pop(lease, None)
+    leases.clear()
+
+
+# Files being downloaded by any provider, so two builds never write the same .part: path -> [lock, users]
+_download_locks: Dict[str, list] = {}
+_download_locks_lock = threading.Lock()
+
+
+@contextmanager
+def _download_lock(dest: Path):
+    key = os.path.normcase(os.path.abspath(dest))
+    with _download_locks_lock:
+        slot = _download_locks.setdefault(key, [threading.Lock(), 0])
+        slot[1] += 1
+    try:
+        with slot[0]:
+            yield
+    finally:
+        with _download_locks_lock:
+            slot[1] -= 1
+            if not slot[1]:
+                _download_locks.pop(key, None)
+
+
+def _is_safe_index_path(path: Any) -> bool:
+    """Whether a path from the remote index stays inside the directory it is joined onto."""
+    if not isinstance(path, str) or not path:
+        return False
+    parts = PurePosixPath(path.replace('\\', '/')).parts
+    return not (path.startswith(('/', '\\')) or PureWindowsPath(path).drive or '..' in parts)
+
+
+class RemoteAssetError(Exception):
+    """Remote asset source error."""
+    pass
+
+
+class RemoteAssetProvider(AssetProvider):
+    """Asset provider backed by a remote HTTP(S) asset library.
+
+    The remote library publishes an ``index.json`` describing every package
+    (its JSON configuration and file list). The index is fetched lazily,
+    cached for ``cacheTTL`` seconds and then revalidated with
+    ``If-None-Match``/``If-Modified-Since``. Only the packages matching a
+    device/OS query are downloaded into a size-bounded LRU cache; downloads
+    run concurrently and resume interrupted transfers with HTTP ranges.
+    Packages a provider has returned are leased until ``release()`` (or until
+    the provider is garbage collected), so eviction by another build sharing
+    the cache never removes them mid-integration.
+
+    Remote layout::
+
+        <siteUrl>/index.json
+        <siteUrl>/drivers/<package>/<file path>
+        <siteUrl>/updates/<package>/<file path>
+        <siteUrl>/sbi/<file path>
+        <siteUrl>/yunona/<file path>
+    """
+
+    def __init__(self, remote_config: Dict[str, Any]):
+        """Initialize with the assetProvider.config section (SharePointAssetConfig fields)."""
+        self.site_url = str(remote_config['siteUrl']).rstrip('/')
+        self.cache_path = Path(remote_config.get('cachePath', 'cache'))
+        self.cache_ttl = int(remote_config.get('cacheTTL', 3600))
+        self.cache_max_bytes = int(remote_config.get('cacheMaxSizeMB', 20480)) * 1024 * 1024
+        self.download_workers = max(1, int(remote_config.get('downloadWorkers', 4)))
+        self.request_timeout = int(remote_config.get('requestTimeout', 60))
+        self.device_mapping_path = Path(remote_config.get('deviceFamilyMappingPath', DEFAULT_DEVICE_FAMILY_MAPPING))
+
+        self.headers: Dict[str, str] = {'User-Agent': 'Kassia-RemoteAssetProvider'}
+        if remote_config.get('accessToken'):
+            self.headers['Authorization'] = f"Bearer {remote_config['accessToken']}"
+        elif remote_config.get('clientSecret'):
+            logger.warning("clientId/clientSecret token acquisition is not supported; "
+                           "provide an accessToken for authenticated libraries")
+
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        self.state_db = self.cache_path / "cache_state.db"
+        self._executor = ThreadPoolExecutor(max_workers=self.download_workers,
+                                            thread_name_prefix="kassia-download")
+        self._index: Optional[Dict[str, Any]] = None
+        self._index_checked = 0.0
+        self._device_mapping: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._lease_prefix = f"{self.cache_path.resolve()}|"
+        self._leases: Set[str] = set()
+        self._release = weakref.finalize(self, _release_leases, self._leases)
+        self.stats = {
+            'index_fetches': 0,
+            'index_not_modified': 0,
+            'files_downloaded': 0,
+            'files_resumed': 0,
+            'files_cached': 0,
+            'bytes_downloaded': 0,
+            'evictions': 0
+        }
+        self.init_database()
+
+        logger.info(f"RemoteAssetProvider initialized:")
+        logger.info(f"  Site URL: {self.site_url}")
+        logger.info(f"  Cache path: {self.cache_path} (max {self.cache_max_bytes // (1024 * 1024)} MB, "
+                    f"TTL {self.cache_ttl}s)")
+        logger.info(f"  Download workers: {self.download_workers}")
+
+    def init_database(self):
+        """Initialize the cache state schema."""
+        with sqlite3.connect(self.state_db) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cached_packages (
+                    key TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS index_state (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL
+                )
+            ''')
+            conn.commit()
+
+    # AssetProvider API
+
+    async def get_drivers(self, device_family: str, os_id: int,
+                          driver_family_ids: Optional[List[int]] = None,
+                          device_ids: Optional[List[int]] = None) -> List[DriverAsset]:
+        """Get drivers for specific device family and OS, downloading only those packages."""
+        drivers = await self.plan_drivers(device_family, os_id, driver_family_ids, device_ids)
+        await self.fetch_assets(drivers)
+        return drivers
+
+    async def get_updates(self, os_id: int) -> List[UpdateAsset]:
+        """Get updates for specific OS, downloading only those packages."""
+        updates = await self.plan_updates(os_id)
+        await self.fetch_assets(updates)
+        return updates
+
+    async def plan_drivers(self, device_family: str, os_id: int,
+                           driver_family_ids: Optional[List[int]] = None,
+                           device_ids: Optional[List[int]] = None) -> List[DriverAsset]:
+        """Resolve compatible drivers from the remote index without downloading them."""
+        index = await self._get_index()
+
+        if device_ids is None:
+            device_ids = self._resolve_device_ids(device_family)
+
+        packages = {p['name']: p for p in index.get('drivers', [])}
+        entries = CompatibilityIndex(
+            self._entry_for(self.cache_path / "drivers", package, "driver")
+            for package in packages.values()
+        ).lookup(os_id, device_ids, driver_family_ids)
+
+        drivers = []
+        for entry in entries:
+            package = packages[entry.package_dir.name]
+            driver_type = self._driver_type_for(package)
+            extension = f".{driver_type.value}"
+            if not any(f['path'].lower().endswith(extension) for f in package.get('files', [])):
+                logger.warning(f"No {driver_type.value.upper()} files listed for remote driver {package['name']}")
+                continue
+
+            config = package.get('config', {})
+            drivers.append(DriverAsset(
+                name=config.get('driverName', package['name']),
+                path=self.cache_path / "drivers" / package['name'],
+                asset_type=AssetType.DRIVER,
+                metadata=self._remote_metadata(config, "drivers", package),
+                size=sum(f.get('size', 0) for f in package.get('files', [])),
+                driver_type=driver_type,
+                family_id=config.get('driverFamilyId'),
+                supported_devices=config.get('supportedDevices', []),
+                supported_os=config.get('supportedOperatingSystems', []),
+                order=config.get('order', 9999)
+            ))
+
+        drivers.sort(key=lambda d: d.order)
+        self._lease("drivers", [d.metadata['remote_package']['name'] for d in drivers])
+        logger.info(f"Found {len(drivers)} compatible remote drivers for {device_family} OS {os_id}")
+        return drivers
+
+    async def plan_updates(self, os_id: int) -> List[UpdateAsset]:
+        """Resolve compatible updates from the remote index without downloading them."""
+        index = await self._get_index()
+
+        updates = []
+        for package in index.get('updates', []):
+            config = package.get('config', {})
+            supported_os = config.get('supportedOperatingSystems', [])
+            if supported_os and os_id not in supported_os:
+                continue
+
+            file_name = config.get('downloadFileName')
+            listed = {f['path']: f for f in package.get('files', [])}
+            if not file_name or file_name not in listed:
+                logger.warning(f"Update file not listed for remote update {package['name']}")
+                continue
+
+            update_file = self.cache_path / "updates" / package['name'] / file_name
+            updates.append(UpdateAsset(
+                name=config.get('updateName', package['name']),
+                path=update_file,
+                asset_type=AssetType.UPDATE,
+                metadata=self._remote_metadata(config, "updates", package),
+                size=listed[file_name].get('size'),
+                update_type=UpdateType(config.get('updateType', update_file.suffix[1:].lower())),
+                update_version=config.get('updateVersion'),
+                supported_os=supported_os,
+                requires_reboot=config.get('rebootRequired', False),
+                order=config.get('order', 9999)
+            ))
+
+        updates.sort(key=lambda u: u.order)
+        self._lease("updates", [u.metadata['remote_package']['name'] for u in updates])
+        logger.info(f"Found {len(updates)} compatible remote updates for OS {os_id}")
+        return updates
+
+    async def fetch_assets(self, assets: List[AssetInfo]) -> None:
+        """Download the packages of assets returned by ``plan_drivers``/``plan_updates``."""
+        if assets:
+            await asyncio.to_thread(self.fetch_assets_sync, assets)
+
+    def fetch_assets_sync(self, assets: List[AssetInfo]) -> None:
+        """Blocking variant of ``fetch_assets`` for use from worker threads."""
+        by_kind: Dict[str, List[Dict[str, Any]]] = {}
+        for asset in assets:
+            kind, package = asset.metadata['remote_kind'], asset.metadata['remote_package']
+            by_kind.setdefault(kind, []).append(package)
+
+        for kind, packages in by_kind.items():
+            self._fetch_packages(kind, packages)
+
+    def is_cached(self, asset: AssetInfo) -> bool:
+        """Whether every file of a remote asset's package is present in the cache."""
+        package = asset.metadata.get('remote_package')
+        if not package:
+            return asset.path.exists()
+        base_dir = self.cache_path / asset.metadata['remote_kind'] / package['name']
+        return all(self._is_fresh(base_dir / f['path'], f) for f in package.get('files', []))
+
+    async def get_sbi(self, os_id: int) -> Optional[SBIAsset]:
+        """Get System Base Image for OS."""
+        index = await self._get_index()
+
+        entry = next((s for s in index.get('sbi', []) if s.get('osId') == os_id), None)
+        if not entry:
+            logger.warning(f"No remote SBI listed for OS {os_id}")
+            return None
+
+        package = {'name': f"sbi-{os_id}", 'files': [entry]}
+        await asyncio.to_thread(self._fetch_packages, "sbi", [package], True)
+
+        wim_path = self.cache_path / "sbi" / entry['path']
+        return SBIAsset(
+            name=wim_path.stem,
+            path=wim_path,
+            asset_type=AssetType.SBI,
+            metadata={"source": "remote", "os_id": os_id, "remote_path": entry['path']},
+            os_id=os_id
+        )
+
+    async def get_yunona_scripts(self) -> List[AssetInfo]:
+        """Get Yunona post-deployment scripts."""
+        index = await self._get_index()
+
+        files = index.get('yunona', [])
+        if not files:
+            return []
+        await asyncio.to_thread(self._fetch_packages, "yunona", [{'name': "yunona", 'files': files}], True)
+
+        scripts = []
+        for entry in files:
+            script_file = self.cache_path / "yunona" / entry['path']
+            if script_file.suffix.lower() in ('.py', '.ps1', '.cmd', '.bat'):
+                scripts.append(AssetInfo(
+                    name=script_file.name,
+                    path=script_file,
+                    asset_type=AssetType.YUNONA,
+                    metadata={"script_type": script_file.suffix, "source": "remote"}
+                ))
+
+        logger.info(f"Found {len(scripts)} remote Yunona scripts")
+        return scripts
+
+    async def validate_asset(self, asset: AssetInfo) -> bool:
+        """Validate a cached asset."""
+        if not asset.path.exists():
+            logger.error(f"Cached asset path does not exist: {asset.path}")
+            return False
+
+        if asset.asset_type == AssetType.DRIVER:
+            extension = f".{asset.driver_type.value}"
+            return any(p.suffix.lower() == extension for p in asset.path.rglob("*") if p.is_file())
+
+        if asset.path.stat().st_size == 0:
+            logger.warning(f"Cached asset file is empty: {asset.path}")
+            return False
+        return True
+
+    def get_cache_info(self) -> Dict[str, Any]:
+        """Get cache usage and transfer statistics."""
+        with sqlite3.connect(self.state_db) as conn:
+            count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cached_packages').fetchone()
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            'cache_path': str(self.cache_path),
+            'packages': count,
+            'cache_size_mb': round(total / (1024 * 1024), 2),
+            'cache_max_mb': self.cache_max_bytes // (1024 * 1024),
+            **stats
+        }
+
+    def get_fetch_stats(self) -> Dict[str, Any]:
+        """Get cache hit/miss and transfer statistics for the current job."""
+        return self.get_cache_info()
+
+    def release(self) -> None:
+        """Release the leases on this provider's packages so they can be evicted."""
+        with self._lock:
+            self._release()
+            self._release = weakref.finalize(self, _release_leases, self._leases)
+
+    # Index handling
+
+    async def _get_index(self) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._load_index)
+
+    def _load_index(self) -> Dict[str, Any]:
+        """Load the remote index, revalidating it once the TTL has expired."""
+        now = time.time()
+        with self._lock:
+            if self._index is not None and now - self._index_checked < self.cache_ttl:
+                return self._index
+
+        index_file = self.cache_path / INDEX_FILE
+        state = self._get_index_state()
+        cached = None
+        if index_file.exists() and state:
+            try:
+                with open(index_file, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+            except Exception as e:
+                logger.warning(f"Cached remote index unreadable, refetching: {e}")
+
+        if cached is not None and now - state['fetched_at'] < self.cache_ttl:
+            return self._set_index(cached, state['fetched_at'])
+
+        headers = dict(self.headers)
+        if cached is not None:
+            if state.get('etag'):
+                headers['If-None-Match'] = state['etag']
+            if state.get('last_modified'):
+                headers['If-Modified-Since'] = state['last_modified']
+
+        request = urllib.request.Request(f"{self.site_url}/{INDEX_FILE}", headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.request_timeout) as response:
+                body = response.read()
+                index = json.loads(body.decode('utf-8'))
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and cached is not None:
+                logger.debug("Remote index not modified")
+                with self._lock:
+                    self.stats['index_not_modified'] += 1
+                self._save_index_state(state.get('etag'), state.get('last_modified'), now)
+                return self._set_index(cached, now)
+            if cached is not None:
+                logger.warning(f"Remote index fetch failed ({e}), using stale cached index")
+                return self._set_index(cached, now)
+            raise RemoteAssetError(f"Failed to fetch remote index: {e}")
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            if cached is not None:
+                logger.warning(f"Remote index unavailable ({e}), using stale cached index")
+                return self._set_index(cached, now)
+            raise RemoteAssetError(f"Failed to fetch remote index: {e}")
+
+        temp_file = index_file.with_name(INDEX_FILE + ".tmp")
+        with open(temp_file, 'wb') as f:
+            f.write(body)
+        os.replace(temp_file, index_file)
+        self._save_index_state(etag, last_modified, now)
+
+        with self._lock:
+            self.stats['index_fetches'] += 1
+        logger.info(f"Remote index fetched: {len(index.get('drivers', []))} drivers, "
+                    f"{len(index.get('updates', []))} updates")
+        return self._set_index(index, now)
+
+    def _set_index(self, index: Dict[str, Any], checked: float) -> Dict[str, Any]:
+        index = self._validate_index(index)
+        with self._lock:
+            self._index = index
+            self._index_checked = checked
+        return index
+
+    @staticmethod
+    def _validate_index(index: Dict[str, Any]) -> Dict[str, Any]:
+        """Drop index entries whose package name or file paths would escape the cache directory."""
+        index = dict(index)
+        for kind in ('drivers', 'updates'):
+            packages = []
+            for package in index.get(kind, []):
+                name = package.get('name')
+                if (not _is_safe_index_path(name) or len(PurePosixPath(name.replace('\\', '/')).parts) != 1
+                        or not all(_is_safe_index_path(f.get('path')) for f in package.get('files', []))):
+                    logger.warning(f"Ignoring remote {kind} package with unsafe paths: {name!r}")
+                    continue
+                packages.append(package)
+            index[kind] = packages
+        for kind in ('sbi', 'yunona'):
+            entries = []
+            for entry in index.get(kind, []):
+                if not _is_safe_index_path(entry.get('path')):
+                    logger.warning(f"Ignoring remote {kind} file with unsafe path: {entry.get('path')!r}")
+                    continue
+                entries.append(entry)
+            index[kind] = entries
+        return index
+
+    def _get_index_state(self) -> Optional[Dict[str, Any]]:
+        with sqlite3.connect(self.state_db) as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute('SELECT * FROM index_state WHERE id = 1').fetchone()
+        return dict(row) if row else None
+
+    def _save_index_state(self, etag: Optional[str], last_modified: Optional[str], fetched_at: float) -> None:
+        with sqlite3.connect(self.state_db) as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO index_state (id, etag, last_modified, fetched_at)
+                VALUES (1, ?, ?, ?)
+            ''', (etag, last_modified, fetched_at))
+            conn.commit()
+
+    # Package downloads and cache
+
+    def _fetch_packages(self, kind: str, packages: List[Dict[str, Any]], flat: bool = False) -> None:
+        """Download missing files of the given packages concurrently, then enforce the cache size."""
+        downloads = []
+        self._lease(kind, [package['name'] for package in packages])
+
+        for package in packages:
+            base_dir = self.cache_path / kind if flat else self.cache_path / kind / package['name']
+            remote_base = kind if flat else f"{kind}/{package['name']}"
+
+            for entry in package.get('files', []):
+                if not _is_safe_index_path(entry['path']):
+                    raise RemoteAssetError(f"Unsafe path in remote {kind} package {package['name']}: "
+                                           f"{entry['path']!r}")
+                local_file = base_dir / entry['path']
+                if self._is_fresh(local_file, entry):
+                    with self._lock:
+                        self.stats['files_cached'] += 1
+                    continue
+                url = f"{self.site_url}/{quote(remote_base)}/{quote(entry['path'])}"
+                downloads.append(self._executor.submit(
+                    self._download_file, url, local_file, entry.get('size'), entry.get('sha256')
+                ))
+
+        if downloads:
+            logger.info(f"Downloading {len(downloads)} {kind} files with {self.download_workers} workers")
+            # Wait for every transfer so partial files are not left mid-write, then report the first failure
+            errors = [f.exception() for f in downloads if f.exception() is not None]
+            if errors:
+                raise errors[0]
+
+        self._record_and_evict(kind, packages, flat)
+
+    @staticmethod
+    def _is_fresh(local_file: Path, entry: Dict[str, Any]) -> bool:
+        """A cached file is current if it exists with the size listed in the index."""
+        try:
+            size = local_file.stat().st_size
+        except OSError:
+            return False
+        return entry.get('size') is None or size == entry['size']
+
+    def _download_file(self, url: str, dest: Path, expected_size: Optional[int],
+                       expected_sha256: Optional[str]) -> None:
+        """Download a file unless another provider on the cache fetched it meanwhile."""
+        with _download_lock(dest):
+            if self._is_fresh(dest, {'size': expected_size}):
+                with self._lock:
+                    self.stats['files_cached'] += 1
+                return
+            self._transfer_file(url, dest, expected_size, expected_sha256)
+
+    def _transfer_file(self, url: str, dest: Path, expected_size: Optional[int],
+                       expected_sha256: Optional[str]) -> None:
+        """Download a file to ``<dest>.part``, resuming with a Range request if possible."""
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        part = dest.with_name(dest.name + ".part")
+        offset = part.stat().st_size if part.exists() else 0
+        if expected_size is not None and offset > expected_size:
+            part.unlink()
+            offset = 0
+
+        headers = dict(self.headers)
+        if offset:
+            headers['Range'] = f"bytes={offset}-"
+
+        request = urllib.request.Request(url, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.request_timeout) as response:
+                resumed = bool(offset) and response.status == 206
+                with open(part, 'ab' if resumed else 'wb') as f:
+                    written = 0
+                    while True:
+                        chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        written += len(chunk)
+        except urllib.error.HTTPError as e:
+            # 416: the partial file already holds the complete content
+            if not (e.code == 416 and offset and offset == expected_size):
+                raise RemoteAssetError(f"Download failed for {url}: {e}")
+            resumed, written = True, 0
+        except (urllib.error.URLError, OSError) as e:
+            raise RemoteAssetError(f"Download failed for {url}: {e}")
+
+        size = part.stat().st_size
+        if expected_size is not None and size != expected_size:
+            raise RemoteAssetError(f"Incomplete download for {url}: {size} of {expected_size} bytes")
+
+        if expected_sha256:
+            sha256 = hashlib.sha256()
+            with open(part, 'rb') as f:
+                for block in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+                    sha256.update(block)
+            if sha256.hexdigest() != expected_sha256.lower():
+                part.unlink()
+                raise RemoteAssetError(f"Digest mismatch for {url}")
+
+        os.replace(part, dest)
+
+        with self._lock:
+            self.stats['files_downloaded'] += 1
+            self.stats['bytes_downloaded'] += written
+            if resumed:
+                self.stats['files_resumed'] += 1
+        logger.debug(f"Downloaded {url} ({written} bytes{', resumed' if resumed else ''})")
+
+    def _lease(self, kind: str, names: Iterable[str]) -> None:
+        """Protect packages from eviction by any provider on this cache until ``release()``."""
+        leases = {f"{self._lease_prefix}{kind}/{name}" for name in names}
+        with self._lock, _leases_lock:
+            for lease in leases - self._leases:
+                _package_leases[lease] = _package_leases.get(lease, 0) + 1
+            self._leases.update(leases)
+
+    def _leased_keys(self) -> Set[str]:
+        prefix = self._lease_prefix
+        with _leases_lock:
+            return {lease[len(prefix):] for lease in _package_leases if lease.startswith(prefix)}
+
+    def _record_and_evict(self, kind: str, packages: List[Dict[str, Any]], flat: bool) -> None:
+        """Record package access times and evict least recently used packages over the size limit."""
+        now = time.time()
+
+        with sqlite3.connect(self.state_db) as conn:
+            for package in packages:
+                key = f"{kind}/{package['name']}"
+                base_dir = self.cache_path / kind if flat else self.cache_path / kind / package['name']
+                paths = [base_dir / f['path'] for f in package.get('files', [])] if flat else [base_dir]
+                size = sum(f.get('size', 0) or 0 for f in package.get('files', []))
+                conn.execute('''
+                    INSERT INTO cached_packages (key, path, size, last_access, fetched_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET path = excluded.path, size = excluded.size,
+                        last_access = excluded.last_access
+                ''', (key, json.dumps([str(p) for p in paths]), size, now, now))
+
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM cached_packages').fetchone()[0]
+            if total > self.cache_max_bytes:
+                rows = conn.execute(
+                    'SELECT key, path, size FROM cached_packages ORDER BY last_access ASC'
+                ).fetchall()
+                # Packages leased by any build using this cache are never evicted
+                in_use = self._leased_keys()
+                for key, paths, size in rows:
+                    if total <= self.cache_max_bytes:
+                        break
+                    if key in in_use:
+                        continue
+                    for path in json.loads(paths):
+                        path = Path(path)
+                        if path.is_dir():
+                            shutil.rmtree(path, ignore_errors=True)
+                        elif path.exists():
+                            path.unlink()
+                    conn.execute('DELETE FROM cached_packages WHERE key = ?', (key,))
+                    total -= size
+                    with self._lock:
+                        self.stats['evictions'] += 1
+                    logger.info(f"Evicted cached package {key} ({size} bytes)")
+            conn.commit()
+
+    # Helper methods
+
+    def _entry_for(self, root: Path, package: Dict[str, Any], kind: str) -> CatalogEntry:
+        """Describe a remote package as a catalog entry for compatibility lookups."""
+        package_dir = root / package['name']
+        return CatalogEntry(
+            config_path=package_dir / f"{package['name']}.json",
+            kind=kind,
+            config=package.get('config', {}),
+            config_mtime=0.0,
+            config_size=0,
+            dir_mtime=0.0
+        )
+
+    @staticmethod
+    def _remote_metadata(config: Dict[str, Any], kind: str, package: Dict[str, Any]) -> Dict[str, Any]:
+        return dict(config, source="remote", remote_kind=kind, remote_package=package)
+
+    @staticmethod
+    def _driver_type_for(package: Dict[str, Any]) -> DriverType:
+        """Use the declared driver type, else infer it from the listed files."""
+        declared = package.get('config', {}).get('driverType')
+        if declared:
+            try:
+                return DriverType(str(declared).lower())
+            except ValueError:
+                logger.warning(f"Unknown declared driver type: {declared}")
+
+        extensions = {Path(f['path']).suffix.lower() for f in package.get('files', [])}
+        for driver_type in (DriverType.INF, DriverType.APPX, DriverType.EXE):
+            if f".{driver_type.value}" in extensions:
+                return driver_type
+        return DriverType.INF
+
+    def _resolve_device_ids(self, device_family: str) -> Optional[List[int]]:
+        if self._device_mapping is None:
+            self._device_mapping = load_device_family_mapping(self.device_mapping_path)
+        family = self._device_mapping.get(device_family)
+        return family.get('deviceIds') if family else None
@@ -0,0 +1,318 @@
+"""
+Asset Watcher - Keeps the asset catalog current from filesystem change notifications
+"""
+
+import os
+import sys
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+import time
+from pathlib import Path
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Any
+import logging
+
+from .local import LocalAssetProvider
+
+
+logger = logging.getLogger(__name__)
+
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+_EVENT_STRUCT = struct.Struct("iIII")
+
+
+def _load_libc():
+    """Load libc with inotify support, or None on platforms without it."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class InotifyUnavailable(Exception):
+    """inotify cannot be used (platform, permissions or watch limit)."""
+    pass
+
+
+class _Inotify:
+    """Minimal recursive inotify wrapper."""
+
+    def __init__(self, libc):
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise InotifyUnavailable(f"inotify_init1 failed: {os.strerror(ctypes.get_errno())}")
+        self.watches: Dict[int, Path] = {}
+
+    def add_tree(self, root: Path) -> None:
+        """Watch a directory and all directories below it."""
+        for directory, subdirs, _files in os.walk(root):
+            self.add_watch(Path(directory))
+
+    def add_watch(self, directory: Path) -> None:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOENT:
+                return  # removed before we got to it
+            raise InotifyUnavailable(f"inotify_add_watch failed for {directory}: {os.strerror(err)}")
+        self.watches[wd] = directory
+
+    def read_events(self, timeout: float):
+        """Yield (path, mask) for pending events, waiting up to ``timeout`` seconds."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset + _EVENT_STRUCT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_STRUCT.unpack_from(data, offset)
+            offset += _EVENT_STRUCT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                yield None, mask
+                continue
+            directory = self.watches.get(wd)
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            if directory is None:
+                continue
+            yield (directory / os.fsdecode(name) if name else directory), mask
+
+    def close(self) -> None:
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+        self.watches.clear()
+
+
+class AssetWatcher:
+    """Watches the driver and update roots and applies changes to the catalog incrementally.
+
+    Uses inotify on Linux and falls back to periodic mtime polling elsewhere
+    (or when inotify watches cannot be added). While running, the catalog
+    roots are marked as watched so discovery requests skip their rescan.
+    ``on_change`` receives an ``assets_changed`` message for every change.
+    """
+
+    def __init__(self, provider: LocalAssetProvider,
+                 on_change: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 poll_interval: float = 5.0, debounce: float = 0.5, use_inotify: bool = True):
+        self.provider = provider
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.use_inotify = use_inotify
+        self.backend: Optional[str] = None
+        self.roots: Dict[str, Path] = {}
+        self._inotify: Optional[_Inotify] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.stats = {'events': 0, 'refreshes': 0, 'changes': 0, 'overflows': 0, 'last_change': None}
+
+    def start(self) -> str:
+        """Index the roots, start watching and return the backend in use."""
+        if self._thread is not None:
+            return self.backend
+
+        self.roots = {kind: root for kind, root in self.provider.get_catalog_roots().items() if root.exists()}
+        for kind in self.provider.get_catalog_roots():
+            if kind not in self.roots:
+                logger.warning(f"Asset root for {kind} packages does not exist, not watching it")
+
+        self.backend = "polling"
+        libc = _load_libc() if self.use_inotify else None
+        if libc is not None:
+            try:
+                self._inotify = _Inotify(libc)
+                for root in self.roots.values():
+                    self._inotify.add_tree(root)
+                self.backend = "inotify"
+            except InotifyUnavailable as e:
+                logger.warning(f"inotify unavailable, falling back to polling: {e}")
+                if self._inotify:
+                    self._inotify.close()
+                self._inotify = None
+
+        # Watches are in place before the initial refresh, so no change is missed
+        for kind in self.roots:
+            self.provider.refresh_catalog(kind)
+            self.provider.set_catalog_watched(kind, True)
+
+        self._stop.clear()
+        target = self._run_inotify if self.backend == "inotify" else self._run_polling
+        self._thread = threading.Thread(target=target, name="kassia-asset-watcher", daemon=True)
+        self._thread.start()
+
+        logger.info(f"Asset watcher started ({self.backend}): {[str(r) for r in self.roots.values()]}")
+        return self.backend
+
+    def stop(self) -> None:
+        """Stop watching; discovery goes back to rescanning on each request."""
+        for kind in self.roots:
+            self.provider.set_catalog_watched(kind, False)
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(self.poll_interval, 2.0) + 1.0)
+            self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        logger.info("Asset watcher stopped")
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_watcher_info(self) -> Dict[str, Any]:
+        """Get watcher state and statistics."""
+        return {
+            'running': self.is_running,
+            'backend': self.backend,
+            'roots': {kind: str(root) for kind, root in self.roots.items()},
+            'watches': len(self._inotify.watches) if self._inotify else 0,
+            **self.stats
+        }
+
+    # Helper methods
+
+    def _run_inotify(self) -> None:
+        pending: Dict[str, Set[Path]] = {}
+        first_event = 0.0
+
+        while not self._stop.is_set():
+            try:
+                timeout = self.debounce if pending else 1.0
+                got_event = False
+                for path, mask in self._inotify.read_events(timeout):
+                    got_event = True
+                    self.stats['events'] += 1
+                    if path is None:
+                        # Event queue overflowed: changes were lost, resync everything
+                        self.stats['overflows'] += 1
+                        logger.warning("inotify queue overflow, resynchronizing asset catalog")
+                        pending = {kind: {root} for kind, root in self.roots.items()}
+                        continue
+
+                    if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                        self._inotify.add_tree(path)
+
+                    kind = self._kind_for(path)
+                    if kind:
+                        if not pending:
+                            first_event = time.monotonic()
+                        pending.setdefault(kind, set()).add(path)
+
+                # Apply once the tree is quiet, or at the latest after 10 debounce periods
+                if pending and (not got_event or time.monotonic() - first_event > self.debounce * 10):
+                    self._apply(pending)
+                    pending = {}
+            except InotifyUnavailable as e:
+                logger.warning(f"inotify watch failed, switching to polling: {e}")
+                self._inotify.close()
+                self._inotify = None
+                self.backend = "polling"
+                self._run_polling()
+                return
+            except Exception as e:
+                logger.error(f"Asset watcher error: {e}")
+                time.sleep(1)
+
+    def _run_polling(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            for kind in self.roots:
+                try:
+                    self.stats['refreshes'] += 1
+                    stats = self.provider.refresh_catalog(kind)
+                    if stats.changed:
+                        self._notify(kind, stats)
+                except Exception as e:
+                    logger.error(f"Asset polling failed for {kind} packages: {e}")
+
+    def _apply(self, pending: Dict[str, Set[Path]]) -> None:
+        """Re-index the subtrees containing the changed paths and report the changes."""
+        for kind, paths in pending.items():
+            try:
+                self.stats['refreshes'] += 1
+                stats = self.provider.refresh_catalog(kind, sorted(paths))
+                if stats.changed:
+                    self._notify(kind, stats)
+            except Exception as e:
+                logger.error(f"Failed to apply asset changes for {kind} packages: {e}")
+
+    def _kind_for(self, path: Path) -> Optional[str]:
+        for kind, root in self.roots.items():
+            if path == root or root in path.parents:
+                return kind
+        return None
+
+    def _notify(self, kind: str, stats) -> None:
+        root = self.roots[kind]
+        self.stats['changes'] += 1
+        self.stats['last_change'] = datetime.now().isoformat()
+
+        message = {
+            'type': 'assets_changed',
+            'kind': kind,
+            'updated': self._relative(root, stats.updated_paths),
+            'removed': self._relative(root, stats.removed_paths),
+            'generation': self.provider.catalog.generation,
+            'backend': self.backend,
+            'timestamp': self.stats['last_change']
+        }
+        logger.info(f"Asset catalog changed ({kind}): {len(message['updated'])} updated, "
+                    f"{len(message['removed'])} removed")
+
+        if self.on_change:
+            try:
+                self.on_change(message)
+            except Exception as e:
+                logger.error(f"Asset change callback failed: {e}")
+
+    @staticmethod
+    def _relative(root: Path, paths: List[str]) -> List[str]:
+        result = []
+        for path in paths:
+            try:
+                result.append(Path(path).relative_to(root).as_posix())
+            except ValueError:
+                result.append(path)
+        return sorted(result)
@@ -1,12 +1,16 @@
 """
 Driver Integration Engine
-Integrates drivers into mounted WIM images using DISM and Yunona staging
+Integrates drivers into mounted WIM images using the imaging backend and Yunona staging
 """
 
 import asyncio
+import os
+import re
 import subprocess
+import tempfile
+import time
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Any, List, Dict, Optional, Set, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 import logging
@@ -14,7 +18,13 @@ import shutil
 import json
 
 from .asset_providers import DriverAsset, DriverType, AssetType
+from .asset_providers.manifest import get_package_manifest
+from .inf_parser import InfInfo, InfParseError, get_inf_info, select_driver_files
+from .image_inventory import ImageInventory
+from .driver_resolver import resolve_driver_versions
 from .wim_handler import DismError
+from .imaging_backend import ImagingBackend, DismBackend, ProgressCallback
+from ..utils.tool_output import DriverPackageStatus, ToolProgress, item_progress, parse_add_driver_output
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +34,7 @@ class DriverIntegrationResult:
     """Result of driver integration operation."""
     driver_asset: DriverAsset
     success: bool
-    method: str  # "DISM", "YUNONA", "SKIPPED"
+    method: str  # Imaging backend method ("DISM", "WIMLIB", ...), "YUNONA", "SKIPPED"
     message: str
     duration: Optional[float] = None
     files_processed: int = 0
@@ -33,22 +43,79 @@ class DriverIntegrationResult:
 class DriverIntegrator:
     """Driver integration engine for WIM images."""
     
-    def __init__(self, dism_path: str = "dism.exe"):
+    def __init__(self, dism_path: str = "dism.exe", backend: Optional[ImagingBackend] = None,
+                 batch_inf: bool = False, staging_dir: Optional[Path] = None,
+                 hardware_ids: Optional[List[str]] = None, deduplicate: bool = False,
+                 inventory: Optional[ImageInventory] = None):
         self.dism_path = dism_path
+        self.backend = backend or DismBackend(dism_path)
+        self.batch_inf = batch_inf  # add all INF packages in one backend run
+        self.staging_dir = staging_dir  # parent of the staging trees (system temp if not set)
+        self.hardware_ids = list(hardware_ids or [])  # only inject INFs matching these device IDs
+        self.deduplicate = deduplicate  # only inject the newest DriverVer per hardware ID across packages
+        self.batch_info: Optional[Dict[str, Any]] = None
+        self.version_info: Optional[Dict[str, Any]] = None
+        self.shadowed_infs: Set[Path] = set()
+        self.inventory = inventory  # drivers already in the image are not injected again
+        self.present_infs: Set[Path] = set()
         self.integration_stats = {
             'total': 0,
             'successful': 0,
             'failed': 0,
             'inf_via_dism': 0,
             'appx_via_yunona': 0,
-            'exe_via_yunona': 0
+            'exe_via_yunona': 0,
+            'inf_files_selected': 0,
+            'inf_files_skipped': 0,
+            'inf_files_shadowed': 0,
+            'inf_files_present': 0
         }
     
     async def integrate_drivers(self, drivers: List[DriverAsset], mount_point: Path, 
-                               yunona_path: Path) -> List[DriverIntegrationResult]:
-        """Integrate all drivers into mounted WIM."""
+                               yunona_path: Path,
+                               progress_callback: Optional[ProgressCallback] = None) -> List[DriverIntegrationResult]:
+        """Integrate all drivers into mounted WIM.
+
+        ``progress_callback`` receives the progress across all drivers.
+        """
         logger.info(f"Starting integration of {len(drivers)} drivers")
         
+        yunona_target = await self.prepare_mount(mount_point, yunona_path)
+        
+        self.integration_stats['total'] = len(drivers)
+        self.batch_info = None
+        
+        # Sort drivers by order for proper installation sequence
+        sorted_drivers = sorted(drivers, key=lambda d: d.order)
+        await asyncio.to_thread(self.resolve_versions, sorted_drivers)
+        
+        # INF packages go first, in one backend run when batching
+        results = {}
+        batch = self.batch_candidates(sorted_drivers)
+        if batch:
+            def batch_progress(progress: ToolProgress) -> None:
+                progress_callback(ToolProgress(progress.operation,
+                                               progress.percent * len(batch) / len(sorted_drivers), progress.target))
+            
+            for result in await self.integrate_driver_batch(
+                batch, mount_point, batch_progress if progress_callback else None
+            ):
+                results[id(result.driver_asset)] = result
+        
+        position = len(results)
+        for driver in sorted_drivers:
+            if id(driver) not in results:
+                progress = item_progress(progress_callback, position, len(sorted_drivers), driver.name)
+                results[id(driver)] = await self.integrate_driver(driver, mount_point, yunona_target, progress)
+                position += 1
+        
+        logger.info(f"Driver integration completed. Success: {self.integration_stats['successful']}, "
+                   f"Failed: {self.integration_stats['failed']}")
+        
+        return [results[id(driver)] for driver in sorted_drivers]
+    
+    async def prepare_mount(self, mount_point: Path, yunona_path: Path) -> Path:
+        """Check the mounted image and make sure Yunona is in it; return the Yunona directory."""
         if not mount_point.exists():
             raise DismError(f"Mount point does not exist: {mount_point}")
         
@@ -63,51 +130,108 @@ class DriverIntegrator:
         
         # Copy Yunona core files if not present
         await self._ensure_yunona_in_wim(yunona_path, yunona_target)
+        return yunona_target
+    
+    def resolve_versions(self, drivers: List[DriverAsset]) -> Optional[Dict[str, Any]]:
+        """Shadow the INFs for which another INF package provides a newer DriverVer.
+
+        Runs before the drivers are integrated (only when deduplicating); the
+        packages are compared in ``order``. Returns the resolution summary with
+        the INF files and bytes injected before and after deduplication.
+        """
+        self.shadowed_infs = set()
+        self.version_info = None
+        inf_drivers = sorted((d for d in drivers if d.driver_type == DriverType.INF), key=lambda d: d.order)
+        if not self.deduplicate or len(inf_drivers) < 2:
+            return None
         
-        results = []
-        self.integration_stats['total'] = len(drivers)
-        
-        # Sort drivers by order for proper installation sequence
-        sorted_drivers = sorted(drivers, key=lambda d: d.order)
-        
-        for driver in sorted_drivers:
-            logger.info(f"Processing driver: {driver.name} [{driver.driver_type.value}]")
-            
+        candidates = {}
+        packages: Dict[str, List[InfInfo]] = {}
+        for driver in inf_drivers:
             try:
-                result = await self._integrate_single_driver(driver, mount_point, yunona_target)
-                results.append(result)
-                
-                if result.success:
-                    self.integration_stats['successful'] += 1
-                    logger.info(f"Driver integration successful: {driver.name}")
-                else:
-                    self.integration_stats['failed'] += 1
-                    logger.error(f"Driver integration failed: {driver.name} - {result.message}")
-                    
+                manifest = get_package_manifest(driver.path)
+                selection = select_driver_files(manifest.root, manifest.files, self.hardware_ids or None)
+                packages[driver.name] = [get_inf_info(path) for path in selection.infs]
             except Exception as e:
-                error_result = DriverIntegrationResult(
-                    driver_asset=driver,
-                    success=False,
-                    method="ERROR",
-                    message=f"Unexpected error: {str(e)}"
-                )
-                results.append(error_result)
-                self.integration_stats['failed'] += 1
-                logger.error(f"Driver integration error for {driver.name}: {e}")
+                logger.warning(f"Cannot read the INF files of {driver.name}, not deduplicating it: {e}")
+                continue
+            candidates[driver.name] = (manifest, selection)
         
-        logger.info(f"Driver integration completed. Success: {self.integration_stats['successful']}, "
-                   f"Failed: {self.integration_stats['failed']}")
+        resolution = resolve_driver_versions(packages)
+        self.shadowed_infs = set(resolution.shadowed_paths)
+        
+        injected = {'infs_before': 0, 'infs_after': 0, 'bytes_before': 0, 'bytes_after': 0}
+        for manifest, selection in candidates.values():
+            # Without hardware IDs a package is added whole unless some of its INFs are shadowed
+            before = selection.files if self.hardware_ids else manifest.files
+            after = before
+            if self.shadowed_infs.intersection(selection.infs):
+                after = select_driver_files(manifest.root, manifest.files, self.hardware_ids or None,
+                                            self.shadowed_infs).files
+            for state, files in (('before', before), ('after', after)):
+                injected[f'infs_{state}'] += sum(1 for path in files if path.suffix.lower() == ".inf")
+                injected[f'bytes_{state}'] += sum(path.stat().st_size for path in files)
+        
+        self.version_info = {
+            'packages': len(candidates),
+            **injected,
+            'saved_bytes': injected['bytes_before'] - injected['bytes_after'],
+            **resolution.to_dict()
+        }
+        logger.info(f"Driver version resolution: {injected['infs_after']} of {injected['infs_before']} INF files, "
+                    f"{self.version_info['saved_bytes']} bytes less to inject")
+        return self.version_info
+    
+    def batch_candidates(self, drivers: List[DriverAsset]) -> List[DriverAsset]:
+        """The INF drivers that are added in one batched run (none unless batching applies)."""
+        batch = [d for d in drivers if d.driver_type == DriverType.INF] if self.batch_inf else []
+        return batch if len(batch) > 1 else []
+    
+    async def integrate_driver(self, driver: DriverAsset, mount_point: Path, yunona_target: Path,
+                               progress: Optional[ProgressCallback] = None) -> DriverIntegrationResult:
+        """Integrate one driver and count the result."""
+        logger.info(f"Processing driver: {driver.name} [{driver.driver_type.value}]")
+        
+        try:
+            result = await self._integrate_single_driver(driver, mount_point, yunona_target, progress)
+        except Exception as e:
+            self.integration_stats['failed'] += 1
+            logger.error(f"Driver integration error for {driver.name}: {e}")
+            return DriverIntegrationResult(
+                driver_asset=driver,
+                success=False,
+                method="ERROR",
+                message=f"Unexpected error: {str(e)}"
+            )
         
+        self._count(result)
+        return result
+    
+    async def integrate_driver_batch(self, drivers: List[DriverAsset], mount_point: Path,
+                                     progress: Optional[ProgressCallback] = None) -> List[DriverIntegrationResult]:
+        """Integrate INF drivers in one batched backend run and count the results."""
+        results = await self._integrate_inf_batch(drivers, mount_point, progress)
+        for result in results:
+            self._count(result)
         return results
     
+    def _count(self, result: DriverIntegrationResult) -> None:
+        if result.success:
+            self.integration_stats['successful'] += 1
+            logger.info(f"Driver integration successful: {result.driver_asset.name}")
+        else:
+            self.integration_stats['failed'] += 1
+            logger.error(f"Driver integration failed: {result.driver_asset.name} - {result.message}")
+    
     async def _integrate_single_driver(self, driver: DriverAsset, mount_point: Path, 
-                                     yunona_target: Path) -> DriverIntegrationResult:
+                                     yunona_target: Path,
+                                     progress: Optional[ProgressCallback] = None) -> DriverIntegrationResult:
         """Integrate a single driver based on its type."""
         start_time = datetime.now()
         
         if driver.driver_type == DriverType.INF:
-            result = await self._integrate_inf_driver(driver, mount_point)
-            if result.success:
+            result = await self._integrate_inf_driver(driver, mount_point, progress)
+            if result.success and result.method != "SKIPPED":
                 self.integration_stats['inf_via_dism'] += 1
                 
         elif driver.driver_type == DriverType.APPX:
@@ -133,82 +257,277 @@ class DriverIntegrator:
         
         return result
     
-    async def _integrate_inf_driver(self, driver: DriverAsset, mount_point: Path) -> DriverIntegrationResult:
-        """Integrate INF driver using DISM."""
-        logger.info(f"Integrating INF driver via DISM: {driver.name}")
+    async def _integrate_inf_driver(self, driver: DriverAsset, mount_point: Path,
+                                    progress: Optional[ProgressCallback] = None,
+                                    selection: Optional[Tuple[List[Path], Optional[List[Path]], int]] = None
+                                    ) -> DriverIntegrationResult:
+        """Integrate INF driver using the imaging backend.
+
+        ``selection`` is the result of ``_select_package_files`` when the
+        package was already selected (and counted) by a batch run.
+        """
+        method = self.backend.method
+        logger.info(f"Integrating INF driver via {method}: {driver.name}")
         
         try:
             # Find INF files in driver directory
-            inf_files = list(driver.path.rglob("*.inf"))
-            if not inf_files:
+            inf_files, files, skipped = selection or self._select_package_files(driver)
+            if not inf_files and not skipped:
                 return DriverIntegrationResult(
                     driver_asset=driver,
                     success=False,
-                    method="DISM",
+                    method=method,
                     message="No INF files found in driver directory"
                 )
+            if not inf_files:
+                return self._left_out_result(driver, skipped)
             
-            # Build DISM command for driver installation
-            cmd = [
-                self.dism_path,
-                f"/Image:{mount_point}",
-                "/Add-Driver",
-                f"/Driver:{driver.path}",
-                "/Recurse",
-                "/ForceUnsigned"  # Allow unsigned drivers for development
-            ]
-            
-            logger.debug(f"DISM command: {' '.join(cmd)}")
-            
-            # Execute DISM command
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=300)
-            
-            # Parse result
-            if process.returncode == 0:
-                return DriverIntegrationResult(
-                    driver_asset=driver,
-                    success=True,
-                    method="DISM",
-                    message=f"INF driver installed successfully ({len(inf_files)} files)",
-                    files_processed=len(inf_files)
+            if files is None:
+                result = await self.backend.add_driver(
+                    mount_point, driver.path, recurse=True, force_unsigned=True, progress=progress
                 )
             else:
-                error_output = stderr.decode('utf-8', errors='ignore')
-                return DriverIntegrationResult(
-                    driver_asset=driver,
-                    success=False,
-                    method="DISM",
-                    message=f"DISM failed with exit code {process.returncode}: {error_output}"
-                )
+                # Only the matching INFs and their files are staged and added
+                staging = self._create_staging_dir("driver_select_")
+                try:
+                    await asyncio.to_thread(self._link_packages, {"001_package": (driver, files)}, staging)
+                    result = await self.backend.add_driver(
+                        mount_point, staging, recurse=True, force_unsigned=True, progress=progress
+                    )
+                finally:
+                    await asyncio.to_thread(shutil.rmtree, staging, True)
+            
+            action = "staged for first-boot installation" if result.staged else "installed successfully"
+            selected = f" of {len(inf_files) + skipped}" if skipped else ""
+            return DriverIntegrationResult(
+                driver_asset=driver,
+                success=True,
+                method=method,
+                message=f"INF driver {action} ({len(inf_files)}{selected} files)",
+                files_processed=len(inf_files)
+            )
                 
-        except asyncio.TimeoutError:
+        except DismError as e:
             return DriverIntegrationResult(
                 driver_asset=driver,
                 success=False,
-                method="DISM",
-                message="DISM operation timed out (300 seconds)"
+                method=method,
+                message=f"{method} failed: {str(e)}"
             )
         except Exception as e:
             return DriverIntegrationResult(
                 driver_asset=driver,
                 success=False,
-                method="DISM",
-                message=f"DISM execution failed: {str(e)}"
+                method=method,
+                message=f"{method} execution failed: {str(e)}"
             )
     
+    async def _integrate_inf_batch(self, drivers: List[DriverAsset], mount_point: Path,
+                                   progress: Optional[ProgressCallback] = None) -> List[DriverIntegrationResult]:
+        """Add several INF driver packages in one backend run.
+
+        The packages are hardlinked into one staging tree (one ``NNN_<name>``
+        directory per package, in installation order), so the imaging tool
+        starts its image session once instead of once per package. The result
+        of each package is taken from the per-INF lines of the tool output;
+        packages a failed run did not report are added one by one afterwards.
+        """
+        method = self.backend.method
+        logger.info(f"Integrating {len(drivers)} INF drivers via {method} in one batch")
+        
+        results: Dict[int, DriverIntegrationResult] = {}
+        packages: Dict[str, Tuple[DriverAsset, List[Path]]] = {}
+        selections: Dict[str, Tuple[List[Path], Optional[List[Path]], int]] = {}
+        for position, driver in enumerate(drivers, 1):
+            skipped = 0
+            try:
+                inf_files, files, skipped = self._select_package_files(driver)
+            except Exception as e:
+                inf_files, message = [], f"{method} execution failed: {str(e)}"
+            else:
+                message = "No INF files found in driver directory"
+            if inf_files:
+                key = f"{position:03d}_{re.sub(r'[^A-Za-z0-9._-]+', '_', driver.name)}"
+                packages[key] = (driver, files if files is not None else get_package_manifest(driver.path).files)
+                selections[key] = (inf_files, files, skipped)
+            elif skipped:
+                results[id(driver)] = self._left_out_result(driver, skipped)
+            else:
+                results[id(driver)] = DriverIntegrationResult(driver, False, method, message)
+        
+        if packages:
+            start = time.perf_counter()
+            linked = copied = 0
+            output, staged, setup_seconds, error = "", False, None, None
+            staging = self._create_staging_dir("driver_batch_")
+            try:
+                linked, copied = await asyncio.to_thread(self._link_packages, packages, staging)
+                result = await self.backend.add_driver(
+                    mount_point, staging, recurse=True, force_unsigned=True, progress=progress,
+                    timeout=300 * len(packages)
+                )
+                output, staged, setup_seconds = result.output, result.staged, result.setup_seconds
+            except DismError as e:
+                output, error = e.output or "", str(e)
+            except Exception as e:
+                error = str(e)
+            finally:
+                await asyncio.to_thread(shutil.rmtree, staging, True)
+            batch_seconds = time.perf_counter() - start
+            
+            if error:
+                logger.warning(f"Batched driver injection failed, adding unreported packages one by one: {error}")
+            
+            statuses: Dict[str, List[DriverPackageStatus]] = {key: [] for key in packages}
+            for status in parse_add_driver_output(output):
+                key = next((part for part in re.split(r"[\\/]", status.inf) if part in statuses), None)
+                if key:
+                    statuses[key].append(status)
+            
+            retry = []
+            action = "staged for first-boot installation" if staged else "installed successfully"
+            for key, (driver, _) in packages.items():
+                inf_files = selections[key][0]
+                reported = statuses[key]
+                failed = [status for status in reported if not status.success]
+                if failed:
+                    inf_name = re.split(r"[\\/]", failed[0].inf)[-1]
+                    results[id(driver)] = DriverIntegrationResult(
+                        driver_asset=driver,
+                        success=False,
+                        method=method,
+                        message=f"{method} failed for {inf_name}: {failed[0].message}",
+                        files_processed=len(reported) - len(failed)
+                    )
+                elif error is None or len(reported) >= len(inf_files):
+                    results[id(driver)] = DriverIntegrationResult(
+                        driver_asset=driver,
+                        success=True,
+                        method=method,
+                        message=f"INF driver {action} in batch ({len(inf_files)} files)",
+                        files_processed=len(inf_files)
+                    )
+                else:
+                    retry.append(key)
+                    continue
+                results[id(driver)].duration = batch_seconds / len(packages)
+            
+            for key in retry:
+                # The selection (and its statistics) of the batch pass is reused
+                driver = packages[key][0]
+                retry_start = time.perf_counter()
+                results[id(driver)] = await self._integrate_inf_driver(driver, mount_point, selection=selections[key])
+                results[id(driver)].duration = time.perf_counter() - retry_start
+            
+            # Without batching every package pays the session startup of the imaging tool
+            estimated = None
+            if setup_seconds is not None and error is None:
+                estimated = batch_seconds + (len(packages) - 1) * setup_seconds
+            self.batch_info = {
+                'packages': len(packages),
+                'hardlinked_files': linked,
+                'copied_files': copied,
+                'seconds': round(batch_seconds, 3),
+                'setup_seconds': round(setup_seconds, 3) if setup_seconds is not None else None,
+                'estimated_package_mode_seconds': round(estimated, 3) if estimated is not None else None,
+                'estimated_saved_seconds': round(estimated - batch_seconds, 3) if estimated is not None else None,
+                'retried': len(retry),
+                'error': error
+            }
+            logger.info(f"Batched INF injection of {len(packages)} packages: {batch_seconds:.1f}s"
+                        + (f", about {estimated - batch_seconds:.1f}s saved" if estimated is not None else ""))
+        
+        batch_results = [results[id(driver)] for driver in drivers]
+        self.integration_stats['inf_via_dism'] += sum(1 for result in batch_results
+                                                      if result.success and result.method != "SKIPPED")
+        return batch_results
+    
+    def _select_package_files(self, driver: DriverAsset) -> Tuple[List[Path], Optional[List[Path]], int]:
+        """The INF files of a package to inject, the package files to stage and the number of left out INFs.
+
+        Without hardware IDs, shadowed INFs and INFs already in the image every
+        INF is injected and the package directory is added as is (``None``
+        files). Otherwise only the INFs matching the device hardware IDs, not
+        shadowed by a newer DriverVer and not already in the driver store of
+        the image, with their catalogs and payload, are staged.
+        """
+        manifest = get_package_manifest(driver.path)
+        inf_files = manifest.get_files(".inf")
+        self.present_infs.update(self._find_present_infs(inf_files))
+        excluded = self.shadowed_infs | self.present_infs
+        if not inf_files or not (self.hardware_ids or excluded.intersection(inf_files)):
+            return inf_files, None, 0
+        
+        selection = select_driver_files(manifest.root, manifest.files, self.hardware_ids or None, excluded)
+        shadowed = len(self.shadowed_infs.intersection(selection.excluded))
+        present = len(selection.excluded) - shadowed
+        self.integration_stats['inf_files_selected'] += len(selection.infs)
+        self.integration_stats['inf_files_skipped'] += len(selection.skipped)
+        self.integration_stats['inf_files_shadowed'] += shadowed
+        self.integration_stats['inf_files_present'] += present
+        for missing in selection.missing:
+            logger.warning(f"File referenced by {driver.name} not found in package: {missing}")
+        logger.info(f"INF selection for {driver.name}: {len(selection.infs)} of {len(inf_files)} INF files "
+                    f"({len(selection.skipped)} not matching, {shadowed} shadowed, {present} already in the image), "
+                    f"{len(selection.files)} of {manifest.file_count} package files")
+        return selection.infs, selection.files, len(selection.skipped) + len(selection.excluded)
+    
+    def _find_present_infs(self, inf_files: List[Path]) -> Set[Path]:
+        """The INF files the driver store of the image already has at the same or a newer DriverVer."""
+        present = set()
+        if self.inventory is None:
+            return present
+        for inf_file in inf_files:
+            try:
+                found = self.inventory.find_driver(get_inf_info(inf_file))
+            except InfParseError:
+                continue
+            if found:
+                logger.debug(f"{inf_file.name} already in the image as {found.path} ({found.driver_version})")
+                present.add(inf_file)
+        return present
+    
+    def _left_out_result(self, driver: DriverAsset, left_out: int) -> DriverIntegrationResult:
+        """Result of a package none of whose INF files is injected."""
+        shadowed_by = sorted({entry['shadowed_by_package'] for entry in (self.version_info or {}).get('shadowed', [])
+                              if entry['package'] == driver.name})
+        if shadowed_by:
+            message = f"Shadowed by newer driver versions in {', '.join(shadowed_by)} ({left_out} INF files left out)"
+        elif self.present_infs.intersection(get_package_manifest(driver.path).get_files(".inf")):
+            message = f"Already in the image at the same or a newer DriverVer ({left_out} INF files left out)"
+        else:
+            message = f"No INF matches the device hardware IDs ({left_out} INF files skipped)"
+        return DriverIntegrationResult(driver_asset=driver, success=True, method="SKIPPED", message=message)
+    
+    def _create_staging_dir(self, prefix: str) -> Path:
+        if self.staging_dir is not None:
+            self.staging_dir.mkdir(parents=True, exist_ok=True)
+        return Path(tempfile.mkdtemp(prefix=prefix, dir=self.staging_dir))
+    
+    @staticmethod
+    def _link_packages(packages: Dict[str, Tuple[DriverAsset, List[Path]]], staging: Path) -> Tuple[int, int]:
+        """Hardlink the given package files into the staging tree; return (linked, copied) file counts."""
+        linked = copied = 0
+        for key, (driver, files) in packages.items():
+            for source in files:
+                target = staging / key / source.relative_to(driver.path)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    os.link(source, target)
+                    linked += 1
+                except OSError:
+                    shutil.copy2(source, target)  # Different volume or no hardlink support
+                    copied += 1
+        return linked, copied
+    
     async def _stage_appx_driver(self, driver: DriverAsset, yunona_target: Path) -> DriverIntegrationResult:
         """Stage APPX driver package to Yunona for post-deployment installation."""
         logger.info(f"Staging APPX driver to Yunona: {driver.name}")
         
         try:
             # Find APPX files
-            appx_files = list(driver.path.rglob("*.appx"))
+            manifest = get_package_manifest(driver.path)
+            appx_files = manifest.get_files(".appx")
             if not appx_files:
                 return DriverIntegrationResult(
                     driver_asset=driver,
@@ -223,15 +542,14 @@ class DriverIntegrator:
             
             # Copy entire driver directory to preserve dependencies
             copied_files = 0
-            for item in driver.path.rglob("*"):
-                if item.is_file():
-                    relative_path = item.relative_to(driver.path)
-                    target_file = driver_target / relative_path
-                    target_file.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    # Copy file
-                    await self._copy_file_async(item, target_file)
-                    copied_files += 1
+            for item in manifest.files:
+                relative_path = item.relative_to(driver.path)
+                target_file = driver_target / relative_path
+                target_file.parent.mkdir(parents=True, exist_ok=True)
+                
+                # Copy file
+                await self._copy_file_async(item, target_file)
+                copied_files += 1
             
             # Create installation script for APPX
             install_script = self._create_appx_install_script(driver, appx_files)
@@ -262,7 +580,8 @@ class DriverIntegrator:
         
         try:
             # Find EXE files
-            exe_files = list(driver.path.rglob("*.exe"))
+            manifest = get_package_manifest(driver.path)
+            exe_files = manifest.get_files(".exe")
             if not exe_files:
                 return DriverIntegrationResult(
                     driver_asset=driver,
@@ -277,15 +596,14 @@ class DriverIntegrator:
             
             # Copy entire driver directory
             copied_files = 0
-            for item in driver.path.rglob("*"):
-                if item.is_file():
-                    relative_path = item.relative_to(driver.path)
-                    target_file = driver_target / relative_path
-                    target_file.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    # Copy file
-                    await self._copy_file_async(item, target_file)
-                    copied_files += 1
+            for item in manifest.files:
+                relative_path = item.relative_to(driver.path)
+                target_file = driver_target / relative_path
+                target_file.parent.mkdir(parents=True, exist_ok=True)
+                
+                # Copy file
+                await self._copy_file_async(item, target_file)
+                copied_files += 1
             
             # Create installation script for EXE
             install_script = self._create_exe_install_script(driver, exe_files)
@@ -414,7 +732,8 @@ class DriverIntegrationManager:
         self.integrator = integrator
     
     async def integrate_drivers_for_device(self, drivers: List[DriverAsset], mount_point: Path,
-                                         yunona_path: Path, device_id: str, os_id: int) -> Dict:
+                                         yunona_path: Path, device_id: str, os_id: int,
+                                         progress_callback: Optional[ProgressCallback] = None) -> Dict:
         """Integrate drivers for specific device and OS."""
         logger.info(f"Starting driver integration for device {device_id}, OS {os_id}")
         
@@ -427,12 +746,7 @@ class DriverIntegrationManager:
             }
         
         # Filter and validate drivers
-        compatible_drivers = []
-        for driver in drivers:
-            if self._validate_driver_compatibility(driver, os_id):
-                compatible_drivers.append(driver)
-            else:
-                logger.warning(f"Skipping incompatible driver: {driver.name}")
+        compatible_drivers = self.compatible_drivers(drivers, os_id)
         
         if not compatible_drivers:
             return {
@@ -445,21 +759,10 @@ class DriverIntegrationManager:
         # Execute integration
         try:
             results = await self.integrator.integrate_drivers(
-                compatible_drivers, mount_point, yunona_path
+                compatible_drivers, mount_point, yunona_path, progress_callback
             )
             
-            # Analyze results
-            successful_count = sum(1 for r in results if r.success)
-            failed_count = len(results) - successful_count
-            
-            return {
-                'success': failed_count == 0,
-                'message': f'Integration completed: {successful_count} successful, {failed_count} failed',
-                'results': results,
-                'stats': self.integrator.get_integration_summary(),
-                'successful_count': successful_count,
-                'failed_count': failed_count
-            }
+            return self.summarize_results(results)
             
         except Exception as e:
             logger.error(f"Driver integration failed: {e}")
@@ -470,6 +773,32 @@ class DriverIntegrationManager:
                 'stats': self.integrator.get_integration_summary()
             }
     
+    def compatible_drivers(self, drivers: List[DriverAsset], os_id: int) -> List[DriverAsset]:
+        """Get the drivers that support the OS (incompatible ones are skipped)."""
+        compatible_drivers = []
+        for driver in drivers:
+            if self._validate_driver_compatibility(driver, os_id):
+                compatible_drivers.append(driver)
+            else:
+                logger.warning(f"Skipping incompatible driver: {driver.name}")
+        return compatible_drivers
+    
+    def summarize_results(self, results: List[DriverIntegrationResult]) -> Dict:
+        """Build the integration result summary from the per-driver results."""
+        successful_count = sum(1 for r in results if r.success)
+        failed_count = len(results) - successful_count
+        
+        return {
+            'success': failed_count == 0,
+            'message': f'Integration completed: {successful_count} successful, {failed_count} failed',
+            'results': results,
+            'stats': self.integrator.get_integration_summary(),
+            'successful_count': successful_count,
+            'failed_count': failed_count,
+            'batch': self.integrator.batch_info,
+            'versions': self.integrator.version_info
+        }
+    
     def _validate_driver_compatibility(self, driver: DriverAsset, os_id: int) -> bool:
         """Validate driver compatibility with OS."""
         if not driver.supported_os:
@@ -0,0 +1,142 @@
+"""
+Driver Resolver - Keep the newest DriverVer per hardware ID across driver packages
+
+Two packages that cover the same devices (an old and a new chipset release,
+or the same release twice) would both be injected and Windows would pick one
+at PnP time. The resolver compares the parsed INFs of the packages selected
+for a build and shadows an INF when, for every hardware ID it lists, another
+package provides a newer driver. DriverVer is compared the way Windows ranks
+drivers: date first, then version; on a tie the package installed first
+(lowest ``order``) wins. Hardware IDs are compared per architecture of the
+models section listing them, so an ARM64-only package never shadows the
+x64 driver of another package.
+"""
+
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import logging
+
+from .inf_parser import InfInfo
+
+logger = logging.getLogger(__name__)
+
+
+def driver_ver_key(info: InfInfo) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+    """Sort key of an INF's DriverVer: ((year, month, day), (w, x, y, z)); missing parts sort first."""
+    date = ()
+    match = re.match(r"^\s*(\d{1,2})[/-](\d{1,2})[/-](\d{4})\s*$", info.driver_date or "")
+    if match:
+        month, day, year = (int(part) for part in match.groups())
+        date = (year, month, day)
+    version = tuple(int(part) for part in re.findall(r"\d+", info.driver_version or ""))[:4]
+    return date, version
+
+
+def format_driver_ver(info: InfInfo) -> str:
+    return ", ".join(part for part in (info.driver_date, info.driver_version) if part) or "no DriverVer"
+
+
+@dataclass
+class ShadowedInf:
+    """An INF left out because another package provides a newer driver for its hardware IDs."""
+    inf: InfInfo
+    package: str
+    shadowed_by: InfInfo
+    shadowed_by_package: str
+    hardware_id: str   # one of the hardware IDs of the INF
+    architecture: str = ""  # of the models section listing it ("" if undecorated)
+
+    @property
+    def reason(self) -> str:
+        same = driver_ver_key(self.inf) == driver_ver_key(self.shadowed_by)
+        architecture = f" ({self.architecture})" if self.architecture else ""
+        return (f"{self.shadowed_by.path.name} in {self.shadowed_by_package} "
+                f"{'has the same DriverVer' if same else 'is newer'} "
+                f"({format_driver_ver(self.shadowed_by)}) for {self.hardware_id}{architecture}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'inf': str(self.inf.path),
+            'package': self.package,
+            'driver_ver': format_driver_ver(self.inf),
+            'shadowed_by': str(self.shadowed_by.path),
+            'shadowed_by_package': self.shadowed_by_package,
+            'shadowed_by_driver_ver': format_driver_ver(self.shadowed_by),
+            'hardware_id': self.hardware_id,
+            'architecture': self.architecture,
+            'reason': self.reason
+        }
+
+
+@dataclass
+class DriverResolution:
+    """The INFs kept and shadowed across a set of driver packages."""
+    kept: Dict[str, List[InfInfo]] = field(default_factory=dict)   # per package, in package order
+    shadowed: List[ShadowedInf] = field(default_factory=list)
+
+    @property
+    def shadowed_paths(self) -> List[Path]:
+        return [entry.inf.path for entry in self.shadowed]
+
+    @property
+    def shadowed_packages(self) -> List[str]:
+        """Packages all of whose INFs are shadowed."""
+        shadowed = {entry.package for entry in self.shadowed}
+        return [package for package, infs in self.kept.items() if not infs and package in shadowed]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'kept_infs': sum(len(infs) for infs in self.kept.values()),
+            'shadowed_infs': len(self.shadowed),
+            'shadowed_packages': self.shadowed_packages,
+            'shadowed': [entry.to_dict() for entry in self.shadowed]
+        }
+
+
+def _targets(info: InfInfo) -> List[Tuple[str, str]]:
+    """(architecture, hardware ID) pairs an INF installs on."""
+    return [(architecture, hardware_id) for hardware_id in info.hardware_ids
+            for architecture in info.architectures.get(hardware_id) or [""]]
+
+
+def resolve_driver_versions(packages: Dict[str, List[InfInfo]]) -> DriverResolution:
+    """Keep the newest DriverVer per architecture and hardware ID across packages.
+
+    ``packages`` maps package names to their INFs, in installation order.
+    INFs of the same package never shadow each other (they usually target
+    different OS versions or architectures), and INFs without hardware IDs
+    are always kept.
+    """
+    # Best DriverVer per (architecture, hardware ID) and the first package providing it
+    best: Dict[Tuple[str, str], Tuple[Tuple, str, InfInfo]] = {}
+    for package, infs in packages.items():
+        for info in infs:
+            key = driver_ver_key(info)
+            for target in _targets(info):
+                current = best.get(target)
+                if current is None or key > current[0]:
+                    best[target] = (key, package, info)
+
+    resolution = DriverResolution()
+    for package, infs in packages.items():
+        resolution.kept[package] = []
+        for info in infs:
+            targets = _targets(info)
+            if not targets or any(best[target][1] == package for target in targets):
+                resolution.kept[package].append(info)
+                continue
+            architecture, hardware_id = targets[0]
+            _, winner_package, winner = best[targets[0]]
+            resolution.shadowed.append(
+                ShadowedInf(info, package, winner, winner_package, hardware_id, architecture)
+            )
+
+    for entry in resolution.shadowed:
+        logger.debug(f"Shadowed {entry.inf.path.name} in {entry.package}: {entry.reason}")
+    if resolution.shadowed:
+        logger.info(f"Driver version resolution: {len(resolution.shadowed)} INF files shadowed by newer versions"
+                    + (f", packages left out: {', '.join(resolution.shadowed_packages)}"
+                       if resolution.shadowed_packages else ""))
+    return resolution
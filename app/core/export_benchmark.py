@@ -0,0 +1,203 @@
+"""
+Export Benchmark - Throughput and compression ratio of the export profiles
+
+Exports a source image once per export profile (and splits it for split
+profiles) on the build machine and records the wall time, the throughput
+in uncompressed MB/s and the ratio of output size to image size, so the
+default export profile can be chosen from measurements instead of guesses.
+"""
+
+import shutil
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import logging
+
+from .wim_handler import WimHandler
+from ..models.config import ExportProfile
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_BENCHMARK_PATH = Path("runtime/data/kassia_export_benchmark.db")
+
+
+@dataclass
+class ExportBenchmarkResult:
+    """One measured export of a profile."""
+    profile: str
+    compression: str
+    split_size_mb: Optional[int]
+    backend: str
+    source: str
+    image_bytes: int
+    output_bytes: int
+    parts: int
+    seconds: float
+    created_at: Optional[str] = None
+
+    @property
+    def throughput_mb_s(self) -> float:
+        """Uncompressed image MB exported per second."""
+        return self.image_bytes / (1024 * 1024) / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def ratio(self) -> float:
+        """Output size relative to the uncompressed image size."""
+        return self.output_bytes / self.image_bytes if self.image_bytes else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'profile': self.profile,
+            'compression': self.compression,
+            'split_size_mb': self.split_size_mb,
+            'backend': self.backend,
+            'source': self.source,
+            'image_bytes': self.image_bytes,
+            'output_bytes': self.output_bytes,
+            'parts': self.parts,
+            'seconds': round(self.seconds, 3),
+            'throughput_mb_s': round(self.throughput_mb_s, 2),
+            'ratio': round(self.ratio, 4),
+            'created_at': self.created_at
+        }
+
+
+class ExportBenchmark:
+    """SQLite record of export profile benchmark runs."""
+
+    def __init__(self, db_path: Path = DEFAULT_BENCHMARK_PATH):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self.init_database()
+
+    def init_database(self):
+        """Initialize benchmark schema."""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS export_benchmarks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    profile TEXT NOT NULL,
+                    compression TEXT NOT NULL,
+                    split_size_mb INTEGER,
+                    backend TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    image_bytes INTEGER NOT NULL,
+                    output_bytes INTEGER NOT NULL,
+                    parts INTEGER NOT NULL,
+                    seconds REAL NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            ''')
+            conn.commit()
+
+    def record(self, result: ExportBenchmarkResult) -> None:
+        """Store a measured export."""
+        result.created_at = result.created_at or datetime.now().isoformat()
+        with self._lock, sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                INSERT INTO export_benchmarks
+                (profile, compression, split_size_mb, backend, source, image_bytes, output_bytes, parts, seconds,
+                 created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (result.profile, result.compression, result.split_size_mb, result.backend, result.source,
+                  result.image_bytes, result.output_bytes, result.parts, result.seconds, result.created_at))
+            conn.commit()
+
+    def results(self, limit: int = 100) -> List[ExportBenchmarkResult]:
+        """Recorded exports, newest first."""
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute('''
+                SELECT profile, compression, split_size_mb, backend, source, image_bytes, output_bytes, parts,
+                       seconds, created_at
+                FROM export_benchmarks ORDER BY id DESC LIMIT ?
+            ''', (limit,)).fetchall()
+        return [ExportBenchmarkResult(*row) for row in rows]
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Throughput and ratio per profile and backend, fastest first."""
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute('''
+                SELECT profile, backend, COUNT(*), SUM(image_bytes), SUM(output_bytes), SUM(seconds), MAX(created_at)
+                FROM export_benchmarks GROUP BY profile, backend
+            ''').fetchall()
+
+        summary = [
+            {
+                'profile': profile,
+                'backend': backend,
+                'runs': runs,
+                'throughput_mb_s': round(image_bytes / (1024 * 1024) / seconds, 2) if seconds else 0.0,
+                'ratio': round(output_bytes / image_bytes, 4) if image_bytes else 0.0,
+                'last_run': last_run
+            }
+            for profile, backend, runs, image_bytes, output_bytes, seconds, last_run in rows
+        ]
+        return sorted(summary, key=lambda entry: entry['throughput_mb_s'], reverse=True)
+
+
+async def run_export_benchmark(handler: WimHandler, source_wim: Path, profiles: Dict[str, ExportProfile],
+                               work_dir: Path, benchmark: Optional[ExportBenchmark] = None,
+                               index: int = 1) -> List[ExportBenchmarkResult]:
+    """Export ``source_wim`` with every profile in turn and record the measurements.
+
+    Profiles run one after another so they do not compete for disk and CPU.
+    The outputs are written to ``work_dir`` and removed after each profile.
+    """
+    wim_info = await handler.get_wim_info(source_wim, index)
+    selected = next((image for image in wim_info.images if image.index == wim_info.index), None)
+    image_bytes = (selected.total_bytes if selected and selected.total_bytes else 0) or source_wim.stat().st_size
+
+    results = []
+    for name, profile in profiles.items():
+        profile_dir = work_dir / name
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        target = profile_dir / f"benchmark{'.esd' if profile.compression == 'recovery' else '.wim'}"
+        try:
+            start = time.perf_counter()
+            outputs = [await handler.export_wim(source_wim, target, index, compression=profile.compression)]
+            if profile.splitSizeMB:
+                outputs = await handler.split_wim(target, target.with_suffix(".swm"), profile.splitSizeMB)
+            seconds = time.perf_counter() - start
+
+            result = ExportBenchmarkResult(
+                profile=name,
+                compression=profile.compression,
+                split_size_mb=profile.splitSizeMB,
+                backend=handler.backend.name,
+                source=str(source_wim),
+                image_bytes=image_bytes,
+                output_bytes=sum(output.stat().st_size for output in outputs),
+                parts=len(outputs),
+                seconds=seconds
+            )
+        finally:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+
+        if benchmark:
+            benchmark.record(result)
+        logger.info(f"Export profile {name}: {result.throughput_mb_s:.1f} MB/s, ratio {result.ratio:.3f}, "
+                    f"{result.parts} part(s)")
+        results.append(result)
+
+    return results
+
+
+# Global benchmark instances (one per database path)
+_benchmark_instances: Dict[str, ExportBenchmark] = {}
+_benchmark_lock = threading.Lock()
+
+
+def get_export_benchmark(db_path: Path = DEFAULT_BENCHMARK_PATH) -> ExportBenchmark:
+    """Get the shared export benchmark record for a database path."""
+    key = str(Path(db_path).resolve())
+    with _benchmark_lock:
+        if key not in _benchmark_instances:
+            _benchmark_instances[key] = ExportBenchmark(Path(db_path))
+        return _benchmark_instances[key]
@@ -0,0 +1,271 @@
+"""
+Image Inventory - Drivers and servicing packages already present in a mounted image
+
+Reads the driver store (``Windows/System32/DriverStore/FileRepository``) and
+the servicing package manifests (``Windows/servicing/Packages/*.mum``) of a
+mounted image directly, without the imaging tool. Every build of the same
+base image (SBI or serviced layer) sees the same content, so the inventory
+is cached by image digest; drivers and updates the base image already has
+at the same or a newer version are not integrated again.
+"""
+
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import logging
+
+from .asset_providers import UpdateAsset
+from .driver_resolver import driver_ver_key
+from .inf_parser import InfInfo, InfParseError, parse_inf
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_INVENTORY_PATH = Path("runtime/data/kassia_image_inventory.db")
+INVENTORY_VERSION = 1  # part of the cache key; bump when the inventory format or parsing changes
+
+DRIVER_STORE = Path("Windows/System32/DriverStore/FileRepository")
+SERVICING_PACKAGES = Path("Windows/servicing/Packages")
+
+_KB_PATTERN = re.compile(r"KB(\d{6,8})", re.IGNORECASE)
+_MUM_IDENTIFIER = re.compile(r'identifier\s*=\s*"KB(\d+)"', re.IGNORECASE)
+
+
+def find_kb(*values: Optional[str]) -> Optional[str]:
+    """The first KB number (``KB5034441``) in any of the values."""
+    for value in values:
+        match = _KB_PATTERN.search(value or "")
+        if match:
+            return f"KB{match.group(1)}"
+    return None
+
+
+@dataclass
+class InventoryPackage:
+    """A servicing package of the image (one .mum manifest)."""
+    name: str                 # package identity name, e.g. Package_for_KB5034441
+    version: Optional[str]    # e.g. 19041.3920.1.2
+    architecture: Optional[str]
+    kb: Optional[str]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'version': self.version, 'architecture': self.architecture, 'kb': self.kb}
+
+
+@dataclass
+class ImageInventory:
+    """The drivers and servicing packages of an image."""
+    key: Optional[str]
+    drivers: List[InfInfo] = field(default_factory=list)          # paths relative to the driver store
+    packages: List[InventoryPackage] = field(default_factory=list)
+    seconds: float = 0.0      # time spent reading the image
+    created_at: Optional[str] = None
+    cache_hit: bool = False
+    _drivers_by_name: Dict[str, List[InfInfo]] = field(default_factory=dict, init=False, repr=False)
+    _packages_by_kb: Dict[str, InventoryPackage] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self):
+        for info in self.drivers:
+            self._drivers_by_name.setdefault(info.path.name.lower(), []).append(info)
+        for package in self.packages:
+            if package.kb:
+                self._packages_by_kb.setdefault(package.kb.upper(), package)
+
+    def find_driver(self, info: InfInfo) -> Optional[InfInfo]:
+        """The driver store INF that already provides ``info``: same INF name, all of its
+        hardware IDs and the same or a newer DriverVer."""
+        hardware_ids = set(info.hardware_ids)
+        for present in self._drivers_by_name.get(info.path.name.lower(), []):
+            if hardware_ids <= set(present.hardware_ids) and driver_ver_key(present) >= driver_ver_key(info):
+                return present
+        return None
+
+    def find_update(self, update: UpdateAsset) -> Optional[InventoryPackage]:
+        """The servicing package of the update's KB, if the image has it."""
+        kb = find_kb(update.update_version, update.name, Path(update.path).name)
+        return self._packages_by_kb.get(kb.upper()) if kb else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary for job results."""
+        return {
+            'key': self.key,
+            'drivers': len(self.drivers),
+            'packages': len(self.packages),
+            'kbs': sorted(self._packages_by_kb),
+            'seconds': round(self.seconds, 3),
+            'created_at': self.created_at,
+            'cache_hit': self.cache_hit
+        }
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'drivers': [info.to_dict() for info in self.drivers],
+            'packages': [package.to_dict() for package in self.packages]
+        })
+
+    @classmethod
+    def from_json(cls, key: str, data: str, seconds: float, created_at: str) -> "ImageInventory":
+        content = json.loads(data)
+        return cls(
+            key=key,
+            drivers=[InfInfo.from_dict(entry) for entry in content['drivers']],
+            packages=[InventoryPackage(**entry) for entry in content['packages']],
+            seconds=seconds,
+            created_at=created_at
+        )
+
+
+def _read_package(mum: Path) -> InventoryPackage:
+    # <name>~<public key token>~<architecture>~<language>~<version>.mum
+    parts = mum.stem.split("~")
+    name = parts[0]
+    architecture = (parts[2] or None) if len(parts) > 2 else None
+    version = (parts[4] or None) if len(parts) > 4 else None
+    kb = find_kb(name)
+    if kb is None:
+        # Rollups (Package_for_RollupFix) name their KB only in the manifest
+        try:
+            match = _MUM_IDENTIFIER.search(mum.read_text(encoding='utf-8', errors='replace'))
+        except OSError:
+            match = None
+        kb = f"KB{match.group(1)}" if match else None
+    return InventoryPackage(name=name, version=version, architecture=architecture, kb=kb)
+
+
+def read_image_inventory(mount_point: Path, key: Optional[str] = None) -> ImageInventory:
+    """Read the driver store and servicing packages of a mounted image."""
+    start = time.perf_counter()
+    mount_point = Path(mount_point)
+
+    drivers = []
+    driver_store = mount_point / DRIVER_STORE
+    if driver_store.is_dir():
+        for inf in sorted(driver_store.glob("*/*.inf")):
+            try:
+                info = parse_inf(inf)
+            except InfParseError as e:
+                logger.warning(f"Skipping driver store entry: {e}")
+                continue
+            info.path = inf.relative_to(driver_store)
+            drivers.append(info)
+
+    packages = []
+    packages_dir = mount_point / SERVICING_PACKAGES
+    if packages_dir.is_dir():
+        packages = [_read_package(mum) for mum in sorted(packages_dir.glob("*.mum"))]
+
+    inventory = ImageInventory(key=key, drivers=drivers, packages=packages, seconds=time.perf_counter() - start,
+                               created_at=datetime.now().isoformat())
+    logger.info(f"Image inventory read in {inventory.seconds:.1f}s: {len(drivers)} driver store INFs, "
+                f"{len(packages)} servicing packages")
+    return inventory
+
+
+def image_inventory_key(source_sha256: Optional[str] = None, layer_key: Optional[str] = None,
+                        index: int = 1) -> Optional[str]:
+    """Cache key of the image a build mounts: its serviced layer or the SBI digest and index."""
+    if layer_key:
+        return f"v{INVENTORY_VERSION}:layer:{layer_key}"
+    if source_sha256:
+        return f"v{INVENTORY_VERSION}:sbi:{source_sha256}:{index}"
+    return None
+
+
+class ImageInventoryCache:
+    """SQLite cache of image inventories by image digest."""
+
+    def __init__(self, db_path: Path = DEFAULT_INVENTORY_PATH):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self.init_database()
+
+    def init_database(self):
+        """Initialize inventory schema."""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS image_inventories (
+                    key TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    drivers INTEGER NOT NULL,
+                    packages INTEGER NOT NULL,
+                    seconds REAL NOT NULL,
+                    created_at TEXT NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            conn.commit()
+
+    def get(self, key: str) -> Optional[ImageInventory]:
+        """Get a cached inventory and count the hit."""
+        with self._lock, sqlite3.connect(self.db_path) as conn:
+            row = conn.execute('SELECT data, seconds, created_at FROM image_inventories WHERE key = ?',
+                               (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE image_inventories SET hits = hits + 1 WHERE key = ?', (key,))
+            conn.commit()
+        inventory = ImageInventory.from_json(key, *row)
+        inventory.cache_hit = True
+        return inventory
+
+    def store(self, inventory: ImageInventory) -> None:
+        with self._lock, sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO image_inventories (key, data, drivers, packages, seconds, created_at, hits)
+                VALUES (?, ?, ?, ?, ?, ?, 0)
+            ''', (inventory.key, inventory.to_json(), len(inventory.drivers), len(inventory.packages),
+                  inventory.seconds, inventory.created_at))
+            conn.commit()
+
+    async def get_or_read(self, key: Optional[str], mount_point: Path) -> ImageInventory:
+        """The cached inventory for ``key``, or read it from the mounted image and cache it.
+
+        Without a key (no image digest available) the image is read every time.
+        """
+        if key:
+            cached = await asyncio.to_thread(self.get, key)
+            if cached:
+                logger.info(f"Image inventory cache hit: {key}")
+                return cached
+        inventory = await asyncio.to_thread(read_image_inventory, mount_point, key)
+        if key:
+            await asyncio.to_thread(self.store, inventory)
+        return inventory
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """Drop a cached inventory, or all of them when no key is given; return the count."""
+        with self._lock, sqlite3.connect(self.db_path) as conn:
+            if key is None:
+                cursor = conn.execute('DELETE FROM image_inventories')
+            else:
+                cursor = conn.execute('DELETE FROM image_inventories WHERE key = ?', (key,))
+            conn.commit()
+            return cursor.rowcount
+
+    def get_cache_info(self) -> Dict[str, Any]:
+        with sqlite3.connect(self.db_path) as conn:
+            entries, hits = conn.execute('SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM image_inventories').fetchone()
+        return {'entries': entries, 'hits': hits, 'db_path': str(self.db_path)}
+
+
+# Global inventory cache instances (one per database path)
+_inventory_cache_instances: Dict[str, ImageInventoryCache] = {}
+_inventory_cache_lock = threading.Lock()
+
+
+def get_image_inventory_cache(db_path: Path = DEFAULT_INVENTORY_PATH) -> ImageInventoryCache:
+    """Get the shared image inventory cache for a database path."""
+    key = str(Path(db_path).resolve())
+    with _inventory_cache_lock:
+        if key not in _inventory_cache_instances:
+            _inventory_cache_instances[key] = ImageInventoryCache(Path(db_path))
+        return _inventory_cache_instances[key]
@@ -0,0 +1,807 @@
+"""
+Imaging Backends - Pluggable implementations of the WIM servicing operations
+
+WimHandler, DriverIntegrator and UpdateIntegrator run every image operation
+(info, mount, unmount, add-driver, add-package, export) through an
+``ImagingBackend``:
+
+- ``DismBackend``      dism.exe (Windows, full offline servicing)
+- ``WimlibBackend``    wimlib-imagex (Linux/Windows, no offline servicing stack)
+- ``SimulatedBackend`` in-process fake with configurable latency and failures
+"""
+
+import asyncio
+import random
+import re
+import shutil
+import subprocess
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+
+from .wim_reader import WimImageInfo, parse_wim_xml
+from ..utils.tool_output import DEFAULT_TAIL_LINES, ToolOutputParser, ToolProgress, run_streaming
+from ..models.config import FinalizeStrategy, ImagingBackendType, WimlibImagingConfig, SimulatedImagingConfig
+
+logger = logging.getLogger(__name__)
+
+
+class DismError(Exception):
+    """DISM operation error."""
+    def __init__(self, message: str, exit_code: int = None, output: str = None):
+        super().__init__(message)
+        self.exit_code = exit_code
+        self.output = output
+
+
+@dataclass
+class ImagingResult:
+    """Result of an add-driver / add-package operation."""
+    output: str = ""
+    staged: bool = False  # True if staged for first-boot installation instead of serviced offline
+    setup_seconds: Optional[float] = None  # Tool session startup before the first driver package
+
+
+@dataclass
+class MountedImage:
+    """An image the imaging tool reports as mounted."""
+    mount_point: Path
+    wim_path: Optional[Path] = None
+    index: int = 1
+    read_write: bool = True
+    status: str = "ok"  # "ok", "needs_remount" (e.g. after a reboot) or "invalid"
+
+
+ProgressCallback = Callable[[ToolProgress], None]
+
+
+class ImagingBackend(ABC):
+    """Interface of the image servicing operations used by the build workflow.
+
+    Operations raise ``DismError`` on failure. Long-running operations take an
+    optional ``progress`` callback that receives ``ToolProgress`` updates.
+    """
+
+    name: str = "base"
+    method: str = "BASE"  # Label used in integration results
+    # Ways a mounted image can be turned into the final WIM (see WimWorkflow.finalize_and_export_wim)
+    finalize_strategies: Tuple[str, ...] = (FinalizeStrategy.EXPORT.value,)
+    renames_images: bool = False  # rename_image is available
+
+    def validate(self) -> None:
+        """Check that the backend can be used (raises DismError otherwise)."""
+        pass
+
+    async def get_version(self) -> str:
+        """Identify the servicing tool and its version (part of serviced layer keys)."""
+        return self.name
+
+    @abstractmethod
+    async def get_info(self, wim_path: Path) -> List[WimImageInfo]:
+        """Get the images contained in a WIM file."""
+        pass
+
+    @abstractmethod
+    async def mount(self, wim_path: Path, mount_point: Path, index: int = 1, read_write: bool = True,
+                    progress: Optional[ProgressCallback] = None) -> None:
+        """Mount an image of a WIM file at an existing directory."""
+        pass
+
+    @abstractmethod
+    async def unmount(self, mount_point: Path, commit: bool = True,
+                      progress: Optional[ProgressCallback] = None) -> None:
+        """Unmount an image, committing or discarding changes."""
+        pass
+
+    @abstractmethod
+    async def add_driver(self, mount_point: Path, driver_path: Path, recurse: bool = True,
+                         force_unsigned: bool = True, progress: Optional[ProgressCallback] = None,
+                         timeout: int = 300) -> ImagingResult:
+        """Add INF driver packages from a directory to a mounted image."""
+        pass
+
+    @abstractmethod
+    async def add_package(self, mount_point: Path, package_path: Path,
+                          progress: Optional[ProgressCallback] = None) -> ImagingResult:
+        """Add an MSU/CAB package to a mounted image."""
+        pass
+
+    @abstractmethod
+    async def export(self, source_wim: Path, source_index: int, dest_wim: Path,
+                     compression: str = "max", dest_name: Optional[str] = None,
+                     progress: Optional[ProgressCallback] = None, append: bool = False) -> None:
+        """Export an image to another WIM file.
+
+        With ``append`` the image is added as a new index of the existing
+        ``dest_wim`` (single-instance storage, the compression of the
+        destination is kept).
+        """
+        pass
+
+    async def delete_image(self, wim_path: Path, index: int) -> None:
+        """Remove an image (index) from a multi-image WIM."""
+        raise DismError(f"{self.name} backend cannot delete images")
+
+    async def rename_image(self, wim_path: Path, index: int, name: str) -> None:
+        """Change the name of an image (index) of a WIM."""
+        raise DismError(f"{self.name} backend cannot rename images")
+
+    async def capture(self, source_dir: Path, dest_wim: Path, name: str, compression: str = "max",
+                      progress: Optional[ProgressCallback] = None) -> None:
+        """Capture a directory tree (e.g. a mounted image) into a new WIM file."""
+        raise DismError(f"{self.name} backend cannot capture images")
+
+    async def optimize(self, wim_path: Path, compression: Optional[str] = None,
+                       progress: Optional[ProgressCallback] = None) -> None:
+        """Rebuild a WIM in place, dropping unreferenced data (and recompressing if ``compression`` is given)."""
+        raise DismError(f"{self.name} backend cannot optimize images")
+
+    async def split(self, wim_path: Path, swm_path: Path, size_mb: int,
+                    progress: Optional[ProgressCallback] = None) -> None:
+        """Split a WIM into ``swm_path``, ``<stem>2.swm``, ... parts of at most ``size_mb``."""
+        raise DismError(f"{self.name} backend cannot split images")
+
+    async def cleanup(self, mount_point: Optional[Path] = None) -> None:
+        """Discard the mount at ``mount_point``, or clean up stale mounts if not given."""
+        pass
+
+    async def get_mounted(self) -> Optional[List[MountedImage]]:
+        """List the mounted images, or ``None`` if the tool keeps no mount registry."""
+        return None
+
+    async def remount(self, mount_point: Path) -> None:
+        """Reattach a mount that is no longer serviceable (e.g. after a reboot)."""
+        raise DismError(f"{self.name} backend cannot remount images")
+
+
+class CommandBackend(ImagingBackend):
+    """Base for backends that drive an external imaging tool."""
+
+    tool_name = "tool"
+    _version: Optional[str] = None
+
+    async def _run(self, cmd: List[str], timeout: int = 300, operation: str = "",
+                   progress: Optional[ProgressCallback] = None,
+                   tail_lines: Optional[int] = DEFAULT_TAIL_LINES,
+                   parser: Optional[ToolOutputParser] = None) -> subprocess.CompletedProcess:
+        """Run a command, streaming its output; raise DismError on failure or timeout.
+
+        Only the last ``tail_lines`` output lines are kept (``None`` keeps all).
+        A ``parser`` passed in replaces the default stdout parser, so the caller
+        can read what it collected.
+        """
+        logger.debug(f"Running {self.tool_name} command: {' '.join(cmd)}")
+        stdout = parser or ToolOutputParser(operation, progress, tail_lines)
+        stderr = ToolOutputParser(operation)
+
+        try:
+            returncode = await run_streaming(cmd, timeout, stdout, stderr)
+        except asyncio.TimeoutError:  # before OSError: TimeoutError subclasses it on 3.11+
+            raise DismError(f"{self.tool_name} command timed out after {timeout} seconds",
+                            output=stdout.text())
+        except OSError as e:
+            raise DismError(f"{self.tool_name} command execution failed: {e}")
+
+        result = subprocess.CompletedProcess(
+            args=cmd,
+            returncode=returncode,
+            stdout=stdout.text(),
+            stderr=stderr.text()
+        )
+
+        if result.returncode != 0:
+            error_msg = f"{self.tool_name} command failed with exit code {result.returncode}"
+            if stdout.error_code:
+                error_msg += f" (error {stdout.error_code}"
+                error_msg += f": {stdout.error_message})" if stdout.error_message else ")"
+            if result.stderr:
+                error_msg += f"\nError: {result.stderr}"
+            raise DismError(error_msg, result.returncode, result.stdout)
+
+        return result
+
+    async def _exec(self, cmd: List[str], timeout: int):
+        """Run a command and capture its complete raw output (small, binary outputs only)."""
+        logger.debug(f"Running {self.tool_name} command: {' '.join(cmd)}")
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except OSError as e:
+            raise DismError(f"{self.tool_name} command execution failed: {e}")
+
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise DismError(f"{self.tool_name} command timed out after {timeout} seconds")
+
+        return process.returncode, stdout, stderr
+
+    async def _tool_version(self, cmd: List[str]) -> str:
+        """Run a version command once and remember "<name> <first dotted version number>"."""
+        if self._version is None:
+            result = await self._run(cmd, timeout=30, tail_lines=None)
+            match = re.search(r"\d+(?:\.\d+)+", result.stdout)
+            self._version = f"{self.name} {match.group(0) if match else 'unknown'}"
+        return self._version
+
+    def _validate_tool(self, cmd: List[str]) -> None:
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        except FileNotFoundError:
+            raise DismError(f"{self.tool_name} not found at: {cmd[0]}")
+        except Exception as e:
+            raise DismError(f"{self.tool_name} validation error: {str(e)}")
+
+        if result.returncode != 0:
+            raise DismError(f"{self.tool_name} validation failed with exit code {result.returncode}")
+        logger.info(f"{self.tool_name} validation successful")
+
+    @staticmethod
+    def _decode(data: bytes) -> str:
+        return data.decode('utf-8', errors='ignore')
+
+
+class DismBackend(CommandBackend):
+    """dism.exe backend (full offline servicing, Windows only)."""
+
+    name = "dism"
+    method = "DISM"
+    tool_name = "DISM"
+    finalize_strategies = (FinalizeStrategy.EXPORT.value, FinalizeStrategy.CAPTURE.value)
+
+    def __init__(self, dism_path: str = "dism.exe"):
+        self.dism_path = dism_path
+
+    def validate(self) -> None:
+        self._validate_tool([self.dism_path, "/?"])
+
+    async def get_version(self) -> str:
+        return await self._tool_version([self.dism_path, "/English", "/?"])
+
+    async def get_info(self, wim_path: Path) -> List[WimImageInfo]:
+        result = await self._run([self.dism_path, "/Get-WimInfo", f"/WimFile:{wim_path}"], tail_lines=None)
+        return self._parse_wim_info(result.stdout)
+
+    async def mount(self, wim_path: Path, mount_point: Path, index: int = 1, read_write: bool = True,
+                    progress: Optional[ProgressCallback] = None) -> None:
+        cmd = [
+            self.dism_path,
+            "/Mount-Wim",
+            f"/WimFile:{wim_path}",
+            f"/Index:{index}",
+            f"/MountDir:{mount_point}"
+        ]
+        if not read_write:
+            cmd.append("/ReadOnly")
+        await self._run(cmd, timeout=300, operation="mount", progress=progress)
+
+    async def unmount(self, mount_point: Path, commit: bool = True,
+                      progress: Optional[ProgressCallback] = None) -> None:
+        cmd = [
+            self.dism_path,
+            "/Unmount-Wim",
+            f"/MountDir:{mount_point}",
+            "/Commit" if commit else "/Discard"
+        ]
+        await self._run(cmd, timeout=600, operation="unmount", progress=progress)
+
+    async def add_driver(self, mount_point: Path, driver_path: Path, recurse: bool = True,
+                         force_unsigned: bool = True, progress: Optional[ProgressCallback] = None,
+                         timeout: int = 300) -> ImagingResult:
+        cmd = [self.dism_path, f"/Image:{mount_point}", "/Add-Driver", f"/Driver:{driver_path}"]
+        if recurse:
+            cmd.append("/Recurse")
+        if force_unsigned:
+            cmd.append("/ForceUnsigned")  # Allow unsigned drivers for development
+        # Keep every line: the per-INF results are parsed from the output
+        parser = ToolOutputParser("add_driver", progress, tail_lines=None)
+        result = await self._run(cmd, timeout=timeout, operation="add_driver", parser=parser)
+        return ImagingResult(output=result.stdout, setup_seconds=parser.setup_seconds)
+
+    async def add_package(self, mount_point: Path, package_path: Path,
+                          progress: Optional[ProgressCallback] = None) -> ImagingResult:
+        cmd = [self.dism_path, f"/Image:{mount_point}", "/Add-Package", f"/PackagePath:{package_path}"]
+        result = await self._run(cmd, timeout=600, operation="add_package", progress=progress)
+        return ImagingResult(output=result.stdout)
+
+    async def export(self, source_wim: Path, source_index: int, dest_wim: Path,
+                     compression: str = "max", dest_name: Optional[str] = None,
+                     progress: Optional[ProgressCallback] = None, append: bool = False) -> None:
+        cmd = [
+            self.dism_path,
+            "/Export-Image",
+            f"/SourceImageFile:{source_wim}",
+            f"/SourceIndex:{source_index}",
+            f"/DestinationImageFile:{dest_wim}"
+        ]
+        if not append:
+            cmd.append(f"/Compress:{compression}")
+        if dest_name:
+            cmd.append(f"/DestinationName:{dest_name}")
+        await self._run(cmd, timeout=1800, operation="export", progress=progress)
+
+    async def delete_image(self, wim_path: Path, index: int) -> None:
+        await self._run([self.dism_path, "/Delete-Image", f"/ImageFile:{wim_path}", f"/Index:{index}"],
+                        timeout=600, operation="delete")
+
+    async def capture(self, source_dir: Path, dest_wim: Path, name: str, compression: str = "max",
+                      progress: Optional[ProgressCallback] = None) -> None:
+        cmd = [
+            self.dism_path,
+            "/Capture-Image",
+            f"/ImageFile:{dest_wim}",
+            f"/CaptureDir:{source_dir}",
+            f"/Name:{name}",
+            f"/Compress:{compression}"
+        ]
+        await self._run(cmd, timeout=3600, operation="capture", progress=progress)
+
+    async def split(self, wim_path: Path, swm_path: Path, size_mb: int,
+                    progress: Optional[ProgressCallback] = None) -> None:
+        cmd = [self.dism_path, "/Split-Image", f"/ImageFile:{wim_path}", f"/SWMFile:{swm_path}", f"/FileSize:{size_mb}"]
+        await self._run(cmd, timeout=1800, operation="split", progress=progress)
+
+    async def cleanup(self, mount_point: Optional[Path] = None) -> None:
+        if mount_point is not None:
+            await self._run([self.dism_path, "/Unmount-Wim", f"/MountDir:{mount_point}", "/Discard"], timeout=60)
+        else:
+            await self._run([self.dism_path, "/Cleanup-Wim"], timeout=60)
+
+    async def get_mounted(self) -> Optional[List[MountedImage]]:
+        result = await self._run([self.dism_path, "/English", "/Get-MountedWimInfo"], timeout=60, tail_lines=None)
+        return self._parse_mounted_info(result.stdout)
+
+    async def remount(self, mount_point: Path) -> None:
+        await self._run([self.dism_path, "/Remount-Image", f"/MountDir:{mount_point}"], timeout=600,
+                        operation="remount")
+
+    @staticmethod
+    def _parse_wim_info(dism_output: str) -> List[WimImageInfo]:
+        """Parse DISM /Get-WimInfo output (one block per image index)."""
+        images: List[WimImageInfo] = []
+
+        for line in dism_output.split('\n'):
+            line = line.strip()
+            if line.startswith('Index :'):
+                try:
+                    images.append(WimImageInfo(index=int(line.split(':')[1].strip())))
+                except ValueError:
+                    pass
+            elif not images or ' : ' not in line:
+                continue
+            elif line.startswith('Name :'):
+                images[-1].name = line.split(':', 1)[1].strip()
+            elif line.startswith('Description :'):
+                images[-1].description = line.split(':', 1)[1].strip()
+            elif line.startswith('Architecture :'):
+                images[-1].architecture = line.split(':', 1)[1].strip()
+
+        return images
+
+    @staticmethod
+    def _parse_mounted_info(dism_output: str) -> List[MountedImage]:
+        """Parse DISM /Get-MountedWimInfo output (one block per mount)."""
+        mounts: List[MountedImage] = []
+
+        for line in dism_output.split('\n'):
+            key, _, value = line.strip().partition(' : ')
+            value = value.strip()
+            if key == 'Mount Dir':
+                mounts.append(MountedImage(mount_point=Path(value)))
+            elif not mounts:
+                continue
+            elif key == 'Image File':
+                mounts[-1].wim_path = Path(value)
+            elif key == 'Image Index':
+                try:
+                    mounts[-1].index = int(value)
+                except ValueError:
+                    pass
+            elif key == 'Mounted Read/Write':
+                mounts[-1].read_write = value.lower() == 'yes'
+            elif key == 'Status':
+                mounts[-1].status = value.lower().replace(' ', '_')
+
+        return mounts
+
+
+class WimlibBackend(CommandBackend):
+    """wimlib-imagex backend.
+
+    Mounting (FUSE on Linux), committing and exporting are native. wimlib has
+    no offline servicing stack, so drivers and MSU/CAB packages are staged into
+    the image's Yunona directory together with an install script that runs at
+    first boot (``pnputil`` for drivers, ``wusa``/``dism /Online`` for packages).
+    """
+
+    name = "wimlib"
+    method = "WIMLIB"
+    tool_name = "wimlib-imagex"
+    finalize_strategies = (FinalizeStrategy.EXPORT.value, FinalizeStrategy.COMMIT.value)
+    renames_images = True
+
+    # DISM /Compress values -> wimlib-imagex --compress values
+    COMPRESSION = {
+        'none': "none",
+        'fast': "fast",
+        'max': "maximum",
+        'maximum': "maximum",
+        'recovery': "LZMS"
+    }
+
+    def __init__(self, wimlib_path: str = "wimlib-imagex", staging_dir: str = "Users/Public/Yunona"):
+        self.wimlib_path = wimlib_path
+        self.staging_dir = staging_dir
+
+    def validate(self) -> None:
+        self._validate_tool([self.wimlib_path, "--version"])
+
+    async def get_version(self) -> str:
+        return await self._tool_version([self.wimlib_path, "--version"])
+
+    async def get_info(self, wim_path: Path) -> List[WimImageInfo]:
+        # --xml writes the raw UTF-16LE XML metadata of the WIM
+        cmd = [self.wimlib_path, "info", str(wim_path), "--xml"]
+        returncode, stdout, stderr = await self._exec(cmd, timeout=300)
+        if returncode != 0:
+            raise DismError(f"wimlib-imagex info failed with exit code {returncode}\n"
+                            f"Error: {self._decode(stderr)}", returncode)
+        try:
+            return parse_wim_xml(stdout.decode('utf-16-le'))
+        except Exception as e:
+            raise DismError(f"Failed to parse wimlib-imagex XML output: {e}")
+
+    async def mount(self, wim_path: Path, mount_point: Path, index: int = 1, read_write: bool = True,
+                    progress: Optional[ProgressCallback] = None) -> None:
+        command = "mountrw" if read_write else "mount"
+        await self._run([self.wimlib_path, command, str(wim_path), str(index), str(mount_point)], timeout=300,
+                        operation="mount", progress=progress)
+
+    async def unmount(self, mount_point: Path, commit: bool = True,
+                      progress: Optional[ProgressCallback] = None) -> None:
+        cmd = [self.wimlib_path, "unmount", str(mount_point)]
+        if commit:
+            cmd.append("--commit")
+        await self._run(cmd, timeout=600, operation="unmount", progress=progress)
+
+    async def add_driver(self, mount_point: Path, driver_path: Path, recurse: bool = True,
+                         force_unsigned: bool = True, progress: Optional[ProgressCallback] = None,
+                         timeout: int = 300) -> ImagingResult:
+        target = mount_point / self.staging_dir / "Drivers" / driver_path.name
+        flags = "/subdirs /install" if recurse else "/install"
+        script = (
+            "@echo off\r\n"
+            f"REM Install {driver_path.name} driver packages (staged by Kassia)\r\n"
+            f'pnputil.exe /add-driver "%~dp0*.inf" {flags}\r\n'
+        )
+        await asyncio.to_thread(self._stage, driver_path, target, "install_inf.cmd", script)
+        return ImagingResult(output=f"Staged to {target}", staged=True)
+
+    async def add_package(self, mount_point: Path, package_path: Path,
+                          progress: Optional[ProgressCallback] = None) -> ImagingResult:
+        target = mount_point / self.staging_dir / "Updates" / package_path.stem
+        if package_path.suffix.lower() == ".msu":
+            command = f'wusa.exe "%~dp0{package_path.name}" /quiet /norestart'
+        else:
+            command = f'dism.exe /Online /Add-Package /PackagePath:"%~dp0{package_path.name}" /Quiet /NoRestart'
+        script = (
+            "@echo off\r\n"
+            f"REM Install {package_path.name} (staged by Kassia)\r\n"
+            f"{command}\r\n"
+        )
+        await asyncio.to_thread(self._stage, package_path, target, "install_package.cmd", script)
+        return ImagingResult(output=f"Staged to {target}", staged=True)
+
+    async def export(self, source_wim: Path, source_index: int, dest_wim: Path,
+                     compression: str = "max", dest_name: Optional[str] = None,
+                     progress: Optional[ProgressCallback] = None, append: bool = False) -> None:
+        cmd = [self.wimlib_path, "export", str(source_wim), str(source_index), str(dest_wim)]
+        if dest_name:
+            cmd.append(dest_name)
+        if not append:
+            cmd.append(f"--compress={self.COMPRESSION.get(compression.lower(), compression)}")
+            if compression.lower() == "recovery":
+                cmd.append("--solid")
+        await self._run(cmd, timeout=1800, operation="export", progress=progress)
+
+    async def delete_image(self, wim_path: Path, index: int) -> None:
+        # --soft leaves the unreferenced data in place like DISM /Delete-Image
+        await self._run([self.wimlib_path, "delete", str(wim_path), str(index), "--soft"], timeout=600,
+                        operation="delete")
+
+    async def rename_image(self, wim_path: Path, index: int, name: str) -> None:
+        await self._run([self.wimlib_path, "info", str(wim_path), str(index), name], timeout=600,
+                        operation="rename")
+
+    async def optimize(self, wim_path: Path, compression: Optional[str] = None,
+                       progress: Optional[ProgressCallback] = None) -> None:
+        cmd = [self.wimlib_path, "optimize", str(wim_path)]
+        if compression:
+            cmd.extend(["--recompress", f"--compress={self.COMPRESSION.get(compression.lower(), compression)}"])
+            if compression.lower() == "recovery":
+                cmd.append("--solid")
+        await self._run(cmd, timeout=1800, operation="optimize", progress=progress)
+
+    async def split(self, wim_path: Path, swm_path: Path, size_mb: int,
+                    progress: Optional[ProgressCallback] = None) -> None:
+        await self._run([self.wimlib_path, "split", str(wim_path), str(swm_path), str(size_mb)], timeout=1800,
+                        operation="split", progress=progress)
+
+    async def cleanup(self, mount_point: Optional[Path] = None) -> None:
+        # wimlib keeps no global mount registry; only a specific mount can be discarded
+        if mount_point is not None:
+            await self._run([self.wimlib_path, "unmount", str(mount_point)], timeout=60)
+
+    @staticmethod
+    def _stage(source: Path, target: Path, script_name: str, script: str) -> None:
+        target.mkdir(parents=True, exist_ok=True)
+        if source.is_dir():
+            shutil.copytree(source, target, dirs_exist_ok=True)
+        else:
+            shutil.copy2(source, target / source.name)
+        with open(target / script_name, 'w', encoding='utf-8') as f:
+            f.write(script)
+
+
+class SimulatedBackend(ImagingBackend):
+    """In-process imaging backend for tests and throughput measurements.
+
+    Every operation sleeps for its configured latency (plus optional jitter)
+    and fails with the configured probability. Randomness comes from a seeded
+    generator, so a run is reproducible. Mounting creates a minimal Windows
+    tree, export copies the source WIM.
+    """
+
+    name = "simulated"
+    method = "SIMULATED"
+
+    OPERATIONS = ('info', 'mount', 'unmount', 'add_driver', 'add_package', 'export', 'delete', 'rename',
+                  'capture', 'optimize', 'split', 'cleanup')
+    renames_images = True
+    PROGRESS_STEPS = 4
+
+    def __init__(self, latency: Optional[Dict[str, float]] = None, jitter: float = 0.0,
+                 failure_rate: float = 0.0, failures: Optional[Dict[str, float]] = None, seed: int = 0,
+                 finalize_strategies: Optional[Sequence[str]] = None):
+        self.latency = {op: 0.0 for op in self.OPERATIONS}
+        self.latency.update(latency or {})
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failures = failures or {}
+        self.seed = seed
+        if finalize_strategies:
+            self.finalize_strategies = tuple(finalize_strategies)  # emulate the capabilities of a real tool
+        self._random = random.Random(seed)
+        self._forced_failures: Dict[str, int] = {}
+        self.mounts: Dict[str, Dict[str, Any]] = {}
+        # Indexes of the WIMs written by export, by file identity so they follow a moved file
+        self.images: Dict[str, List[WimImageInfo]] = {}
+        self.stats: Dict[str, Dict[str, float]] = {
+            op: {'calls': 0, 'failures': 0, 'seconds': 0.0} for op in self.OPERATIONS
+        }
+
+    def fail_next(self, operation: str, count: int = 1) -> None:
+        """Make the next ``count`` calls of an operation fail."""
+        self._forced_failures[operation] = self._forced_failures.get(operation, 0) + count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-operation call, failure and time statistics."""
+        return {op: dict(values, seconds=round(values['seconds'], 3)) for op, values in self.stats.items()}
+
+    async def get_info(self, wim_path: Path) -> List[WimImageInfo]:
+        await self._operation('info')
+        if not wim_path.exists():
+            raise DismError(f"WIM file not found: {wim_path}", 2)
+        if self._wim_key(wim_path) in self.images:
+            return list(self.images[self._wim_key(wim_path)])
+        return [self._image(1, wim_path.stem)]
+
+    async def mount(self, wim_path: Path, mount_point: Path, index: int = 1, read_write: bool = True,
+                    progress: Optional[ProgressCallback] = None) -> None:
+        await self._operation('mount', progress)
+        if str(mount_point) in self.mounts:
+            raise DismError(f"Mount directory is already in use: {mount_point}", 0xC1420127)
+        for directory in ("Windows/System32", "Windows/INF", "Users/Public"):
+            (mount_point / directory).mkdir(parents=True, exist_ok=True)
+        self.mounts[str(mount_point)] = {
+            'wim_path': wim_path, 'index': index, 'read_write': read_write, 'drivers': [], 'packages': [],
+            'status': "ok"
+        }
+
+    async def unmount(self, mount_point: Path, commit: bool = True,
+                      progress: Optional[ProgressCallback] = None) -> None:
+        await self._operation('unmount', progress)
+        if self._mounted(mount_point)['status'] != "ok":
+            raise DismError(f"The image at {mount_point} must be remounted first", 0xC1420127)
+        del self.mounts[str(mount_point)]
+        self._clear(mount_point)
+
+    async def add_driver(self, mount_point: Path, driver_path: Path, recurse: bool = True,
+                         force_unsigned: bool = True, progress: Optional[ProgressCallback] = None,
+                         timeout: int = 300) -> ImagingResult:
+        start = time.perf_counter()
+        await self._operation('add_driver', progress)
+        self._mounted(mount_point)['drivers'].append(driver_path)
+        # Report the INFs like DISM; the operation latency stands for the image session startup
+        infs = sorted(driver_path.rglob("*.inf") if recurse else driver_path.glob("*.inf"))
+        lines = [f"Installing {number} of {len(infs)} - {inf}: The driver package was successfully installed."
+                 for number, inf in enumerate(infs, 1)]
+        return ImagingResult(output="\n".join(lines) or f"Simulated driver installation: {driver_path.name}",
+                             setup_seconds=time.perf_counter() - start)
+
+    async def add_package(self, mount_point: Path, package_path: Path,
+                          progress: Optional[ProgressCallback] = None) -> ImagingResult:
+        await self._operation('add_package', progress)
+        self._mounted(mount_point)['packages'].append(package_path)
+        return ImagingResult(output=f"Simulated package installation: {package_path.name}")
+
+    async def export(self, source_wim: Path, source_index: int, dest_wim: Path,
+                     compression: str = "max", dest_name: Optional[str] = None,
+                     progress: Optional[ProgressCallback] = None, append: bool = False) -> None:
+        await self._operation('export', progress)
+        name = dest_name or source_wim.stem
+        if append and dest_wim.exists():
+            # Single-instance storage: the shared file does not grow for identical content
+            images = self.images.setdefault(self._wim_key(dest_wim), [self._image(1, dest_wim.stem)])
+            if any(image.name == name for image in images):
+                raise DismError(f"An image named {name} already exists in {dest_wim}", 0xC1420115)
+            images.append(self._image(len(images) + 1, name))
+        else:
+            await asyncio.to_thread(shutil.copyfile, source_wim, dest_wim)
+            self.images[self._wim_key(dest_wim)] = [self._image(1, name)]
+
+    async def delete_image(self, wim_path: Path, index: int) -> None:
+        await self._operation('delete')
+        images = self.images.get(self._wim_key(wim_path), [])
+        if not 1 <= index <= len(images) or len(images) == 1:
+            raise DismError(f"Cannot delete image {index} of {wim_path}", 0xC1420115)
+        del images[index - 1]
+        for position, image in enumerate(images, 1):
+            image.index = position
+
+    async def rename_image(self, wim_path: Path, index: int, name: str) -> None:
+        await self._operation('rename')
+        images = self.images.setdefault(self._wim_key(wim_path), [self._image(1, wim_path.stem)])
+        if not 1 <= index <= len(images):
+            raise DismError(f"Cannot rename image {index} of {wim_path}", 0xC1420115)
+        if any(image.name == name and image.index != index for image in images):
+            raise DismError(f"An image named {name} already exists in {wim_path}", 0xC1420115)
+        images[index - 1].name = images[index - 1].description = name
+
+    async def capture(self, source_dir: Path, dest_wim: Path, name: str, compression: str = "max",
+                      progress: Optional[ProgressCallback] = None) -> None:
+        await self._operation('capture', progress)
+        # The captured tree is the mounted image, so its source WIM stands in for the result
+        await asyncio.to_thread(shutil.copyfile, self._mounted(source_dir)['wim_path'], dest_wim)
+        self.images[self._wim_key(dest_wim)] = [self._image(1, name)]
+
+    async def optimize(self, wim_path: Path, compression: Optional[str] = None,
+                       progress: Optional[ProgressCallback] = None) -> None:
+        await self._operation('optimize', progress)
+        if not wim_path.exists():
+            raise DismError(f"WIM file not found: {wim_path}", 2)
+
+    async def split(self, wim_path: Path, swm_path: Path, size_mb: int,
+                    progress: Optional[ProgressCallback] = None) -> None:
+        await self._operation('split', progress)
+        await asyncio.to_thread(self._split, wim_path, swm_path, size_mb * 1024 * 1024)
+
+    async def cleanup(self, mount_point: Optional[Path] = None) -> None:
+        await self._operation('cleanup')
+        mount_points = [mount_point] if mount_point is not None else [Path(p) for p in self.mounts]
+        for path in mount_points:
+            if self.mounts.pop(str(path), None) is not None:
+                self._clear(path)
+
+    async def get_mounted(self) -> Optional[List[MountedImage]]:
+        return [
+            MountedImage(Path(path), mount['wim_path'], mount['index'], mount['read_write'], mount['status'])
+            for path, mount in self.mounts.items()
+        ]
+
+    async def remount(self, mount_point: Path) -> None:
+        await self._operation('mount')
+        self._mounted(mount_point)['status'] = "ok"
+
+    # Helper methods
+
+    async def _operation(self, operation: str, progress: Optional[ProgressCallback] = None) -> None:
+        """Apply latency and failure injection for one call of an operation.
+
+        With ``progress`` the latency is split into ``PROGRESS_STEPS`` reports.
+        """
+        stats = self.stats[operation]
+        stats['calls'] += 1
+
+        delay = self.latency.get(operation, 0.0)
+        if delay and self.jitter:
+            delay *= 1 + self._random.uniform(-self.jitter, self.jitter)
+        fail = self._random.random() < self.failures.get(operation, self.failure_rate)
+        if self._forced_failures.get(operation):
+            self._forced_failures[operation] -= 1
+            fail = True
+
+        start = time.perf_counter()
+        steps = self.PROGRESS_STEPS if progress else 1
+        for step in range(1, steps + 1):
+            if delay > 0:
+                await asyncio.sleep(delay / steps)
+            if progress and (step < steps or not fail):
+                progress(ToolProgress(operation, 100.0 * step / steps))
+        stats['seconds'] += time.perf_counter() - start
+
+        if fail:
+            stats['failures'] += 1
+            raise DismError(f"Simulated {operation} failure", 1, "Simulated failure injected")
+
+    @staticmethod
+    def _wim_key(wim_path: Path) -> str:
+        stat = wim_path.stat()
+        return f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    @staticmethod
+    def _image(index: int, name: str) -> WimImageInfo:
+        return WimImageInfo(index=index, name=name, description=name, architecture="x64")
+
+    def _mounted(self, mount_point: Path) -> Dict[str, Any]:
+        mount = self.mounts.get(str(mount_point))
+        if mount is None:
+            raise DismError(f"No image is mounted at: {mount_point}", 0xC1420134)
+        return mount
+
+    @staticmethod
+    def _split(wim_path: Path, swm_path: Path, part_size: int) -> None:
+        with open(wim_path, 'rb') as source:
+            part = 1
+            while True:
+                data = source.read(part_size)
+                if not data and part > 1:
+                    break
+                target = swm_path if part == 1 else swm_path.with_name(f"{swm_path.stem}{part}{swm_path.suffix}")
+                target.write_bytes(data)
+                part += 1
+
+    @staticmethod
+    def _clear(mount_point: Path) -> None:
+        # Like DISM, leave the empty mount directory behind
+        if mount_point.exists():
+            for item in mount_point.iterdir():
+                if item.is_dir():
+                    shutil.rmtree(item, ignore_errors=True)
+                else:
+                    item.unlink()
+
+
+def create_imaging_backend(build_config=None) -> ImagingBackend:
+    """Create the imaging backend configured in ``imagingBackend`` (DISM if not configured)."""
+    backend_config = build_config.imagingBackend if build_config else None
+    backend_type = backend_config.type if backend_config else ImagingBackendType.DISM
+    options = backend_config.config if backend_config else {}
+
+    if backend_type == ImagingBackendType.WIMLIB:
+        wimlib_config = WimlibImagingConfig(**options)
+        return WimlibBackend(wimlib_config.wimlibPath)
+
+    if backend_type == ImagingBackendType.SIMULATED:
+        sim_config = SimulatedImagingConfig(**options)
+        logger.warning("Using simulated imaging backend - images are not modified")
+        return SimulatedBackend(
+            latency=sim_config.latency,
+            jitter=sim_config.jitter,
+            failure_rate=sim_config.failureRate,
+            failures=sim_config.failures,
+            seed=sim_config.seed,
+            finalize_strategies=sim_config.finalizeStrategies
+        )
+
+    tools = build_config.windowsTools if build_config else None
+    return DismBackend(tools.dismPath if tools else "dism.exe")
@@ -0,0 +1,429 @@
+"""
+INF Parser - Offline reader for driver INF files and a hardware-ID index
+
+Reads the parts of an INF that decide which devices a driver package is for
+and which files it needs, without setupapi or DISM:
+
+- [Version]: Class, ClassGUID, Provider, DriverVer and CatalogFile
+- [Manufacturer] and its (decorated) models sections: hardware and compatible IDs
+- [SourceDisksNames]/[SourceDisksFiles] and CopyINF: files the INF installs from the package
+
+The parsed INFs are indexed by hardware ID, so only the INFs matching the
+hardware IDs of a device (plus their catalogs and payload) are injected.
+"""
+
+import codecs
+import fnmatch
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path, PureWindowsPath
+from typing import Any, Collection, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Section entries: (key, value); key is None for lines without '='
+_Entries = List[Tuple[Optional[str], str]]
+
+
+class InfParseError(Exception):
+    """INF file could not be read."""
+    pass
+
+
+@dataclass
+class InfInfo:
+    """What an INF file declares about its driver package."""
+    path: Path
+    driver_class: Optional[str] = None
+    class_guid: Optional[str] = None
+    provider: Optional[str] = None
+    driver_date: Optional[str] = None      # DriverVer date (mm/dd/yyyy)
+    driver_version: Optional[str] = None   # DriverVer version (w.x.y.z)
+    catalog_files: List[str] = field(default_factory=list)   # CatalogFile and CatalogFile.<decoration>
+    hardware_ids: List[str] = field(default_factory=list)    # upper case, in models section order
+    # Hardware ID -> architectures of the models sections listing it ("" for undecorated sections)
+    architectures: Dict[str, List[str]] = field(default_factory=dict)
+    source_files: List[str] = field(default_factory=list)    # package-relative paths, '/' separated
+
+    @property
+    def referenced_files(self) -> List[str]:
+        """Files next to or below the INF that are needed to install it."""
+        return self.catalog_files + [f for f in self.source_files if f not in self.catalog_files]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'path': str(self.path),
+            'class': self.driver_class,
+            'class_guid': self.class_guid,
+            'provider': self.provider,
+            'driver_date': self.driver_date,
+            'driver_version': self.driver_version,
+            'catalog_files': self.catalog_files,
+            'hardware_ids': self.hardware_ids,
+            'architectures': self.architectures,
+            'source_files': self.source_files
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "InfInfo":
+        return cls(
+            path=Path(data['path']),
+            driver_class=data.get('class'),
+            class_guid=data.get('class_guid'),
+            provider=data.get('provider'),
+            driver_date=data.get('driver_date'),
+            driver_version=data.get('driver_version'),
+            catalog_files=list(data.get('catalog_files', [])),
+            hardware_ids=list(data.get('hardware_ids', [])),
+            architectures={k: list(v) for k, v in data.get('architectures', {}).items()},
+            source_files=list(data.get('source_files', []))
+        )
+
+
+def _decode(data: bytes) -> str:
+    """INFs are UTF-16 (with BOM), UTF-8 or ANSI."""
+    if data.startswith(codecs.BOM_UTF16_LE) or data.startswith(codecs.BOM_UTF16_BE):
+        return data.decode('utf-16')
+    if data.startswith(codecs.BOM_UTF8):
+        return data[len(codecs.BOM_UTF8):].decode('utf-8', errors='replace')
+    if b"\x00" in data[:64]:
+        return data.decode('utf-16-le', errors='replace')
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('cp1252', errors='replace')
+
+
+def _strip_comment(line: str) -> str:
+    """Remove a ';' comment that is not inside quotes."""
+    quoted = False
+    for position, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ';' and not quoted:
+            return line[:position]
+    return line
+
+
+def _read_sections(text: str) -> Dict[str, _Entries]:
+    """Split INF text into sections (lower-case names); repeated sections are merged."""
+    sections: Dict[str, _Entries] = {}
+    current: Optional[_Entries] = None
+    pending = ""
+    for raw_line in text.splitlines():
+        line = _strip_comment(raw_line).strip()
+        if line.endswith("\\"):  # line continuation
+            pending += line[:-1]
+            continue
+        line, pending = (pending + line).strip(), ""
+        if not line:
+            continue
+        if line.startswith("[") and "]" in line:
+            current = sections.setdefault(line[1:line.index("]")].strip().lower(), [])
+        elif current is not None:
+            key, sep, value = line.partition("=")
+            current.append((key.strip(), value.strip()) if sep else (None, line))
+    return sections
+
+
+def _unquote(value: str) -> str:
+    value = value.strip()
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+def _split_values(value: str) -> List[str]:
+    """Split a comma-separated INF value list; commas inside quotes are kept."""
+    parts, current, quoted = [], "", False
+    for char in value:
+        if char == '"':
+            quoted = not quoted
+        if char == ',' and not quoted:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += char
+    parts.append(current.strip())
+    return parts
+
+
+def _strings_table(sections: Dict[str, _Entries]) -> Dict[str, str]:
+    """The [Strings] tokens; localized [Strings.<lang>] only fill in missing ones."""
+    table: Dict[str, str] = {}
+    names = sorted((name for name in sections if name == "strings" or name.startswith("strings.")),
+                   key=lambda name: name != "strings")
+    for name in names:
+        for key, value in sections[name]:
+            if key is not None:
+                table.setdefault(key.lower(), _unquote(value))
+    return table
+
+
+def _substitute(value: str, strings: Dict[str, str]) -> str:
+    """Replace %token% references with their [Strings] values."""
+    parts = value.split("%")
+    if len(parts) < 3:
+        return value
+    result = parts[0]
+    for position in range(1, len(parts), 2):
+        token = parts[position]
+        if position + 1 >= len(parts):  # unbalanced '%'
+            result += "%" + token
+            break
+        result += "%" if token == "" else strings.get(token.lower(), f"%{token}%")
+        result += parts[position + 1]
+    return result
+
+
+_ARCHITECTURES = ("x86", "amd64", "arm", "arm64", "ia64")
+
+
+def _decoration_architecture(decoration: str) -> str:
+    """Architecture of a models section decoration (``NTamd64.10.0...17763`` -> ``amd64``); "" if none."""
+    platform = decoration.split(".")[0].strip().lower()
+    if platform.startswith("nt"):
+        platform = platform[2:]
+    return platform if platform in _ARCHITECTURES else ""
+
+
+def _join_relative(*parts: str) -> str:
+    path = PureWindowsPath(*(part.strip().strip("\\") for part in parts if part and part.strip().strip("\\")))
+    return path.as_posix()
+
+
+def parse_inf_text(text: str, path: Path) -> InfInfo:
+    """Parse the text of an INF file."""
+    sections = _read_sections(text)
+    strings = _strings_table(sections)
+    info = InfInfo(path=Path(path))
+
+    for key, value in sections.get("version", []):
+        if key is None:
+            continue
+        name = key.lower()
+        value = _unquote(_substitute(value, strings))
+        if name == "class":
+            info.driver_class = value
+        elif name == "classguid":
+            info.class_guid = value.upper()
+        elif name == "provider":
+            info.provider = value
+        elif name == "driverver":
+            date, _, version = value.partition(",")
+            info.driver_date = date.strip() or None
+            info.driver_version = version.strip() or None
+        elif name == "catalogfile" or name.startswith("catalogfile."):
+            if value and value not in info.catalog_files:
+                info.catalog_files.append(value)
+
+    # [Manufacturer]: <name> = <models section>[, <decoration>...]
+    seen = set()
+    for _, value in sections.get("manufacturer", []):
+        models = _split_values(_substitute(value, strings))
+        base = models[0]
+        decorated = [(f"{base}.{decoration}", _decoration_architecture(decoration))
+                     for decoration in models[1:] if decoration]
+        for section, architecture in [(base, "")] + decorated:
+            # <description> = <install section>, <hardware id>[, <compatible id>...]
+            for _, model in sections.get(section.lower(), []):
+                for device_id in _split_values(_substitute(model, strings))[1:]:
+                    device_id = _unquote(device_id).upper()
+                    if not device_id:
+                        continue
+                    if device_id not in seen:
+                        seen.add(device_id)
+                        info.hardware_ids.append(device_id)
+                    architectures = info.architectures.setdefault(device_id, [])
+                    if architecture not in architectures:
+                        architectures.append(architecture)
+
+    # [SourceDisksNames]: <disk id> = <description>[, <tag file>, <unused>, <path>]
+    disk_paths: Dict[str, str] = {}
+    for name, entries in sections.items():
+        if name == "sourcedisksnames" or name.startswith("sourcedisksnames."):
+            for key, value in entries:
+                values = _split_values(value) if key is not None else []
+                if key is not None and len(values) >= 4 and values[3]:
+                    disk_paths[key] = _unquote(values[3])
+
+    # [SourceDisksFiles]: <file> = <disk id>[, <subdir>, <size>]
+    for name, entries in sections.items():
+        if name == "sourcedisksfiles" or name.startswith("sourcedisksfiles."):
+            for key, value in entries:
+                file_name = _unquote(key if key is not None else value)
+                values = _split_values(value) if key is not None else [""]
+                subdir = _unquote(values[1]) if len(values) > 1 else ""
+                relative = _join_relative(disk_paths.get(values[0], ""), subdir, file_name)
+                if relative and relative not in info.source_files:
+                    info.source_files.append(relative)
+
+    # CopyINF = <inf>[, <inf>...] in install sections brings other INFs of the package along
+    for entries in sections.values():
+        for key, value in entries:
+            if key is not None and key.lower() == "copyinf":
+                for inf_name in _split_values(value):
+                    inf_name = _join_relative(_unquote(inf_name))
+                    if inf_name and inf_name not in info.source_files:
+                        info.source_files.append(inf_name)
+
+    return info
+
+
+def parse_inf(path: Path) -> InfInfo:
+    """Parse an INF file."""
+    try:
+        data = Path(path).read_bytes()
+    except OSError as e:
+        raise InfParseError(f"Cannot read INF file {path}: {e}")
+    return parse_inf_text(_decode(data), path)
+
+
+# Global INF cache (one entry per file, valid while size and mtime are unchanged)
+_inf_cache: Dict[str, Tuple[int, int, InfInfo]] = {}
+_inf_lock = threading.Lock()
+
+
+def get_inf_info(path: Path) -> InfInfo:
+    """Get the cached parse result of an INF file, parsing it again when the file changed."""
+    key = str(Path(path))
+    try:
+        stat = os.stat(key)
+    except OSError as e:
+        raise InfParseError(f"Cannot read INF file {path}: {e}")
+
+    with _inf_lock:
+        cached = _inf_cache.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+    info = parse_inf(Path(path))
+    with _inf_lock:
+        _inf_cache[key] = (stat.st_size, stat.st_mtime_ns, info)
+    return info
+
+
+def invalidate_inf_cache(path: Optional[Path] = None) -> None:
+    """Drop a cached INF, or all INFs when no path is given."""
+    with _inf_lock:
+        if path is None:
+            _inf_cache.clear()
+        else:
+            _inf_cache.pop(str(Path(path)), None)
+
+
+def _id_segments(device_id: str) -> Tuple[str, frozenset]:
+    """Bus/vendor prefix and the remaining '&' fields of a device ID."""
+    first, *rest = device_id.upper().split("&")
+    return first, frozenset(rest)
+
+
+class HardwareIdIndex:
+    """Hardware IDs of a set of INFs, looked up by the IDs a device reports.
+
+    An INF ID matches a device ID when it has the same bus/vendor prefix and
+    all of its '&' fields appear in the device ID, the way Plug and Play
+    derives the less specific IDs of a device: the INF ID
+    ``PCI\\VEN_8086&DEV_A110`` matches ``PCI\\VEN_8086&DEV_A110&SUBSYS_72708086&REV_31``.
+    Device IDs with ``*`` or ``?`` are wildcard patterns over the INF IDs.
+    """
+
+    def __init__(self, infs: Iterable[InfInfo] = ()):
+        self.infs: List[InfInfo] = []
+        self._by_prefix: Dict[str, List[Tuple[frozenset, str, InfInfo]]] = {}
+        for info in infs:
+            self.add(info)
+
+    def add(self, info: InfInfo) -> None:
+        self.infs.append(info)
+        for device_id in info.hardware_ids:
+            prefix, fields = _id_segments(device_id)
+            self._by_prefix.setdefault(prefix, []).append((fields, device_id, info))
+
+    def match(self, hardware_ids: Iterable[str]) -> List[InfInfo]:
+        """The INFs with an ID matching any of ``hardware_ids``, in index order."""
+        matched = set()
+        for device_id in hardware_ids:
+            device_id = device_id.strip().upper()
+            if not device_id:
+                continue
+            if "*" in device_id or "?" in device_id:
+                for entries in self._by_prefix.values():
+                    matched.update(id(info) for _, inf_id, info in entries
+                                   if fnmatch.fnmatchcase(inf_id, device_id))
+                continue
+            prefix, fields = _id_segments(device_id)
+            matched.update(id(info) for inf_fields, _, info in self._by_prefix.get(prefix, [])
+                           if inf_fields <= fields)
+        return [info for info in self.infs if id(info) in matched]
+
+
+@dataclass
+class InfSelection:
+    """The files of a driver package to inject for a set of hardware IDs."""
+    infs: List[Path] = field(default_factory=list)      # matching INFs
+    files: List[Path] = field(default_factory=list)     # matching INFs and the files they reference
+    skipped: List[Path] = field(default_factory=list)   # INFs without a matching hardware ID
+    excluded: List[Path] = field(default_factory=list)  # matching INFs left out by the caller
+    missing: List[str] = field(default_factory=list)    # referenced files not found in the package
+
+
+def select_driver_files(root: Path, files: List[Path], hardware_ids: Optional[List[str]] = None,
+                        excluded: Collection[Path] = ()) -> InfSelection:
+    """Select the INFs of a package that match ``hardware_ids`` and the files they need.
+
+    ``files`` are the package files (e.g. from the package manifest). Without
+    ``hardware_ids`` every INF matches; INFs in ``excluded`` are left out.
+    INFs without any hardware ID are kept unless another INF of the package
+    references them (then they come along with that INF). Referenced files
+    are looked up relative to their INF and case-insensitively, as on the
+    Windows file system.
+    """
+    root = Path(root)
+    by_name = {source.relative_to(root).as_posix().lower(): source for source in files}
+
+    selection = InfSelection()
+    index = HardwareIdIndex()
+    infs: Dict[Path, InfInfo] = {}
+    for source in files:
+        if source.suffix.lower() != ".inf":
+            continue
+        try:
+            infs[source] = get_inf_info(source)
+        except InfParseError as e:
+            logger.warning(f"{e}; keeping it")
+            infs[source] = InfInfo(path=source)
+        index.add(infs[source])
+
+    def dependencies(source: Path) -> List[Tuple[str, Optional[Path]]]:
+        """(referenced name, package file or None) for the files an INF references."""
+        inf_dir = source.relative_to(root).parent
+        found = []
+        for relative in infs[source].referenced_files:
+            key = os.path.normpath((inf_dir / relative).as_posix().lower()).replace(os.sep, "/")
+            found.append((relative, by_name.get(key)))
+        return found
+
+    referenced = {dependency for source in infs for _, dependency in dependencies(source)}
+    matched = set(infs) if hardware_ids is None else {info.path for info in index.match(hardware_ids)}
+    selected = set()
+    for source, info in infs.items():
+        if info.hardware_ids and source not in matched:
+            selection.skipped.append(source)
+            continue
+        if source in excluded:
+            selection.excluded.append(source)
+            continue
+        if not info.hardware_ids and source in referenced:
+            continue
+        selection.infs.append(source)
+        selected.add(source)
+        for relative, dependency in dependencies(source):
+            if dependency is None:
+                selection.missing.append(f"{source.name}: {relative}")
+            else:
+                selected.add(dependency)
+
+    selection.files = [source for source in files if source in selected]
+    return selection
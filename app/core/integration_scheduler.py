@@ -0,0 +1,224 @@
+"""
+Integration Scheduler - Overlap Yunona staging with image servicing
+
+Drivers and updates reach the mounted image on two lanes:
+
+- servicing: INF drivers and MSU/CAB updates through the imaging backend,
+  one operation at a time in ``order`` (drivers before updates)
+- staging: APPX/EXE drivers and EXE/MSI updates copied to
+  ``Users/Public/Yunona`` by a pool of workers
+
+Staging is plain file I/O into a directory the servicing stack does not
+touch, so both lanes run at the same time. The per-lane timings show which
+lane is the critical path of the integration step.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+
+from .asset_providers import DriverAsset, DriverType, UpdateAsset, UpdateType
+from .driver_integration import DriverIntegrationManager
+from .update_integration import UpdateIntegrationManager
+from .imaging_backend import ProgressCallback
+from ..utils.tool_output import ToolProgress
+
+logger = logging.getLogger(__name__)
+
+
+SERVICING_LANE = "servicing"
+STAGING_LANE = "staging"
+
+# Asset types that are only copied into the image for first-boot installation
+STAGED_DRIVER_TYPES = (DriverType.APPX, DriverType.EXE)
+STAGED_UPDATE_TYPES = (UpdateType.EXE, UpdateType.MSI)
+
+
+@dataclass
+class LaneTiming:
+    """Work done on one lane."""
+    lane: str
+    workers: int = 1
+    items: int = 0
+    busy_seconds: float = 0.0          # sum of the item durations
+    started: Optional[float] = None    # start of the first item, seconds into the run
+    finished: Optional[float] = None   # end of the last item, seconds into the run
+
+    @property
+    def wall_seconds(self) -> float:
+        return self.finished - self.started if self.items else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'lane': self.lane,
+            'workers': self.workers,
+            'items': self.items,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'wall_seconds': round(self.wall_seconds, 3),
+            'started': round(self.started, 3) if self.items else None,
+            'finished': round(self.finished, 3) if self.items else None
+        }
+
+
+@dataclass
+class IntegrationSchedule:
+    """Results and lane timings of a scheduled integration run."""
+    drivers: Dict[str, Any]      # as returned by DriverIntegrationManager.summarize_results
+    updates: Dict[str, Any]      # as returned by UpdateIntegrationManager.summarize_results
+    lanes: Dict[str, LaneTiming]
+    seconds: float = 0.0
+
+    @property
+    def critical_path(self) -> Optional[str]:
+        """The lane that determined the duration of the run."""
+        busy = [lane for lane in self.lanes.values() if lane.items]
+        return max(busy, key=lambda lane: lane.wall_seconds).lane if busy else None
+
+    @property
+    def sequential_seconds(self) -> float:
+        """Duration of the same work done one item after another."""
+        return sum(lane.busy_seconds for lane in self.lanes.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'seconds': round(self.seconds, 3),
+            'sequential_seconds': round(self.sequential_seconds, 3),
+            'critical_path': self.critical_path,
+            'lanes': {name: lane.to_dict() for name, lane in self.lanes.items()}
+        }
+
+
+class _ProgressTracker:
+    """Overall progress of items finishing on several lanes; never goes backwards."""
+
+    def __init__(self, callback: Optional[ProgressCallback], total: int):
+        self.callback = callback
+        self.total = max(total, 1)
+        self.done = 0
+        self.reported = 0.0
+
+    def item(self, count: int = 1, target: str = "") -> Optional[ProgressCallback]:
+        """Callback for the tool progress of an operation on ``count`` items."""
+        if self.callback is None:
+            return None
+        return lambda progress: self._report(self.done + count * progress.percent / 100.0,
+                                             progress.operation, target or progress.target)
+
+    def finish(self, count: int, target: str = "") -> None:
+        self.done += count
+        self._report(self.done, "integrate", target)
+
+    def _report(self, items: float, operation: str, target: str) -> None:
+        percent = min(100.0, 100.0 * items / self.total)
+        if self.callback is None or percent <= self.reported:
+            return
+        self.reported = percent
+        self.callback(ToolProgress(operation, percent, target))
+
+
+class IntegrationScheduler:
+    """Integrate drivers and updates with staging running alongside servicing."""
+
+    def __init__(self, driver_manager: DriverIntegrationManager, update_manager: UpdateIntegrationManager,
+                 staging_workers: int = 4):
+        self.driver_manager = driver_manager
+        self.update_manager = update_manager
+        self.staging_workers = max(1, staging_workers)
+
+    async def run(self, drivers: List[DriverAsset], updates: List[UpdateAsset], mount_point: Path,
+                  yunona_path: Path, os_id: int,
+                  progress_callback: Optional[ProgressCallback] = None) -> IntegrationSchedule:
+        """Integrate the drivers and updates compatible with ``os_id`` into the mounted image.
+
+        ``progress_callback`` receives the progress across all items.
+        """
+        driver_integrator = self.driver_manager.integrator
+        update_integrator = self.update_manager.integrator
+        drivers = sorted(self.driver_manager.compatible_drivers(drivers, os_id), key=lambda d: d.order)
+        updates = sorted(self.update_manager.compatible_updates(updates, os_id), key=lambda u: u.order)
+        logger.info(f"Scheduling integration of {len(drivers)} drivers and {len(updates)} updates "
+                    f"({self.staging_workers} staging workers)")
+        start = time.perf_counter()
+
+        yunona_target = await driver_integrator.prepare_mount(mount_point, yunona_path)
+        updates_target = update_integrator.prepare_mount(mount_point)
+        driver_integrator.integration_stats['total'] = len(drivers)
+        driver_integrator.batch_info = None
+        await asyncio.to_thread(driver_integrator.resolve_versions, drivers)
+        update_integrator.integration_stats['total'] = len(updates)
+
+        results: Dict[int, Any] = {}
+        lanes = {
+            SERVICING_LANE: LaneTiming(SERVICING_LANE),
+            STAGING_LANE: LaneTiming(STAGING_LANE, workers=self.staging_workers)
+        }
+        tracker = _ProgressTracker(progress_callback, len(drivers) + len(updates))
+
+        async def timed(lane: str, work: Awaitable, count: int = 1, target: str = ""):
+            timing = lanes[lane]
+            item_start = time.perf_counter() - start
+            try:
+                return await work
+            finally:
+                item_end = time.perf_counter() - start
+                timing.started = item_start if timing.started is None else min(timing.started, item_start)
+                timing.finished = item_end if timing.finished is None else max(timing.finished, item_end)
+                timing.items += count
+                timing.busy_seconds += item_end - item_start
+                tracker.finish(count, target)
+
+        async def servicing() -> None:
+            # One servicing operation at a time, in order: the image session is exclusive
+            serviced_drivers = [d for d in drivers if d.driver_type not in STAGED_DRIVER_TYPES]
+            batch = driver_integrator.batch_candidates(serviced_drivers)
+            if batch:
+                batch_results = await timed(SERVICING_LANE, driver_integrator.integrate_driver_batch(
+                    batch, mount_point, tracker.item(len(batch))
+                ), len(batch))
+                for result in batch_results:
+                    results[id(result.driver_asset)] = result
+
+            for driver in serviced_drivers:
+                if id(driver) not in results:
+                    results[id(driver)] = await timed(SERVICING_LANE, driver_integrator.integrate_driver(
+                        driver, mount_point, yunona_target, tracker.item(1, driver.name)
+                    ), target=driver.name)
+
+            for update in updates:
+                if update.update_type not in STAGED_UPDATE_TYPES:
+                    results[id(update)] = await timed(SERVICING_LANE, update_integrator.integrate_update(
+                        update, mount_point, updates_target, tracker.item(1, update.name)
+                    ), target=update.name)
+
+        async def staging() -> None:
+            workers = asyncio.Semaphore(self.staging_workers)
+
+            async def stage(asset: Any, work: Callable[[], Awaitable]) -> None:
+                async with workers:
+                    results[id(asset)] = await timed(STAGING_LANE, work(), target=asset.name)
+
+            await asyncio.gather(
+                *(stage(driver, lambda driver=driver: driver_integrator.integrate_driver(
+                    driver, mount_point, yunona_target))
+                  for driver in drivers if driver.driver_type in STAGED_DRIVER_TYPES),
+                *(stage(update, lambda update=update: update_integrator.integrate_update(
+                    update, mount_point, updates_target))
+                  for update in updates if update.update_type in STAGED_UPDATE_TYPES)
+            )
+
+        await asyncio.gather(servicing(), staging())
+
+        schedule = IntegrationSchedule(
+            drivers=self.driver_manager.summarize_results([results[id(driver)] for driver in drivers]),
+            updates=self.update_manager.summarize_results([results[id(update)] for update in updates]),
+            lanes=lanes,
+            seconds=time.perf_counter() - start
+        )
+        logger.info(f"Integration finished in {schedule.seconds:.1f}s (sequential {schedule.sequential_seconds:.1f}s): "
+                    + ", ".join(f"{lane.lane} {lane.wall_seconds:.1f}s for {lane.items} items"
+                                for lane in lanes.values())
+                    + f"; critical path: {schedule.critical_path}")
+        return schedule
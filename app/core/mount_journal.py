@@ -0,0 +1,318 @@
+"""
+Mount Journal - Persistent record of the images mounted by Kassia
+
+``WimHandler`` records every mount before it is created and removes the
+entry once the image is unmounted, so mounts left behind by a crashed or
+restarted process can be found without a slow ``dism /Cleanup-Wim``.
+``reconcile_mounts`` handles each orphaned entry in parallel:
+
+- ``forgotten``  the image is no longer mounted, only the entry is removed
+- ``remounted``  a mount that needs a remount (e.g. after a reboot) is reattached first
+- ``reused``     a warm mount with an unchanged source is handed back to its pool
+- ``committed``  an interrupted commit is completed
+- ``discarded``  any other mount is unmounted without saving changes
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+import logging
+
+from .imaging_backend import ImagingBackend, DismError, MountedImage
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_JOURNAL_PATH = Path("runtime/data/kassia_mount_journal.db")
+
+# Journal states
+MOUNTING = "mounting"
+MOUNTED = "mounted"
+COMMITTING = "committing"
+DISCARDING = "discarding"
+
+
+@dataclass
+class MountEntry:
+    """A journaled mount."""
+    mount_point: Path
+    wim_path: Path
+    image_index: int
+    read_write: bool
+    owner: str
+    state: str
+    pid: int
+    backend: str
+    details: Dict[str, Any] = field(default_factory=dict)
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'mount_point': str(self.mount_point),
+            'wim_path': str(self.wim_path),
+            'image_index': self.image_index,
+            'read_write': self.read_write,
+            'owner': self.owner,
+            'state': self.state,
+            'pid': self.pid,
+            'backend': self.backend,
+            'details': self.details,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
+
+
+class MountJournal:
+    """SQLite journal of mounts keyed by mount point."""
+
+    def __init__(self, db_path: Path = DEFAULT_JOURNAL_PATH):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self.init_database()
+
+    def init_database(self):
+        """Initialize mount journal schema."""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS mounts (
+                    mount_point TEXT PRIMARY KEY,
+                    wim_path TEXT NOT NULL,
+                    image_index INTEGER NOT NULL,
+                    read_write INTEGER NOT NULL,
+                    owner TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    pid INTEGER NOT NULL,
+                    backend TEXT NOT NULL,
+                    details TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            ''')
+            conn.commit()
+
+    # Public API
+
+    def record(self, mount_point: Path, wim_path: Path, index: int, read_write: bool, owner: str,
+               backend: str, state: str = MOUNTING, details: Optional[Dict[str, Any]] = None) -> None:
+        """Record a mount owned by this process (replacing any entry for the mount point)."""
+        now = datetime.now().isoformat()
+        with self._lock, sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO mounts
+                (mount_point, wim_path, image_index, read_write, owner, state, pid, backend, details,
+                 created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (self._key(mount_point), str(wim_path), index, int(read_write), owner, state, os.getpid(),
+                  backend, json.dumps(details or {}), now, now))
+            conn.commit()
+
+    def update(self, mount_point: Path, state: Optional[str] = None, owner: Optional[str] = None,
+               details: Optional[Dict[str, Any]] = None) -> None:
+        """Change the state, owner or details of an entry and claim it for this process."""
+        changes = {'pid': os.getpid(), 'updated_at': datetime.now().isoformat()}
+        if state is not None:
+            changes['state'] = state
+        if owner is not None:
+            changes['owner'] = owner
+        if details is not None:
+            changes['details'] = json.dumps(details)
+
+        assignments = ", ".join(f"{column} = ?" for column in changes)
+        with self._lock, sqlite3.connect(self.db_path) as conn:
+            conn.execute(f'UPDATE mounts SET {assignments} WHERE mount_point = ?',
+                         (*changes.values(), self._key(mount_point)))
+            conn.commit()
+
+    def remove(self, mount_point: Path) -> None:
+        """Forget a mount."""
+        with self._lock, sqlite3.connect(self.db_path) as conn:
+            conn.execute('DELETE FROM mounts WHERE mount_point = ?', (self._key(mount_point),))
+            conn.commit()
+
+    def get(self, mount_point: Path) -> Optional[MountEntry]:
+        """Get the entry of a mount point."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute('SELECT * FROM mounts WHERE mount_point = ?', (self._key(mount_point),)).fetchone()
+        return self._entry(row) if row else None
+
+    def entries(self) -> List[MountEntry]:
+        """Get all journaled mounts, oldest first."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute('SELECT * FROM mounts ORDER BY created_at').fetchall()
+        return [self._entry(row) for row in rows]
+
+    def orphaned(self, active_owners: Iterable[str] = ()) -> List[MountEntry]:
+        """Entries no running owner will clean up.
+
+        An entry of this process is orphaned unless its owner is in
+        ``active_owners``; an entry of another process is orphaned once that
+        process has exited.
+        """
+        active = set(active_owners)
+        own_pid = os.getpid()
+        return [
+            entry for entry in self.entries()
+            if (entry.owner not in active if entry.pid == own_pid else not _process_alive(entry.pid))
+        ]
+
+    # Helper methods
+
+    @staticmethod
+    def _key(mount_point: Path) -> str:
+        return str(Path(mount_point).resolve())
+
+    @staticmethod
+    def _entry(row: sqlite3.Row) -> MountEntry:
+        return MountEntry(
+            mount_point=Path(row['mount_point']),
+            wim_path=Path(row['wim_path']),
+            image_index=row['image_index'],
+            read_write=bool(row['read_write']),
+            owner=row['owner'],
+            state=row['state'],
+            pid=row['pid'],
+            backend=row['backend'],
+            details=json.loads(row['details'] or "{}"),
+            created_at=row['created_at'],
+            updated_at=row['updated_at']
+        )
+
+
+def _process_alive(pid: int) -> bool:
+    """Check whether a process exists (without signalling it)."""
+    if pid <= 0:
+        return False
+    if os.name == 'nt':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            return exit_code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+ReuseHandler = Callable[[MountEntry], Awaitable[bool]]
+
+
+async def reconcile_mounts(journal: MountJournal, backend: ImagingBackend,
+                           reuse: Optional[ReuseHandler] = None,
+                           active_owners: Iterable[str] = (),
+                           max_parallel: int = 4) -> List[Dict[str, Any]]:
+    """Recover the orphaned mounts of the journal in parallel.
+
+    ``reuse`` is offered every healthy orphaned mount first; it returns True
+    if it took the mount over (and updated its journal entry). Returns one
+    result per entry with the action taken.
+    """
+    orphaned = journal.orphaned(active_owners)
+    if not orphaned:
+        return []
+
+    try:
+        mounted = await backend.get_mounted()
+    except DismError as e:
+        logger.warning(f"Could not list mounted images, recovering journaled mounts blindly: {e}")
+        mounted = None
+    registry = {MountJournal._key(m.mount_point): m for m in mounted} if mounted is not None else None
+
+    semaphore = asyncio.Semaphore(max(1, max_parallel))
+
+    async def recover(entry: MountEntry) -> Dict[str, Any]:
+        async with semaphore:
+            return await _recover_entry(journal, backend, entry, registry, reuse)
+
+    results = await asyncio.gather(*(recover(entry) for entry in orphaned))
+    recovered = sum(1 for r in results if r['success'])
+    logger.info(f"Recovered {recovered}/{len(results)} orphaned mounts: "
+                f"{[r['action'] for r in results]}")
+    return list(results)
+
+
+async def _recover_entry(journal: MountJournal, backend: ImagingBackend, entry: MountEntry,
+                         registry: Optional[Dict[str, MountedImage]],
+                         reuse: Optional[ReuseHandler]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    result = dict(entry.to_dict(), action="", success=False, error=None)
+    actions: List[str] = []
+
+    try:
+        mounted = registry.get(MountJournal._key(entry.mount_point)) if registry is not None else None
+        if registry is not None and mounted is None:
+            actions.append("forgotten")
+        else:
+            if mounted is not None and mounted.status == "needs_remount":
+                await backend.remount(entry.mount_point)
+                actions.append("remounted")
+
+            if mounted is not None and mounted.status == "invalid":
+                await backend.cleanup(entry.mount_point)
+                actions.append("discarded")
+            elif entry.state == MOUNTED and reuse and await reuse(entry):
+                actions.append("reused")
+            elif entry.state == COMMITTING:
+                try:
+                    await backend.unmount(entry.mount_point, commit=True)
+                    actions.append("committed")
+                except DismError as e:
+                    logger.warning(f"Could not complete commit of {entry.mount_point}, discarding: {e}")
+                    await _discard(backend, entry.mount_point)
+                    actions.append("discarded")
+            else:
+                await _discard(backend, entry.mount_point)
+                actions.append("discarded")
+
+        if "reused" not in actions:
+            journal.remove(entry.mount_point)
+        result['success'] = True
+    except Exception as e:
+        result['error'] = str(e)
+        logger.warning(f"Failed to recover mount {entry.mount_point} of {entry.owner}: {e}")
+
+    result['action'] = "+".join(actions) or "failed"
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+async def _discard(backend: ImagingBackend, mount_point: Path) -> None:
+    try:
+        await backend.unmount(mount_point, commit=False)
+    except DismError:
+        await backend.cleanup(mount_point)
+
+
+# Global mount journal instances (one per database path)
+_mount_journal_instances: Dict[str, MountJournal] = {}
+_mount_journal_lock = threading.Lock()
+
+
+def get_mount_journal(db_path: Path = DEFAULT_JOURNAL_PATH) -> MountJournal:
+    """Get the shared mount journal for a database path."""
+    key = str(Path(db_path).resolve())
+    with _mount_journal_lock:
+        if key not in _mount_journal_instances:
+            _mount_journal_instances[key] = MountJournal(Path(db_path))
+        return _mount_journal_instances[key]
@@ -0,0 +1,453 @@
+"""
+Mount Manager - Per-job workspaces, a concurrency cap and a pool of warm read-write mounts
+"""
+
+import asyncio
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+import logging
+
+from .imaging_backend import ImagingBackend
+from .mount_journal import MountEntry, MountJournal, get_mount_journal, reconcile_mounts
+from .wim_handler import MountInfo, WimHandler, WimWorkflow
+from .wim_staging import WimStagingCache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WarmMount:
+    """A private copy of a source WIM, mounted read-write and waiting for a job."""
+    source: Path
+    identity: Tuple[int, int]           # source (size, mtime_ns) when the mount was prepared
+    root: Path
+    workflow: WimWorkflow               # owns the copy, the mount and the staging clone
+    prepared_seconds: float
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def wim_path(self) -> Path:
+        return self.workflow.workflow_state['temp_wim']
+
+    @property
+    def mount_point(self) -> Path:
+        return self.workflow.workflow_state['mount_info'].mount_point
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'source': str(self.source),
+            'mount_point': str(self.mount_point),
+            'prepared_seconds': round(self.prepared_seconds, 1),
+            'age_seconds': round(time.time() - self.created_at, 1)
+        }
+
+
+@dataclass
+class JobWorkspace:
+    """Directories owned by one build job."""
+    job_id: str
+    mount_point: Path
+    temp_dir: Path
+    export_dir: Path
+    owned_dirs: List[Path] = field(default_factory=list)
+    warm_mount: Optional[WarmMount] = None
+
+    def adopt(self, warm_mount: WarmMount) -> None:
+        """Take over a warm mount: its mount point and copy replace the job's own."""
+        self.warm_mount = warm_mount
+        self.mount_point = warm_mount.mount_point
+        self.temp_dir = warm_mount.wim_path.parent
+        self.owned_dirs.append(warm_mount.root)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'mount_point': str(self.mount_point),
+            'temp_dir': str(self.temp_dir),
+            'export_dir': str(self.export_dir),
+            'warm_mount': self.warm_mount is not None
+        }
+
+
+class MountManager:
+    """Allocates per-job mount/temp/export directories and limits concurrent builds.
+
+    With ``warm_pool_size`` > 0 the manager keeps up to that many read-write
+    mounts of the most frequently used source WIMs (used at least
+    ``warm_threshold`` times) ready. A job whose source has a warm mount takes
+    it over and skips the copy and mount steps; the pool is refilled in the
+    background. Warm mounts are discarded when their source changes.
+
+    With a ``journal`` every mount is persisted; ``recover`` cleans up (or
+    returns to the pool) the mounts a crashed process left behind.
+    """
+
+    def __init__(self, mount_root: Path, temp_root: Path, export_root: Path, backend: ImagingBackend,
+                 max_concurrent: int = 2, warm_pool_size: int = 0, warm_threshold: int = 2,
+                 staging_cache: Optional[WimStagingCache] = None, journal: Optional[MountJournal] = None,
+                 recovery_workers: int = 4):
+        self.mount_root = Path(mount_root)
+        self.temp_root = Path(temp_root)
+        self.export_root = Path(export_root)
+        self.backend = backend
+        self.max_concurrent = max(1, max_concurrent)
+        self.warm_pool_size = max(0, warm_pool_size)
+        self.warm_threshold = max(1, warm_threshold)
+        self.staging_cache = staging_cache
+        self.journal = journal
+        self.recovery_workers = max(1, recovery_workers)
+        self.active: Dict[str, JobWorkspace] = {}
+        self.warm: Dict[str, WarmMount] = {}          # source path -> warm mount
+        self.usage: Dict[str, int] = {}
+        self.stats = {'jobs': 0, 'waits': 0, 'wait_seconds': 0.0, 'warm_hits': 0, 'warm_misses': 0,
+                      'warm_prepared': 0, 'warm_failures': 0, 'warm_discarded': 0, 'warm_recovered': 0}
+        self._waiters: List[asyncio.Future] = []
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._preparing: Set[str] = set()  # journal owners of warm mounts being prepared
+        self._lock = threading.Lock()
+
+    # Job workspaces
+
+    async def acquire(self, job_id: str) -> JobWorkspace:
+        """Wait for a build slot and create the job's directories."""
+        start = time.perf_counter()
+        waited = False
+        while len(self.active) >= self.max_concurrent:
+            if not waited:
+                waited = True
+                self.stats['waits'] += 1
+                logger.info(f"Job {job_id} waiting for a build slot ({self.max_concurrent} in use)")
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except BaseException:
+                # Pass a wake-up this job can no longer use on to the next waiter
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.stats['wait_seconds'] += time.perf_counter() - start
+
+        workspace = JobWorkspace(
+            job_id=job_id,
+            mount_point=self.mount_root / job_id,
+            temp_dir=self.temp_root / job_id,
+            export_dir=self.export_root / job_id
+        )
+        workspace.owned_dirs = [workspace.mount_point, workspace.temp_dir]
+        # Claim the slot before anything else can run on the loop
+        self.active[job_id] = workspace
+
+        try:
+            for directory in (workspace.mount_point, workspace.temp_dir, workspace.export_dir):
+                directory.mkdir(parents=True, exist_ok=True)
+        except BaseException:
+            self.active.pop(job_id, None)
+            self._wake()
+            raise
+
+        self.stats['jobs'] += 1
+        logger.info(f"Allocated workspace for job {job_id}: {workspace.mount_point}")
+        return workspace
+
+    def release(self, workspace: JobWorkspace, remove_dirs: bool = True) -> None:
+        """Free the job's slot and remove its working directories (not a non-empty export).
+
+        The job must have unmounted its image (``WimWorkflow.cleanup_workflow``)
+        before its directories are removed; pass ``remove_dirs=False`` if that failed.
+        """
+        if self.active.pop(workspace.job_id, None) is None:
+            return
+
+        if remove_dirs:
+            for directory in workspace.owned_dirs:
+                shutil.rmtree(directory, ignore_errors=True)
+        else:
+            logger.warning(f"Keeping directories of job {workspace.job_id}: {workspace.mount_point} may still be mounted")
+        try:
+            workspace.export_dir.rmdir()  # only succeeds if nothing was exported
+        except OSError:
+            pass
+
+        self._wake()
+        logger.info(f"Released workspace of job {workspace.job_id}")
+
+    def available_slots(self) -> int:
+        """Number of jobs that can start without waiting."""
+        return max(0, self.max_concurrent - len(self.active))
+
+    # Warm mount pool
+
+    def take_warm(self, source_wim: Path, job_id: Optional[str] = None) -> Optional[WarmMount]:
+        """Hand a warm mount of ``source_wim`` to a job, and refill the pool in the background."""
+        key = self._source_key(source_wim)
+        with self._lock:
+            self.usage[key] = self.usage.get(key, 0) + 1
+            warm_mount = self.warm.get(key)
+            if warm_mount is not None and warm_mount.identity == self._identity(Path(source_wim)):
+                del self.warm[key]
+            else:
+                warm_mount = None
+
+        if warm_mount is not None:
+            self.stats['warm_hits'] += 1
+            # From now on the mount holds the job's changes and must not return to the pool
+            handler = warm_mount.workflow.wim_handler
+            handler.owner = job_id or f"job:{uuid.uuid4().hex[:12]}"
+            if self.journal:
+                self.journal.update(warm_mount.mount_point, owner=handler.owner)
+            logger.info(f"Job takes warm mount of {source_wim} at {warm_mount.mount_point}")
+        elif self.warm_pool_size:
+            self.stats['warm_misses'] += 1
+
+        self.refill()
+        return warm_mount
+
+    def refill(self) -> None:
+        """Start preparing warm mounts for the most used sources, up to the pool size."""
+        if not self.warm_pool_size:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        self._discard_stale()
+        with self._lock:
+            candidates = sorted(
+                (key for key, uses in self.usage.items()
+                 if uses >= self.warm_threshold and key not in self.warm and key not in self._pending),
+                key=lambda k: self.usage[k], reverse=True
+            )
+            free = self.warm_pool_size - len(self.warm) - len(self._pending)
+            for key in candidates[:max(0, free)]:
+                self._pending[key] = loop.create_task(self._prepare_warm(key))
+
+    async def wait_for_pool(self) -> None:
+        """Wait until pending warm mounts are prepared."""
+        while True:
+            with self._lock:
+                pending = list(self._pending.values())
+            if not pending:
+                return
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def shutdown(self) -> None:
+        """Discard all warm mounts."""
+        with self._lock:
+            pending = list(self._pending.values())
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        with self._lock:
+            warm_mounts = list(self.warm.values())
+            self.warm.clear()
+        for warm_mount in warm_mounts:
+            await self._discard(warm_mount)
+
+    def get_pool_info(self) -> Dict[str, Any]:
+        """Get workspace, slot and warm pool state."""
+        with self._lock:
+            warm = [w.to_dict() for w in self.warm.values()]
+            pending = list(self._pending)
+            usage = dict(self.usage)
+        return {
+            'max_concurrent': self.max_concurrent,
+            'active_jobs': list(self.active),
+            'available_slots': self.available_slots(),
+            'warm_pool_size': self.warm_pool_size,
+            'warm_threshold': self.warm_threshold,
+            'warm': warm,
+            'pending': pending,
+            'usage': usage,
+            'journal': [e.to_dict() for e in self.journal.entries()] if self.journal else [],
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.stats.items()}
+        }
+
+    # Crash recovery
+
+    async def recover(self) -> List[Dict[str, Any]]:
+        """Recover the mounts a crashed or restarted process left in the journal.
+
+        Warm mounts of unchanged sources go back to the pool (if it has room);
+        all other orphaned mounts are discarded, or committed if a commit was
+        interrupted, and their job directories removed.
+        """
+        if not self.journal:
+            return []
+
+        with self._lock:
+            active_owners = {w.workflow.wim_handler.owner for w in self.warm.values()} | self._preparing
+        active_owners.update(self.active)
+        results = await reconcile_mounts(
+            self.journal, self.backend, reuse=self._reuse_warm,
+            active_owners=active_owners, max_parallel=self.recovery_workers
+        )
+        for result in results:
+            if result['success'] and result['action'] != "reused":
+                self._remove_recovered_dirs(Path(result['mount_point']), Path(result['wim_path']))
+        return results
+
+    async def _reuse_warm(self, entry: MountEntry) -> bool:
+        """Put an orphaned warm mount back into the pool if its source is unchanged."""
+        source = entry.details.get('source')
+        identity = entry.details.get('identity')
+        if not entry.owner.startswith("warm:") or not source or not identity or not entry.read_write:
+            return False
+        if tuple(identity) != self._identity(Path(source)) or not entry.wim_path.exists():
+            return False
+
+        with self._lock:
+            if source in self.warm or len(self.warm) + len(self._pending) >= self.warm_pool_size:
+                return False
+            handler = WimHandler(backend=self.backend, journal=self.journal, owner=entry.owner)
+            mount_info = MountInfo(entry.wim_path, entry.mount_point, entry.image_index, True,
+                                   datetime.now(), entry.read_write)
+            handler.mounted_images[str(entry.mount_point)] = mount_info
+            workflow = WimWorkflow(handler, self.staging_cache)
+            workflow.workflow_state.update(temp_wim=entry.wim_path, mount_info=mount_info)
+            self.warm[source] = WarmMount(Path(source), tuple(identity), entry.mount_point.parent, workflow, 0.0)
+            self.usage.setdefault(source, self.warm_threshold)
+
+        self.journal.update(entry.mount_point)  # claim the entry for this process
+        self.stats['warm_recovered'] += 1
+        logger.info(f"Recovered warm mount of {source} at {entry.mount_point}")
+        return True
+
+    def _remove_recovered_dirs(self, mount_point: Path, wim_path: Path) -> None:
+        """Remove the workspace directories of a recovered job or warm mount."""
+        mount_root = self.mount_root.resolve()
+        if mount_point.parent.parent == mount_root / "warm":
+            shutil.rmtree(mount_point.parent, ignore_errors=True)
+            return
+        if mount_point.parent == mount_root:
+            shutil.rmtree(mount_point, ignore_errors=True)
+            try:
+                (self.export_root / mount_point.name).rmdir()  # only if nothing was exported
+            except OSError:
+                pass
+        if wim_path.resolve().parent.parent == self.temp_root.resolve():
+            shutil.rmtree(wim_path.parent, ignore_errors=True)
+
+    # Helper methods
+
+    def _wake(self) -> None:
+        """Wake the longest waiting job."""
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.get_loop().call_soon_threadsafe(self._resolve, waiter)
+                return
+
+    @staticmethod
+    def _resolve(waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            waiter.set_result(None)
+
+    async def _prepare_warm(self, key: str) -> None:
+        source = Path(key)
+        root = self.mount_root / "warm" / uuid.uuid4().hex[:12]
+        handler = WimHandler(backend=self.backend, journal=self.journal, owner=f"warm:{root.name}")
+        workflow = WimWorkflow(handler, self.staging_cache)
+        start = time.perf_counter()
+        self._preparing.add(handler.owner)
+
+        try:
+            identity = self._identity(source)
+            temp_wim = await workflow.prepare_wim_for_modification(source, root / "temp")
+            await workflow.mount_wim_for_modification(temp_wim, root / "mount")
+            warm_mount = WarmMount(source, identity, root, workflow, time.perf_counter() - start)
+            if self.journal:
+                self.journal.update(warm_mount.mount_point, details={'source': key, 'identity': identity})
+            with self._lock:
+                self.warm[key] = warm_mount
+            self.stats['warm_prepared'] += 1
+            logger.info(f"Warm mount of {source} ready at {warm_mount.mount_point} "
+                        f"({warm_mount.prepared_seconds:.1f}s)")
+        except BaseException as e:
+            if not isinstance(e, asyncio.CancelledError):
+                self.stats['warm_failures'] += 1
+                logger.warning(f"Failed to prepare warm mount of {source}: {e}")
+            await workflow.cleanup_workflow(keep_export=False)
+            shutil.rmtree(root, ignore_errors=True)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            self._preparing.discard(handler.owner)
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _discard_stale(self) -> None:
+        with self._lock:
+            stale = [key for key, w in self.warm.items() if w.identity != self._identity(w.source)]
+            warm_mounts = [self.warm.pop(key) for key in stale]
+        for warm_mount in warm_mounts:
+            logger.info(f"Discarding warm mount of changed source {warm_mount.source}")
+            asyncio.get_running_loop().create_task(self._discard(warm_mount))
+
+    async def _discard(self, warm_mount: WarmMount) -> None:
+        try:
+            await warm_mount.workflow.cleanup_workflow(keep_export=False)
+        finally:
+            shutil.rmtree(warm_mount.root, ignore_errors=True)
+            self.stats['warm_discarded'] += 1
+
+    @staticmethod
+    def _source_key(source_wim: Path) -> str:
+        return str(Path(source_wim).resolve())
+
+    @staticmethod
+    def _identity(source: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = source.stat()
+        except OSError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+
+# Global mount manager instances (one per mount root)
+_mount_manager_instances: Dict[str, MountManager] = {}
+_mount_manager_lock = threading.Lock()
+
+
+def get_mount_manager(build_config, backend: ImagingBackend,
+                      staging_cache: Optional[WimStagingCache] = None,
+                      warm_pool: bool = True) -> MountManager:
+    """Get the shared mount manager for the configured mount root.
+
+    The first call fixes the imaging backend used by the manager's jobs and
+    warm mounts; later calls update the concurrency and pool settings.
+    """
+    key = str(Path(build_config.mountPoint).resolve())
+    with _mount_manager_lock:
+        manager = _mount_manager_instances.get(key)
+        if manager is None:
+            manager = MountManager(
+                Path(build_config.mountPoint), Path(build_config.tempPath), Path(build_config.exportPath),
+                backend, staging_cache=staging_cache,
+                journal=get_mount_journal(Path(build_config.mountJournalPath)),
+                recovery_workers=build_config.mountRecoveryWorkers
+            )
+            _mount_manager_instances[key] = manager
+        manager.max_concurrent = build_config.maxConcurrentBuilds
+        manager.warm_pool_size = build_config.warmMountPool if warm_pool else 0
+        manager.warm_threshold = build_config.warmMountThreshold
+        return manager
+
+
+async def shutdown_mount_managers() -> None:
+    """Discard the warm mounts of all mount managers."""
+    with _mount_manager_lock:
+        managers = list(_mount_manager_instances.values())
+    for manager in managers:
+        await manager.shutdown()
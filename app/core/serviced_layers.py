@@ -0,0 +1,517 @@
+"""
+Serviced Layer Cache - Source WIMs with their OS updates applied, shared by all device builds of an OS
+"""
+
+import asyncio
+import hashlib
+import json
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+
+from .asset_providers import AssetInfo, UpdateAsset
+from .imaging_backend import ImagingBackend
+from .mount_journal import MountJournal
+from .mount_manager import JobWorkspace
+from .update_integration import UpdateIntegrator, UpdateIntegrationManager
+from .wim_handler import WimHandler, WimWorkflow
+from .wim_staging import WimStagingCache
+from ..utils.digest_cache import DEFAULT_DIGEST_CACHE_PATH, DigestCache, get_digest_cache
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_LAYER_CACHE_PATH = Path("runtime/cache/layers")
+
+
+class ServicedLayerError(Exception):
+    """A serviced layer could not be resolved or built."""
+    pass
+
+
+@dataclass
+class LayerKey:
+    """Identity of a serviced layer: source image, ordered update set and servicing tool."""
+    key: str
+    os_id: int
+    source_sha256: str
+    update_set_sha256: str
+    backend_version: str
+    updates: List[UpdateAsset] = field(default_factory=list)  # compatible updates in integration order
+
+
+@dataclass
+class ServicedLayer:
+    """A cached source WIM with an update set applied."""
+    key: str
+    os_id: int
+    path: Path
+    source_sha256: str
+    update_set_sha256: str
+    backend_version: str
+    updates: List[Dict[str, Any]]  # integration result per update
+    size: int
+    build_seconds: float
+    created_at: str
+    hits: int = 0
+    cache_hit: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for job results and the API."""
+        return {
+            'key': self.key,
+            'os_id': self.os_id,
+            'path': str(self.path),
+            'source_sha256': self.source_sha256,
+            'update_set_sha256': self.update_set_sha256,
+            'backend_version': self.backend_version,
+            'update_count': len(self.updates),
+            'updates': self.updates,
+            'size_mb': round(self.size / (1024 * 1024), 1),
+            'build_seconds': round(self.build_seconds, 1),
+            'created_at': self.created_at,
+            'hits': self.hits,
+            'cache_hit': self.cache_hit
+        }
+
+
+class ServicedLayerCache:
+    """Builds each (source WIM, update set, backend version) layer once and reuses it.
+
+    Updates only depend on the OS, so the serviced image is the same for every
+    device. A layer is built by mounting a copy of the source WIM, integrating
+    the OS updates and committing; device builds then start from the layer and
+    only integrate their drivers. Builds with failed updates are not cached.
+    Least recently used layers are evicted when the cache exceeds its quota.
+    """
+
+    def __init__(self, cache_path: Path = DEFAULT_LAYER_CACHE_PATH, max_size_mb: int = 102400,
+                 digest_cache: Optional[DigestCache] = None):
+        self.cache_path = Path(cache_path)
+        self.max_bytes = int(max_size_mb) * 1024 * 1024
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        self.state_db = self.cache_path / "layer_state.db"
+        self.digest_cache = digest_cache or get_digest_cache(DEFAULT_DIGEST_CACHE_PATH)
+        self._in_use: Dict[str, int] = {}
+        self._build_locks: Dict[tuple, asyncio.Lock] = {}
+        self._building: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.init_database()
+
+    def init_database(self):
+        """Initialize the layer cache schema."""
+        with sqlite3.connect(self.state_db) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS serviced_layers (
+                    key TEXT PRIMARY KEY,
+                    os_id INTEGER NOT NULL,
+                    layer_file TEXT NOT NULL,
+                    layer_size INTEGER NOT NULL,
+                    layer_mtime_ns INTEGER NOT NULL,
+                    source_sha256 TEXT NOT NULL,
+                    update_set_sha256 TEXT NOT NULL,
+                    backend_version TEXT NOT NULL,
+                    updates_json TEXT NOT NULL,
+                    build_seconds REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_layers_os ON serviced_layers (os_id)')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS layer_stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    misses INTEGER NOT NULL DEFAULT 0,
+                    builds INTEGER NOT NULL DEFAULT 0,
+                    build_failures INTEGER NOT NULL DEFAULT 0,
+                    evictions INTEGER NOT NULL DEFAULT 0,
+                    invalidations INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            conn.execute('INSERT OR IGNORE INTO layer_stats (id) VALUES (1)')
+            conn.commit()
+
+    # Public API
+
+    async def resolve_key(self, sbi: AssetInfo, updates: List[UpdateAsset], backend: ImagingBackend,
+                          os_id: int) -> LayerKey:
+        """Compute the layer key of an SBI and the updates compatible with ``os_id``."""
+        compatible = sorted(
+            (u for u in updates if not u.supported_os or os_id in u.supported_os),
+            key=lambda u: u.order
+        )
+        if not compatible:
+            raise ServicedLayerError(f"No updates to service for OS {os_id}")
+
+        source_sha256, update_digests, backend_version = await asyncio.gather(
+            self._asset_digest(sbi),
+            asyncio.gather(*(self._asset_digest(u) for u in compatible)),
+            backend.get_version()
+        )
+
+        update_set = hashlib.sha256()
+        for update, digest in zip(compatible, update_digests):
+            update_set.update(f"{update.update_type.value}\0{digest}\n".encode('utf-8'))
+        update_set_sha256 = update_set.hexdigest()
+
+        key = hashlib.sha256(
+            f"{source_sha256}|{update_set_sha256}|{backend_version}".encode('utf-8')
+        ).hexdigest()[:32]
+        return LayerKey(key, os_id, source_sha256, update_set_sha256, backend_version, compatible)
+
+    def exists(self, key: str) -> bool:
+        """Whether a layer is cached (without counting a hit)."""
+        with sqlite3.connect(self.state_db) as conn:
+            row = conn.execute('SELECT layer_file FROM serviced_layers WHERE key = ?', (key,)).fetchone()
+        return row is not None and Path(row[0]).exists()
+
+    def get(self, key: str) -> Optional[ServicedLayer]:
+        """Get an intact layer and mark it in use (see ``release``), counting the hit."""
+        self._acquire(key)
+        layer = self._lookup(key)
+        if layer is None:
+            self._release_key(key)
+        return layer
+
+    async def build(self, layer_key: LayerKey, source_wim: Path, backend: ImagingBackend, yunona_path: Path,
+                    staging_cache: Optional[WimStagingCache] = None,
+                    journal: Optional[MountJournal] = None,
+                    workspace: Optional[JobWorkspace] = None) -> ServicedLayer:
+        """Service ``source_wim`` with the layer's updates and store the result.
+
+        The returned layer is marked in use (see ``release``). The build mount
+        is recorded in ``journal`` if given. With a ``workspace`` (of the job
+        or pre-build holding a build slot) the source is copied to and
+        mounted in the workspace, and the mount is journaled under its job id.
+        """
+        key = layer_key.key
+        build_dir = None
+        if workspace is not None:
+            temp_dir, mount_point, owner = workspace.temp_dir, workspace.mount_point, workspace.job_id
+        else:
+            build_dir = self.cache_path / "build" / f"{key}.{uuid.uuid4().hex[:8]}"
+            temp_dir, mount_point, owner = build_dir, build_dir / "mount", f"layer:{key[:12]}"
+        handler = WimHandler(backend=backend, journal=journal, owner=owner)
+        workflow = WimWorkflow(handler, staging_cache)
+        start = time.perf_counter()
+        logger.info(f"Building serviced layer {key} for OS {layer_key.os_id} "
+                    f"({len(layer_key.updates)} updates, {layer_key.backend_version})")
+
+        self._acquire(key)
+        with self._lock:
+            self._building[key] = layer_key.os_id
+        try:
+            work_wim = await workflow.prepare_wim_for_modification(Path(source_wim), temp_dir)
+            await workflow.mount_wim_for_modification(work_wim, mount_point)
+
+            manager = UpdateIntegrationManager(UpdateIntegrator(backend=backend))
+            result = await manager.integrate_updates_for_os(
+                layer_key.updates, mount_point, Path(yunona_path), layer_key.os_id
+            )
+            if not result['success']:
+                raise ServicedLayerError(f"Update integration failed: {result['message']}")
+
+            if not await workflow.wim_handler.unmount_wim(mount_point, commit=True):
+                raise ServicedLayerError("Failed to commit serviced layer")
+
+            # The workspace may be on another volume than the cache
+            layer_file = self.cache_path / f"{key}.wim"
+            await asyncio.to_thread(shutil.move, str(work_wim), str(layer_file))
+            layer = self._store(layer_key, layer_file, result['results'], time.perf_counter() - start)
+        except BaseException:
+            self._release_key(key)
+            self._count('build_failures')
+            raise
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+            await workflow.cleanup_workflow(keep_export=False)
+            if build_dir is not None:
+                shutil.rmtree(build_dir, ignore_errors=True)
+
+        logger.info(f"Serviced layer {key} built in {layer.build_seconds:.1f}s ({layer.size} bytes)")
+        self._evict(keep=key)
+        return layer
+
+    async def get_or_build(self, layer_key: LayerKey, source_wim: Path, backend: ImagingBackend,
+                           yunona_path: Path, staging_cache: Optional[WimStagingCache] = None,
+                           before_build: Optional[Callable[[], Awaitable[Any]]] = None,
+                           journal: Optional[MountJournal] = None,
+                           workspace: Optional[JobWorkspace] = None) -> ServicedLayer:
+        """Get a layer, building it on a miss; concurrent requests for a key build it once.
+
+        ``before_build`` is awaited before a build, e.g. to wait for update
+        downloads. A build runs in ``workspace`` if given (see ``build``).
+        """
+        # asyncio locks belong to one event loop
+        lock_key = (id(asyncio.get_running_loop()), layer_key.key)
+        with self._lock:
+            build_lock = self._build_locks.setdefault(lock_key, asyncio.Lock())
+
+        async with build_lock:
+            layer = self.get(layer_key.key)
+            if layer is not None:
+                return layer
+
+            self._count('misses')
+            if before_build is not None:
+                await before_build()
+            return await self.build(layer_key, source_wim, backend, yunona_path, staging_cache, journal, workspace)
+
+    def release(self, layer: ServicedLayer) -> None:
+        """Mark a layer as no longer in use by a job."""
+        self._release_key(layer.key)
+
+    def list_layers(self, os_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """List cached layers, most recently used first."""
+        query = 'SELECT * FROM serviced_layers'
+        params: tuple = ()
+        if os_id is not None:
+            query += ' WHERE os_id = ?'
+            params = (os_id,)
+
+        with sqlite3.connect(self.state_db) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(query + ' ORDER BY last_used DESC', params).fetchall()
+        return [self._row_to_layer(row).to_dict() for row in rows]
+
+    def invalidate(self, key: Optional[str] = None, os_id: Optional[int] = None) -> int:
+        """Remove one layer, the layers of an OS, or all layers. Returns the number removed."""
+        query = 'SELECT key, layer_file FROM serviced_layers'
+        params: tuple = ()
+        if key is not None:
+            query += ' WHERE key = ?'
+            params = (key,)
+        elif os_id is not None:
+            query += ' WHERE os_id = ?'
+            params = (os_id,)
+
+        removed = 0
+        with sqlite3.connect(self.state_db) as conn:
+            for layer_key, layer_file in conn.execute(query, params).fetchall():
+                # The entry goes even if a job still holds the file open
+                try:
+                    self._unlink(Path(layer_file))
+                except OSError as e:
+                    logger.warning(f"Failed to remove serviced layer {layer_file}: {e}")
+                conn.execute('DELETE FROM serviced_layers WHERE key = ?', (layer_key,))
+                removed += 1
+            conn.execute('UPDATE layer_stats SET invalidations = invalidations + ? WHERE id = 1', (removed,))
+            conn.commit()
+
+        logger.info(f"Invalidated {removed} serviced layer(s)")
+        return removed
+
+    def get_building(self) -> Dict[str, int]:
+        """Layers currently being built (key -> OS id)."""
+        with self._lock:
+            return dict(self._building)
+
+    def get_cache_info(self) -> Dict[str, Any]:
+        """Get cache size and hit statistics."""
+        with sqlite3.connect(self.state_db) as conn:
+            entries, total = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(layer_size), 0) FROM serviced_layers'
+            ).fetchone()
+            hits, misses, builds, build_failures, evictions, invalidations = conn.execute(
+                'SELECT hits, misses, builds, build_failures, evictions, invalidations FROM layer_stats WHERE id = 1'
+            ).fetchone()
+
+        lookups = hits + misses
+        return {
+            'cache_path': str(self.cache_path),
+            'entries': entries,
+            'size_mb': round(total / (1024 * 1024), 1),
+            'max_size_mb': self.max_bytes // (1024 * 1024),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'builds': builds,
+            'build_failures': build_failures,
+            'evictions': evictions,
+            'invalidations': invalidations
+        }
+
+    # Helper methods
+
+    async def _asset_digest(self, asset: AssetInfo) -> str:
+        """Content digest of an asset: recorded, listed in the remote index, declared or computed."""
+        metadata = asset.metadata or {}
+        if metadata.get('sha256'):
+            return metadata['sha256']
+
+        # Remote packages are identified by the digests of their listed files
+        package = metadata.get('remote_package')
+        if package and package.get('files') and all(f.get('sha256') for f in package['files']):
+            package_hash = hashlib.sha256()
+            for entry in sorted(package['files'], key=lambda f: f['path']):
+                package_hash.update(f"{entry['path']}\0{entry['sha256'].lower()}\n".encode('utf-8'))
+            return package_hash.hexdigest()
+
+        if metadata.get('expected_sha256'):
+            return metadata['expected_sha256'].lower()
+
+        if asset.path.is_file():
+            return await self.digest_cache.digest_async(asset.path)
+        if asset.path.is_dir():
+            files = [p for p in asset.path.rglob("*") if p.is_file()]
+            return await self.digest_cache.digest_tree_async(asset.path, files)
+
+        raise ServicedLayerError(f"No content digest available for {asset.name}")
+
+    def _acquire(self, key: str) -> None:
+        with self._lock:
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+
+    def _release_key(self, key: str) -> None:
+        with self._lock:
+            count = self._in_use.get(key, 0) - 1
+            if count > 0:
+                self._in_use[key] = count
+            else:
+                self._in_use.pop(key, None)
+
+    def _count(self, counter: str) -> None:
+        with sqlite3.connect(self.state_db) as conn:
+            conn.execute(f'UPDATE layer_stats SET {counter} = {counter} + 1 WHERE id = 1')
+            conn.commit()
+
+    def _lookup(self, key: str) -> Optional[ServicedLayer]:
+        """Return the layer for ``key`` if present and intact, counting the hit."""
+        with sqlite3.connect(self.state_db) as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute('SELECT * FROM serviced_layers WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+
+            layer_file = Path(row['layer_file'])
+            try:
+                layer_stat = layer_file.stat()
+                intact = (layer_stat.st_size == row['layer_size']
+                          and layer_stat.st_mtime_ns == row['layer_mtime_ns'])
+            except OSError:
+                intact = False
+
+            if not intact:
+                logger.warning(f"Discarding modified or missing serviced layer {layer_file}")
+                conn.execute('DELETE FROM serviced_layers WHERE key = ?', (key,))
+                conn.commit()
+                self._unlink(layer_file)
+                return None
+
+            conn.execute('UPDATE serviced_layers SET hits = hits + 1, last_used = ? WHERE key = ?',
+                         (time.time(), key))
+            conn.execute('UPDATE layer_stats SET hits = hits + 1 WHERE id = 1')
+            conn.commit()
+
+        layer = self._row_to_layer(row)
+        layer.hits += 1
+        layer.cache_hit = True
+        return layer
+
+    def _store(self, layer_key: LayerKey, layer_file: Path, results: List[Any],
+               build_seconds: float) -> ServicedLayer:
+        updates = [
+            {
+                'name': r.update_asset.name,
+                'type': r.update_asset.update_type.value,
+                'success': r.success,
+                'method': r.method,
+                'message': r.message,
+                'duration': r.duration
+            }
+            for r in results
+        ]
+        stat = layer_file.stat()
+        created_at = datetime.now().isoformat()
+
+        with sqlite3.connect(self.state_db) as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO serviced_layers
+                    (key, os_id, layer_file, layer_size, layer_mtime_ns, source_sha256, update_set_sha256,
+                     backend_version, updates_json, build_seconds, hits, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?)
+            ''', (layer_key.key, layer_key.os_id, str(layer_file), stat.st_size, stat.st_mtime_ns,
+                  layer_key.source_sha256, layer_key.update_set_sha256, layer_key.backend_version,
+                  json.dumps(updates), build_seconds, created_at, time.time()))
+            conn.execute('UPDATE layer_stats SET builds = builds + 1 WHERE id = 1')
+            conn.commit()
+
+        return ServicedLayer(
+            layer_key.key, layer_key.os_id, layer_file, layer_key.source_sha256, layer_key.update_set_sha256,
+            layer_key.backend_version, updates, stat.st_size, build_seconds, created_at
+        )
+
+    @staticmethod
+    def _row_to_layer(row: sqlite3.Row) -> ServicedLayer:
+        return ServicedLayer(
+            key=row['key'],
+            os_id=row['os_id'],
+            path=Path(row['layer_file']),
+            source_sha256=row['source_sha256'],
+            update_set_sha256=row['update_set_sha256'],
+            backend_version=row['backend_version'],
+            updates=json.loads(row['updates_json']),
+            size=row['layer_size'],
+            build_seconds=row['build_seconds'],
+            created_at=row['created_at'],
+            hits=row['hits']
+        )
+
+    def _evict(self, keep: str) -> None:
+        """Evict least recently used layers until the cache fits its quota."""
+        with self._lock:
+            in_use = set(self._in_use) | {keep}
+
+        with sqlite3.connect(self.state_db) as conn:
+            total = conn.execute('SELECT COALESCE(SUM(layer_size), 0) FROM serviced_layers').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            rows = conn.execute(
+                'SELECT key, layer_file, layer_size FROM serviced_layers ORDER BY last_used ASC'
+            ).fetchall()
+            for key, layer_file, size in rows:
+                if total <= self.max_bytes:
+                    break
+                if key in in_use:
+                    continue
+                self._unlink(Path(layer_file))
+                conn.execute('DELETE FROM serviced_layers WHERE key = ?', (key,))
+                conn.execute('UPDATE layer_stats SET evictions = evictions + 1 WHERE id = 1')
+                total -= size
+                logger.info(f"Evicted serviced layer {layer_file} ({size} bytes)")
+            conn.commit()
+
+    @staticmethod
+    def _unlink(path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# Global layer cache instances (one per cache path)
+_layer_cache_instances: Dict[str, ServicedLayerCache] = {}
+_layer_cache_lock = threading.Lock()
+
+
+def get_serviced_layer_cache(cache_path: Path = DEFAULT_LAYER_CACHE_PATH, max_size_mb: int = 102400,
+                             digest_cache: Optional[DigestCache] = None) -> ServicedLayerCache:
+    """Get the shared serviced layer cache for a cache directory."""
+    key = str(Path(cache_path).resolve())
+    with _layer_cache_lock:
+        if key not in _layer_cache_instances:
+            _layer_cache_instances[key] = ServicedLayerCache(Path(cache_path), max_size_mb, digest_cache)
+        cache = _layer_cache_instances[key]
+        cache.max_bytes = int(max_size_mb) * 1024 * 1024
+        return cache
@@ -1,9 +1,10 @@
 """
 Update Integration Engine
-Integrates Windows updates into mounted WIM images using DISM and Yunona staging
+Integrates Windows updates into mounted WIM images using the imaging backend and Yunona staging
 """
 
 import asyncio
+import os
 import subprocess
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
@@ -15,16 +16,27 @@ import json
 
 from .asset_providers import UpdateAsset, UpdateType, AssetType
 from .wim_handler import DismError
+from .imaging_backend import ImagingBackend, DismBackend, ProgressCallback
+from .image_inventory import ImageInventory
+from ..utils.tool_output import item_progress
 
 logger = logging.getLogger(__name__)
 
+# The parts of an image that package servicing writes to; the Yunona staging
+# lane copies into Users/Public/Yunona at the same time and is not counted.
+SERVICING_SUBTREES = (
+    Path("Windows/WinSxS"),
+    Path("Windows/servicing"),
+    Path("Windows/System32/DriverStore"),
+)
+
 
 @dataclass
 class UpdateIntegrationResult:
     """Result of update integration operation."""
     update_asset: UpdateAsset
     success: bool
-    method: str  # "DISM", "YUNONA", "SKIPPED"
+    method: str  # Imaging backend method ("DISM", "WIMLIB", ...), "YUNONA", "SKIPPED"
     message: str
     duration: Optional[float] = None
     size_added: Optional[int] = None  # Bytes added to WIM
@@ -33,8 +45,11 @@ class UpdateIntegrationResult:
 class UpdateIntegrator:
     """Update integration engine for WIM images."""
     
-    def __init__(self, dism_path: str = "dism.exe"):
+    def __init__(self, dism_path: str = "dism.exe", backend: Optional[ImagingBackend] = None,
+                 inventory: Optional[ImageInventory] = None):
         self.dism_path = dism_path
+        self.backend = backend or DismBackend(dism_path)
+        self.inventory = inventory  # MSU/CAB updates already in the image are not added again
         self.integration_stats = {
             'total': 0,
             'successful': 0,
@@ -43,29 +58,20 @@ class UpdateIntegrator:
             'cab_via_dism': 0,
             'exe_via_yunona': 0,
             'msi_via_yunona': 0,
+            'already_present': 0,
             'total_size_added': 0
         }
     
     async def integrate_updates(self, updates: List[UpdateAsset], mount_point: Path, 
-                               yunona_path: Path) -> List[UpdateIntegrationResult]:
-        """Integrate all updates into mounted WIM."""
+                               yunona_path: Path,
+                               progress_callback: Optional[ProgressCallback] = None) -> List[UpdateIntegrationResult]:
+        """Integrate all updates into mounted WIM.
+
+        ``progress_callback`` receives the progress across all updates.
+        """
         logger.info(f"Starting integration of {len(updates)} updates")
         
-        if not mount_point.exists():
-            raise DismError(f"Mount point does not exist: {mount_point}")
-        
-        # Verify mount point has Windows directory
-        windows_dir = mount_point / "Windows"
-        if not windows_dir.exists():
-            raise DismError(f"Invalid mount point - no Windows directory: {mount_point}")
-        
-        # Ensure Yunona directory exists in mounted WIM
-        yunona_target = mount_point / "Users" / "Public" / "Yunona"
-        yunona_target.mkdir(parents=True, exist_ok=True)
-        
-        # Ensure Updates directory in Yunona
-        updates_target = yunona_target / "Updates"
-        updates_target.mkdir(parents=True, exist_ok=True)
+        updates_target = self.prepare_mount(mount_point)
         
         results = []
         self.integration_stats['total'] = len(updates)
@@ -73,48 +79,83 @@ class UpdateIntegrator:
         # Sort updates by order for proper installation sequence
         sorted_updates = sorted(updates, key=lambda u: u.order)
         
-        for update in sorted_updates:
-            logger.info(f"Processing update: {update.name} [{update.update_type.value}]")
-            
-            try:
-                result = await self._integrate_single_update(update, mount_point, updates_target)
-                results.append(result)
-                
-                if result.success:
-                    self.integration_stats['successful'] += 1
-                    if result.size_added:
-                        self.integration_stats['total_size_added'] += result.size_added
-                    logger.info(f"Update integration successful: {update.name}")
-                else:
-                    self.integration_stats['failed'] += 1
-                    logger.error(f"Update integration failed: {update.name} - {result.message}")
-                    
-            except Exception as e:
-                error_result = UpdateIntegrationResult(
-                    update_asset=update,
-                    success=False,
-                    method="ERROR",
-                    message=f"Unexpected error: {str(e)}"
-                )
-                results.append(error_result)
-                self.integration_stats['failed'] += 1
-                logger.error(f"Update integration error for {update.name}: {e}")
+        for index, update in enumerate(sorted_updates):
+            progress = item_progress(progress_callback, index, len(sorted_updates), update.name)
+            results.append(await self.integrate_update(update, mount_point, updates_target, progress))
         
         logger.info(f"Update integration completed. Success: {self.integration_stats['successful']}, "
                    f"Failed: {self.integration_stats['failed']}")
         
         return results
     
+    def prepare_mount(self, mount_point: Path) -> Path:
+        """Check the mounted image and create the Yunona Updates directory; return it."""
+        if not mount_point.exists():
+            raise DismError(f"Mount point does not exist: {mount_point}")
+        
+        # Verify mount point has Windows directory
+        windows_dir = mount_point / "Windows"
+        if not windows_dir.exists():
+            raise DismError(f"Invalid mount point - no Windows directory: {mount_point}")
+        
+        # Ensure Updates directory in Yunona
+        updates_target = mount_point / "Users" / "Public" / "Yunona" / "Updates"
+        updates_target.mkdir(parents=True, exist_ok=True)
+        return updates_target
+    
+    async def integrate_update(self, update: UpdateAsset, mount_point: Path, updates_target: Path,
+                               progress: Optional[ProgressCallback] = None) -> UpdateIntegrationResult:
+        """Integrate one update and count the result."""
+        logger.info(f"Processing update: {update.name} [{update.update_type.value}]")
+        
+        try:
+            result = await self._integrate_single_update(update, mount_point, updates_target, progress)
+        except Exception as e:
+            self.integration_stats['failed'] += 1
+            logger.error(f"Update integration error for {update.name}: {e}")
+            return UpdateIntegrationResult(
+                update_asset=update,
+                success=False,
+                method="ERROR",
+                message=f"Unexpected error: {str(e)}"
+            )
+        
+        if result.success:
+            self.integration_stats['successful'] += 1
+            if result.size_added:
+                self.integration_stats['total_size_added'] += result.size_added
+            logger.info(f"Update integration successful: {update.name}")
+        else:
+            self.integration_stats['failed'] += 1
+            logger.error(f"Update integration failed: {update.name} - {result.message}")
+        return result
+    
     async def _integrate_single_update(self, update: UpdateAsset, mount_point: Path, 
-                                     updates_target: Path) -> UpdateIntegrationResult:
+                                     updates_target: Path,
+                                     progress: Optional[ProgressCallback] = None) -> UpdateIntegrationResult:
         """Integrate a single update based on its type."""
+        # Updates already in the image are skipped before anything is measured
+        present = (self.inventory.find_update(update)
+                   if self.inventory and update.update_type in [UpdateType.MSU, UpdateType.CAB] else None)
+        if present:
+            self.integration_stats['already_present'] += 1
+            return UpdateIntegrationResult(
+                update_asset=update,
+                success=True,
+                method="SKIPPED",
+                message=f"Already in the image ({' '.join(filter(None, (present.name, present.version)))})",
+                duration=0.0
+            )
+        
         start_time = datetime.now()
         
-        # Get initial WIM size for size calculation
-        initial_size = self._get_mount_size(mount_point)
+        # Servicing size before the update, measured off the event loop
+        initial_size = None
+        if update.update_type in [UpdateType.MSU, UpdateType.CAB]:
+            initial_size = await asyncio.to_thread(self._get_servicing_size, mount_point)
         
         if update.update_type in [UpdateType.MSU, UpdateType.CAB]:
-            result = await self._integrate_dism_update(update, mount_point)
+            result = await self._integrate_dism_update(update, mount_point, progress)
             if result.success:
                 if update.update_type == UpdateType.MSU:
                     self.integration_stats['msu_via_dism'] += 1
@@ -140,22 +181,24 @@ class UpdateIntegrator:
         duration = (datetime.now() - start_time).total_seconds()
         result.duration = duration
         
-        if result.success and update.update_type in [UpdateType.MSU, UpdateType.CAB]:
-            final_size = self._get_mount_size(mount_point)
+        if result.success and initial_size is not None and result.size_added is None:
+            final_size = await asyncio.to_thread(self._get_servicing_size, mount_point)
             result.size_added = max(0, final_size - initial_size)
         
         return result
     
-    async def _integrate_dism_update(self, update: UpdateAsset, mount_point: Path) -> UpdateIntegrationResult:
-        """Integrate MSU/CAB update using DISM."""
-        logger.info(f"Integrating {update.update_type.value.upper()} update via DISM: {update.name}")
+    async def _integrate_dism_update(self, update: UpdateAsset, mount_point: Path,
+                                     progress: Optional[ProgressCallback] = None) -> UpdateIntegrationResult:
+        """Integrate MSU/CAB update using the imaging backend."""
+        method = self.backend.method
+        logger.info(f"Integrating {update.update_type.value.upper()} update via {method}: {update.name}")
         
         try:
             if not update.path.exists():
                 return UpdateIntegrationResult(
                     update_asset=update,
                     success=False,
-                    method="DISM",
+                    method=method,
                     message=f"Update file not found: {update.path}"
                 )
             
@@ -165,78 +208,54 @@ class UpdateIntegrator:
                 return UpdateIntegrationResult(
                     update_asset=update,
                     success=False,
-                    method="DISM",
+                    method=method,
                     message="Update file is empty"
                 )
             
-            # Build DISM command for update installation
-            cmd = [
-                self.dism_path,
-                f"/Image:{mount_point}",
-                "/Add-Package",
-                f"/PackagePath:{update.path}"
-            ]
-            
-            logger.debug(f"DISM command: {' '.join(cmd)}")
+            result = await self.backend.add_package(mount_point, update.path, progress=progress)
             
-            # Execute DISM command
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+            file_size_mb = file_size / (1024 * 1024)
+            action = "staged for first-boot installation" if result.staged else "installed successfully"
+            return UpdateIntegrationResult(
+                update_asset=update,
+                success=True,
+                method=method,
+                message=f"{update.update_type.value.upper()} update {action} ({file_size_mb:.1f} MB)",
+                # A staged package adds its file, not a servicing delta
+                size_added=file_size if result.staged else None
             )
+                
+        except DismError as e:
+            error_output = str(e).lower()
+            stdout_output = (e.output or "").lower()
             
-            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=600)  # 10 minute timeout
-            
-            # Parse result
-            if process.returncode == 0:
-                file_size_mb = file_size / (1024 * 1024)
+            # Check for common DISM errors
+            if "not applicable" in error_output or "not applicable" in stdout_output:
+                return UpdateIntegrationResult(
+                    update_asset=update,
+                    success=False,
+                    method=method,
+                    message="Update not applicable to this image"
+                )
+            elif "already installed" in error_output or "already installed" in stdout_output:
                 return UpdateIntegrationResult(
                     update_asset=update,
                     success=True,
-                    method="DISM",
-                    message=f"{update.update_type.value.upper()} update installed successfully ({file_size_mb:.1f} MB)"
+                    method=method,
+                    message="Update already installed"
                 )
-            else:
-                error_output = stderr.decode('utf-8', errors='ignore')
-                stdout_output = stdout.decode('utf-8', errors='ignore')
-                
-                # Check for common DISM errors
-                if "not applicable" in error_output.lower() or "not applicable" in stdout_output.lower():
-                    return UpdateIntegrationResult(
-                        update_asset=update,
-                        success=False,
-                        method="DISM",
-                        message="Update not applicable to this image"
-                    )
-                elif "already installed" in error_output.lower() or "already installed" in stdout_output.lower():
-                    return UpdateIntegrationResult(
-                        update_asset=update,
-                        success=True,
-                        method="DISM",
-                        message="Update already installed"
-                    )
-                else:
-                    return UpdateIntegrationResult(
-                        update_asset=update,
-                        success=False,
-                        method="DISM",
-                        message=f"DISM failed with exit code {process.returncode}: {error_output[:200]}"
-                    )
-                
-        except asyncio.TimeoutError:
             return UpdateIntegrationResult(
                 update_asset=update,
                 success=False,
-                method="DISM",
-                message="DISM operation timed out (600 seconds)"
+                method=method,
+                message=f"{method} failed: {str(e)[:200]}"
             )
         except Exception as e:
             return UpdateIntegrationResult(
                 update_asset=update,
                 success=False,
-                method="DISM",
-                message=f"DISM execution failed: {str(e)}"
+                method=method,
+                message=f"{method} execution failed: {str(e)}"
             )
     
     async def _stage_update_to_yunona(self, update: UpdateAsset, updates_target: Path) -> UpdateIntegrationResult:
@@ -404,20 +423,17 @@ class UpdateIntegrator:
         loop = asyncio.get_event_loop()
         await loop.run_in_executor(None, copy_file)
     
-    def _get_mount_size(self, mount_point: Path) -> int:
-        """Get approximate size of mounted directory."""
-        try:
-            total_size = 0
-            for dirpath, dirnames, filenames in os.walk(mount_point):
+    def _get_servicing_size(self, mount_point: Path) -> int:
+        """Get approximate size of the servicing subtrees of the mounted image."""
+        total_size = 0
+        for subtree in SERVICING_SUBTREES:
+            for dirpath, dirnames, filenames in os.walk(mount_point / subtree):
                 for filename in filenames:
-                    filepath = Path(dirpath) / filename
                     try:
-                        total_size += filepath.stat().st_size
-                    except (OSError, FileNotFoundError):
+                        total_size += os.stat(os.path.join(dirpath, filename)).st_size
+                    except OSError:
                         pass
-            return total_size
-        except Exception:
-            return 0
+        return total_size
     
     def get_integration_summary(self) -> Dict[str, int]:
         """Get integration statistics summary."""
@@ -431,7 +447,8 @@ class UpdateIntegrationManager:
         self.integrator = integrator
     
     async def integrate_updates_for_os(self, updates: List[UpdateAsset], mount_point: Path,
-                                     yunona_path: Path, os_id: int) -> Dict:
+                                     yunona_path: Path, os_id: int,
+                                     progress_callback: Optional[ProgressCallback] = None) -> Dict:
         """Integrate updates for specific OS."""
         logger.info(f"Starting update integration for OS {os_id}")
         
@@ -444,12 +461,7 @@ class UpdateIntegrationManager:
             }
         
         # Filter and validate updates
-        compatible_updates = []
-        for update in updates:
-            if self._validate_update_compatibility(update, os_id):
-                compatible_updates.append(update)
-            else:
-                logger.warning(f"Skipping incompatible update: {update.name}")
+        compatible_updates = self.compatible_updates(updates, os_id)
         
         if not compatible_updates:
             return {
@@ -462,21 +474,10 @@ class UpdateIntegrationManager:
         # Execute integration
         try:
             results = await self.integrator.integrate_updates(
-                compatible_updates, mount_point, yunona_path
+                compatible_updates, mount_point, yunona_path, progress_callback
             )
             
-            # Analyze results
-            successful_count = sum(1 for r in results if r.success)
-            failed_count = len(results) - successful_count
-            
-            return {
-                'success': failed_count == 0,
-                'message': f'Integration completed: {successful_count} successful, {failed_count} failed',
-                'results': results,
-                'stats': self.integrator.get_integration_summary(),
-                'successful_count': successful_count,
-                'failed_count': failed_count
-            }
+            return self.summarize_results(results)
             
         except Exception as e:
             logger.error(f"Update integration failed: {e}")
@@ -487,6 +488,30 @@ class UpdateIntegrationManager:
                 'stats': self.integrator.get_integration_summary()
             }
     
+    def compatible_updates(self, updates: List[UpdateAsset], os_id: int) -> List[UpdateAsset]:
+        """Get the updates that support the OS (incompatible ones are skipped)."""
+        compatible_updates = []
+        for update in updates:
+            if self._validate_update_compatibility(update, os_id):
+                compatible_updates.append(update)
+            else:
+                logger.warning(f"Skipping incompatible update: {update.name}")
+        return compatible_updates
+    
+    def summarize_results(self, results: List[UpdateIntegrationResult]) -> Dict:
+        """Build the integration result summary from the per-update results."""
+        successful_count = sum(1 for r in results if r.success)
+        failed_count = len(results) - successful_count
+        
+        return {
+            'success': failed_count == 0,
+            'message': f'Integration completed: {successful_count} successful, {failed_count} failed',
+            'results': results,
+            'stats': self.integrator.get_integration_summary(),
+            'successful_count': successful_count,
+            'failed_count': failed_count
+        }
+    
     def _validate_update_compatibility(self, update: UpdateAsset, os_id: int) -> bool:
         """Validate update compatibility with OS."""
         if not update.supported_os:
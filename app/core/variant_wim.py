@@ -0,0 +1,320 @@
+"""
+Variant WIM Store - Device builds of an OS kept as indexes of one shared WIM
+
+Device builds of the same OS share almost all of their content. In append
+export mode every build is exported into ``os<ID>.wim`` as an image named
+after the device ID instead of into a standalone WIM; the WIM's
+single-instance storage writes only the files that differ, so the shared
+file grows by the per-device delta. Rebuilding a device appends the new
+image first and removes the earlier one only once the export succeeded; the
+data replaced images leave behind is reclaimed once it passes a share of
+the file. A device image is turned back into a standalone WIM with
+``extract``.
+"""
+
+import asyncio
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import logging
+
+from .imaging_backend import ImagingBackend, DismError, ProgressCallback
+from .wim_handler import WimHandler
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_VARIANT_ROOT = Path("runtime/export/variants")
+
+_VARIANT_WIM = re.compile(r"^os(\d+)\.wim$", re.IGNORECASE)
+_REPLACING = ".replacing"  # name suffix of a rebuilt image until the image it replaces is removed
+
+
+class VariantWimError(Exception):
+    """A device image is not in the shared WIM of its OS."""
+    pass
+
+
+@dataclass
+class VariantImage:
+    """The image of one device in the shared WIM of an OS."""
+    os_id: int
+    device_id: str
+    index: int
+    wim_path: Path
+    total_bytes: int = 0
+    modified: Optional[datetime] = None
+    added_bytes: int = 0     # growth of the shared WIM when the image was appended
+    replaced: bool = False   # an earlier image of the device was replaced
+    compacted: bool = False  # the shared WIM was rewritten without unreferenced data afterwards
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'os_id': self.os_id,
+            'device_id': self.device_id,
+            'index': self.index,
+            'wim_path': str(self.wim_path),
+            'total_bytes': self.total_bytes,
+            'modified': self.modified.isoformat() if self.modified else None,
+            'added_bytes': self.added_bytes,
+            'replaced': self.replaced,
+            'compacted': self.compacted
+        }
+
+
+class VariantWimStore:
+    """Shared per-OS WIMs with one image per device.
+
+    Removing a replaced image leaves its data in the file (DISM
+    ``/Delete-Image``, ``wimlib-imagex delete --soft``). The store keeps an
+    estimate of that data per WIM and compacts the WIM once the estimate
+    reaches ``compact_percent`` of the file (0: after every replacement),
+    with ``optimize`` where the backend has it, otherwise by exporting every
+    image into a fresh file that replaces the old one. Backends that cannot
+    rename images get the fresh file on every replacement, which also drops
+    the earlier image.
+    """
+
+    def __init__(self, root: Path, backend: ImagingBackend, compact_percent: int = 25):
+        self.root = Path(root)
+        self.backend = backend
+        self.handler = WimHandler(backend=backend)
+        self.compact_percent = compact_percent
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.state_db = self.root / "variant_state.db"
+        self.init_database()
+
+    def init_database(self):
+        """Initialize the variant state schema."""
+        with sqlite3.connect(self.state_db) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS variant_wims (
+                    os_id INTEGER PRIMARY KEY,
+                    reclaimable_bytes INTEGER NOT NULL DEFAULT 0,
+                    compactions INTEGER NOT NULL DEFAULT 0,
+                    last_compacted REAL
+                )
+            ''')
+            conn.commit()
+
+    def wim_path(self, os_id: int) -> Path:
+        """Path of the shared WIM of an OS."""
+        return self.root / f"os{os_id}.wim"
+
+    async def list_images(self, os_id: Optional[int] = None) -> List[VariantImage]:
+        """List the device images of one OS, or of all OSes."""
+        if os_id is not None:
+            paths = [self.wim_path(os_id)]
+        else:
+            paths = sorted(self.root.glob("os*.wim")) if self.root.exists() else []
+
+        images = []
+        for path in paths:
+            match = _VARIANT_WIM.match(path.name)
+            if match and path.exists():
+                images.extend(await self._read(int(match.group(1)), path))
+        return images
+
+    async def find(self, os_id: int, device_id: str) -> Optional[VariantImage]:
+        """Get the image of a device, if the OS's shared WIM contains one."""
+        return next((image for image in await self.list_images(os_id) if image.device_id == device_id), None)
+
+    async def append(self, source_wim: Path, os_id: int, device_id: str, source_index: int = 1,
+                     compression: str = "max", progress: Optional[ProgressCallback] = None) -> VariantImage:
+        """Append a device build to the shared WIM of its OS, replacing an earlier build of the device.
+
+        The earlier build is removed only after the new one was appended, so a
+        failed export leaves the shared WIM as it was.
+        """
+        path = self.wim_path(os_id)
+        async with self._lock(path):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            images = await self._read(os_id, path) if path.exists() else []
+
+            # The new image of an earlier replacement that did not complete is discarded
+            leftover = next((image for image in images if image.device_id == device_id + _REPLACING), None)
+            if leftover:
+                logger.warning(f"Removing incomplete replacement of {device_id} from {path}")
+                if len(images) == 1:
+                    path.unlink()
+                else:
+                    await self.backend.delete_image(path, leftover.index)
+                images = await self._read(os_id, path) if path.exists() else []
+
+            existing = next((image for image in images if image.device_id == device_id), None)
+            append = path.exists()
+            size_before = path.stat().st_size if append else 0
+            logger.info(f"{'Appending' if append else 'Creating'} {path} index for {device_id}"
+                        f"{' (replacing its earlier image)' if existing else ''}")
+            try:
+                await self.backend.export(source_wim, source_index, path, compression,
+                                          device_id + _REPLACING if existing else device_id,
+                                          progress=progress, append=append)
+            except Exception as e:
+                if not append and path.exists():
+                    path.unlink()
+                raise DismError(f"Appending {device_id} to {path} failed: {e}")
+            added_bytes = path.stat().st_size - size_before
+
+            compacted = False
+            if existing:
+                compacted = await self._replace(os_id, path, existing, added_bytes, compression)
+
+            image = next((i for i in await self._read(os_id, path) if i.device_id == device_id), None)
+            if image is None:
+                raise DismError(f"Image of {device_id} missing from {path} after export")
+            image.added_bytes = added_bytes
+            image.replaced = existing is not None
+            image.compacted = compacted
+
+        logger.info(f"Device {device_id} is index {image.index} of {path} "
+                    f"(+{image.added_bytes / (1024 * 1024):.1f} MB)")
+        return image
+
+    async def extract(self, os_id: int, device_id: str, dest_wim: Path, compression: str = "max",
+                      progress: Optional[ProgressCallback] = None) -> Path:
+        """Export the image of a device into a standalone WIM."""
+        path = self.wim_path(os_id)
+        async with self._lock(path):
+            image = await self.find(os_id, device_id)
+            if image is None:
+                raise VariantWimError(f"No image of device {device_id} in {path}")
+            return await self.handler.export_wim(path, dest_wim, image.index, dest_name=device_id,
+                                                 compression=compression, progress_callback=progress)
+
+    def get_store_info(self) -> Dict[str, Any]:
+        """Shared WIMs, their sizes and the estimated data left behind by replaced images."""
+        with sqlite3.connect(self.state_db) as conn:
+            state = {row[0]: row[1:] for row in conn.execute(
+                'SELECT os_id, reclaimable_bytes, compactions FROM variant_wims'
+            )}
+
+        wims = []
+        for path in (sorted(self.root.glob("os*.wim")) if self.root.exists() else []):
+            match = _VARIANT_WIM.match(path.name)
+            if match:
+                reclaimable, compactions = state.get(int(match.group(1)), (0, 0))
+                wims.append({'os_id': int(match.group(1)), 'path': str(path), 'size': path.stat().st_size,
+                             'reclaimable_bytes': reclaimable, 'compactions': compactions})
+        return {
+            'root': str(self.root),
+            'wims': wims,
+            'total_size_mb': round(sum(wim['size'] for wim in wims) / (1024 * 1024), 2)
+        }
+
+    # Helper methods
+
+    def _lock(self, path: Path) -> asyncio.Lock:
+        # Exports into the same WIM must not overlap
+        return self._locks.setdefault(str(path), asyncio.Lock())
+
+    async def _read(self, os_id: int, path: Path) -> List[VariantImage]:
+        wim_info = await self.handler.get_wim_info(path)
+        return [
+            VariantImage(
+                os_id=os_id,
+                device_id=image.name or f"index{image.index}",
+                index=image.index,
+                wim_path=path,
+                total_bytes=image.total_bytes,
+                modified=image.modified
+            )
+            for image in wim_info.images
+        ]
+
+    async def _replace(self, os_id: int, path: Path, existing: VariantImage, added_bytes: int,
+                       compression: str) -> bool:
+        """Drop the earlier image of a device once its new (last) image is in; return whether compacted.
+
+        The data of the dropped image stays in the file; the new image's delta
+        stands in for it in the reclaimable estimate.
+        """
+        reclaimable = self._add_reclaimable(os_id, added_bytes)
+        new_index = len(await self._read(os_id, path))
+        if not self.backend.renames_images:
+            # The rewrite drops the earlier image and gives the new one the device name
+            await self._compact(os_id, path, compression, skip=existing.index,
+                                names={new_index: existing.device_id})
+            return True
+
+        await self.backend.delete_image(path, existing.index)
+        await self.backend.rename_image(path, new_index - 1, existing.device_id)
+        if reclaimable * 100 < path.stat().st_size * self.compact_percent:
+            return False
+        try:
+            await self._compact(os_id, path, compression)
+            return True
+        except DismError as e:
+            logger.warning(f"Compacting {path} failed, its unreferenced data is kept for now: {e}")
+            return False
+
+    async def _compact(self, os_id: int, path: Path, compression: str, skip: Optional[int] = None,
+                       names: Optional[Dict[int, str]] = None) -> None:
+        """Rewrite a shared WIM without unreferenced data (and without the ``skip`` index)."""
+        size_before = path.stat().st_size
+        if skip is None and not names:
+            try:
+                await self.backend.optimize(path)
+                self._reset_reclaimable(os_id)
+                logger.info(f"Optimized {path}: {size_before} -> {path.stat().st_size} bytes")
+                return
+            except DismError as e:
+                logger.debug(f"Cannot optimize {path}, exporting its images instead: {e}")
+
+        part = path.with_name(f"{path.stem}.{uuid.uuid4().hex[:8]}.part.wim")
+        try:
+            images = [image for image in await self._read(os_id, path) if image.index != skip]
+            for position, image in enumerate(images):
+                await self.backend.export(path, image.index, part, compression,
+                                          (names or {}).get(image.index, image.device_id), append=position > 0)
+            part.replace(path)
+        except BaseException:
+            if part.exists():
+                part.unlink()
+            raise
+        self._reset_reclaimable(os_id)
+        logger.info(f"Rewrote {path} with {len(images)} images: {size_before} -> {path.stat().st_size} bytes")
+
+    def _add_reclaimable(self, os_id: int, count: int) -> int:
+        with sqlite3.connect(self.state_db) as conn:
+            conn.execute('INSERT OR IGNORE INTO variant_wims (os_id) VALUES (?)', (os_id,))
+            conn.execute('UPDATE variant_wims SET reclaimable_bytes = reclaimable_bytes + ? WHERE os_id = ?',
+                         (max(0, count), os_id))
+            conn.commit()
+            return conn.execute('SELECT reclaimable_bytes FROM variant_wims WHERE os_id = ?', (os_id,)).fetchone()[0]
+
+    def _reset_reclaimable(self, os_id: int) -> None:
+        with sqlite3.connect(self.state_db) as conn:
+            conn.execute('INSERT OR IGNORE INTO variant_wims (os_id) VALUES (?)', (os_id,))
+            conn.execute('''
+                UPDATE variant_wims SET reclaimable_bytes = 0, compactions = compactions + 1, last_compacted = ?
+                WHERE os_id = ?
+            ''', (time.time(), os_id))
+            conn.commit()
+
+
+# Global variant WIM stores (one per root directory)
+_variant_store_instances: Dict[str, VariantWimStore] = {}
+_variant_store_lock = threading.Lock()
+
+
+def get_variant_store(root: Path = DEFAULT_VARIANT_ROOT, backend: Optional[ImagingBackend] = None,
+                      compact_percent: Optional[int] = None) -> VariantWimStore:
+    """Get the shared variant WIM store for a root directory."""
+    key = str(Path(root).resolve())
+    with _variant_store_lock:
+        if key not in _variant_store_instances:
+            if backend is None:
+                raise ValueError("An imaging backend is required to create a variant WIM store")
+            _variant_store_instances[key] = VariantWimStore(Path(root), backend)
+        store = _variant_store_instances[key]
+        if compact_percent is not None:
+            store.compact_percent = compact_percent
+        return store
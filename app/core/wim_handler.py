@@ -1,17 +1,27 @@
 """
-WIM Handler - DISM Integration for Windows Image Management
+WIM Handler - Windows Image Management on top of a pluggable imaging backend
 """
 
-import subprocess
 import asyncio
 import shutil
 from pathlib import Path
-from typing import Optional, Dict, Any, List
-from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Callable, Sequence, Tuple
+from dataclasses import dataclass, field
 from datetime import datetime
 import logging
 import os
 import tempfile
+import time
+
+from .wim_reader import WimReader, WimReadError, WimImageInfo
+from .imaging_backend import ImagingBackend, DismBackend, DismError, ProgressCallback
+from ..utils.file_copy import copy_file, CopyProgress, CopyResult
+from .wim_staging import WimStagingCache
+from .mount_journal import MountJournal, MOUNTED, COMMITTING, DISCARDING
+from ..models.config import FinalizeStrategy
+
+if TYPE_CHECKING:
+    from .variant_wim import VariantWimStore, VariantImage
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +36,24 @@ class WimInfo:
     architecture: Optional[str] = None
     size: Optional[int] = None
     image_count: int = 1
+    build: Optional[str] = None
+    edition: Optional[str] = None
+    compression: Optional[str] = None
+    images: List[WimImageInfo] = field(default_factory=list)
+    
+    @classmethod
+    def from_images(cls, path: Path, images: List[WimImageInfo], index: int = 1, **kwargs) -> "WimInfo":
+        """Build WIM info describing one index of a multi-image WIM."""
+        selected = next((i for i in images if i.index == index), images[0] if images else None)
+        info = cls(path=path, image_count=max(len(images), 1), images=images, **kwargs)
+        if selected:
+            info.index = selected.index
+            info.name = selected.name
+            info.description = selected.description
+            info.architecture = selected.architecture
+            info.build = selected.build
+            info.edition = selected.edition
+        return info
 
 
 @dataclass
@@ -39,55 +67,124 @@ class MountInfo:
     read_write: bool = True
 
 
-class DismError(Exception):
-    """DISM operation error."""
-    def __init__(self, message: str, exit_code: int = None, output: str = None):
-        super().__init__(message)
-        self.exit_code = exit_code
-        self.output = output
+# Operations reported while finalizing, in the order the strategies run them
+FINALIZE_OPERATIONS = ("capture", "unmount", "optimize", "export", "split")
+
+# DISM /Compress values -> WIM header compression
+_HEADER_COMPRESSION = {'none': "none", 'fast': "xpress", 'max': "lzx", 'maximum': "lzx", 'recovery': "lzms"}
+
+
+@dataclass
+class FinalizeResult:
+    """How the final WIM of a job was written."""
+    strategy: str
+    reason: str
+    compression: str
+    seconds: float = 0.0
+    steps: Dict[str, float] = field(default_factory=dict)  # wall time per operation
+    size: int = 0    # bytes written (all parts of a split image)
+    parts: int = 1
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'strategy': self.strategy,
+            'reason': self.reason,
+            'compression': self.compression,
+            'seconds': round(self.seconds, 3),
+            'steps': {step: round(seconds, 3) for step, seconds in self.steps.items()},
+            'size': self.size,
+            'parts': self.parts
+        }
+
+
+def swm_parts(swm_path: Path) -> List[Path]:
+    """The parts of a split image, first part first (``install.swm``, ``install2.swm``, ...)."""
+    parts = [swm_path] if swm_path.exists() else []
+    number = 2
+    while True:
+        part = swm_path.with_name(f"{swm_path.stem}{number}{swm_path.suffix}")
+        if not part.exists():
+            return parts
+        parts.append(part)
+        number += 1
+
+
+def select_finalize_strategy(requested: str, supported: Sequence[str], compression: str = "max",
+                             image_count: int = 1) -> Tuple[str, str]:
+    """Choose how a mounted image becomes the final WIM; returns the strategy and why.
+    
+    - ``capture``: the mounted tree is compressed once into the destination
+      and the mount is discarded (no commit into the temp WIM)
+    - ``commit``: the changes are committed into the temp WIM, which is
+      optimized in place and moved to the destination
+    - ``export``: commit, then export (and recompress) into a new file
+    
+    ``auto`` never captures: a capture writes a new image from the loose
+    files and loses the source image's description, flags and display name.
+    """
+    requested = FinalizeStrategy(requested)
+    recovery = compression.lower() == "recovery"
+    
+    if requested != FinalizeStrategy.AUTO:
+        if requested.value not in supported:
+            return FinalizeStrategy.EXPORT.value, f"{requested.value} is not supported by the imaging backend"
+        if requested == FinalizeStrategy.CAPTURE and recovery:
+            return FinalizeStrategy.EXPORT.value, "recovery compression is only available for exports"
+        if requested == FinalizeStrategy.COMMIT and image_count > 1:
+            return FinalizeStrategy.EXPORT.value, f"the temp WIM holds {image_count} images"
+        return requested.value, "configured"
+    
+    if recovery:
+        return FinalizeStrategy.EXPORT.value, "recovery compression is only available for exports"
+    if FinalizeStrategy.COMMIT.value in supported and image_count == 1:
+        return FinalizeStrategy.COMMIT.value, "the single-image temp WIM is finalized in place"
+    return FinalizeStrategy.EXPORT.value, "the imaging backend cannot finalize in a single pass"
 
 
 class WimHandler:
-    """Windows Image Management with DISM integration."""
+    """Windows Image Management through an imaging backend (DISM by default)."""
     
-    def __init__(self, dism_path: str = "dism.exe"):
+    def __init__(self, dism_path: str = "dism.exe", backend: Optional[ImagingBackend] = None,
+                 journal: Optional[MountJournal] = None, owner: str = "kassia"):
         self.dism_path = dism_path
+        self.backend = backend or DismBackend(dism_path)
         self.mounted_images: Dict[str, MountInfo] = {}
-        self._validate_dism()
+        self.last_copy: Optional[CopyResult] = None
+        self.journal = journal  # Persists mounts so they can be recovered after a crash
+        self.owner = owner
     
-    def _validate_dism(self) -> None:
-        """Validate DISM availability."""
-        try:
-            result = subprocess.run(
-                [self.dism_path, "/?"],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            if result.returncode != 0:
-                raise DismError(f"DISM validation failed with exit code {result.returncode}")
-            
-            logger.info("DISM validation successful")
-        except FileNotFoundError:
-            raise DismError(f"DISM not found at: {self.dism_path}")
-        except Exception as e:
-            raise DismError(f"DISM validation error: {str(e)}")
+    def validate(self) -> None:
+        """Validate that the imaging backend is available (raises DismError)."""
+        self.backend.validate()
     
-    async def get_wim_info(self, wim_path: Path) -> WimInfo:
-        """Get WIM file information using DISM."""
+    async def get_wim_info(self, wim_path: Path, index: int = 1) -> WimInfo:
+        """Get WIM file information.
+        
+        The WIM header and XML metadata are read natively; the imaging backend
+        is only used as a fallback for files the native reader cannot decode.
+        """
         logger.info(f"Getting WIM info for: {wim_path}")
         
         if not wim_path.exists():
             raise DismError(f"WIM file not found: {wim_path}")
         
         try:
-            # Run DISM to get WIM info
-            cmd = [self.dism_path, "/Get-WimInfo", f"/WimFile:{wim_path}"]
-            
-            result = await self._run_dism_async(cmd)
-            
-            # Parse DISM output
-            wim_info = self._parse_wim_info(result.stdout, wim_path)
+            loop = asyncio.get_running_loop()
+            file_info = await loop.run_in_executor(None, WimReader(wim_path).read)
+            wim_info = WimInfo.from_images(
+                wim_path, file_info.images, index,
+                size=file_info.file_size,
+                compression=file_info.header.compression
+            )
+            logger.info(f"WIM info read natively: {wim_info.name}, Index: {wim_info.index} "
+                        f"of {wim_info.image_count}")
+            return wim_info
+        except WimReadError as e:
+            logger.warning(f"Native WIM read failed, falling back to {self.backend.name}: {e}")
+        
+        try:
+            images = await self.backend.get_info(wim_path)
+            wim_info = WimInfo.from_images(wim_path, images, index, size=wim_path.stat().st_size)
             
             logger.info(f"WIM info retrieved: {wim_info.name}, Index: {wim_info.index}")
             return wim_info
@@ -95,8 +192,15 @@ class WimHandler:
         except Exception as e:
             raise DismError(f"Failed to get WIM info: {str(e)}")
     
-    async def copy_wim_to_temp(self, source_wim: Path, temp_dir: Path) -> Path:
-        """Copy WIM file to temporary location with progress."""
+    async def copy_wim_to_temp(self, source_wim: Path, temp_dir: Path, expected_sha256: Optional[str] = None,
+                               progress_callback: Optional[Callable[[CopyProgress], None]] = None) -> Path:
+        """Copy WIM file to temporary location with progress.
+        
+        Uses a reflink clone or in-kernel copy where available. With
+        ``expected_sha256`` the data is hashed while it is copied and checked
+        against the digest (not needed for a reflink clone, which shares the
+        source extents). ``progress_callback`` is called on the event loop.
+        """
         logger.info(f"Copying WIM to temporary location...")
         
         if not source_wim.exists():
@@ -114,8 +218,12 @@ class WimHandler:
             
             logger.info(f"Copying {source_size_mb:.1f} MB from {source_wim} to {temp_wim}")
             
-            # Copy with chunked reading for large files
-            await self._copy_file_async(source_wim, temp_wim)
+            result = await self._copy_file_async(
+                source_wim, temp_wim,
+                hash_algorithm="sha256" if expected_sha256 else None,
+                progress_callback=progress_callback
+            )
+            self.last_copy = result
             
             # Verify copy
             if not temp_wim.exists():
@@ -125,7 +233,11 @@ class WimHandler:
             if temp_size != source_size:
                 raise DismError(f"WIM copy failed - size mismatch: {temp_size} != {source_size}")
             
-            logger.info(f"WIM copied successfully to: {temp_wim}")
+            if result.digest and result.digest != expected_sha256.lower():
+                raise DismError(f"WIM copy failed - SHA-256 mismatch: {result.digest} != {expected_sha256}")
+            
+            logger.info(f"WIM copied successfully to: {temp_wim} ({result.method}, "
+                        f"{result.bytes_per_second / (1024 * 1024):.1f} MB/s)")
             return temp_wim
             
         except Exception as e:
@@ -134,8 +246,9 @@ class WimHandler:
                 temp_wim.unlink()
             raise DismError(f"WIM copy failed: {str(e)}")
     
-    async def mount_wim(self, wim_path: Path, mount_point: Path, index: int = 1, read_write: bool = True) -> MountInfo:
-        """Mount WIM image using DISM."""
+    async def mount_wim(self, wim_path: Path, mount_point: Path, index: int = 1, read_write: bool = True,
+                        progress_callback: Optional[ProgressCallback] = None) -> MountInfo:
+        """Mount WIM image; ``progress_callback`` receives the tool's progress."""
         logger.info(f"Mounting WIM: {wim_path} at {mount_point}")
         
         if not wim_path.exists():
@@ -152,25 +265,12 @@ class WimHandler:
                 logger.warning(f"Mount point already in use: {mount_point}")
                 return existing_mount
         
+        if self.journal:
+            self.journal.record(mount_point, wim_path, index, read_write, self.owner, self.backend.name)
+        
         try:
-            # Build DISM command
-            cmd = [
-                self.dism_path,
-                "/Mount-Wim",
-                f"/WimFile:{wim_path}",
-                f"/Index:{index}",
-                f"/MountDir:{mount_point}"
-            ]
-            
-            if read_write:
-                # No additional flag needed for read-write (default)
-                pass
-            else:
-                cmd.append("/ReadOnly")
-            
-            # Execute mount command
-            logger.info("Executing DISM mount command...")
-            result = await self._run_dism_async(cmd, timeout=300)  # 5 minute timeout
+            logger.info(f"Executing {self.backend.name} mount...")
+            await self.backend.mount(wim_path, mount_point, index, read_write, progress=progress_callback)
             
             # Verify mount
             if not self._verify_mount(mount_point):
@@ -188,6 +288,8 @@ class WimHandler:
             
             # Store mount info
             self.mounted_images[mount_key] = mount_info
+            if self.journal:
+                self.journal.update(mount_point, state=MOUNTED)
             
             logger.info(f"WIM mounted successfully at: {mount_point}")
             return mount_info
@@ -195,10 +297,13 @@ class WimHandler:
         except Exception as e:
             # Cleanup on failure
             await self._cleanup_failed_mount(mount_point)
+            if self.journal:
+                self.journal.remove(mount_point)
             raise DismError(f"WIM mount failed: {str(e)}")
     
-    async def unmount_wim(self, mount_point: Path, commit: bool = True, discard: bool = False) -> bool:
-        """Unmount WIM image using DISM."""
+    async def unmount_wim(self, mount_point: Path, commit: bool = True, discard: bool = False,
+                          progress_callback: Optional[ProgressCallback] = None) -> bool:
+        """Unmount WIM image."""
         logger.info(f"Unmounting WIM: {mount_point} (commit={commit}, discard={discard})")
         
         mount_key = str(mount_point)
@@ -208,22 +313,13 @@ class WimHandler:
             logger.warning(f"No mounted image found at: {mount_point}")
             return True
         
+        commit = commit and not discard
+        if self.journal:
+            self.journal.update(mount_point, state=COMMITTING if commit else DISCARDING)
+        
         try:
-            # Build DISM command
-            cmd = [
-                self.dism_path,
-                "/Unmount-Wim",
-                f"/MountDir:{mount_point}"
-            ]
-            
-            if commit and not discard:
-                cmd.append("/Commit")
-            elif discard:
-                cmd.append("/Discard")
-            
-            # Execute unmount command
-            logger.info("Executing DISM unmount command...")
-            result = await self._run_dism_async(cmd, timeout=600)  # 10 minute timeout
+            logger.info(f"Executing {self.backend.name} unmount...")
+            await self.backend.unmount(mount_point, commit=commit, progress=progress_callback)
             
             # Update mount info
             mount_info.is_mounted = False
@@ -231,6 +327,8 @@ class WimHandler:
             # Remove from tracking
             if mount_key in self.mounted_images:
                 del self.mounted_images[mount_key]
+            if self.journal:
+                self.journal.remove(mount_point)
             
             logger.info(f"WIM unmounted successfully: {mount_point}")
             return True
@@ -242,8 +340,9 @@ class WimHandler:
             return False
     
     async def export_wim(self, source_wim: Path, dest_wim: Path, source_index: int = 1, 
-                        dest_name: str = None, compression: str = "max") -> Path:
-        """Export WIM image using DISM."""
+                        dest_name: str = None, compression: str = "max",
+                        progress_callback: Optional[ProgressCallback] = None) -> Path:
+        """Export WIM image."""
         logger.info(f"Exporting WIM: {source_wim} -> {dest_wim}")
         
         if not source_wim.exists():
@@ -253,22 +352,9 @@ class WimHandler:
         dest_wim.parent.mkdir(parents=True, exist_ok=True)
         
         try:
-            # Build DISM command
-            cmd = [
-                self.dism_path,
-                "/Export-Image",
-                f"/SourceImageFile:{source_wim}",
-                f"/SourceIndex:{source_index}",
-                f"/DestinationImageFile:{dest_wim}",
-                f"/Compress:{compression}"
-            ]
-            
-            if dest_name:
-                cmd.append(f"/DestinationName:{dest_name}")
-            
-            # Execute export command
-            logger.info("Executing DISM export command...")
-            result = await self._run_dism_async(cmd, timeout=1800)  # 30 minute timeout
+            logger.info(f"Executing {self.backend.name} export...")
+            await self.backend.export(source_wim, source_index, dest_wim, compression, dest_name,
+                                      progress=progress_callback)
             
             # Verify export
             if not dest_wim.exists():
@@ -287,6 +373,59 @@ class WimHandler:
                 dest_wim.unlink()
             raise DismError(f"WIM export failed: {str(e)}")
     
+    async def capture_wim(self, mount_point: Path, dest_wim: Path, name: str, compression: str = "max",
+                          progress_callback: Optional[ProgressCallback] = None) -> Path:
+        """Capture a mounted image into a new WIM file."""
+        logger.info(f"Capturing mounted image: {mount_point} -> {dest_wim}")
+        
+        dest_wim.parent.mkdir(parents=True, exist_ok=True)
+        
+        try:
+            await self.backend.capture(mount_point, dest_wim, name, compression, progress=progress_callback)
+            if not dest_wim.exists():
+                raise DismError("Capture failed - destination file not created")
+            
+            logger.info(f"WIM captured successfully: {dest_wim} ({dest_wim.stat().st_size / (1024 * 1024):.1f} MB)")
+            return dest_wim
+            
+        except Exception as e:
+            if dest_wim.exists():
+                dest_wim.unlink()
+            raise DismError(f"WIM capture failed: {str(e)}")
+    
+    async def optimize_wim(self, wim_path: Path, compression: Optional[str] = None,
+                           progress_callback: Optional[ProgressCallback] = None) -> Path:
+        """Rebuild a WIM in place, optionally recompressing it."""
+        logger.info(f"Optimizing WIM: {wim_path} (recompress={compression or 'no'})")
+        
+        try:
+            await self.backend.optimize(wim_path, compression, progress=progress_callback)
+            logger.info(f"WIM optimized: {wim_path} ({wim_path.stat().st_size / (1024 * 1024):.1f} MB)")
+            return wim_path
+        except Exception as e:
+            raise DismError(f"WIM optimize failed: {str(e)}")
+    
+    async def split_wim(self, wim_path: Path, swm_path: Path, size_mb: int,
+                        progress_callback: Optional[ProgressCallback] = None) -> List[Path]:
+        """Split a WIM into .swm parts of at most ``size_mb``; returns the parts."""
+        logger.info(f"Splitting WIM: {wim_path} -> {swm_path} ({size_mb} MB parts)")
+        
+        swm_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        try:
+            await self.backend.split(wim_path, swm_path, size_mb, progress=progress_callback)
+            parts = swm_parts(swm_path)
+            if not parts:
+                raise DismError("Split failed - no .swm parts created")
+            
+            logger.info(f"WIM split into {len(parts)} parts")
+            return parts
+            
+        except Exception as e:
+            for part in swm_parts(swm_path):
+                part.unlink()
+            raise DismError(f"WIM split failed: {str(e)}")
+    
     async def cleanup_all_mounts(self, force: bool = False) -> List[str]:
         """Cleanup all mounted images."""
         logger.info("Cleaning up all mounted images...")
@@ -313,80 +452,17 @@ class WimHandler:
     
     # Helper methods
     
-    async def _run_dism_async(self, cmd: List[str], timeout: int = 300) -> subprocess.CompletedProcess:
-        """Run DISM command asynchronously with timeout."""
-        logger.debug(f"Running DISM command: {' '.join(cmd)}")
+    async def _copy_file_async(self, source: Path, dest: Path, hash_algorithm: Optional[str] = None,
+                               progress_callback: Optional[Callable[[CopyProgress], None]] = None) -> CopyResult:
+        """Copy file in a worker thread, delivering progress on the event loop."""
+        loop = asyncio.get_running_loop()
         
-        try:
-            # Run command
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
-            
-            # Create result object
-            result = subprocess.CompletedProcess(
-                args=cmd,
-                returncode=process.returncode,
-                stdout=stdout.decode('utf-8', errors='ignore'),
-                stderr=stderr.decode('utf-8', errors='ignore')
-            )
-            
-            if result.returncode != 0:
-                error_msg = f"DISM command failed with exit code {result.returncode}"
-                if result.stderr:
-                    error_msg += f"\nError: {result.stderr}"
-                raise DismError(error_msg, result.returncode, result.stdout)
-            
-            return result
-            
-        except asyncio.TimeoutError:
-            raise DismError(f"DISM command timed out after {timeout} seconds")
-        except Exception as e:
-            raise DismError(f"DISM command execution failed: {str(e)}")
-    
-    async def _copy_file_async(self, source: Path, dest: Path, chunk_size: int = 1024*1024) -> None:
-        """Copy file asynchronously with chunked reading."""
-        def copy_chunks():
-            with open(source, 'rb') as src, open(dest, 'wb') as dst:
-                while True:
-                    chunk = src.read(chunk_size)
-                    if not chunk:
-                        break
-                    dst.write(chunk)
-        
-        # Run in thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, copy_chunks)
-    
-    def _parse_wim_info(self, dism_output: str, wim_path: Path) -> WimInfo:
-        """Parse DISM WIM info output."""
-        lines = dism_output.split('\n')
-        
-        wim_info = WimInfo(path=wim_path)
-        
-        for line in lines:
-            line = line.strip()
-            if 'Index :' in line:
-                try:
-                    wim_info.index = int(line.split(':')[1].strip())
-                except:
-                    pass
-            elif 'Name :' in line:
-                wim_info.name = line.split(':', 1)[1].strip()
-            elif 'Description :' in line:
-                wim_info.description = line.split(':', 1)[1].strip()
-            elif 'Architecture :' in line:
-                wim_info.architecture = line.split(':', 1)[1].strip()
-        
-        # Get file size
-        if wim_path.exists():
-            wim_info.size = wim_path.stat().st_size
-        
-        return wim_info
+        def report(progress: CopyProgress) -> None:
+            loop.call_soon_threadsafe(progress_callback, progress)
+        
+        return await asyncio.to_thread(
+            copy_file, source, dest, hash_algorithm, report if progress_callback else None
+        )
     
     def _verify_mount(self, mount_point: Path) -> bool:
         """Verify that WIM is properly mounted."""
@@ -398,17 +474,15 @@ class WimHandler:
         """Cleanup failed mount attempt."""
         try:
             # Try to unmount with discard
-            cmd = [self.dism_path, "/Unmount-Wim", f"/MountDir:{mount_point}", "/Discard"]
-            await self._run_dism_async(cmd, timeout=60)
+            await self.backend.cleanup(mount_point)
         except:
             pass  # Ignore errors during cleanup
     
     async def _force_cleanup_mount(self, mount_point: Path) -> None:
         """Force cleanup of mount point."""
         try:
-            # Try cleanup-wim command
-            cmd = [self.dism_path, "/Cleanup-Wim"]
-            await self._run_dism_async(cmd, timeout=60)
+            # Clean up stale mounts
+            await self.backend.cleanup()
         except:
             pass  # Ignore errors during cleanup
 
@@ -416,15 +490,20 @@ class WimHandler:
 class WimWorkflow:
     """High-level WIM workflow management."""
     
-    def __init__(self, wim_handler: WimHandler):
+    def __init__(self, wim_handler: WimHandler, staging_cache: Optional[WimStagingCache] = None):
         self.wim_handler = wim_handler
+        self.staging_cache = staging_cache
         self.workflow_state = {
             'temp_wim': None,
+            'staged': None,
             'mount_info': None,
-            'export_path': None
+            'export_path': None,
+            'finalize': None
         }
     
-    async def prepare_wim_for_modification(self, source_wim: Path, temp_dir: Path) -> Path:
+    async def prepare_wim_for_modification(self, source_wim: Path, temp_dir: Path,
+                                           expected_sha256: Optional[str] = None,
+                                           progress_callback: Optional[Callable[[CopyProgress], None]] = None) -> Path:
         """Prepare WIM for modification by copying to temp location."""
         logger.info("Step 1: Preparing WIM for modification...")
         
@@ -432,43 +511,169 @@ class WimWorkflow:
         wim_info = await self.wim_handler.get_wim_info(source_wim)
         logger.info(f"Source WIM info: {wim_info.name} ({wim_info.architecture})")
         
-        # Copy to temp location
-        temp_wim = await self.wim_handler.copy_wim_to_temp(source_wim, temp_dir)
+        # Clone from the staging cache, or copy to temp location
+        if self.staging_cache:
+            staged = await self.staging_cache.stage(
+                source_wim, temp_dir, expected_sha256=expected_sha256, progress_callback=progress_callback
+            )
+            self.workflow_state['staged'] = staged
+            self.wim_handler.last_copy = staged.copy
+            temp_wim = staged.path
+        else:
+            temp_wim = await self.wim_handler.copy_wim_to_temp(
+                source_wim, temp_dir, expected_sha256=expected_sha256, progress_callback=progress_callback
+            )
         self.workflow_state['temp_wim'] = temp_wim
         
         return temp_wim
     
-    async def mount_wim_for_modification(self, wim_path: Path, mount_point: Path) -> MountInfo:
+    async def mount_wim_for_modification(self, wim_path: Path, mount_point: Path,
+                                         progress_callback: Optional[ProgressCallback] = None) -> MountInfo:
         """Mount WIM for modification."""
         logger.info("Step 2: Mounting WIM for modification...")
         
-        mount_info = await self.wim_handler.mount_wim(wim_path, mount_point, read_write=True)
+        mount_info = await self.wim_handler.mount_wim(
+            wim_path, mount_point, read_write=True, progress_callback=progress_callback
+        )
         self.workflow_state['mount_info'] = mount_info
         
         return mount_info
     
     async def finalize_and_export_wim(self, mount_point: Path, export_path: Path, 
-                                     export_name: str = None) -> Path:
-        """Finalize modifications and export WIM."""
+                                     export_name: str = None,
+                                     progress_callback: Optional[ProgressCallback] = None,
+                                     strategy: str = FinalizeStrategy.AUTO.value,
+                                     compression: str = "max",
+                                     split_size_mb: Optional[int] = None) -> Path:
+        """Finalize modifications and export WIM.
+
+        ``strategy`` selects how the final WIM is written (see
+        ``select_finalize_strategy``); the chosen strategy and its timings are
+        available from ``get_finalize_info``. With ``split_size_mb`` the WIM
+        is split into .swm parts next to ``export_path`` and the first part is
+        returned. ``progress_callback`` receives the progress of the
+        operations in ``FINALIZE_OPERATIONS`` order.
+        """
         logger.info("Step 3: Finalizing and exporting WIM...")
+        start = time.perf_counter()
         
-        # Unmount with commit
-        success = await self.wim_handler.unmount_wim(mount_point, commit=True)
-        if not success:
-            raise DismError("Failed to unmount WIM with changes")
-        
-        # Export final WIM
         temp_wim = self.workflow_state['temp_wim']
         if not temp_wim:
             raise DismError("No temporary WIM found for export")
         
-        final_wim = await self.wim_handler.export_wim(
-            temp_wim, export_path, dest_name=export_name
+        split_target = None
+        if split_size_mb:
+            split_target, export_path = export_path.with_suffix(".swm"), export_path.with_suffix(".wim")
+        
+        backend = self.wim_handler.backend
+        temp_info = None
+        if (FinalizeStrategy.COMMIT.value in backend.finalize_strategies
+                and strategy in (FinalizeStrategy.AUTO.value, FinalizeStrategy.COMMIT.value)):
+            temp_info = await self.wim_handler.get_wim_info(temp_wim)
+        chosen, reason = select_finalize_strategy(
+            strategy, backend.finalize_strategies, compression, temp_info.image_count if temp_info else 1
         )
+        result = FinalizeResult(chosen, reason, compression)
+        self.workflow_state['finalize'] = result
+        logger.info(f"Finalize strategy: {chosen} ({reason})")
         
+        async def timed(step: str, operation):
+            step_start = time.perf_counter()
+            try:
+                return await operation
+            finally:
+                result.steps[step] = time.perf_counter() - step_start
+        
+        if chosen == FinalizeStrategy.CAPTURE.value:
+            # The mounted tree is compressed straight into the destination; nothing is committed
+            final_wim = await timed("capture", self.wim_handler.capture_wim(
+                mount_point, export_path, export_name or export_path.stem, compression, progress_callback
+            ))
+            if not await timed("unmount", self.wim_handler.unmount_wim(
+                    mount_point, commit=False, progress_callback=progress_callback)):
+                logger.warning(f"Failed to discard {mount_point} after capture")
+        else:
+            # Unmount with commit
+            success = await timed("unmount", self.wim_handler.unmount_wim(
+                mount_point, commit=True, progress_callback=progress_callback
+            ))
+            if not success:
+                raise DismError("Failed to unmount WIM with changes")
+            
+            if chosen == FinalizeStrategy.COMMIT.value:
+                # Rebuild the committed temp WIM in place and move it to the destination
+                recompress = _HEADER_COMPRESSION.get(compression.lower()) != temp_info.compression
+                await timed("optimize", self.wim_handler.optimize_wim(
+                    temp_wim, compression if recompress else None, progress_callback
+                ))
+                export_path.parent.mkdir(parents=True, exist_ok=True)
+                final_wim = Path(await timed("move", asyncio.to_thread(shutil.move, str(temp_wim), str(export_path))))
+            else:
+                # Export final WIM
+                final_wim = await timed("export", self.wim_handler.export_wim(
+                    temp_wim, export_path, dest_name=export_name, compression=compression,
+                    progress_callback=progress_callback
+                ))
+        
+        parts = [final_wim]
+        if split_target:
+            # Split for media with a file size limit (FAT32); the unsplit WIM is removed
+            parts = await timed("split", self.wim_handler.split_wim(
+                final_wim, split_target, split_size_mb, progress_callback
+            ))
+            final_wim.unlink()
+            final_wim = parts[0]
+        
+        result.seconds = time.perf_counter() - start
+        result.size = sum(part.stat().st_size for part in parts)
+        result.parts = len(parts)
+        logger.info(f"WIM finalized with {chosen} strategy in {result.seconds:.1f}s")
         self.workflow_state['export_path'] = final_wim
         return final_wim
     
+    async def finalize_and_append_wim(self, mount_point: Path, variant_store: "VariantWimStore", os_id: int,
+                                      device_id: str,
+                                      progress_callback: Optional[ProgressCallback] = None,
+                                      compression: str = "max") -> "VariantImage":
+        """Finalize modifications and append the image to the shared WIM of the OS.
+
+        ``compression`` only applies when the shared WIM is created. The
+        shared WIM is not an export of this workflow and is kept by
+        ``cleanup_workflow``.
+        """
+        logger.info("Step 3: Finalizing and appending WIM...")
+        start = time.perf_counter()
+        result = FinalizeResult(FinalizeStrategy.EXPORT.value, "appended to the shared WIM of the OS", compression)
+        self.workflow_state['finalize'] = result
+        
+        temp_wim = self.workflow_state['temp_wim']
+        if not temp_wim:
+            raise DismError("No temporary WIM found for export")
+        
+        success = await self.wim_handler.unmount_wim(mount_point, commit=True, progress_callback=progress_callback)
+        result.steps['unmount'] = time.perf_counter() - start
+        if not success:
+            raise DismError("Failed to unmount WIM with changes")
+        
+        variant = await variant_store.append(temp_wim, os_id, device_id, compression=compression,
+                                             progress=progress_callback)
+        result.seconds = time.perf_counter() - start
+        result.steps['export'] = result.seconds - result.steps['unmount']
+        result.size = variant.wim_path.stat().st_size
+        return variant
+    
+    def get_finalize_info(self) -> Dict[str, Any]:
+        """Finalize strategy of this job, the reason it was chosen and its wall time."""
+        finalize = self.workflow_state.get('finalize')
+        return finalize.to_dict() if finalize else {}
+    
+    def get_staging_info(self) -> Dict[str, Any]:
+        """Staging cache outcome of this job and cache hit statistics."""
+        staged = self.workflow_state.get('staged')
+        if not self.staging_cache or not staged:
+            return {}
+        return dict(staged.to_dict(), cache=self.staging_cache.get_cache_info())
+    
     async def cleanup_workflow(self, keep_export: bool = True) -> None:
         """Cleanup workflow temporary files."""
         logger.info("Cleaning up workflow...")
@@ -485,19 +690,27 @@ class WimWorkflow:
             except Exception as e:
                 logger.warning(f"Failed to remove temp WIM: {e}")
         
+        staged = self.workflow_state.get('staged')
+        if staged:
+            self.staging_cache.release(staged)
+        
         # Optionally remove export (for testing)
         if not keep_export:
             export_path = self.workflow_state.get('export_path')
-            if export_path and export_path.exists():
-                try:
-                    export_path.unlink()
-                    logger.info(f"Removed export WIM: {export_path}")
-                except Exception as e:
-                    logger.warning(f"Failed to remove export WIM: {e}")
+            exports = swm_parts(export_path) if export_path and export_path.suffix == ".swm" else [export_path]
+            for export_file in exports:
+                if export_file and export_file.exists():
+                    try:
+                        export_file.unlink()
+                        logger.info(f"Removed export WIM: {export_file}")
+                    except Exception as e:
+                        logger.warning(f"Failed to remove export WIM: {e}")
         
         # Reset state
         self.workflow_state = {
             'temp_wim': None,
+            'staged': None,
             'mount_info': None,
-            'export_path': None
+            'export_path': None,
+            'finalize': None
         }
\ No newline at end of file
@@ -0,0 +1,349 @@
+"""
+WIM Reader - Native WIM header and XML metadata reader (no DISM required)
+"""
+
+import mmap
+import struct
+import uuid
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+WIM_MAGIC = b"MSWIM\0\0\0"
+WIM_HEADER_SIZE = 208
+
+# Header flags
+WIM_HDR_FLAG_COMPRESSION = 0x00000002
+WIM_HDR_FLAG_READONLY = 0x00000004
+WIM_HDR_FLAG_SPANNED = 0x00000008
+WIM_HDR_FLAG_WRITE_IN_PROGRESS = 0x00000040
+WIM_HDR_FLAG_COMPRESS_XPRESS = 0x00020000
+WIM_HDR_FLAG_COMPRESS_LZX = 0x00040000
+WIM_HDR_FLAG_COMPRESS_LZMS = 0x00080000
+
+# Resource header flags
+RESHDR_FLAG_COMPRESSED = 0x04
+
+# <ARCH> values used in the WIM XML
+ARCHITECTURES = {
+    0: "x86",
+    5: "arm",
+    6: "ia64",
+    9: "x64",
+    12: "arm64"
+}
+
+# Header layout: magic, cbSize, version, flags, chunk size, GUID, part number,
+# total parts, image count, offset table, XML data, boot metadata, boot index,
+# integrity table, unused
+_HEADER_STRUCT = struct.Struct("<8sIIII16sHHI24s24s24sI24s60s")
+
+
+class WimReadError(Exception):
+    """WIM file could not be read."""
+    pass
+
+
+@dataclass
+class WimResource:
+    """Resource header (offset/size of a resource inside the WIM)."""
+    size: int
+    flags: int
+    offset: int
+    original_size: int
+
+    @property
+    def is_compressed(self) -> bool:
+        return bool(self.flags & RESHDR_FLAG_COMPRESSED)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "WimResource":
+        size_and_flags, offset, original_size = struct.unpack("<QQQ", data)
+        return cls(
+            size=size_and_flags & 0x00FFFFFFFFFFFFFF,
+            flags=size_and_flags >> 56,
+            offset=offset,
+            original_size=original_size
+        )
+
+
+@dataclass
+class WimHeader:
+    """Decoded WIM file header."""
+    version: int
+    flags: int
+    chunk_size: int
+    guid: str
+    part_number: int
+    total_parts: int
+    image_count: int
+    boot_index: int
+    offset_table: WimResource
+    xml_data: WimResource
+    boot_metadata: WimResource
+    integrity: WimResource
+
+    @property
+    def compression(self) -> str:
+        if not self.flags & WIM_HDR_FLAG_COMPRESSION:
+            return "none"
+        if self.flags & WIM_HDR_FLAG_COMPRESS_LZMS:
+            return "lzms"
+        if self.flags & WIM_HDR_FLAG_COMPRESS_LZX:
+            return "lzx"
+        if self.flags & WIM_HDR_FLAG_COMPRESS_XPRESS:
+            return "xpress"
+        return "unknown"
+
+    @property
+    def is_spanned(self) -> bool:
+        return bool(self.flags & WIM_HDR_FLAG_SPANNED) or self.total_parts > 1
+
+    @property
+    def has_integrity_table(self) -> bool:
+        return self.integrity.size > 0
+
+
+@dataclass
+class WimImageInfo:
+    """Metadata of one image (index) inside a WIM."""
+    index: int
+    name: Optional[str] = None
+    description: Optional[str] = None
+    display_name: Optional[str] = None
+    edition: Optional[str] = None
+    flags: Optional[str] = None
+    product_name: Optional[str] = None
+    installation_type: Optional[str] = None
+    architecture: Optional[str] = None
+    build: Optional[str] = None
+    build_number: Optional[int] = None
+    sp_build: Optional[int] = None
+    languages: List[str] = field(default_factory=list)
+    default_language: Optional[str] = None
+    total_bytes: int = 0
+    file_count: int = 0
+    dir_count: int = 0
+    created: Optional[datetime] = None
+    modified: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for JSON output."""
+        return {
+            'index': self.index,
+            'name': self.name,
+            'description': self.description,
+            'display_name': self.display_name,
+            'edition': self.edition,
+            'architecture': self.architecture,
+            'build': self.build,
+            'languages': self.languages,
+            'total_bytes': self.total_bytes,
+            'file_count': self.file_count,
+            'created': self.created.isoformat() if self.created else None
+        }
+
+
+@dataclass
+class WimFileInfo:
+    """Header and per-image metadata of a WIM file."""
+    path: Path
+    file_size: int
+    header: WimHeader
+    images: List[WimImageInfo] = field(default_factory=list)
+    total_bytes: int = 0
+
+    def get_image(self, index: int) -> Optional[WimImageInfo]:
+        for image in self.images:
+            if image.index == index:
+                return image
+        return None
+
+
+class WimReader:
+    """Reads the WIM header and embedded XML metadata via mmap."""
+
+    def __init__(self, wim_path: Path):
+        self.wim_path = Path(wim_path)
+
+    def read(self) -> WimFileInfo:
+        """Read header and image metadata."""
+        try:
+            file_size = self.wim_path.stat().st_size
+        except OSError as e:
+            raise WimReadError(f"Cannot access WIM file {self.wim_path}: {e}")
+
+        if file_size < WIM_HEADER_SIZE:
+            raise WimReadError(f"File too small for a WIM header: {file_size} bytes")
+
+        try:
+            with open(self.wim_path, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    header = self._parse_header(view[:WIM_HEADER_SIZE])
+                    xml_text = self._read_xml(view, header, file_size)
+        except OSError as e:
+            raise WimReadError(f"Failed to read WIM file {self.wim_path}: {e}")
+
+        images, total_bytes = self._parse_xml(xml_text)
+
+        if header.image_count != len(images):
+            logger.warning(f"WIM header reports {header.image_count} images, "
+                           f"XML describes {len(images)}: {self.wim_path}")
+
+        return WimFileInfo(
+            path=self.wim_path,
+            file_size=file_size,
+            header=header,
+            images=images,
+            total_bytes=total_bytes
+        )
+
+    def read_header(self) -> WimHeader:
+        """Read only the WIM header."""
+        try:
+            with open(self.wim_path, 'rb') as f:
+                data = f.read(WIM_HEADER_SIZE)
+        except OSError as e:
+            raise WimReadError(f"Failed to read WIM file {self.wim_path}: {e}")
+        return self._parse_header(data)
+
+    # Helper methods
+
+    @staticmethod
+    def _parse_header(data: bytes) -> WimHeader:
+        if len(data) < WIM_HEADER_SIZE:
+            raise WimReadError("Truncated WIM header")
+
+        (magic, header_size, version, flags, chunk_size, guid, part_number, total_parts,
+         image_count, offset_table, xml_data, boot_metadata, boot_index, integrity,
+         _unused) = _HEADER_STRUCT.unpack(data[:WIM_HEADER_SIZE])
+
+        if magic != WIM_MAGIC:
+            raise WimReadError(f"Invalid WIM magic: {magic!r}")
+        if header_size != WIM_HEADER_SIZE:
+            raise WimReadError(f"Unexpected WIM header size: {header_size}")
+
+        return WimHeader(
+            version=version,
+            flags=flags,
+            chunk_size=chunk_size,
+            guid=str(uuid.UUID(bytes_le=guid)),
+            part_number=part_number,
+            total_parts=total_parts,
+            image_count=image_count,
+            boot_index=boot_index,
+            offset_table=WimResource.unpack(offset_table),
+            xml_data=WimResource.unpack(xml_data),
+            boot_metadata=WimResource.unpack(boot_metadata),
+            integrity=WimResource.unpack(integrity)
+        )
+
+    @staticmethod
+    def _read_xml(view, header: WimHeader, file_size: int) -> str:
+        resource = header.xml_data
+        if resource.size == 0:
+            raise WimReadError("WIM has no XML metadata resource")
+        if resource.is_compressed:
+            raise WimReadError("Compressed XML metadata is not supported")
+        if resource.offset + resource.size > file_size:
+            raise WimReadError("XML metadata resource extends beyond end of file "
+                               "(truncated or incomplete WIM)")
+
+        raw = view[resource.offset:resource.offset + resource.size]
+        try:
+            return raw.decode('utf-16-le').lstrip('\ufeff').rstrip('\x00')
+        except UnicodeDecodeError as e:
+            raise WimReadError(f"Failed to decode WIM XML metadata: {e}")
+
+    @classmethod
+    def _parse_xml(cls, xml_text: str):
+        try:
+            root = ET.fromstring(xml_text)
+        except ET.ParseError as e:
+            raise WimReadError(f"Invalid WIM XML metadata: {e}")
+
+        images = [cls._parse_image(element) for element in root.findall('IMAGE')]
+        images.sort(key=lambda image: image.index)
+        return images, _int(root.findtext('TOTALBYTES'))
+
+    @staticmethod
+    def _parse_image(element) -> WimImageInfo:
+        image = WimImageInfo(
+            index=_int(element.get('INDEX')),
+            name=element.findtext('NAME'),
+            description=element.findtext('DESCRIPTION'),
+            display_name=element.findtext('DISPLAYNAME'),
+            flags=element.findtext('FLAGS'),
+            total_bytes=_int(element.findtext('TOTALBYTES')),
+            file_count=_int(element.findtext('FILECOUNT')),
+            dir_count=_int(element.findtext('DIRCOUNT')),
+            created=_filetime(element.find('CREATIONTIME')),
+            modified=_filetime(element.find('LASTMODIFICATIONTIME'))
+        )
+
+        windows = element.find('WINDOWS')
+        if windows is not None:
+            arch = windows.findtext('ARCH')
+            if arch is not None:
+                image.architecture = ARCHITECTURES.get(_int(arch), f"unknown({arch})")
+            image.edition = windows.findtext('EDITIONID')
+            image.product_name = windows.findtext('PRODUCTNAME')
+            image.installation_type = windows.findtext('INSTALLATIONTYPE')
+
+            languages = windows.find('LANGUAGES')
+            if languages is not None:
+                image.languages = [lang.text for lang in languages.findall('LANGUAGE') if lang.text]
+                image.default_language = languages.findtext('DEFAULT')
+
+            version = windows.find('VERSION')
+            if version is not None:
+                parts = [version.findtext(tag) for tag in ('MAJOR', 'MINOR', 'BUILD', 'SPBUILD')]
+                image.build = ".".join(p for p in parts if p is not None) or None
+                if version.findtext('BUILD') is not None:
+                    image.build_number = _int(version.findtext('BUILD'))
+                if version.findtext('SPBUILD') is not None:
+                    image.sp_build = _int(version.findtext('SPBUILD'))
+
+        return image
+
+
+def read_wim_info(wim_path: Path) -> WimFileInfo:
+    """Read header and image metadata of a WIM file."""
+    return WimReader(wim_path).read()
+
+
+def parse_wim_xml(xml_text: str) -> List[WimImageInfo]:
+    """Parse image metadata from WIM XML (e.g. ``wimlib-imagex info --xml`` output)."""
+    images, _total_bytes = WimReader._parse_xml(xml_text.lstrip('\ufeff').rstrip('\x00'))
+    return images
+
+
+def _int(value: Optional[str]) -> int:
+    if not value:
+        return 0
+    value = value.strip()
+    try:
+        return int(value, 16) if value.lower().startswith('0x') else int(value)
+    except ValueError:
+        return 0
+
+
+def _filetime(element) -> Optional[datetime]:
+    """Convert a <HIGHPART>/<LOWPART> FILETIME element to datetime."""
+    if element is None:
+        return None
+    high = _int(element.findtext('HIGHPART'))
+    low = _int(element.findtext('LOWPART'))
+    ticks = (high << 32) | low
+    if not ticks:
+        return None
+    try:
+        return datetime(1601, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=ticks // 10)
+    except OverflowError:
+        return None
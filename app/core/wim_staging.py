@@ -0,0 +1,326 @@
+"""
+WIM Staging Cache - Pristine local copies of source WIMs, cloned per job
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+import logging
+
+from ..utils.file_copy import copy_file, tee_file, CopyProgress, CopyResult
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_STAGING_CACHE_PATH = Path("runtime/cache/sbi")
+
+
+@dataclass
+class StagedWim:
+    """A job's working copy of a source WIM."""
+    path: Path
+    source: Path
+    cache_key: str
+    cache_hit: bool
+    clone_method: str                       # "reflink", "tee" (written with the pristine copy) or a copy method
+    copy: CopyResult                        # pristine -> job clone, or the tee of a miss
+    populate: Optional[CopyResult] = None   # source -> pristine (cache miss only)
+    bytes_copied: int = 0                   # bytes written for this job (reflink clones write none)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for job results."""
+        return {
+            'cache_hit': self.cache_hit,
+            'clone_method': self.clone_method,
+            'clone_seconds': round(self.copy.seconds, 3),
+            'bytes_copied': self.bytes_copied,
+            'populate': self.populate.to_dict() if self.populate else None
+        }
+
+
+class WimStagingCache:
+    """Keeps one verified pristine copy per source WIM and hands out cheap clones.
+
+    Entries are keyed by source identity (path, size, mtime) and, when known,
+    the source SHA-256. Jobs receive a reflink clone where the filesystem
+    supports it, otherwise a full copy: on a miss the source is read once and
+    written to the pristine and the job copy in the same pass. Least recently
+    used entries are evicted when the cache exceeds its size quota.
+    """
+
+    def __init__(self, cache_path: Path = DEFAULT_STAGING_CACHE_PATH, max_size_mb: int = 51200):
+        self.cache_path = Path(cache_path)
+        self.max_bytes = int(max_size_mb) * 1024 * 1024
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        self.state_db = self.cache_path / "staging_state.db"
+        self._in_use: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.init_database()
+
+    def init_database(self):
+        """Initialize the staging cache schema."""
+        with sqlite3.connect(self.state_db) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS staged_images (
+                    key TEXT PRIMARY KEY,
+                    source_path TEXT NOT NULL,
+                    source_size INTEGER NOT NULL,
+                    source_mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT,
+                    cache_file TEXT NOT NULL,
+                    cache_mtime_ns INTEGER NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS staging_stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    misses INTEGER NOT NULL DEFAULT 0,
+                    evictions INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            conn.execute('INSERT OR IGNORE INTO staging_stats (id) VALUES (1)')
+            conn.commit()
+
+    # Public API
+
+    async def stage(self, source_wim: Path, temp_dir: Path, expected_sha256: Optional[str] = None,
+                    progress_callback: Optional[Callable[[CopyProgress], None]] = None) -> StagedWim:
+        """Give a job its own copy of ``source_wim`` in ``temp_dir``.
+
+        On a miss the source is copied into the cache once (hashed and checked
+        against ``expected_sha256`` if given); ``progress_callback`` is called
+        on the event loop during that copy.
+        """
+        loop = asyncio.get_running_loop()
+
+        def report(progress: CopyProgress) -> None:
+            loop.call_soon_threadsafe(progress_callback, progress)
+
+        return await asyncio.to_thread(
+            self._stage, Path(source_wim), Path(temp_dir), expected_sha256,
+            report if progress_callback else None
+        )
+
+    def release(self, staged: StagedWim) -> None:
+        """Mark a job's clone as no longer in use (the job removes the file itself)."""
+        self._release_key(staged.cache_key)
+
+    def get_cache_info(self) -> Dict[str, Any]:
+        """Get cache size and hit statistics."""
+        with sqlite3.connect(self.state_db) as conn:
+            entries, total = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(source_size), 0) FROM staged_images'
+            ).fetchone()
+            hits, misses, evictions = conn.execute(
+                'SELECT hits, misses, evictions FROM staging_stats WHERE id = 1'
+            ).fetchone()
+
+        lookups = hits + misses
+        return {
+            'cache_path': str(self.cache_path),
+            'entries': entries,
+            'size_mb': round(total / (1024 * 1024), 1),
+            'max_size_mb': self.max_bytes // (1024 * 1024),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'evictions': evictions
+        }
+
+    # Helper methods
+
+    def _stage(self, source: Path, temp_dir: Path, expected_sha256: Optional[str],
+               progress: Optional[Callable[[CopyProgress], None]]) -> StagedWim:
+        stat = source.stat()
+        source_path = str(source.resolve())
+        key = hashlib.sha256(f"{source_path}|{stat.st_size}|{stat.st_mtime_ns}".encode('utf-8')).hexdigest()[:32]
+        expected = expected_sha256.lower() if expected_sha256 else None
+
+        with self._lock:
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+
+        try:
+            temp_dir.mkdir(parents=True, exist_ok=True)
+            dest = temp_dir / source.name
+            pristine = self._lookup(key, expected)
+            if pristine is None:
+                staged = self._populate(key, source, source_path, stat, expected, dest, progress)
+            else:
+                staged = self._clone(pristine, dest, source, key)
+        except BaseException:
+            self._release_key(key)
+            raise
+
+        self._evict(keep=key)
+        logger.info(f"Staged {source.name} for job: {'hit' if staged.cache_hit else 'miss'}, "
+                    f"{staged.clone_method} in {staged.copy.seconds:.2f}s, {staged.bytes_copied} bytes written")
+        return staged
+
+    def _release_key(self, key: str) -> None:
+        with self._lock:
+            count = self._in_use.get(key, 0) - 1
+            if count > 0:
+                self._in_use[key] = count
+            else:
+                self._in_use.pop(key, None)
+
+    def _lookup(self, key: str, expected: Optional[str]) -> Optional[Path]:
+        """Return the pristine copy for ``key`` if present and intact, counting the hit."""
+        with sqlite3.connect(self.state_db) as conn:
+            row = conn.execute(
+                'SELECT cache_file, source_size, cache_mtime_ns, sha256 FROM staged_images WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            cache_file, size, mtime_ns, sha256 = row
+            pristine = Path(cache_file)
+            try:
+                pristine_stat = pristine.stat()
+                intact = pristine_stat.st_size == size and pristine_stat.st_mtime_ns == mtime_ns
+            except OSError:
+                intact = False
+
+            if not intact or (expected and sha256 and sha256 != expected):
+                logger.warning(f"Discarding stale staging cache entry {pristine}")
+                conn.execute('DELETE FROM staged_images WHERE key = ?', (key,))
+                conn.commit()
+                self._unlink(pristine)
+                return None
+
+            conn.execute('UPDATE staged_images SET hits = hits + 1, last_used = ? WHERE key = ?',
+                         (time.time(), key))
+            conn.execute('UPDATE staging_stats SET hits = hits + 1 WHERE id = 1')
+            conn.commit()
+        return pristine
+
+    def _populate(self, key: str, source: Path, source_path: str, stat: os.stat_result,
+                  expected: Optional[str], dest: Path, progress) -> StagedWim:
+        """Copy the source into the cache (verifying its digest if known) and give the job its copy.
+
+        Where the job copy can be a reflink of the pristine copy the source is
+        copied into the cache only; otherwise both copies are written from a
+        single read of the source.
+        """
+        pristine = self.cache_path / f"{key}.wim"
+        part = self.cache_path / f"{key}.{uuid.uuid4().hex[:8]}.part"
+        hash_algorithm = "sha256" if expected else None
+        self._unlink(dest)
+        logger.info(f"Staging cache miss, copying {source} into the cache")
+
+        tee = not self._reflink_supported(dest.parent)
+        if tee:
+            result = tee_file(source, [part, dest], hash_algorithm=hash_algorithm, progress=progress)
+        else:
+            result = copy_file(source, part, hash_algorithm=hash_algorithm, progress=progress)
+        if expected and result.digest and result.digest != expected:
+            self._unlink(part)
+            self._unlink(dest)
+            raise OSError(f"Source WIM SHA-256 mismatch: {result.digest} != {expected}")
+        os.replace(part, pristine)
+
+        now = time.time()
+        with sqlite3.connect(self.state_db) as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO staged_images
+                    (key, source_path, source_size, source_mtime_ns, sha256, cache_file, cache_mtime_ns,
+                     hits, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?)
+            ''', (key, source_path, stat.st_size, stat.st_mtime_ns, result.digest or expected,
+                  str(pristine), pristine.stat().st_mtime_ns, now, now))
+            conn.execute('UPDATE staging_stats SET misses = misses + 1 WHERE id = 1')
+            conn.commit()
+
+        if tee:
+            return StagedWim(dest, source, key, False, "tee", result, result, bytes_copied=2 * result.bytes_copied)
+        return self._clone(pristine, dest, source, key, result)
+
+    def _clone(self, pristine: Path, dest: Path, source: Path, key: str,
+               populate: Optional[CopyResult] = None) -> StagedWim:
+        """Clone the pristine copy for a job: reflink, else full copy."""
+        self._unlink(dest)
+        populated = populate.bytes_copied if populate else 0
+
+        try:
+            result = copy_file(pristine, dest, methods=["reflink"])
+            return StagedWim(dest, source, key, populate is None, "reflink", result, populate, populated)
+        except OSError:
+            pass
+
+        result = copy_file(pristine, dest)
+        return StagedWim(dest, source, key, populate is None, result.method, result, populate,
+                         populated + result.bytes_copied)
+
+    def _reflink_supported(self, dest_dir: Path) -> bool:
+        """Whether a file of the cache can be reflinked into ``dest_dir``."""
+        probe = self.cache_path / f".reflink-probe.{uuid.uuid4().hex[:8]}"
+        target = dest_dir / probe.name
+        try:
+            probe.write_bytes(b"kassia")
+            copy_file(probe, target, methods=["reflink"])
+            return True
+        except OSError:
+            return False
+        finally:
+            self._unlink(probe)
+            self._unlink(target)
+
+    def _evict(self, keep: str) -> None:
+        """Evict least recently used entries until the cache fits its quota."""
+        with self._lock:
+            in_use = set(self._in_use) | {keep}
+
+        with sqlite3.connect(self.state_db) as conn:
+            total = conn.execute('SELECT COALESCE(SUM(source_size), 0) FROM staged_images').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            rows = conn.execute(
+                'SELECT key, cache_file, source_size FROM staged_images ORDER BY last_used ASC'
+            ).fetchall()
+            for key, cache_file, size in rows:
+                if total <= self.max_bytes:
+                    break
+                pristine = Path(cache_file)
+                if key in in_use:
+                    continue
+                self._unlink(pristine)
+                conn.execute('DELETE FROM staged_images WHERE key = ?', (key,))
+                conn.execute('UPDATE staging_stats SET evictions = evictions + 1 WHERE id = 1')
+                total -= size
+                logger.info(f"Evicted staged WIM {pristine} ({size} bytes)")
+            conn.commit()
+
+    @staticmethod
+    def _unlink(path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# Global staging cache instances (one per cache path)
+_staging_cache_instances: Dict[str, WimStagingCache] = {}
+_staging_cache_lock = threading.Lock()
+
+
+def get_wim_staging_cache(cache_path: Path = DEFAULT_STAGING_CACHE_PATH, max_size_mb: int = 51200) -> WimStagingCache:
+    """Get the shared staging cache for a cache directory."""
+    key = str(Path(cache_path).resolve())
+    with _staging_cache_lock:
+        if key not in _staging_cache_instances:
+            _staging_cache_instances[key] = WimStagingCache(Path(cache_path), max_size_mb)
+        cache = _staging_cache_instances[key]
+        cache.max_bytes = int(max_size_mb) * 1024 * 1024
+        return cache
@@ -7,6 +7,7 @@ Kassia Python - Main CLI Entry Point (Mit Database Integration und Advanced Logg
 import click
 import sys
 import os
+import json
 import asyncio
 from pathlib import Path
 from datetime import datetime
@@ -21,13 +22,27 @@ from app.utils.logging import (
 
 # Import database system
 from app.utils.job_database import get_job_database, init_job_database
+from app.utils.digest_cache import collect_asset_digests, get_digest_cache
+from app.utils.tool_output import step_progress
 
 # Import existing modules
-from app.models.config import ConfigLoader, ValidationResult
-from app.core.asset_providers import LocalAssetProvider
-from app.core.wim_handler import WimHandler, WimWorkflow, DismError
+from app.models.config import ConfigLoader, ValidationResult, DriverInjection, ExportMode
+from app.core.asset_providers import (
+    create_asset_provider, build_provider_settings, get_package_manifest, get_asset_catalog
+)
+from app.core.asset_providers.manifest import generate_manifest_file, verify_manifest_file
+from app.core.wim_handler import WimHandler, WimWorkflow, FINALIZE_OPERATIONS, WimInfo, DismError
+from app.core.imaging_backend import create_imaging_backend
+from app.core.wim_staging import get_wim_staging_cache
+from app.core.serviced_layers import get_serviced_layer_cache, ServicedLayerError
+from app.core.image_inventory import get_image_inventory_cache, image_inventory_key
+from app.core.mount_manager import get_mount_manager
+from app.core.variant_wim import get_variant_store, VariantWimError
+from app.core.export_benchmark import get_export_benchmark, run_export_benchmark
+from app.core.wim_reader import read_wim_info, WimReadError
 from app.core.driver_integration import DriverIntegrator, DriverIntegrationManager
 from app.core.update_integration import UpdateIntegrator, UpdateIntegrationManager
+from app.core.integration_scheduler import IntegrationScheduler
 
 # Version info
 __version__ = "2.0.0"
@@ -155,16 +170,17 @@ def check_prerequisites() -> ValidationResult:
             result.add_warning(msg)
             logger.warning(msg, LogCategory.SYSTEM, {'error': str(e)})
         
-        # Check if DISM is available
+        # Check if the configured imaging backend (DISM by default) is available
         try:
-            wim_handler = WimHandler()
-            logger.info("DISM validation successful", LogCategory.WIM)
+            imaging_backend = create_imaging_backend(ConfigLoader.load_build_config())
+            WimHandler(backend=imaging_backend).validate()
+            logger.info(f"Imaging backend validation successful ({imaging_backend.name})", LogCategory.WIM)
         except DismError as e:
-            msg = f"DISM not available: {e}"
+            msg = f"Imaging backend not available: {e}"
             result.add_error(msg)
             logger.error(msg, LogCategory.WIM, {'dism_error': str(e)})
         except Exception as e:
-            msg = "DISM tool verification failed"
+            msg = "Imaging tool verification failed"
             result.add_error(msg)
             logger.error(msg, LogCategory.WIM, {'error': str(e)})
         
@@ -205,16 +221,9 @@ async def discover_and_display_assets(kassia_config, device_name: str) -> dict:
     try:
         assets_path = Path("assets")
         
-        # Create asset provider with proper config integration
-        build_config_dict = {
-            'driverRoot': kassia_config.build.driverRoot,
-            'updateRoot': kassia_config.build.updateRoot,
-            'sbiRoot': kassia_config.build.sbiRoot,
-            'yunonaPath': kassia_config.build.yunonaPath,
-            'osWimMap': kassia_config.build.osWimMap
-        }
-        
-        provider = LocalAssetProvider(assets_path, build_config=build_config_dict)
+        # Create the configured asset provider (local, remote or hybrid)
+        build_config_dict = build_provider_settings(kassia_config.build)
+        provider = create_asset_provider(kassia_config.build, assets_path)
         
         click.echo("\n🔍 Discovering assets...")
         logger.info("Starting asset discovery", LogCategory.ASSET, {
@@ -226,7 +235,8 @@ async def discover_and_display_assets(kassia_config, device_name: str) -> dict:
             'sbi': None,
             'drivers': [],
             'updates': [],
-            'yunona_scripts': []
+            'yunona_scripts': [],
+            'provider': provider
         }
         
         # Discover SBI
@@ -243,17 +253,23 @@ async def discover_and_display_assets(kassia_config, device_name: str) -> dict:
             })
             assets_summary['sbi'] = sbi_asset
             
-            # Validate SBI with WIM Handler
+            # Validate SBI from the WIM header and XML metadata (no DISM required)
             try:
-                wim_handler = WimHandler()
-                wim_info = await wim_handler.get_wim_info(sbi_asset.path)
+                wim_file_info = await asyncio.to_thread(read_wim_info, sbi_asset.path)
+                wim_info = WimInfo.from_images(sbi_asset.path, wim_file_info.images,
+                                               size=wim_file_info.file_size,
+                                               compression=wim_file_info.header.compression)
                 click.echo(f"   ✅ WIM validated: {wim_info.name}")
+                for image in wim_info.images:
+                    click.echo(f"      [{image.index}] {image.name} ({image.architecture}, build {image.build})")
                 logger.info("SBI WIM validation successful", LogCategory.WIM, {
                     'wim_name': wim_info.name,
                     'architecture': wim_info.architecture,
-                    'index': wim_info.index
+                    'index': wim_info.index,
+                    'image_count': wim_info.image_count,
+                    'compression': wim_info.compression
                 })
-            except DismError as e:
+            except WimReadError as e:
                 click.echo(f"   ❌ WIM validation failed: {e}")
                 logger.error("SBI WIM validation failed", LogCategory.WIM, {
                     'error': str(e),
@@ -271,7 +287,11 @@ async def discover_and_display_assets(kassia_config, device_name: str) -> dict:
         
         # Discover drivers
         logger.debug("Discovering driver assets", LogCategory.DRIVER)
-        drivers = await provider.get_drivers(device_name, kassia_config.selectedOsId)
+        drivers = await provider.get_drivers(
+            device_name, kassia_config.selectedOsId,
+            driver_family_ids=kassia_config.get_driver_families(),
+            device_ids=kassia_config.device.supportedDeviceIds
+        )
         assets_summary['drivers'] = drivers
         
         if drivers:
@@ -328,12 +348,26 @@ async def discover_and_display_assets(kassia_config, device_name: str) -> dict:
                 'scripts': [{'name': s.name, 'type': s.metadata.get('script_type')} for s in scripts]
             })
         
+        # Record content digests (cached by file identity, so unchanged files cost a stat)
+        if provider.asset_digests:
+            digest_assets = ([sbi_asset] if sbi_asset else []) + drivers + updates + scripts
+            digests = await provider.digest_assets(digest_assets)
+            failed_digests = [name for name, digest in digests.items() if digest is None]
+            if failed_digests:
+                click.echo(f"\n⚠️  Digest verification failed: {', '.join(failed_digests)}")
+            logger.info("Asset digests recorded", LogCategory.ASSET, {
+                'count': len(digests),
+                'failed': failed_digests,
+                'digest_cache': provider.digest_cache.get_cache_info()
+            })
+        
         duration = time.time() - start_time
         logger.log_operation_success("asset_discovery", duration, {
             'sbi_found': bool(assets_summary['sbi']),
             'drivers_count': len(assets_summary['drivers']),
             'updates_count': len(assets_summary['updates']),
-            'scripts_count': len(assets_summary['yunona_scripts'])
+            'scripts_count': len(assets_summary['yunona_scripts']),
+            'discovery_timings': provider.get_discovery_timings()
         })
         
         return assets_summary
@@ -346,12 +380,14 @@ async def discover_and_display_assets(kassia_config, device_name: str) -> dict:
         logger.clear_context()
 
 async def execute_cli_wim_workflow(job_db, job_id: str, kassia_config, assets_summary: dict, 
-                                  skip_drivers: bool, skip_updates: bool, debug: bool) -> Optional[Path]:
+                                  skip_drivers: bool, skip_updates: bool, debug: bool,
+                                  export_profile: Optional[str] = None) -> Optional[Path]:
     """Execute the complete WIM workflow with database persistence."""
     
     logger.set_context(job_id=job_id)
     logger.log_operation_start("cli_wim_workflow")
     workflow_start = time.time()
+    workspace = None
     
     try:
         if not assets_summary['sbi']:
@@ -370,6 +406,8 @@ async def execute_cli_wim_workflow(job_db, job_id: str, kassia_config, assets_su
         
         sbi_asset = assets_summary['sbi']
         build_config = kassia_config.build
+        provider = assets_summary.get('provider')
+        needs_assets = provider is not None and not (skip_drivers and skip_updates)
         
         # Update job to running
         update_cli_job(job_db, job_id,
@@ -389,53 +427,172 @@ async def execute_cli_wim_workflow(job_db, job_id: str, kassia_config, assets_su
         })
         
         # Initialize WIM Handler and Workflow
-        wim_handler = WimHandler()
-        workflow = WimWorkflow(wim_handler)
-        
-        click.echo("\n🚀 Starting WIM processing workflow...")
-        
-        # Step 1: Prepare WIM
-        click.echo("   Step 2/9: 🔄 WIM Preparation - copying to temporary location...")
-        update_cli_job(job_db, job_id,
-            current_step="Preparing WIM",
-            step_number=2,
-            progress=15
+        staging_cache = get_wim_staging_cache(
+            Path(build_config.wimStagingCachePath), build_config.wimStagingCacheMaxSizeMB
+        ) if build_config.wimStagingCache else None
+        # A CLI run builds one image, so it keeps no warm mounts
+        mount_manager = get_mount_manager(
+            build_config, create_imaging_backend(build_config), staging_cache, warm_pool=False
         )
+        imaging_backend = mount_manager.backend
+        wim_handler = WimHandler(backend=imaging_backend, journal=mount_manager.journal, owner=job_id)
+        workflow = WimWorkflow(wim_handler, staging_cache)
         
-        logger.info("Starting WIM preparation", LogCategory.WIM)
-        step_start = time.time()
-        
-        temp_dir = Path(build_config.tempPath)
-        temp_wim = await workflow.prepare_wim_for_modification(sbi_asset.path, temp_dir)
-        
-        step_duration = time.time() - step_start
-        click.echo(f"   Step 2/9: ✅ WIM copied to: {temp_wim}")
-        logger.info("WIM preparation completed", LogCategory.WIM, {
-            'temp_wim': str(temp_wim),
-            'duration': step_duration
-        })
-        
-        # Step 2: Mount WIM
-        click.echo("   Step 3/9: 🔄 WIM Mounting - mounting for modification...")
-        update_cli_job(job_db, job_id,
-            current_step="Mounting WIM",
-            step_number=3,
-            progress=25
-        )
-        
-        logger.info("Starting WIM mount", LogCategory.WIM)
-        step_start = time.time()
+        click.echo("\n🚀 Starting WIM processing workflow...")
         
-        mount_point = Path(build_config.mountPoint)
-        mount_info = await workflow.mount_wim_for_modification(temp_wim, mount_point)
+        # Mounts left behind by crashed runs are discarded before they get in the way
+        recovered_mounts = await mount_manager.recover()
+        if recovered_mounts:
+            click.echo(f"   🧹 Recovered {len(recovered_mounts)} orphaned mount(s) of earlier runs")
+            logger.info("Orphaned mounts recovered", LogCategory.WIM, {'mounts': recovered_mounts})
+        
+        # Per-job mount, temp and export directories
+        if not mount_manager.available_slots():
+            click.echo("   ⏳ Waiting for a free build slot...")
+            update_cli_job(job_db, job_id, current_step="Waiting for a build slot")
+        workspace = await mount_manager.acquire(job_id)
+        logger.info("Job workspace allocated", LogCategory.WIM, workspace.to_dict())
+        
+        # Live DISM/wimlib progress of the mount, integration and export steps
+        def report_step(step: str, progress: int) -> None:
+            update_cli_job(job_db, job_id, current_step=step, progress=progress)
+        
+        # Download remote-only drivers and updates while the SBI is copied and mounted
+        if needs_assets:
+            provider.start_prefetch()
+        
+        # OS updates only depend on the SBI: start from the cached serviced layer (built on first use)
+        serviced_layer = None
+        layer_cache = get_serviced_layer_cache(
+            Path(build_config.servicedLayerCachePath), build_config.servicedLayerCacheMaxSizeMB,
+            get_digest_cache(Path(build_config.digestCachePath), build_config.digestWorkers)
+        ) if build_config.servicedLayerCache else None
+        if layer_cache and not skip_updates and assets_summary['updates']:
+            click.echo("   Step 2/9: 🔄 Serviced Layer - resolving OS update layer...")
+            update_cli_job(job_db, job_id,
+                current_step="Resolving serviced layer",
+                step_number=2,
+                progress=10
+            )
+            step_start = time.time()
+            
+            try:
+                layer_key = await layer_cache.resolve_key(
+                    sbi_asset, assets_summary['updates'], imaging_backend, kassia_config.selectedOsId
+                )
+                serviced_layer = await layer_cache.get_or_build(
+                    layer_key, sbi_asset.path, imaging_backend, Path(build_config.yunonaPath), staging_cache,
+                    before_build=provider.wait_for_prefetch if needs_assets else None,
+                    journal=mount_manager.journal, workspace=workspace
+                )
+                layer_state = "cache hit" if serviced_layer.cache_hit else f"built in {serviced_layer.build_seconds:.0f}s"
+                click.echo(f"   Step 2/9: ✅ Serviced layer {serviced_layer.key[:12]} ready ({layer_state})")
+                logger.info("Serviced layer ready", LogCategory.UPDATE, {
+                    'layer_key': serviced_layer.key,
+                    'cache_hit': serviced_layer.cache_hit,
+                    'update_count': len(serviced_layer.updates),
+                    'duration': time.time() - step_start
+                })
+            except (ServicedLayerError, DismError, OSError) as e:
+                click.echo(f"   Step 2/9: ⚠️ Serviced layer unavailable, integrating updates in this build: {e}")
+                logger.warning("Serviced layer unavailable, integrating updates per job", LogCategory.UPDATE, {
+                    'error': str(e),
+                    'duration': time.time() - step_start
+                })
         
-        step_duration = time.time() - step_start
-        click.echo(f"   Step 3/9: ✅ WIM mounted at: {mount_point}")
-        logger.info("WIM mount completed", LogCategory.WIM, {
-            'mount_point': str(mount_point),
-            'duration': step_duration,
-            'read_write': mount_info.read_write
-        })
+        if serviced_layer:
+            source_wim, expected_sha256 = serviced_layer.path, None
+        else:
+            source_wim = sbi_asset.path
+            expected_sha256 = sbi_asset.metadata.get('sha256') if build_config.verifyWimCopy else None
+        
+        warm_mount = mount_manager.take_warm(source_wim, job_id)
+        if warm_mount:
+            # The warm pool already copied and mounted this image
+            if serviced_layer:
+                layer_cache.release(serviced_layer)
+            workspace.adopt(warm_mount)
+            workflow = warm_mount.workflow
+            wim_handler = workflow.wim_handler
+            temp_wim = warm_mount.wim_path
+            mount_point = warm_mount.mount_point
+            mount_info = workflow.workflow_state['mount_info']
+            wim_staging = workflow.get_staging_info()
+            click.echo(f"   Step 3/9: ✅ Warm mount taken over at: {mount_point}")
+            update_cli_job(job_db, job_id,
+                current_step="Using warm mount",
+                step_number=3,
+                progress=25
+            )
+            logger.info("Warm mount taken over", LogCategory.WIM, warm_mount.to_dict())
+        else:
+            # Step 1: Prepare WIM
+            click.echo("   Step 2/9: 🔄 WIM Preparation - copying to temporary location...")
+            update_cli_job(job_db, job_id,
+                current_step="Preparing WIM",
+                step_number=2,
+                progress=15
+            )
+            
+            logger.info("Starting WIM preparation", LogCategory.WIM)
+            step_start = time.time()
+            
+            temp_dir = workspace.temp_dir
+            
+            def report_copy_progress(progress):
+                update_cli_job(job_db, job_id,
+                    current_step=f"Preparing WIM ({progress.percent:.0f}%, "
+                                 f"{progress.bytes_per_second / (1024 * 1024):.0f} MB/s)",
+                    progress=15 + int(progress.percent * 0.09)
+                )
+            
+            try:
+                temp_wim = await workflow.prepare_wim_for_modification(
+                    source_wim, temp_dir,
+                    expected_sha256=expected_sha256,
+                    progress_callback=report_copy_progress
+                )
+            finally:
+                if serviced_layer:
+                    layer_cache.release(serviced_layer)
+            
+            step_duration = time.time() - step_start
+            copy_result = wim_handler.last_copy
+            wim_staging = workflow.get_staging_info()
+            staging_note = f", staging cache {'hit' if wim_staging['cache_hit'] else 'miss'}" if wim_staging else ""
+            click.echo(f"   Step 2/9: ✅ WIM copied to: {temp_wim} "
+                       f"({copy_result.method}, {copy_result.bytes_per_second / (1024 * 1024):.0f} MB/s{staging_note})")
+            logger.info("WIM preparation completed", LogCategory.WIM, {
+                'temp_wim': str(temp_wim),
+                'duration': step_duration,
+                'staging': wim_staging,
+                'copy': copy_result.to_dict()
+            })
+            
+            # Step 2: Mount WIM
+            click.echo("   Step 3/9: 🔄 WIM Mounting - mounting for modification...")
+            update_cli_job(job_db, job_id,
+                current_step="Mounting WIM",
+                step_number=3,
+                progress=25
+            )
+            
+            logger.info("Starting WIM mount", LogCategory.WIM)
+            step_start = time.time()
+            
+            mount_point = workspace.mount_point
+            mount_info = await workflow.mount_wim_for_modification(
+                temp_wim, mount_point,
+                progress_callback=step_progress("Mounting WIM", 25, 40, report_step)
+            )
+            
+            step_duration = time.time() - step_start
+            click.echo(f"   Step 3/9: ✅ WIM mounted at: {mount_point}")
+            logger.info("WIM mount completed", LogCategory.WIM, {
+                'mount_point': str(mount_point),
+                'duration': step_duration,
+                'read_write': mount_info.read_write
+            })
         
         # Verify mount
         windows_dir = mount_point / "Windows"
@@ -452,44 +609,109 @@ async def execute_cli_wim_workflow(job_db, job_id: str, kassia_config, assets_su
             )
             raise Exception(error_msg)
         
-        # Step 3: Driver Integration
-        if not skip_drivers and assets_summary['drivers']:
-            driver_count = len(assets_summary['drivers'])
-            click.echo(f"   Step 5/9: 🔄 Driver Integration - integrating {driver_count} drivers...")
+        # Remote assets must be available before integration
+        if needs_assets:
+            await provider.wait_for_prefetch()
+            logger.info("Asset prefetch completed", LogCategory.ASSET, provider.get_fetch_stats())
+        
+        # Drivers and updates the base image already has are not integrated again
+        inventory = None
+        if build_config.imageInventory and (assets_summary['drivers'] or assets_summary['updates']):
+            step_start = time.time()
+            inventory_key = image_inventory_key(sbi_asset.metadata.get('sha256'),
+                                                serviced_layer.key if serviced_layer else None)
+            try:
+                inventory_cache = get_image_inventory_cache(Path(build_config.imageInventoryPath))
+                inventory = await inventory_cache.get_or_read(inventory_key, mount_point)
+                inventory_state = "cache hit" if inventory.cache_hit else f"read in {inventory.seconds:.1f}s"
+                click.echo(f"   📋 Image inventory: {len(inventory.drivers)} driver store INFs, "
+                           f"{len(inventory.packages)} servicing packages ({inventory_state})")
+                logger.info("Image inventory ready", LogCategory.WIM, {
+                    **inventory.to_dict(),
+                    'duration': time.time() - step_start
+                })
+            except Exception as e:
+                logger.warning("Image inventory unavailable, integrating all drivers and updates", LogCategory.WIM, {
+                    'error': str(e)
+                })
+        
+        # Steps 3 and 4: Driver and update integration, Yunona staging alongside servicing
+        drivers_to_integrate = assets_summary['drivers'] if not skip_drivers else []
+        updates_to_integrate = assets_summary['updates'] if not (serviced_layer or skip_updates) else []
+        driver_manager = DriverIntegrationManager(DriverIntegrator(
+            backend=imaging_backend,
+            batch_inf=kassia_config.build.driverInjection == DriverInjection.BATCH,
+            staging_dir=workspace.temp_dir,
+            hardware_ids=kassia_config.device.hardwareIds,
+            deduplicate=kassia_config.build.driverDeduplication,
+            inventory=inventory
+        ))
+        update_manager = UpdateIntegrationManager(UpdateIntegrator(backend=imaging_backend, inventory=inventory))
+        schedule = None
+        
+        if drivers_to_integrate or updates_to_integrate:
+            item_text = f"{len(drivers_to_integrate)} drivers and {len(updates_to_integrate)} updates"
+            click.echo(f"   Step 5/9: 🔄 Integration - integrating {item_text}...")
             update_cli_job(job_db, job_id,
-                current_step=f"Integrating {driver_count} drivers",
+                current_step=f"Integrating {item_text}",
                 step_number=5,
                 progress=50
             )
             
-            logger.info("Starting driver integration", LogCategory.DRIVER, {
-                'driver_count': driver_count
+            logger.info("Starting driver and update integration", LogCategory.WORKFLOW, {
+                'driver_count': len(drivers_to_integrate),
+                'update_count': len(updates_to_integrate),
+                'staging_workers': kassia_config.build.integrationStagingWorkers
             })
-            step_start = time.time()
             
-            # Initialize driver integration
-            driver_integrator = DriverIntegrator()
-            driver_manager = DriverIntegrationManager(driver_integrator)
-            
-            # Execute driver integration
-            integration_result = await driver_manager.integrate_drivers_for_device(
-                assets_summary['drivers'],
+            scheduler = IntegrationScheduler(driver_manager, update_manager,
+                                             kassia_config.build.integrationStagingWorkers)
+            schedule = await scheduler.run(
+                drivers_to_integrate,
+                updates_to_integrate,
                 mount_point,
                 Path(kassia_config.build.yunonaPath),
-                kassia_config.device.deviceId,
-                kassia_config.selectedOsId
+                kassia_config.selectedOsId,
+                progress_callback=step_progress(f"Integrating {item_text}", 50, 85, report_step)
             )
             
-            step_duration = time.time() - step_start
+            servicing, staging = schedule.lanes['servicing'], schedule.lanes['staging']
+            click.echo(f"   ⏱️ Servicing {servicing.wall_seconds:.1f}s ({servicing.items} items), "
+                       f"staging {staging.wall_seconds:.1f}s ({staging.items} items), "
+                       f"total {schedule.seconds:.1f}s - critical path: {schedule.critical_path}")
+            logger.info("Integration lanes", LogCategory.WORKFLOW, schedule.to_dict())
+        
+        # Step 3: Driver Integration
+        if not skip_drivers and assets_summary['drivers']:
+            driver_count = len(assets_summary['drivers'])
+            integration_result = schedule.drivers
+            step_duration = schedule.seconds
             
             if integration_result['success']:
                 successful = integration_result['successful_count']
                 click.echo(f"   Step 5/9: ✅ Driver Integration completed ({successful}/{driver_count} successful)")
+                batch = integration_result.get('batch')
+                if batch and batch['estimated_saved_seconds'] is not None:
+                    click.echo(f"   ⚡ {batch['packages']} INF packages in one run ({batch['seconds']:.1f}s, "
+                               f"about {batch['estimated_saved_seconds']:.1f}s saved)")
+                stats = integration_result['stats']
+                if stats.get('inf_files_skipped'):
+                    click.echo(f"   🎯 {stats['inf_files_selected']} INF files match the device hardware IDs "
+                               f"({stats['inf_files_skipped']} skipped)")
+                versions = integration_result.get('versions')
+                if versions and versions['shadowed_infs']:
+                    click.echo(f"   🧹 {versions['shadowed_infs']} INF files shadowed by newer driver versions "
+                               f"({versions['infs_before']} → {versions['infs_after']} INF files, "
+                               f"{versions['saved_bytes'] / (1024 * 1024):.1f} MB less)")
+                if stats.get('inf_files_present'):
+                    click.echo(f"   📋 {stats['inf_files_present']} INF files already in the image left out")
                 logger.info("Driver integration completed", LogCategory.DRIVER, {
                     'duration': step_duration,
                     'successful_count': successful,
                     'failed_count': integration_result['failed_count'],
-                    'stats': integration_result['stats']
+                    'stats': integration_result['stats'],
+                    'batch': integration_result.get('batch'),
+                    'versions': integration_result.get('versions')
                 })
                 
                 # Display detailed results
@@ -504,6 +726,8 @@ async def execute_cli_wim_workflow(job_db, job_id: str, kassia_config, assets_su
                     'duration': step_duration,
                     'failed_count': failed,
                     'error_message': integration_result['message'],
+                    'batch': integration_result.get('batch'),
+                    'versions': integration_result.get('versions'),
                     'results': [r.__dict__ for r in integration_result['results']]
                 })
                 
@@ -525,33 +749,26 @@ async def execute_cli_wim_workflow(job_db, job_id: str, kassia_config, assets_su
             logger.warning("No drivers found for integration", LogCategory.DRIVER)
         
         # Step 4: Update Integration
-        if not skip_updates and assets_summary['updates']:
-            update_count = len(assets_summary['updates'])
-            click.echo(f"   Step 6/9: 🔄 Update Integration - integrating {update_count} updates...")
+        if serviced_layer:
+            update_count = len(serviced_layer.updates)
+            successful = sum(1 for u in serviced_layer.updates if u['success'])
+            click.echo(f"   Step 6/9: ✅ Update Integration from serviced layer "
+                       f"{serviced_layer.key[:12]} ({successful}/{update_count} updates)")
             update_cli_job(job_db, job_id,
-                current_step=f"Integrating {update_count} updates",
+                current_step="Updates from serviced layer",
                 step_number=6,
                 progress=70
             )
-            
-            logger.info("Starting update integration", LogCategory.UPDATE, {
-                'update_count': update_count
+            logger.info("Updates provided by serviced layer", LogCategory.UPDATE, {
+                'layer_key': serviced_layer.key,
+                'cache_hit': serviced_layer.cache_hit,
+                'updates': serviced_layer.updates
             })
-            step_start = time.time()
-            
-            # Initialize update integration
-            update_integrator = UpdateIntegrator()
-            update_manager = UpdateIntegrationManager(update_integrator)
             
-            # Execute update integration
-            integration_result = await update_manager.integrate_updates_for_os(
-                assets_summary['updates'],
-                mount_point,
-                Path(kassia_config.build.yunonaPath),
-                kassia_config.selectedOsId
-            )
-            
-            step_duration = time.time() - step_start
+        elif not skip_updates and assets_summary['updates']:
+            update_count = len(assets_summary['updates'])
+            integration_result = schedule.updates
+            step_duration = schedule.seconds
             
             if integration_result['success']:
                 successful = integration_result['successful_count']
@@ -606,29 +823,60 @@ async def execute_cli_wim_workflow(job_db, job_id: str, kassia_config, assets_su
         logger.info("Starting WIM export", LogCategory.WIM)
         step_start = time.time()
         
-        export_dir = Path(build_config.exportPath)
+        export_dir = workspace.export_dir
+        export_profile = export_profile or build_config.defaultExportProfile
+        profile = build_config.get_export_profile(export_profile)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        export_name = f"{kassia_config.selectedOsId}_{kassia_config.device.deviceId}_{timestamp}.wim"
+        export_name = f"{kassia_config.selectedOsId}_{kassia_config.device.deviceId}_{timestamp}{profile.extension}"
         export_path = export_dir / export_name
+        export_progress = step_progress("Exporting WIM", 85, 95, report_step, FINALIZE_OPERATIONS)
+        variant = None
         
-        # Export final WIM
-        final_wim = await workflow.finalize_and_export_wim(
-            mount_point, 
-            export_path, 
-            export_name=f"Kassia {kassia_config.device.deviceId} OS{kassia_config.selectedOsId}"
-        )
+        if build_config.exportMode == ExportMode.APPEND:
+            # Append the build as the device's index of the shared WIM of the OS
+            variant = await workflow.finalize_and_append_wim(
+                mount_point,
+                get_variant_store(Path(build_config.variantWimPath), imaging_backend,
+                                  build_config.variantWimCompactPercent),
+                kassia_config.selectedOsId,
+                kassia_config.device.deviceId,
+                progress_callback=export_progress,
+                compression=profile.compression
+            )
+            final_wim = variant.wim_path
+            export_name = variant.device_id
+        else:
+            # Export final WIM
+            final_wim = await workflow.finalize_and_export_wim(
+                mount_point, 
+                export_path, 
+                export_name=f"Kassia {kassia_config.device.deviceId} OS{kassia_config.selectedOsId}",
+                progress_callback=export_progress,
+                strategy=build_config.finalizeStrategy.value,
+                compression=profile.compression,
+                split_size_mb=profile.splitSizeMB
+            )
+        finalize_info = workflow.get_finalize_info()
         
         step_duration = time.time() - step_start
-        export_size = final_wim.stat().st_size
+        export_size = finalize_info['size']
         export_size_mb = export_size / (1024 * 1024)
         
-        click.echo(f"   Step 7/9: ✅ WIM exported to: {final_wim}")
-        click.echo(f"   📊 Final WIM size: {export_size_mb:.1f} MB")
+        if variant:
+            click.echo(f"   Step 7/9: ✅ WIM appended to: {final_wim} (index {variant.index})")
+            click.echo(f"   📊 Shared WIM size: {export_size_mb:.1f} MB "
+                       f"(+{variant.added_bytes / (1024 * 1024):.1f} MB)")
+        else:
+            click.echo(f"   Step 7/9: ✅ WIM exported to: {final_wim} (profile {export_profile})")
+            click.echo(f"   📊 Final WIM size: {export_size_mb:.1f} MB ({finalize_info['parts']} file(s))")
         logger.info("WIM export completed", LogCategory.WIM, {
             'duration': step_duration,
             'final_wim': str(final_wim),
             'size_mb': export_size_mb,
-            'export_name': export_name
+            'export_name': export_name,
+            'export_profile': export_profile,
+            'variant': variant.to_dict() if variant else None,
+            'finalize': finalize_info
         })
         
         # Step 6: Cleanup
@@ -643,6 +891,9 @@ async def execute_cli_wim_workflow(job_db, job_id: str, kassia_config, assets_su
         step_start = time.time()
         
         await workflow.cleanup_workflow(keep_export=True)
+        workspace_info = workspace.to_dict()
+        mount_manager.release(workspace, remove_dirs=not wim_handler.mounted_images)
+        workspace = None
         
         step_duration = time.time() - step_start
         click.echo("   Step 8/9: ✅ Cleanup completed")
@@ -658,7 +909,20 @@ async def execute_cli_wim_workflow(job_db, job_id: str, kassia_config, assets_su
             'final_wim_size_mb': export_size_mb,
             'total_duration_seconds': workflow_duration,
             'driver_integration': locals().get('integration_result', {}),
-            'export_name': export_name
+            'export_name': export_name,
+            'variant': variant.to_dict() if variant else {},
+            'finalize': finalize_info,
+            'integration_lanes': schedule.to_dict() if schedule else {},
+            'driver_versions': (schedule.drivers.get('versions') or {}) if schedule else {},
+            'image_inventory': inventory.to_dict() if inventory else {},
+            'export_profile': export_profile,
+            'asset_digests': collect_asset_digests(assets_summary),
+            'asset_fetch': provider.get_fetch_stats() if provider else {},
+            'wim_copy': wim_handler.last_copy.to_dict() if wim_handler.last_copy else {},
+            'wim_staging': wim_staging,
+            'workspace': workspace_info,
+            'serviced_layer': serviced_layer.to_dict() if serviced_layer else {},
+            'serviced_layer_cache': layer_cache.get_cache_info() if layer_cache else {}
         }
         
         update_cli_job(job_db, job_id,
@@ -736,11 +1000,27 @@ async def execute_cli_wim_workflow(job_db, job_id: str, kassia_config, assets_su
             import traceback
             traceback.print_exc()
         
+        # Emergency cleanup
+        if workspace is not None:
+            try:
+                await workflow.cleanup_workflow(keep_export=False)
+                logger.info("Emergency cleanup completed", LogCategory.SYSTEM)
+            except Exception as cleanup_error:
+                logger.error("Emergency cleanup failed", LogCategory.SYSTEM, {
+                    'cleanup_error': str(cleanup_error)
+                })
+        
         # Finalize job logging with error
         finalize_job_logging(job_id, "failed", error_msg)
         
         return None
     finally:
+        if workspace is not None:
+            # Directories that are still mounted are left for manual cleanup
+            mount_manager.release(workspace, remove_dirs=not wim_handler.mounted_images)
+        if assets_summary.get('provider') is not None:
+            # Remote packages of this build may be evicted by other builds from now on
+            assets_summary['provider'].release()
         logger.clear_context()
 
 @click.command()
@@ -753,13 +1033,23 @@ async def execute_cli_wim_workflow(job_db, job_id: str, kassia_config, assets_su
 @click.option('--no-cleanup', is_flag=True, help='Skip cleanup (for debugging)')
 @click.option('--list-assets', is_flag=True, help='List available assets and exit')
 @click.option('--list-jobs', is_flag=True, help='List previous CLI jobs and exit')
+@click.option('--generate-manifests', is_flag=True, help='Write precomputed driver package manifests and exit')
+@click.option('--verify-manifests', is_flag=True, help='Verify driver package manifests against the files and exit')
+@click.option('--export-profile', metavar='NAME', help='Export profile of the build (default: defaultExportProfile)')
+@click.option('--benchmark-export', is_flag=True, help='Measure the export profiles on the SBI of the OS and exit')
+@click.option('--list-variants', is_flag=True, help='List the device images in the shared WIM of the OS and exit')
+@click.option('--extract-variant', metavar='DEVICE_ID', help='Export a device image from the shared WIM of the OS and exit')
+@click.option('--output', type=click.Path(path_type=Path), help='Target WIM for --extract-variant')
 @click.option('--verbose', '-v', is_flag=True, help='Verbose logging')
 @click.option('--log-file/--no-log-file', default=True, help='Enable/disable file logging')
 @click.option('--db-path', type=click.Path(path_type=Path), help='Custom database path')
 @click.version_option(version=__version__)
 def cli(device: Optional[str], os_id: int, validate: bool, debug: bool, 
         skip_drivers: bool, skip_updates: bool, no_cleanup: bool, list_assets: bool,
-        list_jobs: bool, verbose: bool, log_file: bool, db_path: Optional[Path]):
+        list_jobs: bool, generate_manifests: bool, verify_manifests: bool,
+        export_profile: Optional[str], benchmark_export: bool,
+        list_variants: bool, extract_variant: Optional[str], output: Optional[Path],
+        verbose: bool, log_file: bool, db_path: Optional[Path]):
     """
     🚀 Kassia Windows Image Preparation System - Python CLI with Database Integration
     """
@@ -781,7 +1071,13 @@ def cli(device: Optional[str], os_id: int, validate: bool, debug: bool,
             'skip_drivers': skip_drivers,
             'skip_updates': skip_updates,
             'verbose': verbose,
-            'list_jobs': list_jobs
+            'list_jobs': list_jobs,
+            'generate_manifests': generate_manifests,
+            'verify_manifests': verify_manifests,
+            'export_profile': export_profile,
+            'benchmark_export': benchmark_export,
+            'list_variants': list_variants,
+            'extract_variant': extract_variant
         }
     })
     
@@ -840,6 +1136,63 @@ def cli(device: Optional[str], os_id: int, validate: bool, debug: bool,
             
             return
         
+        # Handle package manifest commands
+        if generate_manifests or verify_manifests:
+            build_config = ConfigLoader.load_build_config()
+            click.echo(f"📦 {'Generating' if generate_manifests else 'Verifying'} driver package manifests...")
+            failed = manage_package_manifests(build_config, generate=generate_manifests)
+            if failed:
+                click.echo(f"\n❌ {failed} package manifest(s) with problems")
+                sys.exit(1)
+            click.echo("\n✅ Package manifests OK")
+            return
+        
+        # Handle export profile benchmark
+        if benchmark_export:
+            build_config = ConfigLoader.load_build_config()
+            try:
+                profiles = ({export_profile: build_config.get_export_profile(export_profile)}
+                            if export_profile else build_config.exportProfiles)
+                click.echo(f"⏱️ Benchmarking {len(profiles)} export profile(s) on the SBI of OS {os_id}...")
+                results, summary = asyncio.run(run_export_profile_benchmark(build_config, os_id, profiles))
+            except (ValueError, DismError) as e:
+                click.echo(f"❌ {e}")
+                sys.exit(1)
+            for result in results:
+                click.echo(f"   ✅ {result.profile}: {result.throughput_mb_s:.1f} MB/s, ratio {result.ratio:.3f}, "
+                           f"{result.output_bytes / (1024 * 1024):.1f} MB in {result.parts} part(s), "
+                           f"{result.seconds:.1f}s")
+            click.echo("\n📊 Recorded averages (fastest first):")
+            for entry in summary:
+                click.echo(f"   {entry['profile']} [{entry['backend']}]: {entry['throughput_mb_s']:.1f} MB/s, "
+                           f"ratio {entry['ratio']:.3f} ({entry['runs']} run(s))")
+            return
+        
+        # Handle shared variant WIM commands
+        if list_variants or extract_variant:
+            build_config = ConfigLoader.load_build_config()
+            store = get_variant_store(Path(build_config.variantWimPath), create_imaging_backend(build_config),
+                                      build_config.variantWimCompactPercent)
+            if extract_variant:
+                target = output or Path(build_config.exportPath) / f"{os_id}_{extract_variant}.wim"
+                click.echo(f"📤 Extracting {extract_variant} from {store.wim_path(os_id)}...")
+                try:
+                    extracted = asyncio.run(store.extract(os_id, extract_variant, target))
+                except (VariantWimError, DismError) as e:
+                    click.echo(f"❌ {e}")
+                    sys.exit(1)
+                click.echo(f"✅ Extracted to: {extracted}")
+                return
+            
+            click.echo(f"🗂️ Device images in {store.wim_path(os_id)}:")
+            images = asyncio.run(store.list_images(os_id))
+            if not images:
+                click.echo("   No device images found.")
+            for image in images:
+                modified = image.modified.strftime('%Y-%m-%d %H:%M') if image.modified else "N/A"
+                click.echo(f"   {image.index:>3}. {image.device_id} | {image.total_bytes / (1024 * 1024):.1f} MB | {modified}")
+            return
+        
         # Check prerequisites
         click.echo("🔍 Checking prerequisites...")
         prereq_result = check_prerequisites()
@@ -915,6 +1268,7 @@ def cli(device: Optional[str], os_id: int, validate: bool, debug: bool,
         
         try:
             kassia_config = ConfigLoader.create_kassia_config(device, os_id)
+            kassia_config.build.get_export_profile(export_profile)
             config_duration = time.time() - config_start
             
             click.echo("✅ Configuration loaded and validated successfully")
@@ -992,7 +1346,7 @@ Total Assets: {total_assets}
         
         # Execute WIM Workflow
         final_wim = asyncio.run(execute_cli_wim_workflow(
-            job_db, job_id, kassia_config, assets_summary, skip_drivers, skip_updates, debug
+            job_db, job_id, kassia_config, assets_summary, skip_drivers, skip_updates, debug, export_profile
         ))
         
         # Final summary
@@ -1124,6 +1478,81 @@ def list_devices() -> List[str]:
     return sorted(devices)
 
 
+def manage_package_manifests(build_config, generate: bool) -> int:
+    """Generate or verify precomputed driver package manifests.
+    
+    Returns the number of packages with problems.
+    """
+    logger = get_logger("kassia.assets")
+    driver_root = Path(build_config.driverRoot)
+    action = "generate" if generate else "verify"
+    
+    if not driver_root.exists():
+        click.echo(f"❌ Drivers path does not exist: {driver_root}")
+        return 1
+    
+    # Same package discovery as the catalog, including packages nested below grouping directories
+    config_files = get_asset_catalog(Path(build_config.assetCatalogPath)).scan_configs(driver_root)
+    
+    failed = 0
+    for config_file in config_files:
+        package_name = config_file.parent.relative_to(driver_root).as_posix()
+        if package_name == ".":
+            package_name = config_file.name
+        try:
+            if generate:
+                with open(config_file, 'r', encoding='utf-8') as f:
+                    driver_type = json.load(f).get('driverType')
+                if not driver_type:
+                    manifest = get_package_manifest(config_file.parent)
+                    driver_type = next((t for t in ("inf", "appx", "exe") if manifest.has(f".{t}")), "inf")
+                manifest_path = generate_manifest_file(config_file, driver_type)
+                click.echo(f"   ✅ {package_name}: {manifest_path.name}")
+            else:
+                problems = verify_manifest_file(config_file)
+                if problems:
+                    failed += 1
+                    click.echo(f"   ❌ {package_name}:")
+                    for problem in problems[:10]:
+                        click.echo(f"      - {problem}")
+                    if len(problems) > 10:
+                        click.echo(f"      ... and {len(problems) - 10} more")
+                else:
+                    click.echo(f"   ✅ {package_name}")
+        except Exception as e:
+            failed += 1
+            click.echo(f"   ❌ {package_name}: {e}")
+    
+    logger.info(f"Package manifests {action} completed", LogCategory.ASSET, {
+        'driver_root': str(driver_root),
+        'packages': len(config_files),
+        'failed': failed
+    })
+    
+    return failed
+
+
+async def run_export_profile_benchmark(build_config, os_id: int, profiles: dict):
+    """Benchmark export profiles on the SBI of an OS; returns the results and the recorded summary."""
+    provider = create_asset_provider(build_config, Path("assets"))
+    sbi_asset = await provider.get_sbi(os_id)
+    if not sbi_asset:
+        raise DismError(f"No SBI found for OS {os_id}")
+    
+    wim_handler = WimHandler(backend=create_imaging_backend(build_config))
+    benchmark = get_export_benchmark(Path(build_config.exportBenchmarkPath))
+    results = await run_export_benchmark(
+        wim_handler, Path(sbi_asset.path), profiles, Path(build_config.tempPath) / "export_benchmark", benchmark
+    )
+    
+    get_logger("kassia.export").info("Export profile benchmark completed", LogCategory.WIM, {
+        'os_id': os_id,
+        'sbi': str(sbi_asset.path),
+        'results': [result.to_dict() for result in results]
+    })
+    return results, benchmark.summary()
+
+
 def initialize_directories(build_config) -> None:
     """Initialize required directories with logging."""
     logger = get_logger("kassia.system")
@@ -19,6 +19,33 @@ class AssetProviderType(str, Enum):
     HYBRID = "hybrid"
 
 
+class ImagingBackendType(str, Enum):
+    """Imaging backend types."""
+    DISM = "dism"
+    WIMLIB = "wimlib"
+    SIMULATED = "simulated"
+
+
+class ExportMode(str, Enum):
+    """How finished device builds are written."""
+    SINGLE = "single"   # one standalone WIM per build
+    APPEND = "append"   # one index per device in a shared WIM per OS
+
+
+class FinalizeStrategy(str, Enum):
+    """How a mounted image is turned into the final WIM."""
+    AUTO = "auto"         # choose from compression and backend
+    EXPORT = "export"     # commit into the temp WIM, then export it
+    COMMIT = "commit"     # commit into the temp WIM, optimize it in place and move it
+    CAPTURE = "capture"   # capture the mounted tree into the destination, then discard
+
+
+class DriverInjection(str, Enum):
+    """How INF driver packages are added to the mounted image."""
+    PACKAGE = "package"   # one add-driver run per package
+    BATCH = "batch"       # all packages in one add-driver run over a hardlinked staging tree
+
+
 class LogLevel(str, Enum):
     """Logging levels."""
     DEBUG = "DEBUG"
@@ -49,6 +76,10 @@ class DeviceConfig(BaseModel):
     description: Optional[str] = Field(None, description="Device description")
     manufacturer: Optional[str] = Field(None, description="Device manufacturer")
     model: Optional[str] = Field(None, description="Device model")
+    hardwareIds: List[str] = Field(
+        default_factory=list,
+        description="Hardware IDs of the device; when set, only INF files matching them are injected"
+    )
     
     @validator('deviceId')
     def validate_device_id(cls, v):
@@ -107,10 +138,14 @@ class LocalAssetConfig(BaseModel):
 class SharePointAssetConfig(BaseModel):
     """SharePoint asset provider configuration."""
     siteUrl: str = Field(..., description="SharePoint site URL")
-    clientId: str = Field(..., description="Azure AD client ID")
-    clientSecret: str = Field(..., description="Azure AD client secret")
+    clientId: Optional[str] = Field(default=None, description="Azure AD client ID")
+    clientSecret: Optional[str] = Field(default=None, description="Azure AD client secret")
+    accessToken: Optional[str] = Field(default=None, description="Bearer token for authenticated libraries")
     cachePath: str = Field(default=".\\cache", description="Local cache directory")
     cacheTTL: int = Field(default=3600, description="Cache TTL in seconds")
+    cacheMaxSizeMB: int = Field(default=20480, description="Maximum size of the local package cache in MB")
+    downloadWorkers: int = Field(default=4, description="Concurrent package downloads")
+    requestTimeout: int = Field(default=60, description="HTTP request timeout in seconds")
     
     @validator('siteUrl')
     def validate_site_url(cls, v):
@@ -123,6 +158,90 @@ class SharePointAssetConfig(BaseModel):
         if v < 0:
             raise ValueError('Cache TTL must be non-negative')
         return v
+    
+    @validator('cacheMaxSizeMB', 'downloadWorkers', 'requestTimeout')
+    def validate_positive(cls, v):
+        if v < 1:
+            raise ValueError('Value must be at least 1')
+        return v
+
+
+class HybridAssetConfig(BaseModel):
+    """Hybrid asset provider configuration (local tree first, remote fallback)."""
+    assetsPath: str = Field(default=".\\assets", description="Local assets directory path")
+    remote: SharePointAssetConfig = Field(..., description="Remote asset source")
+    prefetch: bool = Field(default=True, description="Download remote assets in the background during WIM preparation")
+
+
+class ImagingBackendConfig(BaseModel):
+    """Imaging backend configuration."""
+    type: ImagingBackendType = Field(default=ImagingBackendType.DISM, description="Imaging backend type")
+    config: Dict[str, Any] = Field(default_factory=dict, description="Backend-specific configuration")
+
+
+class WimlibImagingConfig(BaseModel):
+    """wimlib-imagex backend configuration."""
+    wimlibPath: str = Field(default="wimlib-imagex", description="wimlib-imagex executable path")
+
+
+class SimulatedImagingConfig(BaseModel):
+    """Simulated imaging backend configuration (benchmarks and tests)."""
+    latency: Dict[str, float] = Field(default_factory=dict, description="Seconds per operation")
+    jitter: float = Field(default=0.0, description="Relative latency jitter (0.1 = +/-10%)")
+    failureRate: float = Field(default=0.0, description="Failure probability of every operation")
+    failures: Dict[str, float] = Field(default_factory=dict, description="Failure probability per operation")
+    seed: int = Field(default=0, description="Random seed")
+    finalizeStrategies: List[str] = Field(
+        default_factory=list, description="Finalize strategies to emulate (default: export only)"
+    )
+    
+    @validator('failureRate', 'jitter')
+    def validate_fraction(cls, v):
+        if not 0 <= v <= 1:
+            raise ValueError('Value must be between 0 and 1')
+        return v
+
+
+class ExportProfile(BaseModel):
+    """Named compression (and optional split) settings of the final WIM."""
+    compression: str = Field(default="max", description="none, fast, max or recovery")
+    splitSizeMB: Optional[int] = Field(None, description="Split the WIM into .swm parts of this size")
+    description: str = Field(default="", description="Profile description")
+    
+    @validator('compression')
+    def validate_compression(cls, v):
+        v = v.lower()
+        if v not in ('none', 'fast', 'max', 'recovery'):
+            raise ValueError('Compression must be none, fast, max or recovery')
+        return v
+    
+    @validator('splitSizeMB')
+    def validate_split_size(cls, v, values):
+        if v is not None:
+            if v < 1:
+                raise ValueError('Split size must be at least 1 MB')
+            if values.get('compression') == 'recovery':
+                raise ValueError('Recovery (ESD) images cannot be split')
+        return v
+    
+    @property
+    def extension(self) -> str:
+        """File extension of the exported image."""
+        if self.splitSizeMB:
+            return ".swm"
+        return ".esd" if self.compression == "recovery" else ".wim"
+
+
+def default_export_profiles() -> Dict[str, ExportProfile]:
+    """Built-in export profiles."""
+    return {
+        'lab-none': ExportProfile(compression="none", description="Uncompressed, fastest export for throwaway builds"),
+        'lab-fast': ExportProfile(compression="fast", description="XPRESS compression for lab and test builds"),
+        'release-max': ExportProfile(compression="max", description="LZX compression for release builds"),
+        'release-recovery': ExportProfile(compression="recovery", description="LZMS (ESD), smallest and slowest"),
+        'usb-split-4g': ExportProfile(compression="max", splitSizeMB=4000,
+                                      description="LZX split into .swm parts that fit on FAT32 media")
+    }
 
 
 class BuildConfig(BaseModel):
@@ -138,6 +257,77 @@ class BuildConfig(BaseModel):
     updateRoot: str = Field(default=".\\assets\\updates", description="Updates directory")
     yunonaPath: str = Field(default=".\\assets\\yunona", description="Yunona scripts directory")
     sbiRoot: str = Field(default=".\\assets\\sbi", description="System Base Images directory")
+    assetCatalogPath: str = Field(
+        default=".\\runtime\\data\\kassia_asset_catalog.db",
+        description="Persistent asset catalog database"
+    )
+    trustedManifests: bool = Field(
+        default=False,
+        description="Use declared driver types and precomputed package manifests without scanning"
+    )
+    discoveryWorkers: int = Field(default=8, description="Worker threads for asset discovery")
+    assetDigests: bool = Field(default=True, description="Compute and verify SHA-256 digests of assets")
+    digestCachePath: str = Field(
+        default=".\\runtime\\data\\kassia_digest_cache.db",
+        description="Persistent asset digest cache database"
+    )
+    digestWorkers: int = Field(default=2, description="Worker threads for asset hashing")
+    verifyWimCopy: bool = Field(
+        default=False,
+        description="Hash the SBI while copying it and compare with its recorded SHA-256"
+    )
+    wimStagingCache: bool = Field(default=True, description="Clone SBIs from a local staging cache per job")
+    wimStagingCachePath: str = Field(default=".\\runtime\\cache\\sbi", description="SBI staging cache directory")
+    wimStagingCacheMaxSizeMB: int = Field(default=51200, description="Maximum size of the SBI staging cache in MB")
+    servicedLayerCache: bool = Field(
+        default=True,
+        description="Integrate OS updates once per SBI and update set, and reuse the result for all devices"
+    )
+    servicedLayerCachePath: str = Field(default=".\\runtime\\cache\\layers", description="Serviced layer cache directory")
+    servicedLayerCacheMaxSizeMB: int = Field(default=102400, description="Maximum size of the serviced layer cache in MB")
+    maxConcurrentBuilds: int = Field(default=2, description="Builds that may run at the same time")
+    warmMountPool: int = Field(default=0, description="Read-write mounts of frequently used images kept ready")
+    warmMountThreshold: int = Field(default=2, description="Uses of an image before it is kept warm")
+    mountJournalPath: str = Field(
+        default=".\\runtime\\data\\kassia_mount_journal.db",
+        description="Journal of the images mounted by Kassia, used to recover mounts after a crash"
+    )
+    mountRecoveryWorkers: int = Field(default=4, description="Orphaned mounts recovered in parallel at startup")
+    driverInjection: DriverInjection = Field(
+        default=DriverInjection.BATCH, description="Add INF drivers per package or in one batched run"
+    )
+    driverDeduplication: bool = Field(
+        default=True, description="Inject only the newest DriverVer per hardware ID across INF driver packages"
+    )
+    imageInventory: bool = Field(
+        default=True, description="Skip drivers and updates the mounted base image already contains"
+    )
+    imageInventoryPath: str = Field(
+        default=".\\runtime\\data\\kassia_image_inventory.db",
+        description="Cache of the driver store and servicing packages of base images, by image digest"
+    )
+    integrationStagingWorkers: int = Field(
+        default=4, description="Workers copying Yunona-staged drivers and updates while servicing runs"
+    )
+    exportMode: ExportMode = Field(default=ExportMode.SINGLE, description="Export mode of finished builds")
+    finalizeStrategy: FinalizeStrategy = Field(
+        default=FinalizeStrategy.AUTO, description="How a mounted image is turned into the final WIM"
+    )
+    exportProfiles: Dict[str, ExportProfile] = Field(
+        default_factory=default_export_profiles, description="Named export compression profiles"
+    )
+    defaultExportProfile: str = Field(default="release-max", description="Export profile used unless a build selects one")
+    exportBenchmarkPath: str = Field(
+        default=".\\runtime\\data\\kassia_export_benchmark.db",
+        description="Recorded export profile benchmark results"
+    )
+    variantWimPath: str = Field(
+        default=".\\runtime\\export\\variants",
+        description="Directory of the shared per-OS WIMs written in append export mode"
+    )
+    variantWimCompactPercent: int = Field(
+        default=25, description="Share of a shared WIM left behind by replaced images that triggers a rewrite"
+    )
     
     # OS to WIM mapping
     osWimMap: Dict[str, str] = Field(default_factory=dict, description="OS ID to WIM file mapping")
@@ -145,14 +335,63 @@ class BuildConfig(BaseModel):
     # Asset provider
     assetProvider: Optional[AssetProviderConfig] = Field(None, description="Asset provider configuration")
     
+    # Imaging backend
+    imagingBackend: Optional[ImagingBackendConfig] = Field(None, description="Imaging backend configuration")
+    
     # Windows tools
     windowsTools: Optional[WindowsTools] = Field(default_factory=WindowsTools, description="Windows tool paths")
     
-    @validator('mountPoint', 'tempPath', 'exportPath', 'driverRoot', 'updateRoot', 'yunonaPath', 'sbiRoot')
+    @validator('mountPoint', 'tempPath', 'exportPath', 'driverRoot', 'updateRoot', 'yunonaPath', 'sbiRoot',
+               'assetCatalogPath', 'digestCachePath', 'wimStagingCachePath', 'servicedLayerCachePath',
+               'mountJournalPath', 'variantWimPath', 'exportBenchmarkPath', 'imageInventoryPath')
     def validate_directory_paths(cls, v):
         # Normalisiere Pfad aber validiere nicht die Existenz
         return str(Path(v).resolve())
     
+    @validator('discoveryWorkers', 'digestWorkers', 'mountRecoveryWorkers', 'integrationStagingWorkers')
+    def validate_worker_count(cls, v):
+        if v < 1:
+            raise ValueError('Worker count must be at least 1')
+        return v
+    
+    @validator('maxConcurrentBuilds', 'warmMountThreshold')
+    def validate_build_limits(cls, v):
+        if v < 1:
+            raise ValueError('Value must be at least 1')
+        return v
+    
+    @validator('warmMountPool')
+    def validate_pool_size(cls, v):
+        if v < 0:
+            raise ValueError('Warm mount pool size cannot be negative')
+        return v
+    
+    @validator('wimStagingCacheMaxSizeMB', 'servicedLayerCacheMaxSizeMB')
+    def validate_cache_size(cls, v):
+        if v < 1:
+            raise ValueError('Cache size must be at least 1 MB')
+        return v
+    
+    @validator('variantWimCompactPercent')
+    def validate_compact_percent(cls, v):
+        if not 0 <= v <= 100:
+            raise ValueError('Compaction threshold must be between 0 and 100 percent')
+        return v
+    
+    @validator('defaultExportProfile')
+    def validate_default_export_profile(cls, v, values):
+        profiles = values.get('exportProfiles')
+        if profiles is not None and v not in profiles:
+            raise ValueError(f'Unknown export profile: {v}')
+        return v
+    
+    def get_export_profile(self, name: Optional[str] = None) -> ExportProfile:
+        """Get an export profile by name (the default profile if not given)."""
+        name = name or self.defaultExportProfile
+        if name not in self.exportProfiles:
+            raise ValueError(f"Unknown export profile: {name} (available: {', '.join(self.exportProfiles)})")
+        return self.exportProfiles[name]
+    
     @validator('osWimMap')
     def validate_os_wim_map(cls, v):
         if not v:
@@ -0,0 +1,251 @@
+# app/utils/digest_cache.py - Persistent content digest cache
+
+"""
+Content Digest Cache - SHA-256 digests persisted by file identity
+"""
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Optional, Any, Iterable, Tuple
+import logging
+
+logger = logging.getLogger("kassia.digest")
+
+
+DEFAULT_DIGEST_CACHE_PATH = Path("runtime/data/kassia_digest_cache.db")
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024  # 4 MB reads
+
+
+class DigestCache:
+    """SHA-256 digests keyed by (device, inode, size, mtime).
+
+    A lookup for an unchanged file costs one ``stat``; files are only re-hashed
+    when their identity or modification time changes.
+    """
+
+    def __init__(self, db_path: Path = DEFAULT_DIGEST_CACHE_PATH, workers: int = 2,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.db_path = Path(db_path)
+        self.buffer_size = buffer_size
+        self.workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="kassia-digest")
+        self._memory: Dict[Tuple[int, int, int, int], str] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'bytes_hashed': 0, 'hash_seconds': 0.0}
+        self.init_database()
+
+    def init_database(self):
+        """Initialize digest cache schema."""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS file_digests (
+                    device INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    path TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    computed_at TEXT NOT NULL,
+                    PRIMARY KEY (device, inode, size, mtime_ns)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_digest_path ON file_digests (path)')
+            conn.commit()
+
+    # Public API
+
+    def get_cached(self, path: Path) -> Optional[str]:
+        """Get the digest of a file if it is cached and unchanged."""
+        key = self._identity(Path(path))
+        return self._lookup(key) if key else None
+
+    def digest(self, path: Path) -> str:
+        """Get the SHA-256 digest of a file, hashing only if it changed."""
+        path = Path(path)
+        key = self._identity(path)
+        if key is None:
+            raise FileNotFoundError(f"File not found: {path}")
+
+        cached = self._lookup(key)
+        if cached:
+            with self._lock:
+                self.stats['hits'] += 1
+            return cached
+
+        digest = self._hash_file(path)
+
+        # Only store the digest if the file did not change while hashing
+        if self._identity(path) == key:
+            self._store(key, path, digest)
+        else:
+            logger.warning(f"File changed while hashing, digest not cached: {path}")
+
+        with self._lock:
+            self.stats['misses'] += 1
+        return digest
+
+    def digest_tree(self, root: Path, files: Iterable[Path]) -> str:
+        """Get a combined digest of a directory from the digests of its files."""
+        root = Path(root)
+        tree_hash = hashlib.sha256()
+        for file_path in sorted(Path(f) for f in files):
+            relative = file_path.relative_to(root).as_posix()
+            tree_hash.update(f"{relative}\0{self.digest(file_path)}\n".encode('utf-8'))
+        return tree_hash.hexdigest()
+
+    async def digest_async(self, path: Path) -> str:
+        """Hash a file on the digest worker pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.digest, Path(path))
+
+    async def digest_tree_async(self, root: Path, files: Iterable[Path]) -> str:
+        """Hash a directory on the digest worker pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.digest_tree, Path(root), list(files))
+
+    async def digest_many(self, paths: Iterable[Path]) -> Dict[str, str]:
+        """Hash several files concurrently on the digest worker pool."""
+        paths = [Path(p) for p in paths]
+        digests = await asyncio.gather(*(self.digest_async(p) for p in paths))
+        return {str(p): d for p, d in zip(paths, digests)}
+
+    def clear(self) -> None:
+        """Drop all cached digests."""
+        with self._lock:
+            self._memory.clear()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('DELETE FROM file_digests')
+            conn.commit()
+
+    def get_cache_info(self) -> Dict[str, Any]:
+        """Get digest cache statistics."""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                entries = conn.execute('SELECT COUNT(*) FROM file_digests').fetchone()[0]
+        except Exception as e:
+            logger.error(f"Failed to read digest cache info: {e}")
+            entries = 0
+
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        return {
+            'cache_path': str(self.db_path),
+            'entries': entries,
+            'workers': self.workers,
+            'hit_rate': round(stats['hits'] / lookups, 3) if lookups else 0.0,
+            **stats
+        }
+
+    # Helper methods
+
+    @staticmethod
+    def _identity(path: Path) -> Optional[Tuple[int, int, int, int]]:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _lookup(self, key: Tuple[int, int, int, int]) -> Optional[str]:
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                row = conn.execute(
+                    'SELECT sha256 FROM file_digests WHERE device = ? AND inode = ? AND size = ? AND mtime_ns = ?',
+                    key
+                ).fetchone()
+        except Exception as e:
+            logger.error(f"Failed to query digest cache: {e}")
+            return None
+
+        if row:
+            with self._lock:
+                self._memory[key] = row[0]
+            return row[0]
+        return None
+
+    def _store(self, key: Tuple[int, int, int, int], path: Path, digest: str) -> None:
+        with self._lock:
+            self._memory[key] = digest
+
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                # A path has one current identity; drop digests of older versions
+                conn.execute('DELETE FROM file_digests WHERE path = ?', (str(path),))
+                conn.execute('''
+                    INSERT OR REPLACE INTO file_digests (
+                        device, inode, size, mtime_ns, path, sha256, computed_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (*key, str(path), digest, datetime.now().isoformat()))
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to persist digest for {path}: {e}")
+
+    def _hash_file(self, path: Path) -> str:
+        start = time.perf_counter()
+        sha256 = hashlib.sha256()
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        total = 0
+
+        with open(path, 'rb', buffering=0) as f:
+            while True:
+                read = f.readinto(buffer)
+                if not read:
+                    break
+                sha256.update(view[:read])
+                total += read
+
+        duration = time.perf_counter() - start
+        with self._lock:
+            self.stats['bytes_hashed'] += total
+            self.stats['hash_seconds'] += duration
+
+        logger.debug(f"Hashed {path} ({total} bytes in {duration:.2f}s)")
+        return sha256.hexdigest()
+
+
+def collect_asset_digests(assets_summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Collect the digests recorded in asset metadata for job results."""
+    digests: Dict[str, Any] = {}
+
+    sbi = assets_summary.get('sbi')
+    if sbi is not None and sbi.metadata.get('sha256'):
+        digests['sbi'] = {sbi.name: sbi.metadata['sha256']}
+
+    for kind in ('drivers', 'updates', 'yunona_scripts'):
+        kind_digests = {
+            asset.name: asset.metadata['sha256']
+            for asset in assets_summary.get(kind, []) or []
+            if asset.metadata.get('sha256')
+        }
+        if kind_digests:
+            digests[kind] = kind_digests
+
+    return digests
+
+
+# Global digest cache instances (one per database path)
+_digest_cache_instances: Dict[str, DigestCache] = {}
+_digest_cache_lock = threading.Lock()
+
+
+def get_digest_cache(db_path: Path = DEFAULT_DIGEST_CACHE_PATH, workers: int = 2) -> DigestCache:
+    """Get the shared digest cache for a database path."""
+    key = str(Path(db_path).resolve())
+    with _digest_cache_lock:
+        if key not in _digest_cache_instances:
+            _digest_cache_instances[key] = DigestCache(Path(db_path), workers=workers)
+        return _digest_cache_instances[key]
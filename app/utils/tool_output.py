@@ -0,0 +1,262 @@
+# app/utils/tool_output.py - Streaming output of imaging tools
+
+"""
+Tool Output - Line-streaming subprocess runner for DISM and wimlib-imagex
+
+Long-running imaging commands (mount, commit, export, add-package) report
+their progress on stdout while they run:
+
+- DISM redraws a bar with carriage returns: ``[=====      45.0%        ]``
+- wimlib-imagex prints ``Writing data: 1203 MiB of 4096 MiB (29%) done``
+
+``run_streaming`` reads the output as it arrives instead of waiting for the
+process to exit. ``ToolOutputParser`` turns progress bars into throttled
+``ToolProgress`` callbacks, picks up DISM ``Error: 0x...`` codes and keeps
+only a bounded tail of the remaining lines. ``parse_add_driver_output``
+attributes the result of a recursive ``/Add-Driver`` run to each INF.
+"""
+
+import asyncio
+import codecs
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, List, Optional, Sequence
+import logging
+
+logger = logging.getLogger("kassia.tool_output")
+
+
+DEFAULT_TAIL_LINES = 200        # output lines kept per command
+PROGRESS_INTERVAL = 0.5         # seconds between progress reports
+READ_CHUNK_SIZE = 4096
+
+# DISM: "[==========                 20.0%                          ]"
+_DISM_PROGRESS = re.compile(r"\[[=\s]*(\d{1,3}(?:[.,]\d+)?)%[=\s]*\]")
+# wimlib-imagex: "... (29%) done"
+_WIMLIB_PROGRESS = re.compile(r"\((\d{1,3})%\)\s*done")
+# DISM: "Error: 0x800f081f" or "Error: 87"
+_DISM_ERROR = re.compile(r"^Error:\s*(0x[0-9A-Fa-f]+|\d+)\s*$")
+# DISM /Add-Driver: "Installing 2 of 5 - C:\drivers\net\e1d.inf: The driver package was successfully installed."
+_DISM_DRIVER_ITEM = re.compile(r"^Installing (\d+) of (\d+) - (.+?\.inf): (.*)$", re.IGNORECASE)
+_DISM_DRIVER_SUCCESS = "successfully installed"
+_DISM_LOG_HINT = "dism log file"
+
+
+@dataclass
+class ToolProgress:
+    """Progress of a running imaging operation."""
+    operation: str
+    percent: float
+    target: str = ""
+
+
+@dataclass
+class DriverPackageStatus:
+    """Outcome of one INF reported by a DISM /Add-Driver run."""
+    inf: str
+    success: bool
+    message: str
+
+
+class ToolOutputParser:
+    """Parse the output of an imaging tool as it is produced.
+
+    ``progress`` is called at most every ``PROGRESS_INTERVAL`` seconds and
+    only when the percentage changed; 100% is always reported. Progress bar
+    redraws are not kept as output lines. DISM /Add-Driver item lines are
+    reported as progress across the INFs of the run.
+    """
+
+    def __init__(self, operation: str = "",
+                 progress: Optional[Callable[[ToolProgress], None]] = None,
+                 tail_lines: Optional[int] = DEFAULT_TAIL_LINES,
+                 interval: float = PROGRESS_INTERVAL):
+        self.operation = operation
+        self.progress = progress
+        self.interval = interval
+        self.lines: Deque[str] = deque(maxlen=tail_lines)
+        self.line_count = 0
+        self.percent: Optional[float] = None
+        self.error_code: Optional[str] = None
+        self.error_message: Optional[str] = None
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        self._partial = ""
+        self._in_error = False
+        self._reported: Optional[float] = None
+        self._last_report = 0.0
+        self._started = time.perf_counter()
+        self._first_item: Optional[float] = None
+
+    def feed(self, data: bytes) -> None:
+        """Consume a chunk of raw output."""
+        text = self._partial + self._decoder.decode(data)
+        pieces = re.split(r"[\r\n]", text)
+        self._partial = pieces.pop()
+        for piece in pieces:
+            self._parse_line(piece)
+        # A progress bar is redrawn without a line break
+        if self._partial and self._match_progress(self._partial):
+            self._partial = ""
+
+    def close(self) -> None:
+        """Flush the last unterminated line."""
+        rest = self._partial + self._decoder.decode(b"", final=True)
+        self._partial = ""
+        if rest:
+            self._parse_line(rest)
+
+    def text(self) -> str:
+        """The kept output lines."""
+        return "\n".join(self.lines)
+
+    @property
+    def truncated(self) -> bool:
+        return self.line_count > len(self.lines)
+
+    @property
+    def setup_seconds(self) -> Optional[float]:
+        """Seconds from the start until the first item line (the tool's session startup)."""
+        return self._first_item - self._started if self._first_item is not None else None
+
+    def _parse_line(self, line: str) -> None:
+        if self._match_progress(line):
+            return
+        line = line.strip()
+        if not line:
+            return
+
+        self.line_count += 1
+        self.lines.append(line)
+
+        item = _DISM_DRIVER_ITEM.match(line)
+        if item:
+            if self._first_item is None:
+                self._first_item = time.perf_counter()
+            self.percent = 100.0 * (int(item.group(1)) - 1) / max(int(item.group(2)), 1)
+            self._report(self.percent)
+            return
+
+        match = _DISM_ERROR.match(line)
+        if match:
+            self.error_code = match.group(1)
+            self._in_error = True
+        elif self._in_error:
+            # The first line after "Error: <code>" describes the error
+            if _DISM_LOG_HINT not in line.lower() and self.error_message is None:
+                self.error_message = line
+            self._in_error = False
+
+    def _match_progress(self, line: str) -> bool:
+        match = _DISM_PROGRESS.search(line) or _WIMLIB_PROGRESS.search(line)
+        if not match:
+            return False
+        try:
+            percent = min(100.0, float(match.group(1).replace(",", ".")))
+        except ValueError:
+            return False
+        self.percent = percent
+        self._report(percent)
+        return True
+
+    def _report(self, percent: float) -> None:
+        if not self.progress or percent == self._reported:
+            return
+        now = time.perf_counter()
+        if percent < 100.0 and now - self._last_report < self.interval:
+            return
+        self._reported = percent
+        self._last_report = now
+        try:
+            self.progress(ToolProgress(self.operation, percent))
+        except Exception as e:
+            logger.warning(f"Tool progress callback failed: {e}")
+
+
+async def run_streaming(cmd: Sequence[str], timeout: float, stdout: ToolOutputParser,
+                        stderr: Optional[ToolOutputParser] = None) -> int:
+    """Run a command, streaming stdout/stderr into parsers; return the exit code.
+
+    Raises ``OSError`` if the command cannot be started and
+    ``asyncio.TimeoutError`` (after killing the process) on timeout.
+    """
+    stderr = stderr or ToolOutputParser(tail_lines=DEFAULT_TAIL_LINES)
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+
+    async def pump(stream: asyncio.StreamReader, parser: ToolOutputParser) -> None:
+        while True:
+            data = await stream.read(READ_CHUNK_SIZE)
+            if not data:
+                break
+            parser.feed(data)
+        parser.close()
+
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(pump(process.stdout, stdout), pump(process.stderr, stderr), process.wait()),
+            timeout=timeout
+        )
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+
+    return process.returncode
+
+
+def parse_add_driver_output(output: str) -> List[DriverPackageStatus]:
+    """Get the per-INF results of a DISM /Add-Driver run from its output."""
+    statuses = []
+    for line in output.splitlines():
+        match = _DISM_DRIVER_ITEM.match(line.strip())
+        if match:
+            message = match.group(4).strip()
+            statuses.append(DriverPackageStatus(match.group(3).strip(), _DISM_DRIVER_SUCCESS in message.lower(),
+                                                message))
+    return statuses
+
+
+def item_progress(callback: Optional[Callable[[ToolProgress], None]], index: int, count: int,
+                  target: str = "") -> Optional[Callable[[ToolProgress], None]]:
+    """Report the progress of item ``index`` of ``count`` as overall progress of the batch."""
+    if callback is None:
+        return None
+
+    def report(progress: ToolProgress) -> None:
+        percent = (index + progress.percent / 100.0) * 100.0 / max(count, 1)
+        callback(ToolProgress(progress.operation, percent, target or progress.target))
+
+    return report
+
+
+def step_progress(step: str, start: int, end: int, report: Callable[[str, int], None],
+                  operations: Sequence[str] = ()) -> Callable[[ToolProgress], None]:
+    """Map tool progress onto the ``start``-``end`` range of a job step.
+
+    ``report(current_step, progress)`` is only called when the step text or
+    the job progress changes. With ``operations`` (e.g. ``("unmount",
+    "export")``) the range is split evenly between them in that order.
+    """
+    last = {'state': None}
+
+    def callback(progress: ToolProgress) -> None:
+        low, high = start, end
+        if progress.operation in operations:
+            width = (end - start) / len(operations)
+            low = start + width * operations.index(progress.operation)
+            high = low + width
+        target = f" - {progress.target}" if progress.target else ""
+        text = f"{step}{target} ({progress.percent:.0f}%)"
+        value = int(low + (high - low) * progress.percent / 100.0)
+        if (text, value) == last['state']:
+            return
+        last['state'] = (text, value)
+        report(text, value)
+
+    return callback
@@ -151,6 +151,7 @@ def main():
     parser.add_argument('--reload', action='store_true', help='Enable auto-reload')
     parser.add_argument('--no-browser', action='store_true', help='Don\'t open browser automatically')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
+    parser.add_argument('--no-watch', action='store_true', help='Don\'t watch the asset tree for changes')
     args = parser.parse_args()
     
     print("🌐 Kassia WebUI Starter")
@@ -171,6 +172,7 @@ def main():
     print(f"📋 API Docs: http://{args.host}:{args.port}/docs")
     print(f"🔧 Debug Mode: {'Enabled' if args.debug else 'Disabled'}")
     print(f"🔄 Auto-reload: {'Enabled' if args.reload else 'Disabled'}")
+    print(f"👀 Asset watcher: {'Disabled' if args.no_watch else 'Enabled'}")
     print("=" * 50)
     
     # Open browser
@@ -185,7 +187,10 @@ def main():
     
     # Import and start the web application
     try:
-        from web.app import app
+        from web.app import app, enable_asset_watcher
+        
+        # Keep the asset catalog current and push changes to the UI
+        enable_asset_watcher(not args.no_watch)
         
         # Configure uvicorn
         config = uvicorn.Config(
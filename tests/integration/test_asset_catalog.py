@@ -0,0 +1,373 @@
+"""
+Asset Catalog Test Script
+Test persistent catalog indexing and incremental rescans
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.asset_providers import LocalAssetProvider, AssetCatalog, AssetWatcher, get_package_manifest
+from app.core.asset_providers.manifest import generate_manifest_file, verify_manifest_file
+from app.models.config import BuildConfig
+from app.main import manage_package_manifests
+
+
+def create_sample_tree(root: Path):
+    """Create a small driver/update tree for catalog tests."""
+    driver_dir = root / "drivers" / "SampleDriver_1.0"
+    (driver_dir / "x64").mkdir(parents=True)
+    (driver_dir / "x64" / "sample.inf").write_text("; sample inf")
+    with open(driver_dir / "SampleDriver_1.0.json", 'w') as f:
+        json.dump({
+            "driverName": "Sample Driver",
+            "driverType": "inf",
+            "driverFamilyId": 20002,
+            "supportedDevices": [1],
+            "supportedOperatingSystems": [10],
+            "order": 10
+        }, f)
+
+    update_dir = root / "updates" / "2025-01" / "KB0000001"
+    update_dir.mkdir(parents=True)
+    (update_dir / "kb0000001.msu").write_bytes(b"msu")
+    with open(update_dir / "KB0000001.json", 'w') as f:
+        json.dump({
+            "updateName": "Sample Update",
+            "updateVersion": "KB0000001",
+            "updateType": "msu",
+            "downloadFileName": "kb0000001.msu",
+            "supportedOperatingSystems": [10],
+            "order": 100
+        }, f)
+
+    return driver_dir, update_dir
+
+
+def test_catalog_incremental_refresh():
+    """Only changed packages are re-parsed on rescan."""
+
+    print("🔍 Testing incremental catalog refresh...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        driver_dir, _ = create_sample_tree(root)
+        catalog = AssetCatalog(root / "catalog.db")
+
+        first = catalog.refresh(root / "drivers", "driver")
+        assert first.parsed == 1
+
+        second = catalog.refresh(root / "drivers", "driver")
+        assert second.parsed == 0 and second.unchanged == 1
+        print(f"   ✅ Unchanged rescan parsed {second.parsed} packages")
+
+        # Touch the package directory - only that package is re-parsed
+        (driver_dir / "readme.txt").write_text("changed")
+        stat = driver_dir.stat()
+        os.utime(driver_dir, (stat.st_atime, stat.st_mtime + 10))
+        third = catalog.refresh(root / "drivers", "driver")
+        assert third.parsed == 1
+        print(f"   ✅ Changed package re-parsed")
+
+        # A fresh catalog instance reads the persisted index
+        reopened = AssetCatalog(root / "catalog.db")
+        assert len(reopened.get_entries(root / "drivers", "driver")) == 1
+        assert reopened.refresh(root / "drivers", "driver").parsed == 0
+        print(f"   ✅ Persisted index reused after reopen")
+
+
+def test_provider_queries_catalog():
+    """LocalAssetProvider answers from the catalog."""
+
+    print("🔍 Testing provider queries through catalog...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        create_sample_tree(root)
+        provider = LocalAssetProvider(root, build_config={
+            'driverRoot': str(root / "drivers"),
+            'updateRoot': str(root / "updates"),
+            'assetCatalogPath': str(root / "catalog.db"),
+            'digestCachePath': str(root / "digests.db")
+        })
+
+        drivers = asyncio.run(provider.get_drivers("xX-39A", 10))
+        updates = asyncio.run(provider.get_updates(10))
+        assert [d.name for d in drivers] == ["Sample Driver"]
+        assert [u.name for u in updates] == ["Sample Update"]
+        assert asyncio.run(provider.get_updates(21656)) == []
+        print(f"   ✅ Found {len(drivers)} drivers and {len(updates)} updates")
+
+
+def test_nested_package_changes_reindexed():
+    """Files added below a package's subdirectories re-index it without a watcher."""
+
+    print("🔍 Testing nested package changes...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        driver_dir, _ = create_sample_tree(root)
+        build_config = {
+            'driverRoot': str(root / "drivers"),
+            'updateRoot': str(root / "updates"),
+            'assetCatalogPath': str(root / "catalog.db"),
+            'digestCachePath': str(root / "digests.db")
+        }
+        provider = LocalAssetProvider(root, build_config=build_config)
+        assert provider.refresh_catalog("driver").parsed == 1
+
+        # Only the mtime of x64/ changes, not that of the package directory
+        package_mtime = driver_dir.stat().st_mtime
+        (driver_dir / "x64" / "extra.inf").write_text("; extra inf")
+        x64_stat = (driver_dir / "x64").stat()
+        os.utime(driver_dir / "x64", (x64_stat.st_atime, x64_stat.st_mtime + 10))
+        assert driver_dir.stat().st_mtime == package_mtime
+
+        # A new provider (e.g. the next CLI run) reads the persisted entry and still notices
+        provider = LocalAssetProvider(root, build_config=build_config)
+        stats = provider.refresh_catalog("driver")
+        assert stats.parsed == 1 and stats.unchanged == 0
+        [entry] = provider.catalog.get_entries(root / "drivers", "driver")
+        assert entry.details['driver_file_count'] == 2
+        assert provider.refresh_catalog("driver").unchanged == 1
+        print(f"   ✅ Nested change re-indexed: {entry.details['driver_file_count']} INF files")
+
+
+def test_compatibility_index_filters():
+    """Index lookups filter by OS, device id and driver family."""
+
+    print("🔍 Testing compatibility index lookups...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        create_sample_tree(root)
+
+        # Second driver for another device and family, valid on any OS
+        other_dir = root / "drivers" / "OtherDriver_1.0"
+        other_dir.mkdir(parents=True)
+        (other_dir / "other.inf").write_text("; other inf")
+        with open(other_dir / "OtherDriver_1.0.json", 'w') as f:
+            json.dump({
+                "driverName": "Other Driver",
+                "driverType": "inf",
+                "driverFamilyId": 30000,
+                "supportedDevices": [23401],
+                "supportedOperatingSystems": [],
+                "order": 20
+            }, f)
+
+        catalog = AssetCatalog(root / "catalog.db")
+        catalog.refresh(root / "drivers", "driver")
+        index = catalog.get_index(root / "drivers", "driver")
+        assert catalog.get_index(root / "drivers", "driver") is index
+
+        def names(entries):
+            return sorted(e.config['driverName'] for e in entries)
+
+        assert names(index.lookup(os_id=10)) == ["Other Driver", "Sample Driver"]
+        assert names(index.lookup(os_id=21656)) == ["Other Driver"]
+        assert names(index.lookup(os_id=10, device_ids=[1])) == ["Sample Driver"]
+        assert names(index.lookup(os_id=10, family_ids=[30000])) == ["Other Driver"]
+        assert index.lookup(os_id=10, device_ids=[1], family_ids=[30000]) == []
+        print(f"   ✅ Index lookups match expected drivers")
+
+        provider = LocalAssetProvider(root, build_config={
+            'driverRoot': str(root / "drivers"),
+            'updateRoot': str(root / "updates"),
+            'assetCatalogPath': str(root / "provider_catalog.db"),
+            'digestCachePath': str(root / "digests.db")
+        })
+        drivers = asyncio.run(provider.get_drivers("xX-32A", 10, driver_family_ids=[30000, 20002]))
+        assert [d.name for d in drivers] == ["Other Driver"]
+        print(f"   ✅ Device mapping resolves xX-32A to its own drivers")
+
+
+def test_package_manifest_cache():
+    """Package manifests are built once and rebuilt on directory changes."""
+
+    print("🔍 Testing package manifest cache...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        driver_dir, _ = create_sample_tree(Path(tmp))
+
+        manifest = get_package_manifest(driver_dir)
+        assert manifest.count(".inf") == 1 and manifest.has(".JSON")
+        assert manifest.total_bytes == sum(f.stat().st_size for f in manifest.files)
+        assert get_package_manifest(driver_dir) is manifest
+        print(f"   ✅ Manifest: {manifest.get_summary()}")
+
+        # Adding a file in a nested directory invalidates the cached manifest
+        (driver_dir / "x64" / "sample.cat").write_bytes(b"cat")
+        stat = (driver_dir / "x64").stat()
+        os.utime(driver_dir / "x64", (stat.st_atime, stat.st_mtime + 10))
+        rebuilt = get_package_manifest(driver_dir)
+        assert rebuilt is not manifest and rebuilt.count(".cat") == 1
+        print(f"   ✅ Manifest rebuilt after nested change")
+
+
+def test_trusted_manifest_mode():
+    """Trusted mode uses the declared type and the precomputed manifest."""
+
+    print("🔍 Testing trusted manifest mode...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        driver_dir, _ = create_sample_tree(root)
+        config_file = driver_dir / "SampleDriver_1.0.json"
+
+        manifest_path = generate_manifest_file(config_file, "inf")
+        assert verify_manifest_file(config_file) == []
+        print(f"   ✅ Generated {manifest_path.name} verifies cleanly")
+
+        provider = LocalAssetProvider(root, build_config={
+            'driverRoot': str(root / "drivers"),
+            'updateRoot': str(root / "updates"),
+            'assetCatalogPath': str(root / "catalog.db"),
+            'digestCachePath': str(root / "digests.db"),
+            'trustedManifests': True
+        })
+        drivers = asyncio.run(provider.get_drivers("xX-39A", 10))
+        assert len(drivers) == 1
+        assert drivers[0].metadata['packageManifest']['driverFileCount'] == 1
+        assert asyncio.run(provider.validate_asset(drivers[0]))
+        assert len(provider.catalog.get_entries(root / "drivers", "driver")) == 1
+        print(f"   ✅ Trusted discovery used the manifest")
+
+        (driver_dir / "x64" / "extra.inf").write_text("; extra")
+        problems = verify_manifest_file(config_file)
+        assert problems == ["Unlisted file: x64/extra.inf"]
+        print(f"   ✅ Verify reports drift: {problems}")
+
+        # The manifest command finds packages nested below grouping directories, like the catalog
+        nested_dir = root / "drivers" / "Intel" / "Chipset_1.0"
+        (nested_dir / "x64").mkdir(parents=True)
+        (nested_dir / "x64" / "chipset.inf").write_text("; chipset inf")
+        with open(nested_dir / "Chipset_1.0.json", 'w') as f:
+            json.dump({"driverName": "Chipset", "supportedOperatingSystems": [10]}, f)
+        build_config = BuildConfig(driverRoot=str(root / "drivers"), assetCatalogPath=str(root / "catalog.db"),
+                                   digestCachePath=str(root / "digests.db"))
+        assert manage_package_manifests(build_config, generate=True) == 0
+        assert verify_manifest_file(nested_dir / "Chipset_1.0.json") == []
+        assert manage_package_manifests(build_config, generate=False) == 0
+        print(f"   ✅ Manifest generated for nested package Intel/Chipset_1.0")
+
+
+def test_concurrent_discovery():
+    """Discovery runs on the worker pool without blocking the event loop."""
+
+    print("🔍 Testing concurrent discovery...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        for i in range(6):
+            package_dir = root / "drivers" / f"Driver_{i}"
+            package_dir.mkdir(parents=True)
+            (package_dir / "driver.inf").write_text("; inf")
+            with open(package_dir / f"Driver_{i}.json", 'w') as f:
+                json.dump({"driverName": f"Driver {i}", "driverType": "inf",
+                           "supportedOperatingSystems": [10], "order": i}, f)
+
+        catalog = AssetCatalog(root / "catalog.db")
+        pool = ThreadPoolExecutor(max_workers=2)
+        threads = threading.active_count()
+        stats = catalog.refresh(root / "drivers", "driver", workers=4, executor=pool)
+        assert stats.parsed == 6 and stats.failed == 0
+        print(f"   ✅ Parallel refresh parsed {stats.parsed} packages")
+
+        # Refreshes running on every thread of the shared pool finish without extra threads
+        refreshes = [pool.submit(AssetCatalog(root / f"catalog_{i}.db").refresh, root / "drivers", "driver",
+                                 workers=4, executor=pool) for i in range(2)]
+        assert [future.result(timeout=30).parsed for future in refreshes] == [6, 6]
+        assert threading.active_count() <= threads + 2
+        pool.shutdown()
+        print(f"   ✅ Refreshes on the shared pool did not nest thread pools")
+
+        provider = LocalAssetProvider(root, build_config={
+            'driverRoot': str(root / "drivers"),
+            'updateRoot': str(root / "updates"),
+            'assetCatalogPath': str(root / "provider_catalog.db"),
+            'digestCachePath': str(root / "digests.db"),
+            'discoveryWorkers': 4
+        })
+
+        async def discover():
+            drivers, updates = await asyncio.gather(
+                provider.get_drivers("xX-39A", 10), provider.get_updates(10)
+            )
+            valid = await asyncio.gather(*(provider.validate_asset(d) for d in drivers))
+            return drivers, updates, valid
+
+        drivers, updates, valid = asyncio.run(discover())
+        assert [d.name for d in drivers] == [f"Driver {i}" for i in range(6)]
+        assert updates == [] and all(valid)
+
+        timings = provider.get_discovery_timings()
+        assert {'drivers', 'drivers_refresh', 'updates', 'validation'} <= set(timings)
+        print(f"   ✅ Discovery timings: {timings}")
+
+
+def test_asset_watcher_applies_changes():
+    """The watcher re-indexes changed packages and discovery skips the rescan."""
+
+    print("🔍 Testing asset watcher...")
+
+    for use_inotify in (True, False):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            create_sample_tree(root)
+            provider = LocalAssetProvider(root, build_config={
+                'driverRoot': str(root / "drivers"),
+                'updateRoot': str(root / "updates"),
+                'assetCatalogPath': str(root / "catalog.db"),
+                'digestCachePath': str(root / "digests.db")
+            })
+
+            changes = []
+            watcher = AssetWatcher(provider, on_change=changes.append, poll_interval=0.2,
+                                   debounce=0.1, use_inotify=use_inotify)
+            backend = watcher.start()
+            try:
+                assert provider.catalog.is_watched(root / "drivers", "driver")
+
+                driver_dir = root / "drivers" / "NewDriver_2.0"
+                (driver_dir / "x64").mkdir(parents=True)
+                (driver_dir / "x64" / "new.inf").write_text("; new inf")
+                with open(driver_dir / "NewDriver_2.0.json", 'w') as f:
+                    json.dump({"driverName": "New Driver", "driverType": "inf",
+                               "supportedDevices": [1], "supportedOperatingSystems": [10]}, f)
+
+                deadline = time.time() + 10
+                while not any("NewDriver_2.0/NewDriver_2.0.json" in c['updated'] for c in changes):
+                    assert time.time() < deadline, f"no change reported ({backend})"
+                    time.sleep(0.05)
+
+                # Discovery uses the watched catalog without rescanning
+                drivers = asyncio.run(provider.get_drivers("Test", 10, device_ids=[1]))
+                assert {d.name for d in drivers} == {"Sample Driver", "New Driver"}
+                assert provider.get_discovery_timings()['drivers_refresh'] == 0.0
+                assert changes[-1]['type'] == "assets_changed" and changes[-1]['kind'] == "driver"
+                print(f"   ✅ {backend}: {changes[-1]['updated']}")
+            finally:
+                watcher.stop()
+            assert not provider.catalog.is_watched(root / "drivers", "driver")
+
+
+if __name__ == "__main__":
+    test_catalog_incremental_refresh()
+    test_provider_queries_catalog()
+    test_nested_package_changes_reindexed()
+    test_compatibility_index_filters()
+    test_package_manifest_cache()
+    test_trusted_manifest_mode()
+    test_concurrent_discovery()
+    test_asset_watcher_applies_changes()
+    print("\n✅ All asset catalog tests completed!")
@@ -0,0 +1,92 @@
+"""
+Digest Cache Test Script
+Test persistent SHA-256 digests keyed by file identity
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.utils.digest_cache import DigestCache, collect_asset_digests
+from app.core.asset_providers import LocalAssetProvider
+
+
+def test_digest_cache_reuses_unchanged_files():
+    """Unchanged files are served from the cache; changed files are re-hashed."""
+
+    print("🔍 Testing digest cache...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        data_file = root / "update.msu"
+        data_file.write_bytes(b"x" * 100000)
+
+        cache = DigestCache(root / "digests.db", buffer_size=4096)
+        first = cache.digest(data_file)
+        assert first == hashlib.sha256(b"x" * 100000).hexdigest()
+        assert cache.stats['misses'] == 1
+
+        assert cache.digest(data_file) == first
+        assert cache.stats['hits'] == 1
+
+        # A new cache instance reads the persisted digest
+        reopened = DigestCache(root / "digests.db")
+        assert reopened.get_cached(data_file) == first
+        print(f"   ✅ Cached digest reused: {first[:16]}...")
+
+        data_file.write_bytes(b"y" * 100000)
+        stat = data_file.stat()
+        os.utime(data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert reopened.get_cached(data_file) is None
+        assert reopened.digest(data_file) == hashlib.sha256(b"y" * 100000).hexdigest()
+        print(f"   ✅ Changed file re-hashed")
+
+        digests = asyncio.run(cache.digest_many([data_file]))
+        assert digests[str(data_file)] == reopened.digest(data_file)
+
+
+def test_provider_records_and_verifies_digests():
+    """Validation records sha256 in metadata and rejects declared mismatches."""
+
+    print("🔍 Testing provider digest validation...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        payload = b"msu payload"
+
+        for kb, declared in (("KB1", hashlib.sha256(payload).hexdigest()), ("KB2", "0" * 64)):
+            update_dir = root / "updates" / kb
+            update_dir.mkdir(parents=True)
+            (update_dir / f"{kb}.msu").write_bytes(payload)
+            with open(update_dir / f"{kb}.json", 'w') as f:
+                json.dump({"updateName": kb, "updateType": "msu", "downloadFileName": f"{kb}.msu",
+                           "supportedOperatingSystems": [10], "sha256": declared}, f)
+
+        provider = LocalAssetProvider(root, build_config={
+            'driverRoot': str(root / "drivers"),
+            'updateRoot': str(root / "updates"),
+            'assetCatalogPath': str(root / "catalog.db"),
+            'digestCachePath': str(root / "digests.db")
+        })
+
+        updates = {u.name: u for u in asyncio.run(provider.get_updates(10))}
+        assert asyncio.run(provider.validate_asset(updates["KB1"]))
+        assert not asyncio.run(provider.validate_asset(updates["KB2"]))
+        assert updates["KB1"].metadata['sha256'] == hashlib.sha256(payload).hexdigest()
+
+        digests = collect_asset_digests({'updates': list(updates.values())})
+        assert set(digests['updates']) == {"KB1", "KB2"}
+        print(f"   ✅ Digests recorded: {digests}")
+
+
+if __name__ == "__main__":
+    test_digest_cache_reuses_unchanged_files()
+    test_provider_records_and_verifies_digests()
+    print("\n✅ All digest cache tests completed!")
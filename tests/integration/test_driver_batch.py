@@ -0,0 +1,193 @@
+"""
+Driver Batch Test Script
+Test batched INF injection: one add-driver run, per-package attribution and fallback
+"""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.asset_providers import DriverAsset, AssetType, DriverType
+from app.core.imaging_backend import SimulatedBackend, ImagingResult
+from app.core.driver_integration import DriverIntegrator
+from app.core.wim_handler import DismError
+from app.utils.tool_output import ToolOutputParser, parse_add_driver_output
+
+DISM_OUTPUT = """Deployment Image Servicing and Management tool
+Version: 10.0.22621.1
+
+Image Version: 10.0.22631.2861
+
+Searching for driver packages to install...
+Found 3 driver package(s) to install.
+Installing 1 of 3 - C:\\Kassia\\temp\\driver_batch_x\\001_Chipset\\chipset.inf: The driver package was successfully installed.
+Installing 2 of 3 - C:\\Kassia\\temp\\driver_batch_x\\002_Audio\\audio.inf: Error - An error occurred. The driver package could not be installed.
+Installing 3 of 3 - C:\\Kassia\\temp\\driver_batch_x\\003_Network\\x64\\net.inf: The driver package was successfully installed.
+The operation completed successfully."""
+
+SELECT_INF = """[Version]
+Class=System
+DriverVer=07/18/1968, 10.1.2.0
+
+[Manufacturer]
+%MFG%=Models,NTamd64
+
+[Models.NTamd64]
+%Desc%=Install,{hardware_id}
+"""
+
+
+
+class PartialFailureBackend(SimulatedBackend):
+    """Reports one failed INF in the batch run, like DISM does with /Recurse."""
+
+    async def add_driver(self, mount_point, driver_path, recurse=True, force_unsigned=True, progress=None,
+                         timeout=300) -> ImagingResult:
+        result = await super().add_driver(mount_point, driver_path, recurse, force_unsigned, progress, timeout)
+        if len(self.mounts[str(mount_point)]['drivers']) > 1:
+            return result  # Per-package retries succeed
+        lines = [line.replace("was successfully installed", "could not be installed") if "Audio" in line else line
+                 for line in result.output.splitlines()]
+        raise DismError("DISM command failed with exit code 50", 50, "\n".join(lines[:2]))
+
+
+def create_drivers(root: Path):
+    """Three INF packages (one with a subdirectory) and one without INF files."""
+    drivers = []
+    for order, (name, files) in enumerate((
+        ("Chipset", ["chipset.inf", "chipset.sys"]),
+        ("Audio", ["audio.inf", "audio.cat"]),
+        ("Network", ["x64/net.inf", "x64/net.sys", "readme.txt"]),
+        ("Empty", ["readme.txt"]),
+    )):
+        driver_dir = root / "drivers" / name
+        for file in files:
+            (driver_dir / file).parent.mkdir(parents=True, exist_ok=True)
+            (driver_dir / file).write_text(f"{name} {file}\n")
+        drivers.append(DriverAsset(name=name, path=driver_dir, asset_type=AssetType.DRIVER,
+                                   metadata={}, driver_type=DriverType.INF, order=order))
+    return drivers
+
+
+def test_parse_add_driver_output():
+    """Per-INF results and the session startup are read from DISM /Add-Driver output."""
+
+    print("🔍 Testing DISM /Add-Driver output parsing...")
+
+    statuses = parse_add_driver_output(DISM_OUTPUT)
+    assert [status.success for status in statuses] == [True, False, True]
+    assert statuses[2].inf.endswith("003_Network\\x64\\net.inf")
+    assert "could not be installed" in statuses[1].message
+
+    reports = []
+    parser = ToolOutputParser("add_driver", reports.append, tail_lines=None, interval=0)
+    assert parser.setup_seconds is None
+    parser.feed(DISM_OUTPUT.encode())
+    parser.close()
+    assert parser.setup_seconds is not None and parser.setup_seconds >= 0
+    assert [round(report.percent) for report in reports] == [0, 33, 67]
+    assert len(parse_add_driver_output(parser.text())) == 3
+    print(f"   ✅ {len(statuses)} INF results parsed")
+
+
+def test_batched_injection():
+    """All INF packages are added in one backend run over a hardlinked staging tree."""
+
+    print("🔍 Testing batched INF injection...")
+
+    async def run(root: Path):
+        drivers = create_drivers(root)
+        mount_point = root / "mount"
+        timings = {}
+
+        for batch in (False, True):
+            backend = SimulatedBackend(latency={'add_driver': 0.05})
+            await backend.mount(root / "test.wim", mount_point)
+            integrator = DriverIntegrator(backend=backend, batch_inf=batch, staging_dir=root / "staging")
+            start = asyncio.get_running_loop().time()
+            results = await integrator.integrate_drivers(drivers, mount_point, root / "yunona")
+            timings[batch] = asyncio.get_running_loop().time() - start
+
+            assert [result.success for result in results] == [True, True, True, False]
+            assert backend.stats['add_driver']['calls'] == (1 if batch else 3)
+            assert integrator.get_integration_summary()['inf_via_dism'] == 3
+            await backend.unmount(mount_point, commit=False)
+
+        info = integrator.batch_info
+        assert info['packages'] == 3 and info['hardlinked_files'] == 7 and info['copied_files'] == 0
+        assert 0.09 <= info['estimated_saved_seconds'] and info['retried'] == 0
+        assert "in batch" in results[0].message and results[2].files_processed == 1
+        assert not any((root / "staging").iterdir())
+        assert (root / "drivers" / "Network" / "x64" / "net.inf").exists()
+        assert timings[True] < timings[False]
+        print(f"   ✅ Batch {timings[True]:.2f}s vs per package {timings[False]:.2f}s "
+              f"(estimated {info['estimated_saved_seconds']:.2f}s saved)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+def test_batch_failure_attribution():
+    """A failed INF fails only its package; unreported packages are retried one by one."""
+
+    print("🔍 Testing batch failure attribution...")
+
+    async def run(root: Path):
+        drivers = create_drivers(root)[:3]
+        mount_point = root / "mount"
+
+        backend = PartialFailureBackend()
+        await backend.mount(root / "test.wim", mount_point)
+        integrator = DriverIntegrator(backend=backend, batch_inf=True, staging_dir=root / "staging")
+        results = await integrator.integrate_drivers(drivers, mount_point, root / "yunona")
+
+        chipset, audio, network = results
+        assert chipset.success and "in batch" in chipset.message
+        assert not audio.success and "audio.inf" in audio.message
+        assert network.success and "in batch" not in network.message
+        assert integrator.batch_info['retried'] == 1 and integrator.batch_info['estimated_saved_seconds'] is None
+        assert backend.stats['add_driver']['calls'] == 2
+        print(f"   ✅ {audio.message}")
+
+        # A batch run that fails without output falls back to per-package injection
+        backend = SimulatedBackend()
+        await backend.mount(root / "test.wim", root / "mount2")
+        backend.fail_next('add_driver')
+        integrator = DriverIntegrator(backend=backend, batch_inf=True, staging_dir=root / "staging")
+        results = await integrator.integrate_drivers(drivers, root / "mount2", root / "yunona")
+        assert all(result.success for result in results) and integrator.batch_info['retried'] == 3
+        assert backend.stats['add_driver']['calls'] == 4
+
+        # Retried packages reuse the INF selection of the batch pass, so it is counted once
+        selected = []
+        for package_name in ("Chipset_A", "Chipset_B"):
+            package = root / "drivers" / package_name
+            package.mkdir(parents=True)
+            for name, hardware_id in (("pch", "PCI\\VEN_8086&DEV_A110"), ("lpss", "PCI\\VEN_8086&DEV_9D27")):
+                (package / f"{name}.inf").write_text(SELECT_INF.format(hardware_id=hardware_id))
+            selected.append(DriverAsset(name=package_name, path=package, asset_type=AssetType.DRIVER,
+                                        metadata={}, driver_type=DriverType.INF))
+        backend = SimulatedBackend()
+        await backend.mount(root / "test.wim", root / "mount3")
+        backend.fail_next('add_driver')
+        integrator = DriverIntegrator(backend=backend, batch_inf=True, staging_dir=root / "staging",
+                                      hardware_ids=["PCI\\VEN_8086&DEV_A110"])
+        results = await integrator.integrate_drivers(selected, root / "mount3", root / "yunona")
+        stats = integrator.get_integration_summary()
+        assert all(result.success for result in results) and integrator.batch_info['retried'] == 2
+        assert (stats['inf_files_selected'], stats['inf_files_skipped']) == (2, 2)
+        print(f"   ✅ Retried package counted once: {results[0].message}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+if __name__ == "__main__":
+    test_parse_add_driver_output()
+    test_batched_injection()
+    test_batch_failure_attribution()
+    print("\n✅ All driver batch tests completed!")
@@ -0,0 +1,193 @@
+"""
+Driver Resolver Test Script
+Test DriverVer deduplication across INF driver packages
+"""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.asset_providers import DriverAsset, AssetType, DriverType
+from app.core.imaging_backend import SimulatedBackend, ImagingResult
+from app.core.driver_integration import DriverIntegrator
+from app.core.driver_resolver import driver_ver_key, resolve_driver_versions
+from app.core.inf_parser import InfInfo, parse_inf_text
+
+INF_TEMPLATE = """[Version]
+Class=System
+CatalogFile={name}.cat
+DriverVer={driver_ver}
+
+[SourceDisksNames]
+1=%Disk%
+
+[SourceDisksFiles]
+{name}.sys=1
+
+[Manufacturer]
+%MFG%=Models,NTamd64
+
+[Models.NTamd64]
+{models}
+
+[Strings]
+MFG="Chipset Corp"
+Disk="Disk"
+"""
+
+
+def inf(name: str, driver_ver: str, *hardware_ids: str) -> InfInfo:
+    date, version = (part.strip() for part in driver_ver.split(","))
+    return InfInfo(path=Path(f"{name}.inf"), driver_date=date, driver_version=version,
+                   hardware_ids=list(hardware_ids))
+
+
+def write_package(root: Path, package: str, infs) -> Path:
+    """A package directory with one INF, catalog and SYS file per (name, DriverVer, IDs) entry."""
+    package_dir = root / "drivers" / package
+    package_dir.mkdir(parents=True)
+    for name, driver_ver, hardware_ids in infs:
+        models = "\n".join(f"%Desc%=Install,{hardware_id}" for hardware_id in hardware_ids)
+        (package_dir / f"{name}.inf").write_text(INF_TEMPLATE.format(name=name, driver_ver=driver_ver, models=models))
+        (package_dir / f"{name}.cat").write_bytes(b"c" * 1000)
+        (package_dir / f"{name}.sys").write_bytes(b"s" * 4000)
+    return package_dir
+
+
+class RecordingBackend(SimulatedBackend):
+    """Records the INF files below each path handed to add_driver."""
+
+    def __init__(self):
+        super().__init__()
+        self.added = []
+
+    async def add_driver(self, mount_point, driver_path, recurse=True, force_unsigned=True, progress=None,
+                         timeout=300) -> ImagingResult:
+        self.added.extend(sorted(p.name for p in Path(driver_path).rglob("*.inf")))
+        return await super().add_driver(mount_point, driver_path, recurse, force_unsigned, progress, timeout)
+
+
+def test_resolve_versions():
+    """The newest DriverVer per hardware ID wins; date before version; ties go to the first package."""
+
+    print("🔍 Testing DriverVer resolution...")
+
+    assert driver_ver_key(inf("a", "07/18/1968, 10.1.2.10")) > driver_ver_key(inf("b", "07/18/1968, 10.1.2.9"))
+    assert driver_ver_key(inf("a", "01/01/2024, 1.0")) > driver_ver_key(inf("b", "12/31/2023, 9.0"))
+
+    old_pch = inf("pch_old", "07/18/1968, 10.1.1.0", "PCI\\VEN_8086&DEV_A110", "PCI\\VEN_8086&DEV_A111")
+    old_lpss = inf("lpss_old", "07/18/1968, 10.1.1.0", "PCI\\VEN_8086&DEV_9D27")
+    new_pch = inf("pch_new", "07/18/1968, 10.1.2.0", "PCI\\VEN_8086&DEV_A110", "PCI\\VEN_8086&DEV_A111")
+    new_pch_w10 = inf("pch_new_w10", "07/18/1968, 10.1.1.5", "PCI\\VEN_8086&DEV_A110")
+    copy_pch = inf("pch_copy", "07/18/1968, 10.1.2.0", "PCI\\VEN_8086&DEV_A110")
+    extension = inf("extension", "07/18/1968, 10.1.0.0")
+
+    resolution = resolve_driver_versions({
+        'Chipset_old': [old_pch, old_lpss, extension],
+        'Chipset_new': [new_pch, new_pch_w10],
+        'Chipset_copy': [copy_pch],
+    })
+    assert resolution.kept == {
+        'Chipset_old': [old_lpss, extension],   # old LPSS still covers a device nobody else does
+        'Chipset_new': [new_pch, new_pch_w10],  # INFs of one package do not shadow each other
+        'Chipset_copy': []
+    }
+    shadowed = {entry.inf.path.stem: entry for entry in resolution.shadowed}
+    assert set(shadowed) == {"pch_old", "pch_copy"} and resolution.shadowed_packages == ["Chipset_copy"]
+    assert shadowed["pch_old"].shadowed_by is new_pch and "is newer" in shadowed["pch_old"].reason
+    assert "same DriverVer" in shadowed["pch_copy"].reason
+    print(f"   ✅ {shadowed['pch_old'].to_dict()['reason']}")
+
+
+def decorated_inf(name: str, driver_ver: str, hardware_id: str, *decorations: str) -> InfInfo:
+    """An INF listing ``hardware_id`` in one models section per decoration."""
+    sections = "".join(f"[Models.{decoration}]\n%Desc%=Install,{hardware_id}\n\n" for decoration in decorations)
+    text = (f"[Version]\nDriverVer={driver_ver}\n\n[Manufacturer]\n%MFG%=Models,{','.join(decorations)}\n\n"
+            f"{sections}[Strings]\nMFG=\"Chipset Corp\"\n")
+    return parse_inf_text(text, Path(f"{name}.inf"))
+
+
+def test_resolve_versions_per_architecture():
+    """A newer driver only shadows INFs of the same architecture."""
+
+    print("🔍 Testing DriverVer resolution across architectures...")
+
+    hardware_id = "PCI\\VEN_8086&DEV_A110"
+    x64 = decorated_inf("pch_x64", "07/18/1968, 10.1.1.0", hardware_id, "NTamd64.10.0...17763")
+    arm64 = decorated_inf("pch_arm64", "07/18/1968, 10.1.2.0", hardware_id, "NTarm64")
+    both = decorated_inf("pch_both", "07/18/1968, 10.1.3.0", hardware_id, "NTx86", "NTamd64")
+    assert x64.architectures == {hardware_id: ["amd64"]}
+    assert both.architectures == {hardware_id: ["x86", "amd64"]}
+
+    # The newer ARM64-only package leaves the x64 INF of the other package in place
+    resolution = resolve_driver_versions({'Chipset_x64': [x64], 'Chipset_arm64': [arm64]})
+    assert resolution.kept == {'Chipset_x64': [x64], 'Chipset_arm64': [arm64]} and not resolution.shadowed
+    print(f"   ✅ ARM64 driver does not shadow the x64 driver")
+
+    resolution = resolve_driver_versions({'Chipset_x64': [x64], 'Chipset_arm64': [arm64], 'Chipset_new': [both]})
+    assert resolution.kept == {'Chipset_x64': [], 'Chipset_arm64': [arm64], 'Chipset_new': [both]}
+    [entry] = resolution.shadowed
+    assert entry.inf is x64 and entry.shadowed_by is both and entry.architecture == "amd64"
+    print(f"   ✅ {entry.reason}")
+
+
+def test_deduplicated_injection():
+    """Shadowed INFs and their files are not staged; the results report the reduction."""
+
+    print("🔍 Testing deduplicated driver injection...")
+
+    async def run(root: Path):
+        ids = ["PCI\\VEN_8086&DEV_A110", "PCI\\VEN_8086&DEV_9D27"]
+        packages = {
+            'Chipset_10.1.1': write_package(root, "Chipset_10.1.1", [
+                ("pch", "07/18/1968, 10.1.1.0", ids[:1]), ("lpss", "07/18/1968, 10.1.1.0", ids[1:])
+            ]),
+            'Chipset_10.1.2': write_package(root, "Chipset_10.1.2", [("pch", "07/18/1968, 10.1.2.0", ids[:1])]),
+            'Chipset_copy': write_package(root, "Chipset_copy", [("pch", "07/18/1968, 10.1.2.0", ids[:1])]),
+        }
+        drivers = [DriverAsset(name=name, path=path, asset_type=AssetType.DRIVER, metadata={},
+                               driver_type=DriverType.INF, order=order)
+                   for order, (name, path) in enumerate(packages.items())]
+
+        for batch in (False, True):
+            backend = RecordingBackend()
+            mount_point = root / f"mount_{batch}"
+            await backend.mount(root / "test.wim", mount_point)
+            integrator = DriverIntegrator(backend=backend, batch_inf=batch, staging_dir=root / "staging",
+                                          deduplicate=True)
+            results = await integrator.integrate_drivers(drivers, mount_point, root / "yunona")
+
+            assert sorted(backend.added) == ["lpss.inf", "pch.inf"]
+            assert [result.method for result in results] == ["SIMULATED", "SIMULATED", "SKIPPED"]
+            assert "Chipset_10.1.2" in results[2].message
+            assert integrator.get_integration_summary()['inf_files_shadowed'] == 2
+
+            info = integrator.version_info
+            assert (info['infs_before'], info['infs_after']) == (4, 2)
+            assert info['saved_bytes'] == 2 * 5000 + 2 * len(
+                (packages['Chipset_10.1.2'] / "pch.inf").read_bytes())
+            assert info['shadowed_packages'] == ["Chipset_copy"]
+            assert {entry['package'] for entry in info['shadowed']} == {"Chipset_10.1.1", "Chipset_copy"}
+            print(f"   ✅ {'Batch' if batch else 'Package'} mode: {info['infs_before']} → {info['infs_after']} "
+                  f"INF files, {info['saved_bytes']} bytes saved; {results[2].message}")
+
+        # Without deduplication every package is injected whole
+        backend = RecordingBackend()
+        await backend.mount(root / "test.wim", root / "mount")
+        integrator = DriverIntegrator(backend=backend)
+        await integrator.integrate_drivers(drivers, root / "mount", root / "yunona")
+        assert len(backend.added) == 4 and integrator.version_info is None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+if __name__ == "__main__":
+    test_resolve_versions()
+    test_resolve_versions_per_architecture()
+    test_deduplicated_injection()
+    print("\n✅ All driver resolver tests completed!")
@@ -0,0 +1,115 @@
+"""
+Export Profile Test Script
+Test export profiles, split .swm output and the export benchmark
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.models.config import BuildConfig, ExportProfile
+from app.core.export_benchmark import ExportBenchmark, run_export_benchmark
+from app.core.imaging_backend import SimulatedBackend
+from app.core.wim_handler import WimHandler, WimWorkflow, swm_parts
+
+
+def make_source(root: Path, size: int) -> Path:
+    source = root / "sbi" / "test.wim"
+    source.parent.mkdir(exist_ok=True)
+    source.write_bytes(os.urandom(size))
+    return source
+
+
+def test_profile_config():
+    """Built-in profiles are selectable by name; invalid profiles are rejected."""
+
+    print("🔍 Testing export profile configuration...")
+
+    config = BuildConfig(osWimMap={"10": "w10.wim"})
+    assert config.get_export_profile().compression == "max"
+    assert config.get_export_profile("lab-fast").compression == "fast"
+    assert config.get_export_profile("usb-split-4g").extension == ".swm"
+    assert config.get_export_profile("release-recovery").extension == ".esd"
+
+    for invalid in (lambda: config.get_export_profile("missing"),
+                    lambda: ExportProfile(compression="recovery", splitSizeMB=4000),
+                    lambda: ExportProfile(compression="lzx"),
+                    lambda: BuildConfig(osWimMap={"10": "w10.wim"}, defaultExportProfile="missing")):
+        try:
+            invalid()
+            assert False, "invalid profile should be rejected"
+        except ValueError:
+            pass
+    print(f"   ✅ Profiles: {', '.join(config.exportProfiles)}")
+
+
+def test_split_export():
+    """A split profile produces .swm parts; cleanup removes all of them."""
+
+    print("🔍 Testing split export...")
+
+    async def run(root: Path):
+        source_wim = make_source(root, 2 * 1024 * 1024 + 512 * 1024)
+        workflow = WimWorkflow(WimHandler(backend=SimulatedBackend()))
+        temp_wim = await workflow.prepare_wim_for_modification(source_wim, root / "temp")
+        await workflow.mount_wim_for_modification(temp_wim, root / "mount")
+        first_part = await workflow.finalize_and_export_wim(
+            root / "mount", root / "export" / "final.swm", compression="fast", split_size_mb=1
+        )
+
+        parts = swm_parts(first_part)
+        info = workflow.get_finalize_info()
+        assert [p.name for p in parts] == ["final.swm", "final2.swm", "final3.swm"]
+        assert info['parts'] == 3 and info['size'] == source_wim.stat().st_size and "split" in info['steps']
+        assert not (root / "export" / "final.wim").exists()
+        print(f"   ✅ Split into {[p.name for p in parts]}")
+
+        await workflow.cleanup_workflow(keep_export=False)
+        assert not any((root / "export").iterdir())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+def test_export_benchmark():
+    """Every profile is measured once and recorded; the summary is ordered by throughput."""
+
+    print("🔍 Testing export benchmark...")
+
+    async def run(root: Path):
+        source_wim = make_source(root, 2 * 1024 * 1024)
+        handler = WimHandler(backend=SimulatedBackend(latency={'export': 0.05}))
+        benchmark = ExportBenchmark(root / "benchmark.db")
+        profiles = {
+            'lab-fast': ExportProfile(compression="fast"),
+            'usb-split': ExportProfile(compression="max", splitSizeMB=1)
+        }
+
+        results = await run_export_benchmark(handler, source_wim, profiles, root / "work", benchmark)
+        assert [r.profile for r in results] == ["lab-fast", "usb-split"]
+        assert results[1].parts == 2 and all(r.output_bytes == 2 * 1024 * 1024 for r in results)
+        assert all(r.seconds >= 0.05 and r.throughput_mb_s > 0 for r in results)
+        assert not any((root / "work").iterdir())
+        for result in results:
+            print(f"   ✅ {result.profile}: {result.throughput_mb_s:.1f} MB/s, ratio {result.ratio:.2f}")
+
+        await run_export_benchmark(handler, source_wim, {'lab-fast': profiles['lab-fast']}, root / "work", benchmark)
+        summary = benchmark.summary()
+        assert {entry['profile']: entry['runs'] for entry in summary} == {'lab-fast': 2, 'usb-split': 1}
+        assert summary[0]['throughput_mb_s'] >= summary[1]['throughput_mb_s']
+        assert len(benchmark.results()) == 3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+if __name__ == "__main__":
+    test_profile_config()
+    test_split_export()
+    test_export_benchmark()
+    print("\n✅ All export profile tests completed!")
@@ -0,0 +1,78 @@
+"""
+Finalize Strategy Test Script
+Test choosing between commit-then-export, commit-in-place and capture
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.imaging_backend import SimulatedBackend, DismBackend, WimlibBackend
+from app.core.wim_handler import WimHandler, WimWorkflow, select_finalize_strategy
+
+
+def test_strategy_selection():
+    """Auto commits in place where it keeps the image metadata; explicit choices fall back safely."""
+
+    print("🔍 Testing finalize strategy selection...")
+
+    dism, wimlib = DismBackend.finalize_strategies, WimlibBackend.finalize_strategies
+    assert select_finalize_strategy("auto", dism)[0] == "export"
+    assert select_finalize_strategy("capture", dism) == ("capture", "configured")
+    assert select_finalize_strategy("auto", wimlib)[0] == "commit"
+    assert select_finalize_strategy("auto", wimlib, image_count=3)[0] == "export"
+    assert select_finalize_strategy("auto", dism, compression="recovery")[0] == "export"
+    assert select_finalize_strategy("auto", SimulatedBackend.finalize_strategies)[0] == "export"
+    assert select_finalize_strategy("export", dism) == ("export", "configured")
+
+    strategy, reason = select_finalize_strategy("capture", wimlib)
+    assert strategy == "export" and "not supported" in reason
+    print(f"   ✅ Explicit capture on wimlib falls back: {reason}")
+
+
+def test_workflow_strategies():
+    """Every strategy produces the final WIM; only export writes the image twice."""
+
+    print("🔍 Testing finalize strategies...")
+
+    async def run(root: Path):
+        source_wim = root / "sbi" / "test.wim"
+        source_wim.parent.mkdir()
+        source_wim.write_bytes(os.urandom(256 * 1024))
+
+        for strategies, strategy, expected_steps in (
+            ((), "auto", ["unmount", "export"]),
+            (("export", "capture"), "auto", ["unmount", "export"]),
+            (("export", "capture"), "capture", ["capture", "unmount"]),
+            (("export", "commit"), "auto", ["unmount", "optimize", "move"]),
+        ):
+            backend = SimulatedBackend(finalize_strategies=strategies or None)
+            workflow = WimWorkflow(WimHandler(backend=backend))
+            temp_wim = await workflow.prepare_wim_for_modification(source_wim, root / "temp")
+            await workflow.mount_wim_for_modification(temp_wim, root / "mount")
+            final_wim = await workflow.finalize_and_export_wim(root / "mount", root / "export" / "final.wim",
+                                                               strategy=strategy)
+
+            info = workflow.get_finalize_info()
+            assert final_wim.exists() and final_wim.stat().st_size == source_wim.stat().st_size
+            assert list(info['steps']) == expected_steps and info['seconds'] >= 0
+            assert not backend.mounts
+            writes = sum(backend.stats[op]['calls'] for op in ('export', 'capture', 'optimize'))
+            assert writes == 1
+            await workflow.cleanup_workflow(keep_export=False)
+            assert not final_wim.exists() and not temp_wim.exists()
+            print(f"   ✅ {info['strategy']}: {info['steps']}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+if __name__ == "__main__":
+    test_strategy_selection()
+    test_workflow_strategies()
+    print("\n✅ All finalize strategy tests completed!")
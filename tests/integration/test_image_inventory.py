@@ -0,0 +1,161 @@
+"""
+Image Inventory Test Script
+Test reading and caching the drivers and servicing packages of a mounted image
+"""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.asset_providers import DriverAsset, UpdateAsset, AssetType, DriverType, UpdateType
+from app.core.imaging_backend import SimulatedBackend
+from app.core.driver_integration import DriverIntegrator
+from app.core.update_integration import UpdateIntegrator
+from app.core.image_inventory import (
+    DRIVER_STORE, SERVICING_PACKAGES, ImageInventoryCache, image_inventory_key, read_image_inventory
+)
+
+INF_TEMPLATE = """[Version]
+Class=System
+CatalogFile={name}.cat
+DriverVer={driver_ver}
+
+[Manufacturer]
+%MFG%=Models,NTamd64
+
+[Models.NTamd64]
+%Desc%=Install,{hardware_id}
+
+[Strings]
+MFG="Chipset Corp"
+"""
+
+KB_MUM = "Package_for_KB5034441~31bf3856ad364e35~amd64~~19041.3920.1.2.mum"
+
+ROLLUP_MUM = """<?xml version="1.0" encoding="utf-8"?>
+<assembly manifestVersion="1.0"><package identifier="KB5034763" releaseType="Update"/></assembly>
+"""
+
+
+def write_inf(directory: Path, name: str, driver_ver: str, hardware_id: str) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    inf = directory / f"{name}.inf"
+    inf.write_text(INF_TEMPLATE.format(name=name, driver_ver=driver_ver, hardware_id=hardware_id))
+    (directory / f"{name}.cat").write_bytes(b"cat")
+    return inf
+
+
+def create_image(mount_point: Path) -> None:
+    """A mounted image with two driver store INFs, a KB package and a rollup."""
+    store = mount_point / DRIVER_STORE
+    write_inf(store / "pch.inf_amd64_1a2b3c", "pch", "07/18/1968, 10.1.2.0", "PCI\\VEN_8086&DEV_A110")
+    write_inf(store / "lpss.inf_amd64_4d5e6f", "lpss", "07/18/1968, 10.1.1.0", "PCI\\VEN_8086&DEV_9D27")
+    packages = mount_point / SERVICING_PACKAGES
+    packages.mkdir(parents=True, exist_ok=True)
+    (packages / KB_MUM).write_text("<assembly/>")
+    (packages / "Package_for_RollupFix~31bf3856ad364e35~amd64~~19041.4046.1.9.mum").write_text(ROLLUP_MUM)
+
+
+def test_read_and_cache_inventory():
+    """The driver store and servicing packages are read once and cached by image digest."""
+
+    print("🔍 Testing image inventory reading and caching...")
+
+    async def run(root: Path):
+        mount_point = root / "mount"
+        create_image(mount_point)
+
+        inventory = read_image_inventory(mount_point)
+        assert sorted(info.path.as_posix() for info in inventory.drivers) == [
+            "lpss.inf_amd64_4d5e6f/lpss.inf", "pch.inf_amd64_1a2b3c/pch.inf"
+        ]
+        assert inventory.to_dict()['kbs'] == ["KB5034441", "KB5034763"]
+        rollup = [package for package in inventory.packages if package.name == "Package_for_RollupFix"][0]
+        assert (rollup.version, rollup.architecture, rollup.kb) == ("19041.4046.1.9", "amd64", "KB5034763")
+
+        assert image_inventory_key("abc") != image_inventory_key("abc", index=2)
+        assert image_inventory_key("abc", "layer1").endswith(":layer:layer1") and image_inventory_key() is None
+
+        cache = ImageInventoryCache(root / "inventory.db")
+        key = image_inventory_key("abc")
+        first = await cache.get_or_read(key, mount_point)
+        assert not first.cache_hit
+        # The cached inventory is used even though the image changed
+        (mount_point / SERVICING_PACKAGES / KB_MUM).unlink()
+        second = await cache.get_or_read(key, mount_point)
+        assert second.cache_hit and second.to_dict()['kbs'] == first.to_dict()['kbs']
+        assert second.drivers[0].hardware_ids == first.drivers[0].hardware_ids
+        assert cache.get_cache_info()['hits'] == 1
+
+        assert cache.invalidate(key) == 1
+        assert (await cache.get_or_read(key, mount_point)).to_dict()['kbs'] == ["KB5034763"]
+        assert not (await cache.get_or_read(None, mount_point)).cache_hit
+        print(f"   ✅ {len(first.drivers)} drivers, {len(first.packages)} packages; cached: {second.to_dict()}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+def test_skip_present():
+    """Drivers and updates already in the image at the same or a newer version are not integrated."""
+
+    print("🔍 Testing skipping of drivers and updates already in the image...")
+
+    async def run(root: Path):
+        backend = SimulatedBackend()
+        mount_point = root / "mount"
+        await backend.mount(root / "test.wim", mount_point)
+        create_image(mount_point)
+        inventory = read_image_inventory(mount_point)
+
+        # Same pch, older lpss and a newer lpss than the driver store
+        present = root / "drivers" / "Chipset_present"
+        write_inf(present, "pch", "07/18/1968, 10.1.2.0", "PCI\\VEN_8086&DEV_A110")
+        write_inf(present, "lpss", "07/18/1968, 10.1.0.0", "PCI\\VEN_8086&DEV_9D27")
+        newer = root / "drivers" / "Chipset_newer"
+        write_inf(newer, "lpss", "07/18/1968, 10.1.3.0", "PCI\\VEN_8086&DEV_9D27")
+        drivers = [DriverAsset(name=path.name, path=path, asset_type=AssetType.DRIVER, metadata={},
+                               driver_type=DriverType.INF, order=order)
+                   for order, path in enumerate((present, newer))]
+
+        integrator = DriverIntegrator(backend=backend, staging_dir=root / "staging", inventory=inventory)
+        results = await integrator.integrate_drivers(drivers, mount_point, root / "yunona")
+        assert [result.method for result in results] == ["SKIPPED", "SIMULATED"]
+        assert results[0].success and "Already in the image" in results[0].message
+        assert integrator.get_integration_summary()['inf_files_present'] == 2
+        print(f"   ✅ {results[0].message}")
+
+        updates = []
+        for name, version, update_type in (("KB5034441", "KB5034441", UpdateType.MSU),
+                                           ("Cumulative Update", "KB5034763", UpdateType.MSU),
+                                           ("KB5035000", "KB5035000", UpdateType.CAB)):
+            path = root / "updates" / f"{name}.{update_type.value}"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"u" * 1024)
+            updates.append(UpdateAsset(name=name, path=path, asset_type=AssetType.UPDATE, metadata={},
+                                       update_type=update_type, update_version=version))
+
+        update_integrator = UpdateIntegrator(backend=backend, inventory=inventory)
+        measured = []
+        update_integrator._get_servicing_size = lambda mount: measured.append(mount) or 0
+        results = await update_integrator.integrate_updates(updates, mount_point, root / "yunona")
+        assert [result.method for result in results] == ["SKIPPED", "SKIPPED", "SIMULATED"]
+        assert all(result.success for result in results)
+        assert "Package_for_RollupFix 19041.4046.1.9" in results[1].message
+        stats = update_integrator.get_integration_summary()
+        assert (stats['already_present'], stats['cab_via_dism'], stats['msu_via_dism']) == (2, 1, 0)
+        assert len(measured) == 2  # before and after the CAB only; skipped updates are not measured
+        print(f"   ✅ {results[1].message}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+if __name__ == "__main__":
+    test_read_and_cache_inventory()
+    test_skip_present()
+    print("\n✅ All image inventory tests completed!")
@@ -0,0 +1,182 @@
+"""
+Imaging Backend Test Script
+Test the WIM workflow on the simulated backend, failure injection and the wimlib staging
+"""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.asset_providers import DriverAsset, UpdateAsset, AssetType, DriverType, UpdateType
+from app.core.imaging_backend import (
+    SimulatedBackend, DismBackend, WimlibBackend, create_imaging_backend
+)
+from app.core.wim_handler import WimHandler, WimWorkflow, DismError
+from app.core.driver_integration import DriverIntegrator
+from app.core.update_integration import UpdateIntegrator
+from app.models.config import BuildConfig
+
+
+def create_assets(root: Path):
+    """Source WIM, one INF driver and one MSU update."""
+    source_wim = root / "sbi" / "test.wim"
+    source_wim.parent.mkdir(parents=True)
+    source_wim.write_bytes(b"not a real wim" * 1000)
+
+    driver_dir = root / "drivers" / "Chipset"
+    driver_dir.mkdir(parents=True)
+    (driver_dir / "chipset.inf").write_text("[Version]\n")
+    driver = DriverAsset(name="Chipset", path=driver_dir, asset_type=AssetType.DRIVER,
+                         metadata={}, driver_type=DriverType.INF)
+
+    update_file = root / "updates" / "KB1.msu"
+    update_file.parent.mkdir(parents=True)
+    update_file.write_bytes(b"m" * 4096)
+    update = UpdateAsset(name="KB1", path=update_file, asset_type=AssetType.UPDATE,
+                         metadata={}, update_type=UpdateType.MSU)
+
+    return source_wim, driver, update
+
+
+def test_simulated_backend_workflow():
+    """The full prepare/mount/integrate/export workflow runs without DISM."""
+
+    print("🔍 Testing WIM workflow on the simulated backend...")
+
+    async def run(root: Path):
+        source_wim, driver, update = create_assets(root)
+        backend = SimulatedBackend(latency={'mount': 0.01, 'export': 0.01})
+        workflow = WimWorkflow(WimHandler(backend=backend))
+        mount_point = root / "mount"
+
+        temp_wim = await workflow.prepare_wim_for_modification(source_wim, root / "temp")
+        await workflow.mount_wim_for_modification(temp_wim, mount_point)
+        assert (mount_point / "Windows").is_dir()
+
+        driver_results = await DriverIntegrator(backend=backend).integrate_drivers(
+            [driver], mount_point, root / "yunona")
+        update_results = await UpdateIntegrator(backend=backend).integrate_updates(
+            [update], mount_point, root / "yunona")
+        assert driver_results[0].success and driver_results[0].method == "SIMULATED"
+        assert update_results[0].success
+        assert backend.mounts[str(mount_point)]['drivers'] == [driver.path]
+
+        final_wim = await workflow.finalize_and_export_wim(mount_point, root / "export" / "final.wim")
+        assert final_wim.read_bytes() == source_wim.read_bytes()
+        assert not any(mount_point.iterdir())
+        return backend.get_stats()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stats = asyncio.run(run(Path(tmp)))
+
+    assert stats['mount']['calls'] == 1 and stats['export']['calls'] == 1
+    assert stats['mount']['seconds'] >= 0.01
+    print(f"   ✅ Workflow completed: {stats}")
+
+
+def test_simulated_backend_failure_injection():
+    """Injected failures surface as DismError / failed results and are reproducible."""
+
+    print("🔍 Testing simulated failure injection...")
+
+    async def outcomes(seed: int):
+        backend = SimulatedBackend(failure_rate=0.5, seed=seed)
+        results = []
+        for _ in range(20):
+            try:
+                await backend.cleanup()
+                results.append(True)
+            except DismError:
+                results.append(False)
+        return results
+
+    first = asyncio.run(outcomes(7))
+    assert first == asyncio.run(outcomes(7))
+    assert True in first and False in first
+    print(f"   ✅ Seeded failures are deterministic ({first.count(False)}/20 failed)")
+
+    async def run(root: Path):
+        source_wim, driver, update = create_assets(root)
+        backend = SimulatedBackend()
+        handler = WimHandler(backend=backend)
+        mount_point = root / "mount"
+
+        backend.fail_next('mount')
+        try:
+            await handler.mount_wim(source_wim, mount_point)
+            assert False, "mount should fail"
+        except DismError as e:
+            assert "Simulated mount failure" in str(e)
+        assert not handler.mounted_images and not backend.mounts
+
+        await handler.mount_wim(source_wim, mount_point)
+        backend.fail_next('add_driver')
+        results = await DriverIntegrator(backend=backend).integrate_drivers(
+            [driver], mount_point, root / "yunona")
+        assert not results[0].success and "Simulated add_driver failure" in results[0].message
+        assert await handler.unmount_wim(mount_point, commit=False, discard=True)
+        return backend.get_stats()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stats = asyncio.run(run(Path(tmp)))
+
+    assert stats['mount'] == {'calls': 2, 'failures': 1, 'seconds': 0.0}
+    print(f"   ✅ Failed mount cleaned up, failed driver reported")
+
+
+def test_backend_selection_and_wimlib_staging():
+    """Backends are selected from the build config; wimlib stages drivers and packages."""
+
+    print("🔍 Testing backend selection and wimlib staging...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        paths = {'assetCatalogPath': str(root / "catalog.db"), 'digestCachePath': str(root / "digests.db")}
+
+        assert isinstance(create_imaging_backend(BuildConfig(**paths)), DismBackend)
+        backend = create_imaging_backend(BuildConfig(
+            imagingBackend={"type": "simulated", "config": {"latency": {"mount": 2.5}, "seed": 3}}, **paths
+        ))
+        assert isinstance(backend, SimulatedBackend) and backend.latency['mount'] == 2.5
+        wimlib = create_imaging_backend(BuildConfig(
+            imagingBackend={"type": "wimlib", "config": {"wimlibPath": "/opt/wimlib-imagex"}}, **paths
+        ))
+        assert isinstance(wimlib, WimlibBackend) and wimlib.wimlib_path == "/opt/wimlib-imagex"
+
+        # Construction no longer requires dism.exe
+        assert isinstance(WimHandler().backend, DismBackend)
+        print(f"   ✅ dism, simulated and wimlib backends selected from config")
+
+        source_wim, driver, update = create_assets(root)
+        mount_point = root / "mount"
+        (mount_point / "Windows").mkdir(parents=True)
+        driver_results = asyncio.run(DriverIntegrator(backend=wimlib).integrate_drivers(
+            [driver], mount_point, root / "yunona"))
+        update_results = asyncio.run(UpdateIntegrator(backend=wimlib).integrate_updates(
+            [update], mount_point, root / "yunona"))
+
+        staged_driver = mount_point / "Users" / "Public" / "Yunona" / "Drivers" / "Chipset"
+        staged_update = mount_point / "Users" / "Public" / "Yunona" / "Updates" / "KB1"
+        assert driver_results[0].success and "staged" in driver_results[0].message
+        assert (staged_driver / "chipset.inf").exists()
+        assert "pnputil.exe /add-driver" in (staged_driver / "install_inf.cmd").read_text()
+        assert update_results[0].success and (staged_update / "KB1.msu").exists()
+        assert "wusa.exe" in (staged_update / "install_package.cmd").read_text()
+        print(f"   ✅ wimlib staged driver and update for first boot")
+
+    images = DismBackend._parse_wim_info(
+        "Index : 1\nName : Windows 10 Enterprise\nArchitecture : x64\n\n"
+        "Index : 2\nName : Windows 10 Pro\nArchitecture : x64\n"
+    )
+    assert [(i.index, i.name) for i in images] == [(1, "Windows 10 Enterprise"), (2, "Windows 10 Pro")]
+
+
+if __name__ == "__main__":
+    test_simulated_backend_workflow()
+    test_simulated_backend_failure_injection()
+    test_backend_selection_and_wimlib_staging()
+    print("\n✅ All imaging backend tests completed!")
@@ -0,0 +1,212 @@
+"""
+INF Parser Test Script
+Test offline INF parsing, the hardware-ID index and hardware-ID filtered driver injection
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.asset_providers import DriverAsset, AssetType, DriverType
+from app.core.imaging_backend import SimulatedBackend, ImagingResult
+from app.core.driver_integration import DriverIntegrator
+from app.core.inf_parser import HardwareIdIndex, get_inf_info, parse_inf, select_driver_files
+from app.models.config import DeviceConfig
+
+INTEL_INF = Path("assets/drivers/IntelChipset_10.1.19502.8391/DriverFiles/production/W2K16-x64/SunrisePoint-HSystem.inf")
+
+NETWORK_INF = """; Network adapter ; with "quoted; comment"
+[Version]
+Signature   = "$WINDOWS NT$"
+Class       = Net
+ClassGUID   = {4d36e972-e325-11ce-bfc1-08002be10318}
+Provider    = %VENDOR%
+CatalogFile.NTamd64 = netx64.cat
+DriverVer   = 03/14/2024,2.1.0.7
+
+[SourceDisksNames]
+1 = %DiskName%,,,\\x64
+
+[SourceDisksFiles]
+netx.sys = 1
+netx.dll = 1,lib
+
+[Manufacturer]
+%VENDOR% = Vendor, NTamd64.10.0, \\
+           NTx86
+
+[Vendor.NTamd64.10.0]
+%NetDesc% = NetX_Install, PCI\\VEN_10EC&DEV_8168&SUBSYS_00011234, PCI\\VEN_10EC&CC_0200
+
+[NetX_Install]
+CopyINF = netx_ext.inf
+
+[Strings]
+VENDOR = "Vendor, Inc."
+DiskName = "Disk"
+NetDesc = "NetX Adapter"
+"""
+
+AUDIO_INF = """[Version]
+Class=MEDIA
+CatalogFile=audio.cat
+DriverVer=01/02/2023,6.0.1.1
+
+[Manufacturer]
+%MFG%=Audio,NTamd64
+
+[Audio.NTamd64]
+%AudioDesc%=Audio_Install,HDAUDIO\\FUNC_01&VEN_10EC&DEV_0256
+
+[Strings]
+MFG="Audio Corp"
+AudioDesc="HD Audio"
+"""
+
+
+def create_package(root: Path) -> Path:
+    """A package with a network INF (UTF-16), an audio INF and their files."""
+    package = root / "drivers" / "Combo"
+    files = {
+        "net/netx.inf": NETWORK_INF.encode("utf-16"),
+        "net/NETX64.CAT": b"cat",
+        "net/netx_ext.inf": b"[Version]\r\nClass=Extension\r\n",
+        "net/x64/netx.sys": b"sys",
+        "net/x64/lib/netx.dll": b"dll",
+        "audio/audio.inf": AUDIO_INF.encode("utf-8"),
+        "audio/audio.cat": b"cat",
+        "audio/audio.sys": b"sys",
+        "readme.txt": b"readme",
+    }
+    for name, data in files.items():
+        (package / name).parent.mkdir(parents=True, exist_ok=True)
+        (package / name).write_bytes(data)
+    return package
+
+
+class RecordingBackend(SimulatedBackend):
+    """Records the files below each path handed to add_driver."""
+
+    def __init__(self):
+        super().__init__()
+        self.added = []
+
+    async def add_driver(self, mount_point, driver_path, recurse=True, force_unsigned=True, progress=None,
+                         timeout=300) -> ImagingResult:
+        self.added.append(sorted(p.relative_to(driver_path).as_posix().split("/", 1)[-1]
+                                 for p in Path(driver_path).rglob("*") if p.is_file()))
+        return await super().add_driver(mount_point, driver_path, recurse, force_unsigned, progress, timeout)
+
+
+def test_parse_inf():
+    """Version fields, models sections, strings and referenced files are read from INF text."""
+
+    print("🔍 Testing INF parsing...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        package = create_package(Path(tmp))
+        info = parse_inf(package / "net" / "netx.inf")
+        assert (info.driver_class, info.provider) == ("Net", "Vendor, Inc.")
+        assert info.class_guid == "{4D36E972-E325-11CE-BFC1-08002BE10318}"
+        assert (info.driver_date, info.driver_version) == ("03/14/2024", "2.1.0.7")
+        assert info.catalog_files == ["netx64.cat"]
+        assert info.hardware_ids == ["PCI\\VEN_10EC&DEV_8168&SUBSYS_00011234", "PCI\\VEN_10EC&CC_0200"]
+        assert info.source_files == ["x64/netx.sys", "x64/lib/netx.dll", "netx_ext.inf"]
+
+        # Cached per file until it changes
+        audio = package / "audio" / "audio.inf"
+        assert get_inf_info(audio) is get_inf_info(audio)
+        audio.write_text(AUDIO_INF.replace("6.0.1.1", "6.0.2.0"))
+        os.utime(audio, ns=(audio.stat().st_atime_ns, audio.stat().st_mtime_ns + 1_000_000))
+        assert get_inf_info(audio).driver_version == "6.0.2.0"
+
+    if INTEL_INF.exists():
+        intel = parse_inf(INTEL_INF)
+        assert intel.driver_class == "System" and intel.catalog_files == ["SunrisePoint-H.cat"]
+        assert "PCI\\VEN_8086&DEV_A110" in intel.hardware_ids
+        print(f"   ✅ {INTEL_INF.name}: {len(intel.hardware_ids)} hardware IDs, DriverVer {intel.driver_version}")
+
+
+def test_hardware_id_index():
+    """INF IDs match the more specific device IDs; wildcards match INF IDs."""
+
+    print("🔍 Testing hardware-ID index...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        package = create_package(Path(tmp))
+        net, audio = get_inf_info(package / "net" / "netx.inf"), get_inf_info(package / "audio" / "audio.inf")
+        index = HardwareIdIndex([net, audio])
+
+        assert index.match(["pci\\ven_10ec&dev_8168&subsys_00011234&rev_15"]) == [net]
+        assert index.match(["PCI\\VEN_10EC&DEV_8136&CC_0200"]) == [net]  # compatible ID
+        assert index.match(["PCI\\VEN_10EC&DEV_8168"]) == []  # less specific than the INF
+        assert index.match(["HDAUDIO\\FUNC_01&VEN_10EC&DEV_0256&SUBSYS_10280A20&REV_1000"]) == [audio]
+        assert index.match(["*VEN_10EC*"]) == [net, audio]
+
+        selection = select_driver_files(package, sorted(p for p in package.rglob("*") if p.is_file()),
+                                        ["PCI\\VEN_10EC&DEV_8168&SUBSYS_00011234&REV_15"])
+        assert [p.name for p in selection.infs] == ["netx.inf"]  # netx_ext.inf comes along via CopyINF
+        assert [p.name for p in selection.skipped] == ["audio.inf"]
+        assert sorted(p.relative_to(package).as_posix() for p in selection.files) == [
+            "net/NETX64.CAT", "net/netx.inf", "net/netx_ext.inf", "net/x64/lib/netx.dll", "net/x64/netx.sys"
+        ]
+        assert selection.missing == []
+        print(f"   ✅ {len(selection.files)} files selected, {len(selection.skipped)} INF skipped")
+
+        # An INF without hardware IDs that no other INF references is kept
+        selection = select_driver_files(package, [package / "net" / "netx_ext.inf"], ["PCI\\VEN_1234&DEV_0001"])
+        assert [p.name for p in selection.infs] == ["netx_ext.inf"]
+
+
+def test_filtered_injection():
+    """Only the matching INFs and their files reach the backend, batched or per package."""
+
+    print("🔍 Testing hardware-ID filtered driver injection...")
+
+    device = DeviceConfig(deviceId="xX-39A", hardwareIds=["HDAUDIO\\FUNC_01&VEN_10EC&DEV_0256&SUBSYS_10280A20"])
+
+    async def run(root: Path):
+        package = create_package(root)
+        other = root / "drivers" / "Other"
+        other.mkdir(parents=True)
+        (other / "other.inf").write_text(AUDIO_INF.replace("DEV_0256", "DEV_0299"))
+        drivers = [DriverAsset(name=path.name, path=path, asset_type=AssetType.DRIVER, metadata={},
+                               driver_type=DriverType.INF, order=order)
+                   for order, path in enumerate((package, other))]
+
+        for batch in (False, True):
+            backend = RecordingBackend()
+            mount_point = root / f"mount_{batch}"
+            await backend.mount(root / "test.wim", mount_point)
+            integrator = DriverIntegrator(backend=backend, batch_inf=batch, staging_dir=root / "staging",
+                                          hardware_ids=device.hardwareIds)
+            results = await integrator.integrate_drivers(drivers, mount_point, root / "yunona")
+
+            assert backend.added == [["audio/audio.cat", "audio/audio.inf"]]
+            assert results[0].success and results[0].files_processed == 1
+            assert results[1].success and results[1].method == "SKIPPED"
+            stats = integrator.get_integration_summary()
+            assert (stats['inf_files_selected'], stats['inf_files_skipped'], stats['inf_via_dism']) == (1, 2, 1)
+            assert not any((root / "staging").iterdir())
+            print(f"   ✅ {'Batch' if batch else 'Package'} mode: {results[0].message}; {results[1].message}")
+
+        # Without hardware IDs the package directory is added as is
+        backend = RecordingBackend()
+        await backend.mount(root / "test.wim", root / "mount")
+        await DriverIntegrator(backend=backend).integrate_drivers(drivers[:1], root / "mount", root / "yunona")
+        assert len(backend.added[0]) == 9
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+if __name__ == "__main__":
+    test_parse_inf()
+    test_hardware_id_index()
+    test_filtered_injection()
+    print("\n✅ All INF parser tests completed!")
@@ -0,0 +1,162 @@
+"""
+Integration Scheduler Test Script
+Test overlapping Yunona staging with servicing and the per-lane timings
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.asset_providers import DriverAsset, UpdateAsset, AssetType, DriverType, UpdateType
+from app.core.imaging_backend import SimulatedBackend, ImagingResult
+from app.core.driver_integration import DriverIntegrator, DriverIntegrationManager
+from app.core.update_integration import UpdateIntegrator, UpdateIntegrationManager
+from app.core.integration_scheduler import IntegrationScheduler
+
+
+def create_assets(root: Path):
+    """INF, APPX and EXE drivers; MSU, CAB, EXE and MSI updates, listed out of order."""
+    drivers = []
+    for order, name, driver_type, files in (
+        (3, "Audio", DriverType.INF, ["audio.inf"]),
+        (1, "Chipset", DriverType.INF, ["chipset.inf"]),
+        (2, "Panel", DriverType.APPX, ["panel.appx", "dep.appx"]),
+        (4, "Tool", DriverType.EXE, ["setup.exe"]),
+    ):
+        driver_dir = root / "drivers" / name
+        driver_dir.mkdir(parents=True)
+        for file in files:
+            (driver_dir / file).write_bytes(os.urandom(1024 * 1024))
+        drivers.append(DriverAsset(name=name, path=driver_dir, asset_type=AssetType.DRIVER, metadata={},
+                                   driver_type=driver_type, order=order))
+
+    updates = []
+    for order, name, update_type in (
+        (2, "KB2", UpdateType.CAB),
+        (1, "KB1", UpdateType.MSU),
+        (3, "Runtime", UpdateType.EXE),
+        (4, "Agent", UpdateType.MSI),
+    ):
+        update_file = root / "updates" / name / f"{name}.{update_type.value}"
+        update_file.parent.mkdir(parents=True)
+        update_file.write_bytes(os.urandom(2 * 1024 * 1024))
+        updates.append(UpdateAsset(name=name, path=update_file, asset_type=AssetType.UPDATE, metadata={},
+                                   update_type=update_type, order=order))
+    return drivers, updates
+
+
+def test_scheduled_integration():
+    """Servicing keeps its order; staging runs on the worker pool; lanes are timed."""
+
+    print("🔍 Testing scheduled integration...")
+
+    async def run(root: Path):
+        drivers, updates = create_assets(root)
+        backend = SimulatedBackend(latency={'add_driver': 0.05, 'add_package': 0.05})
+        mount_point = root / "mount"
+        await backend.mount(root / "test.wim", mount_point)
+
+        driver_manager = DriverIntegrationManager(DriverIntegrator(backend=backend))
+        update_manager = UpdateIntegrationManager(UpdateIntegrator(backend=backend))
+        reports = []
+        schedule = await IntegrationScheduler(driver_manager, update_manager, staging_workers=2).run(
+            drivers, updates, mount_point, root / "yunona", 10, progress_callback=reports.append
+        )
+
+        assert schedule.drivers['success'] and schedule.updates['success']
+        assert [r.driver_asset.name for r in schedule.drivers['results']] == ["Chipset", "Panel", "Audio", "Tool"]
+        assert [r.update_asset.name for r in schedule.updates['results']] == ["KB1", "KB2", "Runtime", "Agent"]
+
+        # Servicing operations ran through the backend in order, staged assets did not
+        mount = backend.mounts[str(mount_point)]
+        assert [p.name for p in mount['drivers']] == ["Chipset", "Audio"]
+        assert [p.name for p in mount['packages']] == ["KB1.msu", "KB2.cab"]
+        yunona = mount_point / "Users" / "Public" / "Yunona"
+        assert (yunona / "Drivers" / "Panel" / "install_appx.ps1").exists()
+        assert (yunona / "Updates" / "Agent" / "install_update.cmd").exists()
+
+        servicing, staging = schedule.lanes['servicing'], schedule.lanes['staging']
+        assert (servicing.items, staging.items, staging.workers) == (4, 4, 2)
+        assert servicing.wall_seconds >= 0.2 and schedule.critical_path == "servicing"
+        assert staging.started < servicing.finished and staging.finished < servicing.finished
+        assert driver_manager.integrator.get_integration_summary()['total'] == 4
+        assert update_manager.integrator.get_integration_summary()['successful'] == 4
+
+        percents = [report.percent for report in reports]
+        assert percents == sorted(percents) and percents[-1] == 100.0
+        print(f"   ✅ {schedule.seconds:.2f}s instead of {schedule.sequential_seconds:.2f}s sequential "
+              f"(servicing {servicing.wall_seconds:.2f}s, staging {staging.wall_seconds:.2f}s)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+def test_incompatible_assets_skipped():
+    """Assets for another OS are filtered like in the integration managers."""
+
+    print("🔍 Testing OS filtering in the scheduler...")
+
+    async def run(root: Path):
+        drivers, updates = create_assets(root)
+        drivers[0].supported_os = [11]
+        updates[3].supported_os = [11]
+        backend = SimulatedBackend()
+        await backend.mount(root / "test.wim", root / "mount")
+
+        schedule = await IntegrationScheduler(
+            DriverIntegrationManager(DriverIntegrator(backend=backend, batch_inf=True)),
+            UpdateIntegrationManager(UpdateIntegrator(backend=backend))
+        ).run(drivers, updates, root / "mount", root / "yunona", 10)
+
+        assert schedule.drivers['successful_count'] == 3 and schedule.updates['successful_count'] == 3
+        assert schedule.drivers['batch'] is None  # a single INF package is not batched
+        print(f"   ✅ Lanes: {schedule.to_dict()['lanes']}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+class ServicingBackend(SimulatedBackend):
+    """Writes a component into WinSxS for every package added."""
+
+    async def add_package(self, mount_point, package_path, progress=None) -> ImagingResult:
+        component = mount_point / "Windows" / "WinSxS" / package_path.stem
+        component.mkdir(parents=True, exist_ok=True)
+        (component / "payload.dll").write_bytes(b"p" * 4096)
+        return await super().add_package(mount_point, package_path, progress)
+
+
+def test_servicing_size_added():
+    """Only the servicing delta counts as added size, not the files staged alongside."""
+
+    print("🔍 Testing servicing size measurement...")
+
+    async def run(root: Path):
+        drivers, updates = create_assets(root)
+        backend = ServicingBackend(latency={'add_package': 0.05})
+        await backend.mount(root / "test.wim", root / "mount")
+
+        update_manager = UpdateIntegrationManager(UpdateIntegrator(backend=backend))
+        schedule = await IntegrationScheduler(
+            DriverIntegrationManager(DriverIntegrator(backend=backend)), update_manager, staging_workers=2
+        ).run(drivers, updates, root / "mount", root / "yunona", 10)
+
+        sizes = {r.update_asset.name: r.size_added for r in schedule.updates['results']}
+        assert sizes['KB1'] == 4096 and sizes['KB2'] == 4096
+        assert update_manager.integrator.get_integration_summary()['total_size_added'] == 2 * 4096
+        print(f"   ✅ Size added per package: {sizes}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+if __name__ == "__main__":
+    test_scheduled_integration()
+    test_incompatible_assets_skipped()
+    test_servicing_size_added()
+    print("\n✅ All integration scheduler tests completed!")
@@ -0,0 +1,164 @@
+"""
+Mount Journal Test Script
+Test that mounts are journaled and recovered after a crash
+"""
+
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.mount_journal import MountJournal, COMMITTING
+from app.core.mount_manager import MountManager
+from app.core.imaging_backend import SimulatedBackend
+from app.core.asset_providers import SBIAsset, UpdateAsset, UpdateType, AssetType
+from app.core.serviced_layers import ServicedLayerCache
+from app.utils.digest_cache import DigestCache
+from app.core.wim_handler import WimHandler, WimWorkflow
+
+
+def make_source(root: Path, name: str) -> Path:
+    source = root / "sbi" / f"{name}.wim"
+    source.parent.mkdir(exist_ok=True)
+    source.write_bytes(os.urandom(64 * 1024))
+    return source
+
+
+def test_journal_tracks_mount_lifecycle():
+    """A completed workflow leaves nothing in the journal; only dead processes' mounts are orphaned."""
+
+    print("🔍 Testing mount journal lifecycle...")
+
+    async def run(root: Path):
+        journal = MountJournal(root / "journal.db")
+        backend = SimulatedBackend()
+        workflow = WimWorkflow(WimHandler(backend=backend, journal=journal, owner="job-1"))
+
+        temp_wim = await workflow.prepare_wim_for_modification(make_source(root, "w10"), root / "temp")
+        await workflow.mount_wim_for_modification(temp_wim, root / "mount")
+        entry = journal.get(root / "mount")
+        assert entry.state == "mounted" and entry.owner == "job-1" and entry.pid == os.getpid()
+        assert journal.orphaned(active_owners=["job-1"]) == []
+
+        await workflow.finalize_and_export_wim(root / "mount", root / "export" / "final.wim")
+        assert journal.entries() == []
+        print(f"   ✅ Mount recorded while in use and removed after commit")
+
+        # Entries of other processes are orphaned only once the process has exited
+        exited = subprocess.Popen([sys.executable, "-c", "pass"])
+        exited.wait()
+        for name, pid in (("live", os.getppid()), ("dead", exited.pid)):
+            journal.record(root / name, temp_wim, 1, True, f"job-{name}", backend.name)
+            with sqlite3.connect(journal.db_path) as conn:
+                conn.execute('UPDATE mounts SET pid = ? WHERE owner = ?', (pid, f"job-{name}"))
+        assert [e.owner for e in journal.orphaned()] == ["job-dead"]
+        print(f"   ✅ Mounts of running processes are left alone")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+def test_recover_after_crash():
+    """A restarted manager reuses warm mounts and discards or commits the rest in parallel."""
+
+    print("🔍 Testing crash recovery...")
+
+    async def run(root: Path):
+        journal = MountJournal(root / "journal.db")
+        backend = SimulatedBackend(latency={'unmount': 0.2})  # outlives the "crashed" process
+        roots = (root / "mount", root / "temp", root / "export")
+        source, warm_source = make_source(root, "w10"), make_source(root, "w11")
+
+        # First process: two jobs, a warm mount and a stale entry, then a crash
+        crashed = MountManager(*roots, backend, warm_pool_size=1, warm_threshold=1, journal=journal)
+        for job_id in ("job-1", "job-2"):
+            workspace = await crashed.acquire(job_id)
+            workflow = WimWorkflow(WimHandler(backend=backend, journal=journal, owner=job_id))
+            temp_wim = await workflow.prepare_wim_for_modification(source, workspace.temp_dir)
+            await workflow.mount_wim_for_modification(temp_wim, workspace.mount_point)
+        journal.update(root / "mount" / "job-2", state=COMMITTING)     # crashed while committing
+        backend.mounts[str(root / "mount" / "job-1")]['status'] = "needs_remount"  # e.g. after a reboot
+        journal.record(root / "mount" / "job-0", source, 1, True, "job-0", backend.name)  # already unmounted
+        crashed.take_warm(warm_source)
+        await crashed.wait_for_pool()
+        assert len(backend.mounts) == 3 and len(journal.entries()) == 4
+
+        # Restarted process
+        manager = MountManager(*roots, backend, warm_pool_size=1, journal=journal)
+        start = time.perf_counter()
+        results = await manager.recover()
+        elapsed = time.perf_counter() - start
+
+        actions = {Path(r['mount_point']).name: r['action'] for r in results}
+        assert actions == {'job-0': "forgotten", 'job-1': "remounted+discarded",
+                           'job-2': "committed", 'mount': "reused"}, actions
+        assert all(r['success'] for r in results)
+        assert elapsed < 0.35, f"recovery not parallel: {elapsed:.2f}s"
+        assert not (root / "mount" / "job-1").exists() and not (root / "temp" / "job-2").exists()
+        print(f"   ✅ Recovered in {elapsed:.2f}s: {actions}")
+
+        # Only the reused warm mount is left, owned by this process and handed to the next job
+        assert len(backend.mounts) == 1 and [e.owner[:5] for e in journal.entries()] == ["warm:"]
+        warm_mount = manager.take_warm(warm_source, "job-3")
+        assert warm_mount is not None and journal.get(warm_mount.mount_point).owner == "job-3"
+        await warm_mount.workflow.cleanup_workflow(keep_export=False)
+        await manager.wait_for_pool()
+        await manager.shutdown()  # discards the refilled warm mount
+        assert journal.entries() == [] and not backend.mounts
+        assert await manager.recover() == []
+        print(f"   ✅ Warm mount reused by the next job")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+def test_recover_during_layer_build():
+    """A serviced layer being built in this process is not recovered as an orphan."""
+
+    print("🔍 Testing recovery during a serviced layer build...")
+
+    async def run(root: Path):
+        journal = MountJournal(root / "journal.db")
+        backend = SimulatedBackend(latency={'add_package': 0.2})
+        manager = MountManager(root / "mount", root / "temp", root / "export", backend, journal=journal)
+        cache = ServicedLayerCache(root / "layers", digest_cache=DigestCache(root / "digests.db"))
+        source = make_source(root, "w10")
+        update_path = root / "updates" / "kb500001.msu"
+        update_path.parent.mkdir()
+        update_path.write_bytes(os.urandom(4096))
+        sbi = SBIAsset(name="w10", path=source, asset_type=AssetType.SBI, metadata={}, os_id=10)
+        update = UpdateAsset(name="kb500001", path=update_path, asset_type=AssetType.UPDATE, metadata={},
+                             update_type=UpdateType.MSU, supported_os=[10], order=0)
+        key = await cache.resolve_key(sbi, [update], backend, 10)
+
+        workspace = await manager.acquire(f"layer-{key.key[:12]}")
+        build = asyncio.create_task(cache.get_or_build(
+            key, source, backend, root / "yunona", journal=journal, workspace=workspace
+        ))
+        await asyncio.sleep(0.05)
+        assert journal.get(workspace.mount_point) is not None
+        assert await manager.recover() == []
+        print(f"   ✅ Layer build mount left alone by recovery")
+
+        layer = await build
+        cache.release(layer)
+        manager.release(workspace)
+        assert layer.path.exists() and journal.entries() == [] and not backend.mounts
+        print(f"   ✅ Layer build completed after recovery")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+if __name__ == "__main__":
+    test_journal_tracks_mount_lifecycle()
+    test_recover_after_crash()
+    test_recover_during_layer_build()
+    print("\n✅ All mount journal tests completed!")
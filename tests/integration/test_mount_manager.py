@@ -0,0 +1,111 @@
+"""
+Mount Manager Test Script
+Test per-job workspaces, the concurrency cap and the warm mount pool
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.mount_manager import MountManager
+from app.core.imaging_backend import SimulatedBackend
+from app.core.wim_staging import WimStagingCache
+
+
+def make_manager(root: Path, **kwargs) -> MountManager:
+    return MountManager(root / "mount", root / "temp", root / "export", SimulatedBackend(), **kwargs)
+
+
+def test_workspaces_and_concurrency_cap():
+    """Jobs get their own directories; a job over the cap waits for a slot."""
+
+    print("🔍 Testing job workspaces...")
+
+    async def run(root: Path):
+        manager = make_manager(root, max_concurrent=2)
+        first = await manager.acquire("job-1")
+        second = await manager.acquire("job-2")
+        assert first.mount_point != second.mount_point and first.mount_point.is_dir()
+        assert manager.available_slots() == 0
+
+        third_task = asyncio.create_task(manager.acquire("job-3"))
+        await asyncio.sleep(0.05)
+        assert not third_task.done()
+
+        (first.export_dir / "image.wim").write_bytes(b"wim")
+        manager.release(first)
+        third = await asyncio.wait_for(third_task, timeout=1)
+        assert not first.mount_point.exists() and not first.temp_dir.exists()
+        assert (first.export_dir / "image.wim").exists()
+        print(f"   ✅ Third job started after a release: {third.mount_point}")
+
+        manager.release(second)
+        manager.release(third)
+        assert not second.export_dir.exists()
+        info = manager.get_pool_info()
+        assert info['jobs'] == 3 and info['waits'] == 1 and info['available_slots'] == 2
+        print(f"   ✅ Slots freed, empty exports removed")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+def test_warm_mount_pool():
+    """Frequently used sources are kept mounted and handed to jobs."""
+
+    print("🔍 Testing warm mount pool...")
+
+    async def run(root: Path):
+        source = root / "sbi" / "w10.wim"
+        source.parent.mkdir()
+        source.write_bytes(os.urandom(1024 * 1024))
+        manager = make_manager(root, warm_pool_size=1, warm_threshold=2,
+                               staging_cache=WimStagingCache(root / "cache"))
+
+        assert manager.take_warm(source) is None
+        assert manager.take_warm(source) is None  # second use schedules a warm mount
+        await manager.wait_for_pool()
+        assert len(manager.warm) == 1
+
+        workspace = await manager.acquire("job-1")
+        warm_mount = manager.take_warm(source)
+        assert warm_mount is not None and (warm_mount.mount_point / "Windows").is_dir()
+        workspace.adopt(warm_mount)
+        print(f"   ✅ Job took warm mount at {warm_mount.mount_point}")
+
+        workflow = warm_mount.workflow
+        final_wim = await workflow.finalize_and_export_wim(
+            workspace.mount_point, workspace.export_dir / "final.wim"
+        )
+        await workflow.cleanup_workflow(keep_export=True)
+        manager.release(workspace)
+        assert final_wim.exists() and not warm_mount.root.exists()
+
+        # The pool was refilled when the warm mount was taken
+        await manager.wait_for_pool()
+        assert len(manager.warm) == 1 and len(manager.backend.mounts) == 1
+
+        # A changed source invalidates its warm mount
+        os.utime(source, ns=(source.stat().st_atime_ns, source.stat().st_mtime_ns + 10 ** 9))
+        assert manager.take_warm(source) is None
+
+        await manager.wait_for_pool()
+        await manager.shutdown()
+        assert not manager.warm and not manager.backend.mounts
+        info = manager.get_pool_info()
+        assert info['warm_hits'] == 1 and info['warm_prepared'] >= 2
+        print(f"   ✅ Pool refilled and discarded on shutdown: {info['warm_prepared']} prepared")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+if __name__ == "__main__":
+    test_workspaces_and_concurrency_cap()
+    test_warm_mount_pool()
+    print("\n✅ All mount manager tests completed!")
@@ -0,0 +1,314 @@
+"""
+Remote Asset Provider Test Script
+Test index caching, selective parallel downloads, resume and LRU eviction
+"""
+
+import asyncio
+import hashlib
+import json
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.asset_providers import (
+    RemoteAssetProvider, HybridAssetProvider, LocalAssetProvider, DriverType, create_asset_provider
+)
+from app.models.config import BuildConfig
+
+
+def build_library():
+    """In-memory remote library: URL path -> bytes."""
+    inf_data = b"[Version]\r\nSignature=$Windows NT$\r\n" * 100
+    msu_data = b"m" * 300000
+    files = {
+        "drivers/Chipset/x64/chipset.inf": inf_data,
+        "drivers/Chipset/x64/chipset.cat": b"catalog",
+        "drivers/Other/x64/other.inf": inf_data,
+        "updates/KB1/KB1.msu": msu_data,
+    }
+
+    def listing(prefix):
+        return [
+            {"path": name[len(prefix) + 1:], "size": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+            for name, data in files.items() if name.startswith(prefix + "/")
+        ]
+
+    index = {
+        "version": 1,
+        "drivers": [
+            {"name": "Chipset", "config": {"driverName": "Chipset", "driverType": "inf", "driverFamilyId": 1,
+                                           "supportedDevices": [7], "supportedOperatingSystems": [10]},
+             "files": listing("drivers/Chipset")},
+            {"name": "Other", "config": {"driverName": "Other", "driverType": "inf",
+                                         "supportedDevices": [99], "supportedOperatingSystems": [10]},
+             "files": listing("drivers/Other")},
+        ],
+        "updates": [
+            {"name": "KB1", "config": {"updateName": "KB1", "updateType": "msu", "downloadFileName": "KB1.msu",
+                                       "supportedOperatingSystems": [10]},
+             "files": listing("updates/KB1")},
+        ]
+    }
+    files["index.json"] = json.dumps(index).encode('utf-8')
+    return files
+
+
+class LibraryHandler(BaseHTTPRequestHandler):
+    files = {}
+    requests = []
+    chunk_delay = 0.0  # seconds between 64 KB chunks, to keep transfers in flight
+
+    def do_GET(self):
+        path = self.path.lstrip('/')
+        self.requests.append((path, dict(self.headers)))
+        data = self.files.get(path)
+        if data is None:
+            self.send_error(404)
+            return
+
+        etag = f'"{hashlib.sha256(data).hexdigest()[:16]}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        start = 0
+        if self.headers.get('Range'):
+            start = int(self.headers['Range'].split('=')[1].split('-')[0])
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(data) - start))
+        self.end_headers()
+        for offset in range(start, len(data), 65536):
+            self.wfile.write(data[offset:offset + 65536])
+            time.sleep(self.chunk_delay)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(files):
+    LibraryHandler.files = files
+    LibraryHandler.requests = []
+    LibraryHandler.chunk_delay = 0.0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), LibraryHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_remote_provider_downloads_only_compatible_packages():
+    """Only matching packages are downloaded; the index is reused within the TTL."""
+
+    print("🔍 Testing remote provider selective downloads...")
+
+    server, url = serve(build_library())
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            provider = RemoteAssetProvider({
+                'siteUrl': url, 'cachePath': tmp, 'cacheTTL': 3600, 'downloadWorkers': 4
+            })
+
+            drivers = asyncio.run(provider.get_drivers("Test", 10, device_ids=[7]))
+            assert [d.name for d in drivers] == ["Chipset"]
+            assert drivers[0].driver_type == DriverType.INF
+            assert (Path(tmp) / "drivers" / "Chipset" / "x64" / "chipset.inf").exists()
+            assert not (Path(tmp) / "drivers" / "Other").exists()
+            assert asyncio.run(provider.validate_asset(drivers[0]))
+
+            updates = asyncio.run(provider.get_updates(10))
+            assert [u.name for u in updates] == ["KB1"] and updates[0].path.stat().st_size == 300000
+
+            # Second query is served from the cache: no new downloads, one index fetch
+            asyncio.run(provider.get_drivers("Test", 10, device_ids=[7]))
+            info = provider.get_cache_info()
+            assert info['index_fetches'] == 1
+            assert info['files_downloaded'] == 3
+            assert info['files_cached'] == 2
+            print(f"   ✅ Selective download: {info}")
+
+            # Expired TTL revalidates with If-None-Match and gets 304
+            provider.cache_ttl = 0
+            asyncio.run(provider.get_updates(10))
+            assert provider.get_cache_info()['index_not_modified'] == 1
+            index_requests = [h for p, h in LibraryHandler.requests if p == "index.json"]
+            assert 'If-None-Match' in index_requests[-1]
+            print(f"   ✅ Index revalidated with conditional request")
+    finally:
+        server.shutdown()
+
+
+def test_remote_provider_resume_and_eviction():
+    """Partial downloads resume with a Range request; the cache evicts least recently used packages."""
+
+    print("🔍 Testing remote provider resume and eviction...")
+
+    files = build_library()
+    server, url = serve(files)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            part = Path(tmp) / "updates" / "KB1" / "KB1.msu.part"
+            part.parent.mkdir(parents=True)
+            part.write_bytes(files["updates/KB1/KB1.msu"][:100000])
+
+            provider = RemoteAssetProvider({'siteUrl': url, 'cachePath': tmp, 'cacheMaxSizeMB': 1})
+            updates = asyncio.run(provider.get_updates(10))
+            assert updates[0].path.read_bytes() == files["updates/KB1/KB1.msu"]
+            assert provider.stats['files_resumed'] == 1
+            assert provider.stats['bytes_downloaded'] == 200000
+            print(f"   ✅ Download resumed from byte 100000")
+
+            # Shrink the limit: a build on the same cache still holds the update package
+            provider.cache_max_bytes = 10000
+            other = RemoteAssetProvider({'siteUrl': url, 'cachePath': tmp, 'cacheMaxSizeMB': 1})
+            other.cache_max_bytes = 10000
+            asyncio.run(other.get_drivers("Test", 10, device_ids=[7]))
+            assert updates[0].path.exists() and other.get_cache_info()['evictions'] == 0
+            print(f"   ✅ Package leased by a concurrent build kept")
+
+            # Once that build releases it, the update package is evicted when drivers are requested
+            provider.release()
+            asyncio.run(provider.get_drivers("Test", 10, device_ids=[7]))
+            assert not updates[0].path.exists()
+            assert (Path(tmp) / "drivers" / "Chipset" / "x64" / "chipset.inf").exists()
+            assert provider.get_cache_info()['evictions'] == 1
+            print(f"   ✅ Least recently used package evicted")
+    finally:
+        server.shutdown()
+
+
+def test_remote_providers_share_downloads():
+    """Builds fetching the same package into one cache download it once."""
+
+    print("🔍 Testing concurrent downloads into a shared cache...")
+
+    files = build_library()
+    server, url = serve(files)
+    LibraryHandler.chunk_delay = 0.02
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            providers = [RemoteAssetProvider({'siteUrl': url, 'cachePath': tmp}) for _ in range(2)]
+            results, errors = {}, []
+            start = threading.Barrier(len(providers))
+
+            def build(provider):
+                start.wait()
+                try:
+                    results[id(provider)] = asyncio.run(provider.get_updates(10))
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=build, args=(p,)) for p in providers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert not errors, errors
+            for updates in results.values():
+                assert updates[0].path.read_bytes() == files["updates/KB1/KB1.msu"]
+            assert sum(p.stats['files_downloaded'] for p in providers) == 1
+            assert not list((Path(tmp) / "updates" / "KB1").glob("*.part"))
+            msu_requests = [p for p, _ in LibraryHandler.requests if p == "updates/KB1/KB1.msu"]
+            assert len(msu_requests) == 1
+            print(f"   ✅ Both builds got the update from one download")
+    finally:
+        server.shutdown()
+
+
+def test_remote_provider_rejects_unsafe_paths():
+    """Index entries whose paths would escape the cache directory are ignored."""
+
+    print("🔍 Testing remote provider path validation...")
+
+    files = build_library()
+    index = json.loads(files["index.json"])
+    index["drivers"][0]["files"].append({"path": "../../outside.inf", "size": 4})
+    index["updates"].append({"name": "..", "config": {"updateName": "Evil", "updateType": "msu",
+                                                      "downloadFileName": "KB2.msu"},
+                             "files": [{"path": "KB2.msu", "size": 4}]})
+    index["yunona"] = [{"path": "/etc/evil.ps1", "size": 4}, {"path": "C:\\evil.ps1", "size": 4}]
+    files["index.json"] = json.dumps(index).encode('utf-8')
+
+    server, url = serve(files)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = Path(tmp) / "cache"
+            provider = RemoteAssetProvider({'siteUrl': url, 'cachePath': str(cache)})
+            assert asyncio.run(provider.get_drivers("Test", 10, device_ids=[7])) == []
+            assert [u.name for u in asyncio.run(provider.get_updates(10))] == ["KB1"]
+            assert asyncio.run(provider.get_yunona_scripts()) == []
+            assert not (Path(tmp) / "outside.inf").exists()
+            print(f"   ✅ Unsafe package and file paths ignored")
+    finally:
+        server.shutdown()
+
+
+def test_hybrid_provider_prefers_local_and_prefetches():
+    """Local packages are used as-is; remote-only packages download in the background."""
+
+    print("🔍 Testing hybrid provider...")
+
+    server, url = serve(build_library())
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            driver_dir = root / "drivers" / "Chipset"
+            (driver_dir / "x64").mkdir(parents=True)
+            (driver_dir / "x64" / "chipset.inf").write_text("; local inf")
+            with open(driver_dir / "Chipset.json", 'w') as f:
+                json.dump({"driverName": "Chipset", "driverType": "inf", "driverFamilyId": 1,
+                           "supportedDevices": [7], "supportedOperatingSystems": [10]}, f)
+
+            build_config = BuildConfig(
+                driverRoot=str(root / "drivers"),
+                updateRoot=str(root / "updates"),
+                assetCatalogPath=str(root / "catalog.db"),
+                digestCachePath=str(root / "digests.db"),
+                assetProvider={"type": "hybrid", "config": {
+                    "remote": {"siteUrl": url, "cachePath": str(root / "cache")}
+                }}
+            )
+            provider = create_asset_provider(build_config, root)
+            assert isinstance(provider, HybridAssetProvider)
+
+            drivers = asyncio.run(provider.get_drivers("Test", 10, device_ids=[7]))
+            updates = asyncio.run(provider.get_updates(10))
+            assert [d.metadata.get('source') for d in drivers] == [None]
+            assert [u.metadata.get('source') for u in updates] == ["remote"]
+            assert not updates[0].path.exists()
+            assert asyncio.run(provider.validate_asset(updates[0]))
+            print(f"   ✅ Local driver used, remote update deferred")
+
+            provider.start_prefetch()
+            asyncio.run(provider.wait_for_prefetch())
+            assert updates[0].path.stat().st_size == 300000
+
+            stats = provider.get_fetch_stats()
+            assert stats['local_hits'] == 1 and stats['remote_misses'] == 1
+            assert stats['bytes_downloaded'] == 300000 and stats['pending'] == 0
+            print(f"   ✅ Prefetch completed: {stats}")
+
+            # Without an assetProvider section the local provider is used
+            local_config = BuildConfig(assetCatalogPath=str(root / "catalog.db"),
+                                       digestCachePath=str(root / "digests.db"))
+            assert isinstance(create_asset_provider(local_config, root), LocalAssetProvider)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_remote_provider_downloads_only_compatible_packages()
+    test_remote_provider_resume_and_eviction()
+    test_remote_providers_share_downloads()
+    test_remote_provider_rejects_unsafe_paths()
+    test_hybrid_provider_prefers_local_and_prefetches()
+    print("\n✅ All remote provider tests completed!")
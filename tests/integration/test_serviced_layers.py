@@ -0,0 +1,157 @@
+"""
+Serviced Layer Cache Test Script
+Test that OS updates are integrated once per SBI and update set and reused across device builds
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.serviced_layers import ServicedLayerCache, ServicedLayerError
+from app.core.asset_providers import SBIAsset, UpdateAsset, UpdateType, AssetType
+from app.core.imaging_backend import SimulatedBackend
+from app.core.mount_journal import MountJournal
+from app.core.mount_manager import MountManager
+from app.core.wim_staging import WimStagingCache
+from app.utils.digest_cache import DigestCache
+
+
+def make_assets(root: Path, os_id: int = 10):
+    sbi_path = root / "sbi" / "w10.wim"
+    sbi_path.parent.mkdir(parents=True)
+    sbi_path.write_bytes(os.urandom(1024 * 1024))
+    sbi = SBIAsset(name="w10", path=sbi_path, asset_type=AssetType.SBI, metadata={}, os_id=os_id)
+
+    updates = []
+    for order, name in enumerate(("kb500001", "kb500002")):
+        update_path = root / "updates" / name / f"{name}.msu"
+        update_path.parent.mkdir(parents=True)
+        update_path.write_bytes(os.urandom(4096))
+        updates.append(UpdateAsset(
+            name=name, path=update_path, asset_type=AssetType.UPDATE, metadata={},
+            update_type=UpdateType.MSU, supported_os=[os_id], order=order
+        ))
+    return sbi, updates
+
+
+def test_layer_reused_across_device_builds():
+    """The second build of an OS reuses the layer instead of integrating updates again."""
+
+    print("🔍 Testing serviced layer reuse...")
+
+    async def run(root: Path):
+        sbi, updates = make_assets(root)
+        backend = SimulatedBackend()
+        cache = ServicedLayerCache(root / "layers", digest_cache=DigestCache(root / "digests.db"))
+        staging = WimStagingCache(root / "sbi_cache")
+
+        key = await cache.resolve_key(sbi, updates, backend, 10)
+        first = await cache.get_or_build(key, sbi.path, backend, root / "yunona", staging)
+        cache.release(first)
+        assert not first.cache_hit and first.path.exists()
+        assert [u['name'] for u in first.updates] == ["kb500001", "kb500002"]
+        assert all(u['success'] for u in first.updates)
+        print(f"   ✅ Built layer {first.key[:12]} with {len(first.updates)} updates")
+
+        # Same SBI and update set (e.g. another device): cache hit, no servicing
+        again = await cache.resolve_key(sbi, list(reversed(updates)), backend, 10)
+        second = await cache.get_or_build(again, sbi.path, backend, root / "yunona", staging)
+        cache.release(second)
+        assert second.cache_hit and second.key == first.key
+        assert backend.get_stats()['add_package']['calls'] == 2
+        print(f"   ✅ Second build reused the layer: {cache.get_cache_info()}")
+
+        # A different update set is a different layer
+        changed = await cache.resolve_key(sbi, updates[:1], backend, 10)
+        assert changed.key != first.key and changed.source_sha256 == first.source_sha256
+        print(f"   ✅ Update set change produces a new key")
+
+        assert cache.list_layers(os_id=10)[0]['key'] == first.key
+        assert cache.invalidate(os_id=10) == 1
+        assert not first.path.exists() and cache.get(first.key) is None
+        print(f"   ✅ Layers invalidated by OS")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+def test_failed_layer_not_cached():
+    """A build with a failed update raises and leaves nothing behind."""
+
+    print("🔍 Testing failed serviced layer build...")
+
+    async def run(root: Path):
+        sbi, updates = make_assets(root)
+        backend = SimulatedBackend()
+        cache = ServicedLayerCache(root / "layers", digest_cache=DigestCache(root / "digests.db"))
+        key = await cache.resolve_key(sbi, updates, backend, 10)
+
+        backend.fail_next('add_package')
+        try:
+            await cache.get_or_build(key, sbi.path, backend, root / "yunona")
+            assert False, "failed update should fail the layer build"
+        except ServicedLayerError as e:
+            print(f"   ✅ Layer build failed: {e}")
+
+        info = cache.get_cache_info()
+        assert info['entries'] == 0 and info['build_failures'] == 1 and not cache._in_use
+        assert not list((root / "layers" / "build").iterdir())
+        assert not backend.mounts
+
+        try:
+            await cache.resolve_key(sbi, updates, backend, 11)
+            assert False, "no compatible updates should be rejected"
+        except ServicedLayerError:
+            print(f"   ✅ OS without updates has no layer")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+def test_layer_built_in_workspace():
+    """A layer build in a workspace holds its build slot and mounts in the workspace."""
+
+    print("🔍 Testing serviced layer build in a workspace...")
+
+    async def run(root: Path):
+        sbi, updates = make_assets(root)
+        backend = SimulatedBackend(latency={'add_package': 0.1})
+        journal = MountJournal(root / "journal.db")
+        manager = MountManager(root / "mount", root / "temp", root / "export", backend,
+                               max_concurrent=1, journal=journal)
+        cache = ServicedLayerCache(root / "layers", digest_cache=DigestCache(root / "digests.db"))
+        key = await cache.resolve_key(sbi, updates, backend, 10)
+
+        workspace = await manager.acquire(f"layer-{key.key[:12]}")
+        build = asyncio.create_task(cache.get_or_build(
+            key, sbi.path, backend, root / "yunona", journal=journal, workspace=workspace
+        ))
+        job = asyncio.create_task(manager.acquire("job-1"))
+        await asyncio.sleep(0.05)
+        entry = journal.get(workspace.mount_point)
+        assert entry is not None and entry.owner == workspace.job_id
+        assert not job.done() and manager.available_slots() == 0
+        print(f"   ✅ Layer mounted at {workspace.mount_point}, job waits for the slot")
+
+        layer = await build
+        cache.release(layer)
+        assert layer.path.exists() and not list(workspace.temp_dir.iterdir())
+        assert not (root / "layers" / "build").exists() and journal.entries() == []
+        manager.release(workspace)
+        manager.release(await asyncio.wait_for(job, timeout=1))
+        print(f"   ✅ Slot passed on after the layer was built")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+if __name__ == "__main__":
+    test_layer_reused_across_device_builds()
+    test_failed_layer_not_cached()
+    test_layer_built_in_workspace()
+    print("\n✅ All serviced layer tests completed!")
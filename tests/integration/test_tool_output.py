@@ -0,0 +1,143 @@
+"""
+Tool Output Test Script
+Test the streaming DISM/wimlib output parser and the progress reported to jobs
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.utils.tool_output import ToolOutputParser, ToolProgress, run_streaming, step_progress
+from app.core.imaging_backend import DismBackend, DismError, SimulatedBackend
+from app.core.wim_handler import WimHandler, WimWorkflow
+
+
+DISM_EXPORT_OUTPUT = (
+    b"\r\nDeployment Image Servicing and Management tool\r\nVersion: 10.0.22621.1\r\n\r\n"
+    b"Exporting image\r\n"
+    b"[==                         5.0%                           ]\r"
+    b"[==========                20.0%                           ]\r"
+    b"[=====================     45.0%                           ]\r"
+    b"[==========================100.0%==========================]\r\n"
+    b"\r\nError: 0x800f081f\r\n\r\nThe source files could not be found.\r\n"
+    b"The DISM log file can be found at C:\\Windows\\Logs\\DISM\\dism.log\r\n"
+)
+
+
+def test_parser_progress_errors_and_tail():
+    """Progress bars are parsed across chunk boundaries; only a tail of lines is kept."""
+
+    print("🔍 Testing DISM output parser...")
+
+    reported = []
+    parser = ToolOutputParser("export", reported.append, tail_lines=3, interval=0)
+    for i in range(0, len(DISM_EXPORT_OUTPUT), 7):
+        parser.feed(DISM_EXPORT_OUTPUT[i:i + 7])
+    parser.close()
+
+    assert [p.percent for p in reported] == [5.0, 20.0, 45.0, 100.0]
+    assert all(p.operation == "export" for p in reported)
+    assert parser.error_code == "0x800f081f"
+    assert parser.error_message == "The source files could not be found."
+    assert len(parser.lines) == 3 and parser.truncated and parser.line_count == 6
+    assert not any("%" in line for line in parser.lines)
+    print(f"   ✅ Progress {[p.percent for p in reported]}, error {parser.error_code}")
+
+    # Throttled: a burst of redraws reports the first value and 100%
+    reported.clear()
+    parser = ToolOutputParser("mount", reported.append, interval=60)
+    parser.feed(b"".join(f"[=== {p}.0% ===]\r".encode() for p in range(1, 101)))
+    assert [p.percent for p in reported] == [1.0, 100.0]
+
+    # wimlib-imagex progress lines
+    parser = ToolOutputParser("export", reported.append, interval=0)
+    parser.feed(b"Archiving file data: 1203 MiB of 4096 MiB (29%) done\n")
+    assert parser.percent == 29.0
+    print(f"   ✅ Throttling and wimlib progress")
+
+
+def test_streaming_run_reports_before_exit():
+    """Progress arrives while the command is still running; failures carry the DISM error."""
+
+    print("🔍 Testing streaming command runner...")
+
+    script = (
+        "import sys, time\n"
+        "sys.stdout.write('[====  50.0%  ]\\r'); sys.stdout.flush()\n"
+        "time.sleep(0.5)\n"
+        "sys.stdout.write('[====100.0%====]\\r\\nThe operation completed successfully.\\r\\n')\n"
+    )
+
+    async def run():
+        received = []
+        parser = ToolOutputParser("mount", lambda p: received.append((p.percent, time.perf_counter())))
+        start = time.perf_counter()
+        returncode = await run_streaming([sys.executable, "-c", script], 30, parser)
+        end = time.perf_counter()
+        assert returncode == 0 and [p for p, _ in received] == [50.0, 100.0]
+        assert received[0][1] - start < end - start - 0.3
+        assert parser.text() == "The operation completed successfully."
+        print(f"   ✅ 50% reported {received[0][1] - start:.2f}s into a {end - start:.2f}s command")
+
+        backend = DismBackend(sys.executable)
+        failing = "print('Error: 0x800f081f'); print(); print('The source files could not be found.'); exit(2)"
+        try:
+            await backend._run([sys.executable, "-c", failing], timeout=30)
+            assert False, "failing command should raise"
+        except DismError as e:
+            assert e.exit_code == 2 and "0x800f081f" in str(e) and "source files" in str(e)
+            print(f"   ✅ Failure reported: {str(e).splitlines()[0]}")
+
+        try:
+            await backend._run([sys.executable, "-c", "import time; time.sleep(5)"], timeout=0.2)
+            assert False, "slow command should time out"
+        except DismError as e:
+            assert "timed out" in str(e)
+
+    asyncio.run(run())
+
+
+def test_job_step_progress():
+    """Commit and export progress is mapped onto the job's export step range."""
+
+    print("🔍 Testing job step progress...")
+
+    async def run(root: Path):
+        source_wim = root / "sbi" / "test.wim"
+        source_wim.parent.mkdir()
+        source_wim.write_bytes(b"wim" * 1000)
+        backend = SimulatedBackend(latency={'unmount': 0.01, 'export': 0.01})
+        workflow = WimWorkflow(WimHandler(backend=backend))
+
+        steps = []
+        report = step_progress("Exporting", 85, 95, lambda step, value: steps.append((step, value)),
+                               ("unmount", "export"))
+        temp_wim = await workflow.prepare_wim_for_modification(source_wim, root / "temp")
+        await workflow.mount_wim_for_modification(temp_wim, root / "mount")
+        await workflow.finalize_and_export_wim(root / "mount", root / "export" / "final.wim",
+                                               progress_callback=report)
+
+        values = [value for _, value in steps]
+        assert values == sorted(values) and values[0] > 85 and values[-1] == 95
+        assert len(steps) == 2 * SimulatedBackend.PROGRESS_STEPS
+        assert steps[0][0] == "Exporting (25%)"
+        print(f"   ✅ Job progress {values}")
+
+        # Repeated identical updates are not reported again
+        report(ToolProgress("export", 100.0))
+        assert len(steps) == 2 * SimulatedBackend.PROGRESS_STEPS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+if __name__ == "__main__":
+    test_parser_progress_errors_and_tail()
+    test_streaming_run_reports_before_exit()
+    test_job_step_progress()
+    print("\n✅ All tool output tests completed!")
@@ -0,0 +1,151 @@
+"""
+Variant WIM Test Script
+Test appending device builds as indexes of a shared per-OS WIM
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.variant_wim import VariantWimStore, VariantWimError
+from app.core.imaging_backend import SimulatedBackend, DismError
+from app.core.wim_handler import WimHandler, WimWorkflow
+
+
+def make_build(root: Path, device_id: str) -> Path:
+    build = root / "builds" / f"{device_id}.wim"
+    build.parent.mkdir(exist_ok=True)
+    build.write_bytes(os.urandom(256 * 1024))
+    return build
+
+
+def test_append_list_and_extract():
+    """Devices become indexes of one WIM; rebuilds replace their index; images can be extracted."""
+
+    print("🔍 Testing variant WIM store...")
+
+    async def run(root: Path):
+        store = VariantWimStore(root / "variants", SimulatedBackend())
+
+        # Concurrent builds of one OS are appended one after another
+        appended = await asyncio.gather(*(
+            store.append(make_build(root, device), 10, device) for device in ("dev-a", "dev-b", "dev-c")
+        ))
+        assert sorted(image.index for image in appended) == [1, 2, 3]
+        assert appended[0].added_bytes == 256 * 1024 and appended[1].added_bytes == 0
+        images = await store.list_images(10)
+        assert [(i.index, i.device_id) for i in images] == [(1, "dev-a"), (2, "dev-b"), (3, "dev-c")]
+        assert store.get_store_info()['wims'][0]['size'] == 256 * 1024
+        print(f"   ✅ 3 devices in {store.wim_path(10).name}: {[i.device_id for i in images]}")
+
+        # Rebuilding a device replaces its image
+        rebuilt = await store.append(make_build(root, "dev-a"), 10, "dev-a")
+        assert rebuilt.replaced and rebuilt.index == 3
+        assert [i.device_id for i in await store.list_images(10)] == ["dev-b", "dev-c", "dev-a"]
+        await store.append(make_build(root, "dev-x"), 11, "dev-x")
+        assert len(await store.list_images()) == 4
+        print(f"   ✅ Rebuilt device replaced its index")
+
+        extracted = await store.extract(10, "dev-c", root / "out" / "dev-c.wim")
+        assert extracted.exists()
+        assert [i.name for i in await store.backend.get_info(extracted)] == ["dev-c"]
+        try:
+            await store.extract(10, "dev-x", root / "out" / "dev-x.wim")
+            assert False, "missing device should raise"
+        except VariantWimError:
+            pass
+        print(f"   ✅ Extracted {extracted.name}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+class NoRenameBackend(SimulatedBackend):
+    """A backend that cannot rename images, like DISM."""
+    renames_images = False
+
+
+def test_replace_after_append():
+    """A failed rebuild keeps the earlier image; replaced data is reclaimed."""
+
+    print("🔍 Testing safe replacement and compaction...")
+
+    async def run(root: Path):
+        backend = SimulatedBackend()
+        store = VariantWimStore(root / "variants", backend, compact_percent=0)
+        for device in ("dev-a", "dev-b"):
+            await store.append(make_build(root, device), 10, device)
+
+        # The export fails: nothing was removed
+        backend.fail_next('export')
+        try:
+            await store.append(make_build(root, "dev-a"), 10, "dev-a")
+            assert False, "failed export should raise"
+        except DismError:
+            pass
+        assert [(i.index, i.device_id) for i in await store.list_images(10)] == [(1, "dev-a"), (2, "dev-b")]
+
+        # Removing the earlier image fails: the next rebuild discards the incomplete replacement
+        backend.fail_next('delete')
+        try:
+            await store.append(make_build(root, "dev-a"), 10, "dev-a")
+            assert False, "failed delete should raise"
+        except DismError:
+            pass
+        assert [i.device_id for i in await store.list_images(10)] == ["dev-a", "dev-b", "dev-a.replacing"]
+        rebuilt = await store.append(make_build(root, "dev-a"), 10, "dev-a")
+        assert [i.device_id for i in await store.list_images(10)] == ["dev-b", "dev-a"]
+        assert rebuilt.replaced and rebuilt.compacted and backend.get_stats()['optimize']['calls'] == 1
+        assert store.get_store_info()['wims'][0]['compactions'] == 1
+        print(f"   ✅ Failed rebuilds kept dev-a; replacement optimized the WIM")
+
+        # Without renaming, the WIM is rewritten without the earlier image
+        backend = NoRenameBackend()
+        store = VariantWimStore(root / "variants_dism", backend)
+        for device in ("dev-a", "dev-b", "dev-a"):
+            image = await store.append(make_build(root, device), 11, device)
+        assert image.compacted and image.index == 2
+        assert [i.device_id for i in await store.list_images(11)] == ["dev-b", "dev-a"]
+        assert backend.get_stats()['delete']['calls'] == 0
+        assert not list((root / "variants_dism").glob("*.part.wim"))
+        info = store.get_store_info()['wims'][0]
+        assert info['reclaimable_bytes'] == 0 and info['compactions'] == 1
+        print(f"   ✅ Rewritten without the replaced image: {info}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+def test_workflow_append_keeps_shared_wim():
+    """A workflow appends its build; cleaning up the workflow never removes the shared WIM."""
+
+    print("🔍 Testing workflow append export...")
+
+    async def run(root: Path):
+        backend = SimulatedBackend()
+        store = VariantWimStore(root / "variants", backend)
+        workflow = WimWorkflow(WimHandler(backend=backend))
+
+        temp_wim = await workflow.prepare_wim_for_modification(make_build(root, "sbi"), root / "temp")
+        await workflow.mount_wim_for_modification(temp_wim, root / "mount")
+        variant = await workflow.finalize_and_append_wim(root / "mount", store, 10, "dev-a")
+        await workflow.cleanup_workflow(keep_export=False)
+
+        assert variant.wim_path.exists() and not temp_wim.exists() and not backend.mounts
+        assert (await store.find(10, "dev-a")).index == 1
+        print(f"   ✅ Appended {variant.device_id} as index {variant.index} of {variant.wim_path.name}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(Path(tmp)))
+
+
+if __name__ == "__main__":
+    test_append_list_and_extract()
+    test_replace_after_append()
+    test_workflow_append_keeps_shared_wim()
+    print("\n✅ All variant WIM tests completed!")
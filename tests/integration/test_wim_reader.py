@@ -0,0 +1,126 @@
+"""
+WIM Reader Test Script
+Test native WIM header and XML metadata parsing (no DISM required)
+"""
+
+import asyncio
+import struct
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.wim_reader import (
+    WimReader, WimReadError, read_wim_info, WIM_MAGIC, WIM_HEADER_SIZE,
+    WIM_HDR_FLAG_COMPRESSION, WIM_HDR_FLAG_COMPRESS_LZX
+)
+from app.core.asset_providers import LocalAssetProvider, SBIAsset, AssetType
+
+
+SAMPLE_XML = """<WIM><TOTALBYTES>12345</TOTALBYTES>
+<IMAGE INDEX="1"><DIRCOUNT>10</DIRCOUNT><FILECOUNT>100</FILECOUNT><TOTALBYTES>5000</TOTALBYTES>
+<CREATIONTIME><HIGHPART>0x01D9A5C3</HIGHPART><LOWPART>0x5E1E4B20</LOWPART></CREATIONTIME>
+<WINDOWS><ARCH>9</ARCH><PRODUCTNAME>Microsoft Windows Operating System</PRODUCTNAME>
+<EDITIONID>EnterpriseS</EDITIONID><INSTALLATIONTYPE>Client</INSTALLATIONTYPE>
+<LANGUAGES><LANGUAGE>en-US</LANGUAGE><DEFAULT>en-US</DEFAULT></LANGUAGES>
+<VERSION><MAJOR>10</MAJOR><MINOR>0</MINOR><BUILD>19044</BUILD><SPBUILD>1288</SPBUILD></VERSION>
+</WINDOWS><NAME>Windows 10 Enterprise LTSC</NAME><DESCRIPTION>LTSC</DESCRIPTION></IMAGE>
+<IMAGE INDEX="2"><TOTALBYTES>7000</TOTALBYTES>
+<WINDOWS><ARCH>12</ARCH><EDITIONID>IoTEnterpriseS</EDITIONID>
+<VERSION><MAJOR>10</MAJOR><MINOR>0</MINOR><BUILD>26100</BUILD><SPBUILD>1</SPBUILD></VERSION>
+</WINDOWS><NAME>Windows 11 IoT Enterprise LTSC</NAME></IMAGE>
+</WIM>"""
+
+
+def build_wim(path: Path, xml: str = SAMPLE_XML, image_count: int = 2, magic: bytes = WIM_MAGIC):
+    """Write a minimal WIM file: header, padding and the UTF-16LE XML resource."""
+    xml_data = b'\xff\xfe' + xml.encode('utf-16-le')
+    xml_offset = 4096
+
+    def reshdr(size, offset, flags=0):
+        return struct.pack("<QQQ", size | (flags << 56), offset, size)
+
+    header = struct.pack(
+        "<8sIIII16sHHI24s24s24sI24s60s",
+        magic, WIM_HEADER_SIZE, 0x10D00,
+        WIM_HDR_FLAG_COMPRESSION | WIM_HDR_FLAG_COMPRESS_LZX, 32768,
+        uuid.uuid4().bytes_le, 1, 1, image_count,
+        reshdr(0, 0), reshdr(len(xml_data), xml_offset), reshdr(0, 0), 0,
+        reshdr(0, 0), b'\0' * 60
+    )
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(b'\0' * (xml_offset - len(header)))
+        f.write(xml_data)
+    return path
+
+
+def test_read_multi_index_wim():
+    """Every index is reported with name, architecture, build and edition."""
+
+    print("🔍 Testing native WIM metadata reader...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        wim_path = build_wim(Path(tmp) / "sample.wim")
+        info = read_wim_info(wim_path)
+
+        assert info.header.image_count == 2
+        assert info.header.compression == "lzx"
+        assert info.total_bytes == 12345
+        assert [i.index for i in info.images] == [1, 2]
+
+        first, second = info.images
+        assert first.name == "Windows 10 Enterprise LTSC"
+        assert first.architecture == "x64" and first.build == "10.0.19044.1288"
+        assert first.edition == "EnterpriseS" and first.languages == ["en-US"]
+        assert first.total_bytes == 5000 and first.created.year == 2023
+        assert second.architecture == "arm64" and second.build_number == 26100
+        print(f"   ✅ Read {len(info.images)} images: {[i.name for i in info.images]}")
+
+
+def test_reject_invalid_wim():
+    """Bad magic, truncated files and image count mismatches are detected."""
+
+    print("🔍 Testing invalid WIM handling...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bad_magic = build_wim(Path(tmp) / "bad.wim", magic=b"NOTAWIM\0")
+        try:
+            WimReader(bad_magic).read()
+            assert False, "expected WimReadError"
+        except WimReadError:
+            pass
+
+        truncated = build_wim(Path(tmp) / "truncated.wim")
+        with open(truncated, 'r+b') as f:
+            f.truncate(5000)
+        try:
+            read_wim_info(truncated)
+            assert False, "expected WimReadError"
+        except WimReadError:
+            pass
+        print(f"   ✅ Invalid and truncated WIMs rejected")
+
+        provider = LocalAssetProvider(Path(tmp), build_config={
+            'sbiRoot': tmp,
+            'assetCatalogPath': str(Path(tmp) / "catalog.db"),
+            'digestCachePath': str(Path(tmp) / "digests.db")
+        })
+
+        def sbi(path):
+            return SBIAsset(name=path.stem, path=path, asset_type=AssetType.SBI, metadata={})
+
+        mismatch = build_wim(Path(tmp) / "mismatch.wim", image_count=3)
+        valid = build_wim(Path(tmp) / "valid.wim")
+        assert not asyncio.run(provider.validate_asset(sbi(mismatch)))
+        assert asyncio.run(provider.validate_asset(sbi(valid)))
+        print(f"   ✅ SBI validation uses WIM metadata")
+
+
+if __name__ == "__main__":
+    test_read_multi_index_wim()
+    test_reject_invalid_wim()
+    print("\n✅ All WIM reader tests completed!")
@@ -0,0 +1,129 @@
+"""
+WIM Staging Cache Test Script
+Test cache hits, single-pass misses, digest verification and quota eviction
+"""
+
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add app to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.core.wim_staging import WimStagingCache
+from app.core.wim_handler import WimHandler, WimWorkflow
+from app.core.imaging_backend import SimulatedBackend
+
+
+def make_wim(path: Path, size: int = 2 * 1024 * 1024) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(os.urandom(size))
+    return path
+
+
+def test_staging_cache_hits_and_private_copies():
+    """The second job is a cache hit; a miss reads the source once; job copies never share the pristine file."""
+
+    print("🔍 Testing staging cache hits...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        source = make_wim(root / "sbi" / "w10.wim")
+        cache = WimStagingCache(root / "cache", max_size_mb=100)
+        digest = hashlib.sha256(source.read_bytes()).hexdigest()
+
+        first = asyncio.run(cache.stage(source, root / "job1", expected_sha256=digest))
+        second = asyncio.run(cache.stage(source, root / "job2"))
+        assert not first.cache_hit and first.populate is not None
+        assert second.cache_hit and second.populate is None
+        assert first.path.read_bytes() == second.path.read_bytes() == source.read_bytes()
+        size = source.stat().st_size
+        if first.clone_method == "tee":
+            # No reflink: the source is read once for the pristine and the job copy
+            assert first.populate is first.copy and first.populate.bytes_copied == size
+            assert first.bytes_copied == 2 * size and second.bytes_copied == size
+        else:
+            assert first.clone_method == "reflink" and first.bytes_copied == size and second.bytes_copied == 0
+        assert first.to_dict()['bytes_copied'] == first.bytes_copied
+        print(f"   ✅ Miss then hit, clone methods: {first.clone_method}, {second.clone_method}")
+
+        pristine = cache.cache_path / f"{second.cache_key}.wim"
+        assert pristine.stat().st_nlink == 1
+        with open(second.path, 'r+b') as f:
+            f.write(b"modified")
+        assert pristine.read_bytes() == source.read_bytes()
+        assert not list(cache.cache_path.glob(".reflink-probe*"))
+
+        info = cache.get_cache_info()
+        assert info['hits'] == 1 and info['misses'] == 1 and info['hit_rate'] == 0.5
+
+        # A changed source is a new cache entry
+        os.utime(source, ns=(source.stat().st_atime_ns, source.stat().st_mtime_ns + 10 ** 9))
+        third = asyncio.run(cache.stage(source, root / "job3"))
+        assert not third.cache_hit and cache.get_cache_info()['entries'] == 2
+        print(f"   ✅ Modified source re-staged: {cache.get_cache_info()}")
+
+        try:
+            asyncio.run(cache.stage(make_wim(root / "sbi" / "w11.wim"), root / "job4", expected_sha256="0" * 64))
+            assert False, "digest mismatch should fail"
+        except OSError as e:
+            assert "SHA-256 mismatch" in str(e)
+        assert not list(cache.cache_path.glob("*.part")) and not (root / "job4" / "w11.wim").exists()
+        print(f"   ✅ Source digest mismatch rejected")
+
+
+def test_staging_cache_eviction():
+    """Least recently used entries are evicted over the quota, entries in use are kept."""
+
+    print("🔍 Testing staging cache eviction...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        cache = WimStagingCache(root / "cache", max_size_mb=3)
+        sources = [make_wim(root / "sbi" / f"os{i}.wim") for i in range(3)]
+
+        staged = [asyncio.run(cache.stage(source, root / f"job{i}")) for i, source in enumerate(sources)]
+        # All three are in use: nothing may be evicted yet
+        assert cache.get_cache_info()['entries'] == 3
+
+        for item in staged:
+            cache.release(item)
+        asyncio.run(cache.stage(sources[2], root / "job3"))
+        info = cache.get_cache_info()
+        assert info['entries'] == 1 and info['evictions'] == 2
+        assert (cache.cache_path / f"{staged[2].cache_key}.wim").exists()
+        print(f"   ✅ Evicted to quota: {info}")
+
+
+def test_workflow_uses_staging_cache():
+    """WimWorkflow clones from the cache and reports the outcome."""
+
+    print("🔍 Testing workflow with staging cache...")
+
+    async def run(root: Path):
+        source = make_wim(root / "sbi" / "w10.wim")
+        cache = WimStagingCache(root / "cache")
+        workflow = WimWorkflow(WimHandler(backend=SimulatedBackend()), cache)
+
+        temp_wim = await workflow.prepare_wim_for_modification(source, root / "temp")
+        await workflow.mount_wim_for_modification(temp_wim, root / "mount")
+        assert workflow.workflow_state['staged'].path == temp_wim
+        info = workflow.get_staging_info()
+        await workflow.cleanup_workflow()
+        assert not temp_wim.exists() and not cache._in_use
+        return info
+
+    with tempfile.TemporaryDirectory() as tmp:
+        info = asyncio.run(run(Path(tmp)))
+    assert info['cache_hit'] is False and info['cache']['misses'] == 1
+    print(f"   ✅ Workflow staging info: {info}")
+
+
+if __name__ == "__main__":
+    test_staging_cache_hits_and_private_copies()
+    test_staging_cache_eviction()
+    test_workflow_uses_staging_cache()
+    print("\n✅ All WIM staging tests completed!")
@@ -32,13 +32,25 @@ from app.utils.logging import (
 
 # Import database system
 from app.utils.job_database import get_job_database, init_job_database
+from app.utils.digest_cache import collect_asset_digests, get_digest_cache
+from app.utils.tool_output import step_progress
 
 # Import existing modules
-from app.models.config import ConfigLoader
-from app.core.asset_providers import LocalAssetProvider
-from app.core.wim_handler import WimHandler, WimWorkflow, DismError
+from app.models.config import ConfigLoader, AssetProviderType, DriverInjection, ExportMode
+from app.core.asset_providers import (
+    create_asset_provider, build_provider_settings, LocalAssetProvider, AssetWatcher
+)
+from app.core.wim_handler import WimHandler, WimWorkflow, FINALIZE_OPERATIONS, DismError
+from app.core.imaging_backend import create_imaging_backend
+from app.core.wim_staging import get_wim_staging_cache
+from app.core.serviced_layers import get_serviced_layer_cache, ServicedLayerCache, ServicedLayerError
+from app.core.image_inventory import get_image_inventory_cache, image_inventory_key
+from app.core.mount_manager import get_mount_manager, shutdown_mount_managers, MountManager
+from app.core.variant_wim import get_variant_store, VariantWimStore, VariantWimError
+from app.core.export_benchmark import get_export_benchmark, run_export_benchmark
 from app.core.driver_integration import DriverIntegrator, DriverIntegrationManager
 from app.core.update_integration import UpdateIntegrator, UpdateIntegrationManager
+from app.core.integration_scheduler import IntegrationScheduler
 
 # Configure logging for WebUI
 configure_logging(
@@ -248,6 +260,7 @@ class JobStatus:
         self.job_db = get_job_database()
         self._broadcast_queue = None
         self._broadcast_task = None
+        self._loop = None
         self._initialized = False
         
         # Load existing jobs from database on startup
@@ -260,6 +273,7 @@ class JobStatus:
             
         try:
             self._broadcast_queue = asyncio.Queue()
+            self._loop = asyncio.get_running_loop()
             # Start broadcast worker in the event loop
             self._broadcast_task = asyncio.create_task(self._broadcast_worker())
             self._initialized = True
@@ -471,6 +485,16 @@ class JobStatus:
             except (asyncio.QueueFull, AttributeError):
                 self.logger.warning("Broadcast queue full or not initialized, dropping log message")
     
+    def broadcast_assets_changed(self, change: Dict[str, Any]):
+        """Queue an assets_changed message (called from the asset watcher thread)."""
+        if not (self._initialized and self._broadcast_queue and self._loop):
+            return
+        
+        try:
+            self._loop.call_soon_threadsafe(self._broadcast_queue.put_nowait, change)
+        except RuntimeError:
+            self.logger.warning("Event loop closed, dropping assets_changed message")
+    
     async def add_connection(self, websocket: WebSocket):
         """Add a new WebSocket connection."""
         # Ensure async components are initialized
@@ -564,6 +588,32 @@ class JobStatus:
 # Global job status instance
 job_status = JobStatus()
 
+# Asset watcher (enabled by start_webui.py)
+asset_watcher: Optional[AssetWatcher] = None
+_asset_watcher_enabled = False
+
+
+def enable_asset_watcher(enabled: bool = True) -> None:
+    """Start the asset watcher together with the application."""
+    global _asset_watcher_enabled
+    _asset_watcher_enabled = enabled
+
+def get_layer_cache(build_config) -> ServicedLayerCache:
+    """Get the serviced layer cache configured in the build configuration."""
+    return get_serviced_layer_cache(
+        Path(build_config.servicedLayerCachePath), build_config.servicedLayerCacheMaxSizeMB,
+        get_digest_cache(Path(build_config.digestCachePath), build_config.digestWorkers)
+    )
+
+def get_job_mount_manager(build_config, staging_cache=None) -> MountManager:
+    """Get the mount manager shared by all build jobs of the web UI."""
+    return get_mount_manager(build_config, create_imaging_backend(build_config), staging_cache)
+
+def get_variant_wim_store(build_config) -> VariantWimStore:
+    """Get the store of the shared per-OS WIMs written in append export mode."""
+    return get_variant_store(Path(build_config.variantWimPath), get_job_mount_manager(build_config).backend,
+                             build_config.variantWimCompactPercent)
+
 # =================== PYDANTIC MODELS ===================
 
 class BuildRequest(BaseModel):
@@ -572,6 +622,7 @@ class BuildRequest(BaseModel):
     skip_drivers: bool = False
     skip_updates: bool = False
     skip_validation: bool = False
+    export_profile: Optional[str] = None
 
 class AssetInfo(BaseModel):
     name: str
@@ -689,6 +740,13 @@ async def list_devices() -> List[DeviceInfo]:
         logger.log_operation_failure("list_devices", str(e), duration)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/assets/watcher")
+async def get_asset_watcher() -> Dict[str, Any]:
+    """Get asset watcher state."""
+    if asset_watcher is None:
+        return {"running": False, "enabled": _asset_watcher_enabled}
+    return {"enabled": _asset_watcher_enabled, **asset_watcher.get_watcher_info()}
+
 @app.get("/api/assets/{device}/{os_id}")
 async def get_assets(device: str, os_id: int) -> Dict[str, Any]:
     """Get assets for specific device and OS with detailed logging."""
@@ -697,76 +755,81 @@ async def get_assets(device: str, os_id: int) -> Dict[str, Any]:
     start_time = time.time()
     
     try:
-        # Load configuration
-        kassia_config = ConfigLoader.create_kassia_config(device, os_id)
+        # Load configuration (file I/O off the event loop)
+        kassia_config = await asyncio.to_thread(ConfigLoader.create_kassia_config, device, os_id)
         
-        # Create asset provider with proper build config integration
+        # Create the configured asset provider (local, remote or hybrid)
         assets_path = Path("assets")
         
-        build_config_dict = {
-            'driverRoot': kassia_config.build.driverRoot,
-            'updateRoot': kassia_config.build.updateRoot,
-            'sbiRoot': kassia_config.build.sbiRoot,
-            'yunonaPath': kassia_config.build.yunonaPath,
-            'osWimMap': kassia_config.build.osWimMap
-        }
+        provider = create_asset_provider(kassia_config.build, assets_path)
+        
+        # Discover all asset kinds concurrently on the provider's discovery pool
+        sbi_asset, drivers, updates, scripts = await asyncio.gather(
+            provider.get_sbi(os_id),
+            provider.get_drivers(
+                device, os_id,
+                driver_family_ids=kassia_config.get_driver_families(),
+                device_ids=kassia_config.device.supportedDeviceIds
+            ),
+            provider.get_updates(os_id),
+            provider.get_yunona_scripts()
+        )
         
-        provider = LocalAssetProvider(assets_path, build_config=build_config_dict)
+        # Validate all assets concurrently
+        validation_start = time.time()
+        sbi_valid, driver_valid, update_valid, script_valid = await asyncio.gather(
+            provider.validate_asset(sbi_asset) if sbi_asset else asyncio.sleep(0, result=False),
+            asyncio.gather(*(provider.validate_asset(d) for d in drivers)),
+            asyncio.gather(*(provider.validate_asset(u) for u in updates)),
+            asyncio.gather(*(provider.validate_asset(s) for s in scripts))
+        )
+        validation_duration = time.time() - validation_start
         
-        # Get SBI with proper path resolution
-        sbi_asset = await provider.get_sbi(os_id)
         sbi_info = None
         if sbi_asset:
-            is_valid = await provider.validate_asset(sbi_asset)
             sbi_info = AssetInfo(
                 name=sbi_asset.name,
                 type="SBI",
                 path=str(sbi_asset.path),
                 size=sbi_asset.size,
-                valid=is_valid
+                valid=sbi_valid
             )
         
-        # Get drivers
-        drivers = await provider.get_drivers(device, os_id)
-        driver_list = []
-        
-        for driver in drivers:
-            is_valid = await provider.validate_asset(driver)
-            driver_list.append(AssetInfo(
+        driver_list = [
+            AssetInfo(
                 name=driver.name,
                 type=f"Driver ({driver.driver_type.value.upper()})",
                 path=str(driver.path),
                 size=driver.size,
                 valid=is_valid
-            ))
-        
-        # Get updates
-        updates = await provider.get_updates(os_id)
-        update_list = []
+            )
+            for driver, is_valid in zip(drivers, driver_valid)
+        ]
         
-        for update in updates:
-            is_valid = await provider.validate_asset(update)
-            update_list.append(AssetInfo(
+        update_list = [
+            AssetInfo(
                 name=update.name,
                 type=f"Update ({update.update_type.value.upper()})",
                 path=str(update.path),
                 size=update.size,
                 valid=is_valid
-            ))
-        
-        # Get Yunona scripts
-        scripts = await provider.get_yunona_scripts()
-        script_list = []
+            )
+            for update, is_valid in zip(updates, update_valid)
+        ]
         
-        for script in scripts:
-            is_valid = await provider.validate_asset(script)
-            script_list.append(AssetInfo(
+        script_list = [
+            AssetInfo(
                 name=script.name,
                 type="Yunona Script",
                 path=str(script.path),
                 size=script.size,
                 valid=is_valid
-            ))
+            )
+            for script, is_valid in zip(scripts, script_valid)
+        ]
+        
+        discovery_timings = provider.get_discovery_timings()
+        discovery_timings['validation_wall'] = round(validation_duration, 4)
         
         # Build response
         response = {
@@ -777,7 +840,8 @@ async def get_assets(device: str, os_id: int) -> Dict[str, Any]:
             "updates": [u.dict() for u in update_list],
             "yunona_scripts": [s.dict() for s in script_list],
             "driver_families_required": len(kassia_config.get_driver_families()),
-            "wim_path": str(kassia_config.get_wim_path()) if kassia_config.get_wim_path() else None
+            "wim_path": str(kassia_config.get_wim_path()) if kassia_config.get_wim_path() else None,
+            "discovery_timings": discovery_timings
         }
         
         duration = time.time() - start_time
@@ -785,7 +849,8 @@ async def get_assets(device: str, os_id: int) -> Dict[str, Any]:
             'sbi_found': bool(sbi_info),
             'drivers_count': len(driver_list),
             'updates_count': len(update_list),
-            'scripts_count': len(script_list)
+            'scripts_count': len(script_list),
+            'discovery_timings': discovery_timings
         })
         
         return response
@@ -797,6 +862,225 @@ async def get_assets(device: str, os_id: int) -> Dict[str, Any]:
     finally:
         logger.clear_context()
 
+@app.get("/api/layers")
+async def list_serviced_layers(os_id: Optional[int] = None) -> Dict[str, Any]:
+    """List cached serviced layers (SBI with OS updates applied)."""
+    build_config = await asyncio.to_thread(ConfigLoader.load_build_config)
+    layer_cache = get_layer_cache(build_config)
+    return {
+        "layers": layer_cache.list_layers(os_id),
+        "building": layer_cache.get_building(),
+        "cache": layer_cache.get_cache_info()
+    }
+
+@app.post("/api/layers/{os_id}/build")
+async def build_serviced_layer(os_id: int, background_tasks: BackgroundTasks, force: bool = False) -> Dict[str, Any]:
+    """Pre-build the serviced layer of an OS so device builds start from it."""
+    logger.log_operation_start("build_serviced_layer")
+    start_time = time.time()
+    
+    try:
+        build_config = await asyncio.to_thread(ConfigLoader.load_build_config)
+        provider = create_asset_provider(build_config, Path("assets"))
+        sbi_asset, updates = await asyncio.gather(provider.get_sbi(os_id), provider.get_updates(os_id))
+        if not sbi_asset:
+            raise HTTPException(status_code=404, detail=f"No SBI found for OS {os_id}")
+        
+        imaging_backend = get_job_mount_manager(build_config).backend
+        layer_cache = get_layer_cache(build_config)
+        layer_key = await layer_cache.resolve_key(sbi_asset, updates, imaging_backend, os_id)
+        
+        if force:
+            layer_cache.invalidate(key=layer_key.key)
+        elif layer_cache.exists(layer_key.key):
+            return {"key": layer_key.key, "status": "exists", "update_count": len(layer_key.updates)}
+        
+        if layer_key.key in layer_cache.get_building():
+            return {"key": layer_key.key, "status": "building", "update_count": len(layer_key.updates)}
+        
+        background_tasks.add_task(
+            prebuild_serviced_layer, layer_cache, layer_key, sbi_asset, provider, imaging_backend, build_config
+        )
+        
+        duration = time.time() - start_time
+        logger.log_operation_success("build_serviced_layer", duration, {
+            'layer_key': layer_key.key,
+            'os_id': os_id,
+            'update_count': len(layer_key.updates)
+        })
+        
+        return {"key": layer_key.key, "status": "building", "update_count": len(layer_key.updates)}
+        
+    except HTTPException:
+        raise
+    except ServicedLayerError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        duration = time.time() - start_time
+        logger.log_operation_failure("build_serviced_layer", str(e), duration)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/api/layers")
+async def invalidate_serviced_layers(os_id: Optional[int] = None) -> Dict[str, Any]:
+    """Invalidate the serviced layers of an OS, or all layers."""
+    build_config = await asyncio.to_thread(ConfigLoader.load_build_config)
+    removed = get_layer_cache(build_config).invalidate(os_id=os_id)
+    logger.info("Serviced layers invalidated", LogCategory.WEBUI, {'os_id': os_id, 'removed': removed})
+    return {"removed": removed}
+
+@app.delete("/api/layers/{key}")
+async def invalidate_serviced_layer(key: str) -> Dict[str, Any]:
+    """Invalidate one serviced layer."""
+    build_config = await asyncio.to_thread(ConfigLoader.load_build_config)
+    removed = get_layer_cache(build_config).invalidate(key=key)
+    if not removed:
+        raise HTTPException(status_code=404, detail=f"Serviced layer not found: {key}")
+    logger.info("Serviced layer invalidated", LogCategory.WEBUI, {'layer_key': key})
+    return {"removed": removed}
+
+async def prebuild_serviced_layer(layer_cache: ServicedLayerCache, layer_key, sbi_asset, provider,
+                                  imaging_backend, build_config) -> None:
+    """Background task: build a serviced layer outside of a device build.
+
+    The build takes a build slot and workspace like a job, so it counts
+    against maxConcurrentBuilds and its mount is not mistaken for an orphan.
+    """
+    workspace = None
+    try:
+        provider.start_prefetch()
+        staging_cache = get_wim_staging_cache(
+            Path(build_config.wimStagingCachePath), build_config.wimStagingCacheMaxSizeMB
+        ) if build_config.wimStagingCache else None
+        mount_manager = get_job_mount_manager(build_config, staging_cache)
+        # The slot is taken before the layer's build lock, which jobs holding a slot may wait for
+        workspace = await mount_manager.acquire(f"layer-{layer_key.key[:12]}-{uuid.uuid4().hex[:8]}")
+        layer = await layer_cache.get_or_build(
+            layer_key, sbi_asset.path, imaging_backend, Path(build_config.yunonaPath), staging_cache,
+            before_build=provider.wait_for_prefetch,
+            journal=mount_manager.journal, workspace=workspace
+        )
+        layer_cache.release(layer)
+        logger.info("Serviced layer pre-built", LogCategory.UPDATE, {
+            'layer_key': layer.key,
+            'os_id': layer.os_id,
+            'cache_hit': layer.cache_hit,
+            'build_seconds': layer.build_seconds
+        })
+    except Exception as e:
+        logger.error("Serviced layer pre-build failed", LogCategory.UPDATE, {
+            'layer_key': layer_key.key,
+            'error': str(e)
+        })
+    finally:
+        if workspace is not None:
+            # Keep the directories if the layer could not be unmounted
+            mount_manager.release(workspace, remove_dirs=mount_manager.journal.get(workspace.mount_point) is None)
+
+@app.get("/api/mounts")
+async def get_mounts() -> Dict[str, Any]:
+    """Get build slots, job workspaces and the warm mount pool."""
+    build_config = await asyncio.to_thread(ConfigLoader.load_build_config)
+    staging_cache = get_wim_staging_cache(
+        Path(build_config.wimStagingCachePath), build_config.wimStagingCacheMaxSizeMB
+    ) if build_config.wimStagingCache else None
+    return get_job_mount_manager(build_config, staging_cache).get_pool_info()
+
+@app.post("/api/mounts/recover")
+async def recover_mounts() -> Dict[str, Any]:
+    """Recover journaled mounts whose owner is no longer running."""
+    build_config = await asyncio.to_thread(ConfigLoader.load_build_config)
+    staging_cache = get_wim_staging_cache(
+        Path(build_config.wimStagingCachePath), build_config.wimStagingCacheMaxSizeMB
+    ) if build_config.wimStagingCache else None
+    results = await get_job_mount_manager(build_config, staging_cache).recover()
+    logger.info("Mount recovery requested", LogCategory.WEBUI, {'mounts': len(results)})
+    return {"recovered": results}
+
+@app.get("/api/variants")
+async def list_variant_images(os_id: Optional[int] = None) -> Dict[str, Any]:
+    """List the device images of the shared per-OS WIMs."""
+    build_config = await asyncio.to_thread(ConfigLoader.load_build_config)
+    store = get_variant_wim_store(build_config)
+    images = await store.list_images(os_id)
+    return {
+        "images": [image.to_dict() for image in images],
+        "store": store.get_store_info()
+    }
+
+@app.post("/api/variants/{os_id}/{device_id}/extract")
+async def extract_variant_image(os_id: int, device_id: str) -> Dict[str, Any]:
+    """Export the image of a device from the shared WIM of its OS into a standalone WIM."""
+    logger.log_operation_start("extract_variant_image")
+    start_time = time.time()
+    
+    try:
+        build_config = await asyncio.to_thread(ConfigLoader.load_build_config)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        target = Path(build_config.exportPath) / f"{os_id}_{device_id}_{timestamp}.wim"
+        extracted = await get_variant_wim_store(build_config).extract(os_id, device_id, target)
+        
+        duration = time.time() - start_time
+        logger.log_operation_success("extract_variant_image", duration, {
+            'os_id': os_id,
+            'device': device_id,
+            'path': str(extracted)
+        })
+        return {"path": str(extracted), "size_mb": round(extracted.stat().st_size / (1024 * 1024), 2)}
+        
+    except VariantWimError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        duration = time.time() - start_time
+        logger.log_operation_failure("extract_variant_image", str(e), duration)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/export-profiles")
+async def list_export_profiles() -> Dict[str, Any]:
+    """List the export profiles and their recorded benchmark results."""
+    build_config = await asyncio.to_thread(ConfigLoader.load_build_config)
+    return {
+        "profiles": {name: profile.dict() for name, profile in build_config.exportProfiles.items()},
+        "default": build_config.defaultExportProfile,
+        "benchmark": get_export_benchmark(Path(build_config.exportBenchmarkPath)).summary()
+    }
+
+@app.post("/api/export-profiles/benchmark")
+async def benchmark_export_profiles(os_id: int, background_tasks: BackgroundTasks,
+                                    profile: Optional[str] = None) -> Dict[str, Any]:
+    """Measure export throughput and ratio of the profiles on the SBI of an OS."""
+    build_config = await asyncio.to_thread(ConfigLoader.load_build_config)
+    try:
+        profiles = ({profile: build_config.get_export_profile(profile)} if profile
+                    else dict(build_config.exportProfiles))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    provider = create_asset_provider(build_config, Path("assets"))
+    sbi_asset = await provider.get_sbi(os_id)
+    if not sbi_asset:
+        raise HTTPException(status_code=404, detail=f"No SBI found for OS {os_id}")
+    
+    background_tasks.add_task(run_export_profile_benchmark, build_config, os_id, Path(sbi_asset.path), profiles)
+    return {"status": "started", "os_id": os_id, "profiles": list(profiles)}
+
+async def run_export_profile_benchmark(build_config, os_id: int, sbi_path: Path, profiles: Dict[str, Any]) -> None:
+    """Background task: benchmark export profiles outside of a build."""
+    try:
+        results = await run_export_benchmark(
+            WimHandler(backend=get_job_mount_manager(build_config).backend), sbi_path, profiles,
+            Path(build_config.tempPath) / "export_benchmark",
+            get_export_benchmark(Path(build_config.exportBenchmarkPath))
+        )
+        logger.info("Export profile benchmark completed", LogCategory.WIM, {
+            'os_id': os_id,
+            'results': [result.to_dict() for result in results]
+        })
+    except Exception as e:
+        logger.error("Export profile benchmark failed", LogCategory.WIM, {
+            'os_id': os_id,
+            'error': str(e)
+        })
+
 @app.post("/api/build")
 async def start_build(build_request: BuildRequest, background_tasks: BackgroundTasks) -> Dict[str, str]:
     """Start a new build job with database persistence."""
@@ -804,6 +1088,12 @@ async def start_build(build_request: BuildRequest, background_tasks: BackgroundT
     start_time = time.time()
     
     try:
+        build_config = await asyncio.to_thread(ConfigLoader.load_build_config)
+        try:
+            build_config.get_export_profile(build_request.export_profile)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
         # Create job with all build parameters
         job_id = job_status.create_job(
             build_request.device, 
@@ -818,7 +1108,8 @@ async def start_build(build_request: BuildRequest, background_tasks: BackgroundT
             'device': build_request.device,
             'os_id': build_request.os_id,
             'skip_drivers': build_request.skip_drivers,
-            'skip_updates': build_request.skip_updates
+            'skip_updates': build_request.skip_updates,
+            'export_profile': build_request.export_profile
         })
         
         # Start build in background
@@ -829,7 +1120,8 @@ async def start_build(build_request: BuildRequest, background_tasks: BackgroundT
             build_request.os_id,
             build_request.skip_drivers,
             build_request.skip_updates,
-            build_request.skip_validation
+            build_request.skip_validation,
+            build_request.export_profile
         )
         
         duration = time.time() - start_time
@@ -839,6 +1131,8 @@ async def start_build(build_request: BuildRequest, background_tasks: BackgroundT
         
         return {"job_id": job_id, "status": "started"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         duration = time.time() - start_time
         logger.log_operation_failure("start_build", str(e), duration)
@@ -1293,12 +1587,14 @@ async def handle_websocket_message(websocket: WebSocket, data: dict):
 # =================== ENHANCED BUILD JOB EXECUTION ===================
 
 async def execute_cli_wim_workflow_real(job_id: str, kassia_config, assets_summary: dict, 
-                                       skip_drivers: bool, skip_updates: bool, debug: bool) -> Optional[Path]:
+                                       skip_drivers: bool, skip_updates: bool, debug: bool,
+                                       export_profile: Optional[str] = None) -> Optional[Path]:
     """FIXED: Execute REAL WIM workflow instead of simulation."""
     
     logger.set_context(job_id=job_id)
     logger.log_operation_start("webui_real_wim_workflow")
     workflow_start = time.time()
+    workspace = None
     
     try:
         if not assets_summary['sbi']:
@@ -1315,6 +1611,8 @@ async def execute_cli_wim_workflow_real(job_id: str, kassia_config, assets_summa
         
         sbi_asset = assets_summary['sbi']
         build_config = kassia_config.build
+        provider = assets_summary.get('provider')
+        needs_assets = provider is not None and not (skip_drivers and skip_updates)
         
         # Update job to running
         job_status.update_job(job_id,
@@ -1334,49 +1632,148 @@ async def execute_cli_wim_workflow_real(job_id: str, kassia_config, assets_summa
         })
         
         # FIXED: Initialize REAL WIM Handler and Workflow
-        wim_handler = WimHandler()
-        workflow = WimWorkflow(wim_handler)
+        staging_cache = get_wim_staging_cache(
+            Path(build_config.wimStagingCachePath), build_config.wimStagingCacheMaxSizeMB
+        ) if build_config.wimStagingCache else None
+        mount_manager = get_job_mount_manager(build_config, staging_cache)
+        imaging_backend = mount_manager.backend
+        wim_handler = WimHandler(backend=imaging_backend, journal=mount_manager.journal, owner=job_id)
+        workflow = WimWorkflow(wim_handler, staging_cache)
         
         logger.info("REAL WIM workflow components initialized", LogCategory.WIM)
         
-        # Step 1: REAL WIM Preparation
-        job_status.update_job(job_id,
-            current_step="Preparing WIM for modification",
-            step_number=2,
-            progress=15
-        )
-        
-        logger.info("Starting REAL WIM preparation", LogCategory.WIM)
-        step_start = time.time()
+        # Per-job mount, temp and export directories; waits while maxConcurrentBuilds jobs run
+        if not mount_manager.available_slots():
+            job_status.update_job(job_id, current_step="Waiting for a build slot")
+        workspace = await mount_manager.acquire(job_id)
+        logger.info("Job workspace allocated", LogCategory.WIM, workspace.to_dict())
         
-        temp_dir = Path(build_config.tempPath)
-        temp_wim = await workflow.prepare_wim_for_modification(sbi_asset.path, temp_dir)
+        # Live DISM/wimlib progress of the mount, integration and export steps
+        def report_step(step: str, progress: int) -> None:
+            job_status.update_job(job_id, current_step=step, progress=progress)
         
-        step_duration = time.time() - step_start
-        logger.info("REAL WIM preparation completed", LogCategory.WIM, {
-            'temp_wim': str(temp_wim),
-            'duration': step_duration
-        })
+        # Download remote-only drivers and updates while the SBI is copied and mounted
+        if needs_assets:
+            provider.start_prefetch()
         
-        # Step 2: REAL WIM Mount
-        job_status.update_job(job_id,
-            current_step="Mounting WIM for modification",
-            step_number=3,
-            progress=25
-        )
-        
-        logger.info("Starting REAL WIM mount", LogCategory.WIM)
-        step_start = time.time()
-        
-        mount_point = Path(build_config.mountPoint)
-        mount_info = await workflow.mount_wim_for_modification(temp_wim, mount_point)
+        # OS updates only depend on the SBI: start from the cached serviced layer (built on first use)
+        serviced_layer = None
+        layer_cache = get_layer_cache(build_config) if build_config.servicedLayerCache else None
+        if layer_cache and not skip_updates and assets_summary['updates']:
+            job_status.update_job(job_id,
+                current_step="Resolving serviced layer",
+                step_number=2,
+                progress=10
+            )
+            step_start = time.time()
+            
+            try:
+                layer_key = await layer_cache.resolve_key(
+                    sbi_asset, assets_summary['updates'], imaging_backend, kassia_config.selectedOsId
+                )
+                serviced_layer = await layer_cache.get_or_build(
+                    layer_key, sbi_asset.path, imaging_backend, Path(build_config.yunonaPath), staging_cache,
+                    before_build=provider.wait_for_prefetch if needs_assets else None,
+                    journal=mount_manager.journal, workspace=workspace
+                )
+                logger.info("Serviced layer ready", LogCategory.UPDATE, {
+                    'layer_key': serviced_layer.key,
+                    'cache_hit': serviced_layer.cache_hit,
+                    'update_count': len(serviced_layer.updates),
+                    'duration': time.time() - step_start
+                })
+            except (ServicedLayerError, DismError, OSError) as e:
+                logger.warning("Serviced layer unavailable, integrating updates per job", LogCategory.UPDATE, {
+                    'error': str(e),
+                    'duration': time.time() - step_start
+                })
         
-        step_duration = time.time() - step_start
-        logger.info("REAL WIM mount completed", LogCategory.WIM, {
-            'mount_point': str(mount_point),
-            'duration': step_duration,
-            'read_write': mount_info.read_write
-        })
+        if serviced_layer:
+            source_wim, expected_sha256 = serviced_layer.path, None
+        else:
+            source_wim = sbi_asset.path
+            expected_sha256 = sbi_asset.metadata.get('sha256') if build_config.verifyWimCopy else None
+        
+        warm_mount = mount_manager.take_warm(source_wim, job_id)
+        if warm_mount:
+            # The warm pool already copied and mounted this image
+            if serviced_layer:
+                layer_cache.release(serviced_layer)
+            workspace.adopt(warm_mount)
+            workflow = warm_mount.workflow
+            wim_handler = workflow.wim_handler
+            temp_wim = warm_mount.wim_path
+            mount_point = warm_mount.mount_point
+            mount_info = workflow.workflow_state['mount_info']
+            wim_staging = workflow.get_staging_info()
+            job_status.update_job(job_id,
+                current_step="Using warm mount",
+                step_number=3,
+                progress=25
+            )
+            logger.info("Warm mount taken over", LogCategory.WIM, warm_mount.to_dict())
+        else:
+            # Step 1: REAL WIM Preparation
+            job_status.update_job(job_id,
+                current_step="Preparing WIM for modification",
+                step_number=2,
+                progress=15
+            )
+            
+            logger.info("Starting REAL WIM preparation", LogCategory.WIM)
+            step_start = time.time()
+            
+            temp_dir = workspace.temp_dir
+            
+            def report_copy_progress(progress):
+                job_status.update_job(job_id,
+                    current_step=f"Preparing WIM for modification ({progress.percent:.0f}%, "
+                                 f"{progress.bytes_per_second / (1024 * 1024):.0f} MB/s)",
+                    progress=15 + int(progress.percent * 0.09)
+                )
+            
+            try:
+                temp_wim = await workflow.prepare_wim_for_modification(
+                    source_wim, temp_dir,
+                    expected_sha256=expected_sha256,
+                    progress_callback=report_copy_progress
+                )
+            finally:
+                if serviced_layer:
+                    layer_cache.release(serviced_layer)
+            
+            step_duration = time.time() - step_start
+            wim_staging = workflow.get_staging_info()
+            logger.info("REAL WIM preparation completed", LogCategory.WIM, {
+                'temp_wim': str(temp_wim),
+                'duration': step_duration,
+                'staging': wim_staging,
+                'copy': wim_handler.last_copy.to_dict()
+            })
+            
+            # Step 2: REAL WIM Mount
+            job_status.update_job(job_id,
+                current_step="Mounting WIM for modification",
+                step_number=3,
+                progress=25
+            )
+            
+            logger.info("Starting REAL WIM mount", LogCategory.WIM)
+            step_start = time.time()
+            
+            mount_point = workspace.mount_point
+            mount_info = await workflow.mount_wim_for_modification(
+                temp_wim, mount_point,
+                progress_callback=step_progress("Mounting WIM for modification", 25, 40, report_step)
+            )
+            
+            step_duration = time.time() - step_start
+            logger.info("REAL WIM mount completed", LogCategory.WIM, {
+                'mount_point': str(mount_point),
+                'duration': step_duration,
+                'read_write': mount_info.read_write
+            })
+            
         
         # Verify mount
         windows_dir = mount_point / "Windows"
@@ -1392,34 +1789,74 @@ async def execute_cli_wim_workflow_real(job_id: str, kassia_config, assets_summa
             )
             raise Exception(error_msg)
         
-        # Step 3: REAL Driver Integration
-        if not skip_drivers and assets_summary['drivers']:
-            driver_count = len(assets_summary['drivers'])
+        # Remote assets must be available before integration
+        if needs_assets:
+            await provider.wait_for_prefetch()
+            logger.info("Asset prefetch completed", LogCategory.ASSET, provider.get_fetch_stats())
+        
+        # Drivers and updates the base image already has are not integrated again
+        inventory = None
+        if build_config.imageInventory and (assets_summary['drivers'] or assets_summary['updates']):
+            step_start = time.time()
+            inventory_key = image_inventory_key(sbi_asset.metadata.get('sha256'),
+                                                serviced_layer.key if serviced_layer else None)
+            try:
+                inventory_cache = get_image_inventory_cache(Path(build_config.imageInventoryPath))
+                inventory = await inventory_cache.get_or_read(inventory_key, mount_point)
+                logger.info("Image inventory ready", LogCategory.WIM, {
+                    **inventory.to_dict(),
+                    'duration': time.time() - step_start
+                })
+            except Exception as e:
+                logger.warning("Image inventory unavailable, integrating all drivers and updates", LogCategory.WIM, {
+                    'error': str(e)
+                })
+        
+        # Steps 3 and 4: Driver and update integration, Yunona staging alongside servicing
+        drivers_to_integrate = assets_summary['drivers'] if not skip_drivers else []
+        updates_to_integrate = assets_summary['updates'] if not (serviced_layer or skip_updates) else []
+        driver_manager = DriverIntegrationManager(DriverIntegrator(
+            backend=imaging_backend,
+            batch_inf=kassia_config.build.driverInjection == DriverInjection.BATCH,
+            staging_dir=workspace.temp_dir,
+            hardware_ids=kassia_config.device.hardwareIds,
+            deduplicate=kassia_config.build.driverDeduplication,
+            inventory=inventory
+        ))
+        update_manager = UpdateIntegrationManager(UpdateIntegrator(backend=imaging_backend, inventory=inventory))
+        schedule = None
+        
+        if drivers_to_integrate or updates_to_integrate:
+            item_text = f"{len(drivers_to_integrate)} drivers and {len(updates_to_integrate)} updates"
             job_status.update_job(job_id,
-                current_step=f"Integrating {driver_count} drivers",
+                current_step=f"Integrating {item_text}",
                 step_number=4,
                 progress=40
             )
             
-            logger.info("Starting REAL driver integration", LogCategory.DRIVER, {
-                'driver_count': driver_count
+            logger.info("Starting driver and update integration", LogCategory.WORKFLOW, {
+                'driver_count': len(drivers_to_integrate),
+                'update_count': len(updates_to_integrate),
+                'staging_workers': kassia_config.build.integrationStagingWorkers
             })
-            step_start = time.time()
-            
-            # FIXED: Initialize REAL driver integration components
-            driver_integrator = DriverIntegrator()
-            driver_manager = DriverIntegrationManager(driver_integrator)
             
-            # Execute REAL driver integration
-            integration_result = await driver_manager.integrate_drivers_for_device(
-                assets_summary['drivers'],
+            scheduler = IntegrationScheduler(driver_manager, update_manager,
+                                             kassia_config.build.integrationStagingWorkers)
+            schedule = await scheduler.run(
+                drivers_to_integrate,
+                updates_to_integrate,
                 mount_point,
                 Path(kassia_config.build.yunonaPath),
-                kassia_config.device.deviceId,
-                kassia_config.selectedOsId
+                kassia_config.selectedOsId,
+                progress_callback=step_progress(f"Integrating {item_text}", 40, 75, report_step)
             )
-            
-            step_duration = time.time() - step_start
+            logger.info("Integration lanes", LogCategory.WORKFLOW, schedule.to_dict())
+        
+        # Step 3: REAL Driver Integration
+        if not skip_drivers and assets_summary['drivers']:
+            driver_count = len(assets_summary['drivers'])
+            integration_result = schedule.drivers
+            step_duration = schedule.seconds
             
             if integration_result['success']:
                 successful = integration_result['successful_count']
@@ -1427,7 +1864,9 @@ async def execute_cli_wim_workflow_real(job_id: str, kassia_config, assets_summa
                     'duration': step_duration,
                     'successful_count': successful,
                     'failed_count': integration_result['failed_count'],
-                    'stats': integration_result['stats']
+                    'stats': integration_result['stats'],
+                    'batch': integration_result.get('batch'),
+                    'versions': integration_result.get('versions')
                 })
                 
                 job_status.update_job(job_id,
@@ -1442,7 +1881,9 @@ async def execute_cli_wim_workflow_real(job_id: str, kassia_config, assets_summa
                 logger.error(error_msg, LogCategory.DRIVER, {
                     'duration': step_duration,
                     'failed_count': failed,
-                    'error_message': integration_result['message']
+                    'error_message': integration_result['message'],
+                    'batch': integration_result.get('batch'),
+                    'versions': integration_result.get('versions')
                 })
                 
                 # Continue with warning (don't fail completely)
@@ -1468,32 +1909,22 @@ async def execute_cli_wim_workflow_real(job_id: str, kassia_config, assets_summa
             logger.warning("No drivers found for REAL integration", LogCategory.DRIVER)
         
         # Step 4: REAL Update Integration
-        if not skip_updates and assets_summary['updates']:
-            update_count = len(assets_summary['updates'])
+        if serviced_layer:
             job_status.update_job(job_id,
-                current_step=f"Integrating {update_count} updates",
+                current_step="Updates from serviced layer",
                 step_number=5,
                 progress=65
             )
-            
-            logger.info("Starting REAL update integration", LogCategory.UPDATE, {
-                'update_count': update_count
+            logger.info("Updates provided by serviced layer", LogCategory.UPDATE, {
+                'layer_key': serviced_layer.key,
+                'cache_hit': serviced_layer.cache_hit,
+                'updates': serviced_layer.updates
             })
-            step_start = time.time()
-            
-            # FIXED: Initialize REAL update integration components
-            update_integrator = UpdateIntegrator()
-            update_manager = UpdateIntegrationManager(update_integrator)
             
-            # Execute REAL update integration
-            integration_result = await update_manager.integrate_updates_for_os(
-                assets_summary['updates'],
-                mount_point,
-                Path(kassia_config.build.yunonaPath),
-                kassia_config.selectedOsId
-            )
-            
-            step_duration = time.time() - step_start
+        elif not skip_updates and assets_summary['updates']:
+            update_count = len(assets_summary['updates'])
+            integration_result = schedule.updates
+            step_duration = schedule.seconds
             
             if integration_result['success']:
                 successful = integration_result['successful_count']
@@ -1551,27 +1982,52 @@ async def execute_cli_wim_workflow_real(job_id: str, kassia_config, assets_summa
         logger.info("Starting REAL WIM export", LogCategory.WIM)
         step_start = time.time()
         
-        export_dir = Path(build_config.exportPath)
+        export_dir = workspace.export_dir
+        export_profile = export_profile or build_config.defaultExportProfile
+        profile = build_config.get_export_profile(export_profile)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        export_name = f"{kassia_config.selectedOsId}_{kassia_config.device.deviceId}_{timestamp}.wim"
+        export_name = f"{kassia_config.selectedOsId}_{kassia_config.device.deviceId}_{timestamp}{profile.extension}"
         export_path = export_dir / export_name
+        export_progress = step_progress("Exporting final WIM", 85, 95, report_step, FINALIZE_OPERATIONS)
+        variant = None
         
-        # REAL WIM Export
-        final_wim = await workflow.finalize_and_export_wim(
-            mount_point, 
-            export_path, 
-            export_name=f"Kassia {kassia_config.device.deviceId} OS{kassia_config.selectedOsId}"
-        )
+        if build_config.exportMode == ExportMode.APPEND:
+            # Append the build as the device's index of the shared WIM of the OS
+            variant = await workflow.finalize_and_append_wim(
+                mount_point,
+                get_variant_wim_store(build_config),
+                kassia_config.selectedOsId,
+                kassia_config.device.deviceId,
+                progress_callback=export_progress,
+                compression=profile.compression
+            )
+            final_wim = variant.wim_path
+            export_name = variant.device_id
+        else:
+            # REAL WIM Export
+            final_wim = await workflow.finalize_and_export_wim(
+                mount_point, 
+                export_path, 
+                export_name=f"Kassia {kassia_config.device.deviceId} OS{kassia_config.selectedOsId}",
+                progress_callback=export_progress,
+                strategy=build_config.finalizeStrategy.value,
+                compression=profile.compression,
+                split_size_mb=profile.splitSizeMB
+            )
+        finalize_info = workflow.get_finalize_info()
         
         step_duration = time.time() - step_start
-        export_size = final_wim.stat().st_size
+        export_size = finalize_info['size']
         export_size_mb = export_size / (1024 * 1024)
         
         logger.info("REAL WIM export completed", LogCategory.WIM, {
             'duration': step_duration,
             'final_wim': str(final_wim),
             'size_mb': export_size_mb,
-            'export_name': export_name
+            'export_name': export_name,
+            'export_profile': export_profile,
+            'variant': variant.to_dict() if variant else None,
+            'finalize': finalize_info
         })
         
         # Step 6: REAL Cleanup
@@ -1585,6 +2041,9 @@ async def execute_cli_wim_workflow_real(job_id: str, kassia_config, assets_summa
         step_start = time.time()
         
         await workflow.cleanup_workflow(keep_export=True)
+        workspace_info = workspace.to_dict()
+        mount_manager.release(workspace, remove_dirs=not wim_handler.mounted_images)
+        workspace = None
         
         step_duration = time.time() - step_start
         logger.info("REAL cleanup completed", LogCategory.SYSTEM, {
@@ -1599,11 +2058,24 @@ async def execute_cli_wim_workflow_real(job_id: str, kassia_config, assets_summa
             'final_wim_size_mb': export_size_mb,
             'total_duration_seconds': workflow_duration,
             'export_name': export_name,
+            'variant': variant.to_dict() if variant else {},
+            'finalize': finalize_info,
+            'integration_lanes': schedule.to_dict() if schedule else {},
+            'driver_versions': (schedule.drivers.get('versions') or {}) if schedule else {},
+            'image_inventory': inventory.to_dict() if inventory else {},
+            'export_profile': export_profile,
             'device': kassia_config.device.deviceId,
             'os_id': kassia_config.selectedOsId,
             'drivers_integrated': len(assets_summary['drivers']) if not skip_drivers else 0,
             'updates_integrated': len(assets_summary['updates']) if not skip_updates else 0,
-            'workflow_type': 'REAL_WIM_PROCESSING'
+            'workflow_type': 'REAL_WIM_PROCESSING',
+            'asset_digests': collect_asset_digests(assets_summary),
+            'asset_fetch': provider.get_fetch_stats() if provider else {},
+            'wim_copy': wim_handler.last_copy.to_dict() if wim_handler.last_copy else {},
+            'wim_staging': wim_staging,
+            'workspace': workspace_info,
+            'serviced_layer': serviced_layer.to_dict() if serviced_layer else {},
+            'serviced_layer_cache': layer_cache.get_cache_info() if layer_cache else {}
         }
         
         job_status.update_job(job_id,
@@ -1680,17 +2152,34 @@ async def execute_cli_wim_workflow_real(job_id: str, kassia_config, assets_summa
             import traceback
             traceback.print_exc()
         
+        # Emergency cleanup
+        if workspace is not None:
+            try:
+                await workflow.cleanup_workflow(keep_export=False)
+                logger.info("Emergency cleanup completed", LogCategory.SYSTEM)
+            except Exception as cleanup_error:
+                logger.error("Emergency cleanup failed", LogCategory.SYSTEM, {
+                    'cleanup_error': str(cleanup_error)
+                })
+        
         # Finalize job logging with error
         finalize_job_logging(job_id, "failed", error_msg)
         
         return None
     finally:
+        if workspace is not None:
+            # Directories that are still mounted are left for manual cleanup
+            mount_manager.release(workspace, remove_dirs=not wim_handler.mounted_images)
+        if assets_summary.get('provider') is not None:
+            # Remote packages of this build may be evicted by other builds from now on
+            assets_summary['provider'].release()
         logger.clear_context()
 
 
 # FIXED: Execute REAL build job instead of simulation
 async def execute_build_job_with_logging(job_id: str, device: str, os_id: int, 
-                                       skip_drivers: bool, skip_updates: bool, skip_validation: bool):
+                                       skip_drivers: bool, skip_updates: bool, skip_validation: bool,
+                                       export_profile: Optional[str] = None):
     """FIXED: Execute REAL build job instead of simulation."""
     
     # Set up job-specific logger context
@@ -1732,24 +2221,17 @@ async def execute_build_job_with_logging(job_id: str, device: str, os_id: int,
             # Step 3: Asset Discovery (REAL)
             job_logger.info("Starting REAL asset discovery", LogCategory.ASSET)
             
-            # Create asset provider with proper config integration
+            # Create the configured asset provider (local, remote or hybrid)
             assets_path = Path("assets")
             
-            build_config_dict = {
-                'driverRoot': kassia_config.build.driverRoot,
-                'updateRoot': kassia_config.build.updateRoot,
-                'sbiRoot': kassia_config.build.sbiRoot,
-                'yunonaPath': kassia_config.build.yunonaPath,
-                'osWimMap': kassia_config.build.osWimMap
-            }
-            
-            provider = LocalAssetProvider(assets_path, build_config=build_config_dict)
+            provider = create_asset_provider(kassia_config.build, assets_path)
             
             assets_summary = {
                 'sbi': None,
                 'drivers': [],
                 'updates': [],
-                'yunona_scripts': []
+                'yunona_scripts': [],
+                'provider': provider
             }
             
             # REAL Asset Discovery
@@ -1762,7 +2244,11 @@ async def execute_build_job_with_logging(job_id: str, device: str, os_id: int,
                 job_status.add_job_log(job_id, f"No SBI found for OS {kassia_config.selectedOsId}", "WARNING")
             
             job_status.add_job_log(job_id, "Discovering driver assets", "INFO")
-            drivers = await provider.get_drivers(device, kassia_config.selectedOsId)
+            drivers = await provider.get_drivers(
+                device, kassia_config.selectedOsId,
+                driver_family_ids=kassia_config.get_driver_families(),
+                device_ids=kassia_config.device.supportedDeviceIds
+            )
             assets_summary['drivers'] = drivers
             job_status.add_job_log(job_id, f"Found {len(drivers)} compatible drivers", "INFO")
             
@@ -1776,6 +2262,16 @@ async def execute_build_job_with_logging(job_id: str, device: str, os_id: int,
             assets_summary['yunona_scripts'] = scripts
             job_status.add_job_log(job_id, f"Found {len(scripts)} Yunona scripts", "INFO")
             
+            if provider.asset_digests:
+                job_status.add_job_log(job_id, "Verifying asset digests", "INFO")
+                digest_assets = ([sbi_asset] if sbi_asset else []) + drivers + updates + scripts
+                digests = await provider.digest_assets(digest_assets)
+                failed_digests = [name for name, digest in digests.items() if digest is None]
+                if failed_digests:
+                    job_status.add_job_log(job_id, f"Digest verification failed: {', '.join(failed_digests)}", "WARNING")
+                else:
+                    job_status.add_job_log(job_id, f"Verified {len(digests)} asset digests", "INFO")
+            
             job_status.update_job(
                 job_id,
                 current_step="Asset discovery completed",
@@ -1789,7 +2285,8 @@ async def execute_build_job_with_logging(job_id: str, device: str, os_id: int,
             # FIXED: Call the REAL WIM workflow function
             final_wim = await execute_cli_wim_workflow_real(
                 job_id, kassia_config, assets_summary, 
-                skip_drivers, skip_updates, False  # debug=False for WebUI
+                skip_drivers, skip_updates, False,  # debug=False for WebUI
+                export_profile
             )
             
             if final_wim:
@@ -1901,6 +2398,48 @@ async def startup_event():
         logger.info("Daily statistics updated on startup", LogCategory.WEBUI)
     except Exception as e:
         logger.error("Failed to update statistics on startup", LogCategory.WEBUI, {'error': str(e)})
+    
+    await recover_orphaned_mounts()
+    
+    if _asset_watcher_enabled:
+        await start_asset_watcher()
+
+async def recover_orphaned_mounts():
+    """Clean up (or return to the warm pool) the mounts of builds interrupted by a crash or restart."""
+    try:
+        build_config = await asyncio.to_thread(ConfigLoader.load_build_config)
+        staging_cache = get_wim_staging_cache(
+            Path(build_config.wimStagingCachePath), build_config.wimStagingCacheMaxSizeMB
+        ) if build_config.wimStagingCache else None
+        start = time.time()
+        results = await get_job_mount_manager(build_config, staging_cache).recover()
+        if results:
+            logger.info("Orphaned mounts recovered", LogCategory.WIM, {
+                'mounts': len(results),
+                'actions': [r['action'] for r in results],
+                'failed': [r['mount_point'] for r in results if not r['success']],
+                'duration': time.time() - start
+            })
+    except Exception as e:
+        logger.error("Failed to recover orphaned mounts", LogCategory.WIM, {'error': str(e)})
+
+async def start_asset_watcher():
+    """Keep the local asset catalog current and push changes to WebSocket clients."""
+    global asset_watcher
+    
+    try:
+        build_config = await asyncio.to_thread(ConfigLoader.load_build_config)
+        if build_config.assetProvider and build_config.assetProvider.type == AssetProviderType.SHAREPOINT:
+            logger.info("Asset watcher not started: no local asset tree", LogCategory.ASSET)
+            return
+        
+        provider = LocalAssetProvider(Path("assets"), build_config=build_provider_settings(build_config))
+        asset_watcher = AssetWatcher(provider, on_change=job_status.broadcast_assets_changed)
+        await asyncio.to_thread(asset_watcher.start)
+        logger.info("Asset watcher started", LogCategory.ASSET, asset_watcher.get_watcher_info())
+    except Exception as e:
+        asset_watcher = None
+        logger.error("Failed to start asset watcher", LogCategory.ASSET, {'error': str(e)})
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -1916,6 +2455,13 @@ async def shutdown_event():
             completed_at=datetime.now().isoformat()
         )
     
+    # Stop asset watcher before the broadcast worker it feeds
+    if asset_watcher is not None:
+        await asyncio.to_thread(asset_watcher.stop)
+    
+    # Unmount (discarding) images kept warm for upcoming builds
+    await shutdown_mount_managers()
+    
     # Shutdown broadcast worker
     await job_status.shutdown_broadcast_worker()
     
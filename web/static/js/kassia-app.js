@@ -33,6 +33,8 @@ function setupWebSocketHandlers() {
                 addLogToDisplay(data.job_id, data.log);
             } else if (data.type === 'system_status') {
                 updateSystemStatus(data);
+            } else if (data.type === 'assets_changed') {
+                handleAssetsChanged(data);
             } else if (data.type === 'heartbeat') {
                 window.kassiaState.lastHeartbeat = new Date();
                 updateConnectionStatus('connected');
@@ -1197,6 +1199,22 @@ function displayAssets(assets) {
     assetsContent.innerHTML = html;
 }
 
+function handleAssetsChanged(data) {
+    console.log('📦 Assets changed:', data);
+    
+    // The catalog is already up to date on the server; just re-query the visible views
+    const state = window.kassiaState;
+    if (state.selectedDevice && state.selectedOS) {
+        loadAssetPreview(state.selectedDevice, state.selectedOS);
+    }
+    
+    const deviceFilter = document.getElementById('assetDeviceFilter');
+    const osFilter = document.getElementById('assetOSFilter');
+    if (deviceFilter && osFilter && deviceFilter.value && osFilter.value) {
+        loadAssetsForFilter();
+    }
+}
+
 function refreshAssets() {
     console.log('🔄 Refreshing assets...');
     loadAssetsForFilter();
@@ -130,6 +130,12 @@ class WebSocketManager {
                 }
                 break;
                 
+            case 'assets_changed':
+                if (this.onJobUpdate) {
+                    this.onJobUpdate(data);
+                }
+                break;
+                
             case 'pong':
                 console.log('🏓 Received pong');
                 break;